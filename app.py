@@ -30,6 +30,8 @@ from routes.utils import encode_image_uploads, encode_reference_urls
 from routes.publish_api import publish_api
 from routes.generate_api import generate_api
 from routes.bucket_api import buckets_bp
+from routes.bucket_watcher import start_bucket_watcher
+from routes import output_serving
 from routes.test_buckets_ui import test_buckets_bp
 from routes.scheduler_api import scheduler_bp
 from routes.test_scheduler_ui import test_scheduler_bp
@@ -58,6 +60,7 @@ sys.path.append(os.path.abspath(os.path.dirname(__file__)))
 
 # Set app config
 app.config['OUTPUT_DIR'] = OUTPUT_DIR
+output_serving.init(os.path.join(app.root_path, OUTPUT_DIR))
 
 # Register API blueprints with consistent prefix
 app.register_blueprint(publish_api, url_prefix=API_PREFIX)
@@ -176,7 +179,7 @@ def serve(path):
     """Serve static files and handle React frontend routing."""
     # Handle output directory requests
     if path.startswith(f'{OUTPUT_DIR}/'):
-        return send_from_directory(OUTPUT_DIR, path[len(OUTPUT_DIR)+1:])
+        return output_serving.serve(path[len(OUTPUT_DIR)+1:])
 
     # Handle React frontend requests
     if path != "" and os.path.exists(app.static_folder + '/' + path):
@@ -212,6 +215,9 @@ if __name__ == '__main__':
     ws_thread.start()
     alerts_health.register_ws_thread(ws_thread)
 
+    # No-op unless BUCKET_WATCHER_ENABLED
+    start_bucket_watcher()
+
     if DEBUG:
         info(f"Starting Flask dev server on port {PORT} (DEBUG)")
         app.run(host=HOST, debug=True, port=PORT, use_reloader=False)
@@ -17,6 +17,12 @@ PORT = 5000
 DEBUG = False
 WS_PORT = 8765
 
+# WebSocket relay outboxes — see connection_registry.Outbox. Each viewer has a
+# bounded queue drained by its own writer, so broadcasts never wait on a socket.
+WS_SEND_QUEUE_MAX = 64            # queued messages per client before the oldest is dropped
+WS_SEND_TIMEOUT_S = 10            # a send stuck this long closes the client (checked as messages arrive)
+WS_SLOW_CLIENT_MAX_DROPS = 256    # drops since the last completed send that close the client
+
 # API settings
 API_PREFIX = '/api'
 LOG_LIMIT = 100  # Default number of logs to return
@@ -25,6 +31,102 @@ LOG_LIMIT = 100  # Default number of logs to return
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'mp4', 'webm'}
 MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size 
 
+# Bucket storage — see routes/blobstore.py. When enabled, bucket media are
+# hardlinks into a content-addressed store under output/_blobs/ so the same
+# image saved to several buckets is stored once.
+BUCKET_DEDUP_ENABLED = False
+
+# Bucket watcher — see routes/bucket_watcher.py. Picks up files copied into
+# output/<bucket>/ outside the API (inotify, polling fallback) and indexes
+# them incrementally instead of needing a full reindex.
+BUCKET_WATCHER_ENABLED = False
+BUCKET_WATCHER_DEBOUNCE_S = 2.0   # quiet period before a burst of changes is applied
+BUCKET_WATCHER_POLL_S = 15.0      # polling fallback interval / new-bucket discovery
+
+# Bucket quotas — see routes/bucket_usage.py. Per-destination "quota" entries
+# in publish-destinations.json override these; None means no quota.
+BUCKET_QUOTA_SOFT_BYTES = None    # warning alert above this
+BUCKET_QUOTA_HARD_BYTES = None    # error alert (and eviction if enabled) above this
+BUCKET_QUOTA_AUTO_EVICT = False   # evict oldest non-favourites back to the soft quota
+OUTPUT_MIN_FREE_BYTES = 2 * 1024 ** 3   # critical alert when output/ has less free space
+
+# Bucket archiving — see routes/bucket_archive.py. Buckets with an "archive"
+# policy are archived in the background after ingests: straight away once the
+# hot sequence is over max_count, otherwise at most once per interval.
+BUCKET_ARCHIVE_AUTO = True
+BUCKET_ARCHIVE_INTERVAL_S = 3600
+
+# Perceptual-hash index — see routes/phash.py. Ingested items are hashed on
+# this many background threads; queries use whatever is indexed so far.
+PHASH_WORKERS = 1
+
+# /output serving — see routes/output_serving.py. File validators are cached
+# in memory; unchanged files are re-checked against the disk at most this often.
+OUTPUT_STAT_TTL_S = 2.0
+OUTPUT_STAT_CACHE_SIZE = 4096
+
+# Per-display variants — see routes/display_variants.py. Published images are
+# also rendered at each destination's maxwidth × maxheight; a destination's
+# "device_class" picks the encoding.
+DISPLAY_VARIANTS_ENABLED = True
+DISPLAY_VARIANT_DEFAULT_CLASS = "browser"
+DISPLAY_VARIANT_PROFILES = {
+    "browser":   {"format": "WEBP", "quality": 82, "video_max_kbps": 12000},
+    "tv":        {"format": "JPEG", "quality": 90, "video_max_kbps": 8000},   # hardware JPEG decoders
+    "low-power": {"format": "JPEG", "quality": 78, "video_max_kbps": 4000},
+}
+DISPLAY_VARIANT_CACHE_MAX = 500   # rendered files kept under output/_variants/
+
+# Video normalization — see routes/video_normalize.py. Published MP4s get a
+# fast-start copy (moov moved to the front, no re-encode); ones over the
+# destination's "video_max_kbps" (else the profile's) or not in a playable
+# codec are transcoded to H.264 when local ffmpeg is available. Off by
+# default: the original is published at once and the normalized copy follows
+# in a second publish event when a worker has made it.
+VIDEO_NORMALIZE_ENABLED = False
+VIDEO_NORMALIZE_WORKERS = 1
+VIDEO_PLAYABLE_CODECS = ("avc1", "avc3")
+VIDEO_BITRATE_TOLERANCE = 1.2     # only transcode when this far over the cap
+VIDEO_VARIANT_CACHE_MAX = 50      # normalized videos kept under output/_variants/
+VIDEO_TRANSCODE_PRESET = "veryfast"
+VIDEO_TRANSCODE_TIMEOUT_S = 600
+FFMPEG_PATH = "ffmpeg"
+
+# Bucket display prefetch — see routes/display_prefetch.py. After each
+# Next/Previous/Random display the likely next items are staged in the background.
+DISPLAY_PREFETCH_ENABLED = True
+DISPLAY_PREFETCH_DEPTH = 1        # items staged in each direction (plus the next random draw)
+DISPLAY_PREFETCH_WORKERS = 2
+
+# Background publishing — see routes/publish_queue.py.
+PUBLISH_QUEUE_WORKERS = 4         # publishes running at once (one per destination at a time)
+PUBLISH_QUEUE_HISTORY = 200       # finished jobs kept for status queries
+
+# Group fan-out — publisher.publish_to_group fetches and decodes once, then
+# writes each destination's output on this many threads.
+GROUP_PUBLISH_WORKERS = 4
+
+# Overlay rendering caches — see routes/utils.dict_substitute and
+# routes/display.send_overlay. File templates are compiled once per mtime;
+# these bound the in-memory LRUs for the rest.
+TEMPLATE_CACHE_MAX = 64           # compiled inline (string) templates
+QR_CACHE_MAX = 128                # QR code images, by encoded URL
+OVERLAY_RENDER_CACHE_MAX = 256    # rendered overlays, by (template, substitutions)
+
+# Publish undo/redo history — see routes/publish_utils.py. One append-only
+# log per destination (output/<dest>/publish_history.jsonl).
+PUBLISH_HISTORY_MAX = 1000        # entries kept per destination
+PUBLISH_HISTORY_COMPACT_SLACK = 500   # rewrite the log once it has this many dead lines
+
+# Outgoing HTTP — see routes/http_client.py. One pooled keep-alive session;
+# idempotent requests are retried with exponential backoff.
+HTTP_CONNECT_TIMEOUT_S = 10
+HTTP_READ_TIMEOUT_S = 120
+HTTP_RETRIES = 3
+HTTP_RETRY_BACKOFF_S = 0.5        # retries after 0s, 1s, 2s
+HTTP_POOL_SIZE = 16               # connections kept per host
+HTTP_DOWNLOAD_CHUNK = 1024 * 1024
+
 # Scheduler settings
 SCHEDULER_TICK_INTERVAL = 2.0  # Seconds between scheduler trigger checks
 SCHEDULER_TICK_BUFFER = 0.5    # Additional buffer time for scheduler operations 
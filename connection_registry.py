@@ -1,7 +1,90 @@
-from typing import Dict, Set
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional, Set
+import itertools
 import websockets
 import asyncio
 
+import config
+from utils.logger import debug, info
+
+
+class Outbox:
+    """
+    Bounded outgoing queue for one socket, drained by its own writer task,
+    so a broadcast never waits on a slow client:
+
+      • put() never blocks. A message with a coalesce key replaces the queued
+        one with the same key (only the latest lux reading, publish or job
+        progress matters); when the queue is full the oldest message is dropped
+      • a client is closed as a slow consumer when a message arrives while
+        one send has been stuck for over WS_SEND_TIMEOUT_S, or once it has
+        dropped WS_SLOW_CLIENT_MAX_DROPS messages since its last completed send
+    """
+    def __init__(self, ws, on_close: Callable[[object], None]):
+        self.ws = ws
+        self.on_close = on_close
+        self.queue: "OrderedDict[object, str]" = OrderedDict()
+        self.dropped = 0
+        self.closed = False
+        self.sending_since: Optional[float] = None
+        self._ids = itertools.count()
+        self._wake = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._writer())
+
+    def put(self, msg: str, key: Optional[str] = None):
+        if self.closed:
+            return
+        loop = asyncio.get_running_loop()
+        if self.sending_since is not None and loop.time() - self.sending_since > config.WS_SEND_TIMEOUT_S:
+            self.close("send timeout")
+            return
+        if key is not None and key in self.queue:
+            self.queue[key] = msg               # same place in line, newest content
+        else:
+            if len(self.queue) >= config.WS_SEND_QUEUE_MAX:
+                self.queue.popitem(last=False)
+                self.dropped += 1
+                if self.dropped >= config.WS_SLOW_CLIENT_MAX_DROPS:
+                    self.close("slow consumer")
+                    return
+            self.queue[key if key is not None else next(self._ids)] = msg
+        self._wake.set()
+
+    async def _writer(self):
+        try:
+            while not self.closed:
+                if not self.queue:
+                    self._wake.clear()
+                    await self._wake.wait()
+                    continue
+                _, msg = self.queue.popitem(last=False)
+                self.sending_since = asyncio.get_running_loop().time()
+                await self.ws.send(msg)
+                self.sending_since = None
+                self.dropped = 0
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            debug(f"🔌 Send to {getattr(self.ws, 'remote_address', '?')} failed: {e}")
+            self.close(None)
+
+    def close(self, reason: Optional[str]):
+        """Stop writing to the socket, close it if *reason* is given, and unregister it."""
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.clear()
+        if reason:
+            info(f"🐢 Closing {getattr(self.ws, 'remote_address', '?')}: {reason}")
+            try:
+                asyncio.get_running_loop().create_task(self.ws.close(code=1013, reason=reason))
+            except Exception:
+                pass
+        if self._task is not asyncio.current_task():
+            self._task.cancel()
+        self.on_close(self.ws)
+
+
 class ConnectionRegistry:
     """Central place to track active websocket connections."""
     def __init__(self):
@@ -9,6 +92,14 @@ class ConnectionRegistry:
         self.audio_by_target: Dict[str, websockets.WebSocketServerProtocol] = {}
         # Overlay viewers (read-only)
         self.overlays: Set[websockets.WebSocketServerProtocol] = set()
+        # Topic subscriptions (screen ids, groups, "job:<id>", "index") both ways
+        # round, so a send only touches its subscribers. Viewers that never
+        # subscribed are "unfiltered" and still get everything.
+        self.by_topic: Dict[str, Set[websockets.WebSocketServerProtocol]] = {}
+        self.topics_of: Dict[websockets.WebSocketServerProtocol, Set[str]] = {}
+        self.unfiltered: Set[websockets.WebSocketServerProtocol] = set()
+        # One outgoing queue + writer task per viewer, created on first send
+        self.outboxes: Dict[websockets.WebSocketServerProtocol, Outbox] = {}
 
     # ---------- audio producers ----------
     def attach_audio(self, target: str, ws: websockets.WebSocketServerProtocol):
@@ -37,8 +128,55 @@ class ConnectionRegistry:
     # ---------- overlay viewers ----------
     def add_overlay(self, ws: websockets.WebSocketServerProtocol):
         self.overlays.add(ws)
+        if ws not in self.topics_of:
+            self.unfiltered.add(ws)
 
     def remove_overlay(self, ws: websockets.WebSocketServerProtocol):
         self.overlays.discard(ws)
+        self.unfiltered.discard(ws)
+        for topic in self.topics_of.pop(ws, ()):
+            self._drop(topic, ws)
+        outbox = self.outboxes.pop(ws, None)
+        if outbox is not None:
+            outbox.close(None)
+
+    def outbox(self, ws: websockets.WebSocketServerProtocol) -> Outbox:
+        """*ws*'s outgoing queue (call from the event loop)."""
+        outbox = self.outboxes.get(ws)
+        if outbox is None:
+            outbox = self.outboxes[ws] = Outbox(ws, self.remove_overlay)
+        return outbox
+
+    def subscribe(self, ws: websockets.WebSocketServerProtocol, topics: Iterable[str]):
+        """Add topics to a viewer's subscriptions (registering it if needed)."""
+        self.overlays.add(ws)
+        self.unfiltered.discard(ws)
+        mine = self.topics_of.setdefault(ws, set())
+        for topic in topics:
+            mine.add(topic)
+            self.by_topic.setdefault(topic, set()).add(ws)
+
+    def unsubscribe(self, ws: websockets.WebSocketServerProtocol, topics: Iterable[str]):
+        """Drop topics from a viewer's subscriptions; it stays filtered."""
+        mine = self.topics_of.get(ws, set())
+        for topic in topics:
+            mine.discard(topic)
+            self._drop(topic, ws)
+
+    def _drop(self, topic: str, ws: websockets.WebSocketServerProtocol):
+        subscribers = self.by_topic.get(topic)
+        if subscribers is not None:
+            subscribers.discard(ws)
+            if not subscribers:
+                del self.by_topic[topic]
+
+    def recipients(self, topics: Optional[Iterable[str]]) -> Set[websockets.WebSocketServerProtocol]:
+        """Viewers that should get a message for *topics* (None = everyone)."""
+        if topics is None:
+            return set(self.overlays)
+        found = set(self.unfiltered)
+        for topic in topics:
+            found |= self.by_topic.get(topic, set())
+        return found
 
 registry = ConnectionRegistry()  # singleton 
\ No newline at end of file
@@ -8,6 +8,8 @@ from utils.logger import debug, warning, error, info
 from routes.lightsensor import broadcast_lux_level
 from routes.audio_utils import get_audio_transcriber
 from connection_registry import registry  # NEW central registry
+from routes import publish_events
+from routes.utils import _load_json_once
 
 DEBUGGING = False  # Keep original debugging off
 
@@ -52,6 +54,7 @@ PING_TIMEOUT = 10  # seconds
 
 # Add with other global variables
 last_stop_time = {}  # Track last stop time by target
+_server_loop = None  # the loop ws_main runs on; client outboxes live there
 
 # Lightweight keep-alive that just sends a ping every 20 s so that
 # the event-loop touches the socket and client pings are answered.
@@ -87,6 +90,65 @@ async def ping_client(websocket, client_id=None):
     except asyncio.CancelledError:
         pass  # Task was cancelled, exit gracefully
 
+def _with_groups(topics) -> set:
+    """*topics* plus the groups of any destination ids among them."""
+    topics = set(topics or [])
+    try:
+        destinations = _load_json_once("destination", "publish-destinations.json") or []
+    except FileNotFoundError:
+        return topics
+    for d in destinations:
+        if d.get("id") in topics:
+            topics.update(d.get("groups", []))
+    return topics
+
+
+def message_topics(data: dict):
+    """Topics a relayed message is for, or None if every viewer should get it."""
+    screens = data.get("screens")
+    if isinstance(screens, str):
+        screens = [screens]
+    if not screens or "*" in screens or "global" in screens:
+        return None
+    topics = set(screens)
+    if data.get("job_id"):
+        topics.add(f"job:{data['job_id']}")
+    return topics
+
+
+# Viewers subscribe to topics (screen ids, groups, "job:<id>", "index") with
+# {"type": "subscribe", "topics": [...]} at connect time or later, and drop them
+# with {"type": "unsubscribe", "topics": [...]}. A subscribe may carry
+# "since": {dest_id: version} to be sent the publish events it missed.
+async def _subscribe(websocket, data: dict):
+    registry.subscribe(websocket, _with_groups(data.get("topics") or data.get("screens")))
+    since = data.get("since")
+    if isinstance(since, dict) and since:
+        events = await asyncio.to_thread(publish_events.missed, list(since), since)
+        outbox = registry.outbox(websocket)
+        for event in events:
+            outbox.put(json.dumps(event), coalesce_key(event))
+
+
+async def listen_for_subscriptions(websocket):
+    """Handle a viewer's (un)subscribe messages until it disconnects."""
+    try:
+        async for msg in websocket:
+            try:
+                data = json.loads(msg)
+            except (json.JSONDecodeError, TypeError):
+                continue
+            if not isinstance(data, dict):
+                continue
+            if data.get("type") == "subscribe":
+                await _subscribe(websocket, data)
+            elif data.get("type") == "unsubscribe":
+                registry.unsubscribe(websocket, _with_groups(data.get("topics") or data.get("screens")))
+    except websockets.exceptions.ConnectionClosed:
+        pass
+    finally:
+        registry.remove_overlay(websocket)
+
 # Handle WebSocket connections from overlay clients (receivers) and relays (senders)
 async def handler(websocket):
     is_audio_client = False
@@ -108,6 +170,13 @@ async def handler(websocket):
 
             try:
                 data = json.loads(first_msg)
+                # Display page subscribing to publish events: register it as an
+                # overlay listener and replay anything newer than what it last saw
+                if data.get("type") == "subscribe":
+                    await _subscribe(websocket, data)
+                    await listen_for_subscriptions(websocket)
+                    return
+
                 # Check if this is an audio client based on the message type
                 if data.get("type") == "audio":
                     target = data.get("target", "global")
@@ -163,10 +232,7 @@ async def handler(websocket):
             # No message received within timeout - this is a persistent overlay listener
             if DEBUGGING: debug(f"🖥️ Registered overlay client: {websocket.remote_address}")
             registry.add_overlay(websocket)
-            try:
-                await websocket.wait_closed()
-            except websockets.exceptions.ConnectionClosed:
-                pass
+            await listen_for_subscriptions(websocket)
             return
 
         # Now listen for more messages
@@ -242,55 +308,63 @@ async def handler(websocket):
         if keepalive_task:
             keepalive_task.cancel()
 
-# Send overlay message to all connected clients
-async def send_overlay_to_clients(data: dict):
-    if DEBUGGING: debug("📤 Preparing to broadcast overlay:", data)
-
+def coalesce_key(data: dict):
+    """
+    Queued messages with the same key replace each other in a client's
+    outbox (only the newest matters); None means every message is delivered.
+    """
+    if data.get("type") == "published":
+        return f"published:{data.get('dest')}"
+    if "lux" in data:
+        return f"lux:{data.get('sensor_name', 'default')}"
+    if data.get("type") == "transcription" and not data.get("is_end_of_turn"):
+        return f"transcription:{data.get('target')}"
+    if data.get("type") == "generation_update" and data.get("status") == "progress":
+        return f"generation:{data.get('batch_id')}"
+    if data.get("job_id") and data.get("clear", True):
+        return f"job:{data['job_id']}"      # progress overlays that replace each other anyway
+    return None
+
+
+def _fan_out(data: dict):
+    """Queue *data* for each subscribed client; never waits on a socket."""
     # Add specific logging for transcription messages
     if data.get("type") == "transcription":
         info(f"🎙️ Broadcasting transcription: target='{data.get('target')}'")
 
-    if not registry.overlays:
+    recipients = registry.recipients(message_topics(data))
+    if not recipients:
         debug("⚠️ No connected overlay clients.")
         return
 
     msg = json.dumps(data)
     if DEBUGGING: debug(f"📦 Broadcasting message: {msg}")
 
-    # Send to each client individually and handle disconnections
-    disconnected_clients = []
-    successful_sends = 0
-    
-    for ws in list(registry.overlays):  # Iterate over a snapshot
-        try:
-            await ws.send(msg)
-            successful_sends += 1
-        except websockets.exceptions.ConnectionClosed:
-            # Client disconnected, mark for removal
-            disconnected_clients.append(ws)
-            debug(f"🔌 Client {ws.remote_address} disconnected, removing from list")
-        except Exception as e:
-            # Other error, also mark for removal
-            disconnected_clients.append(ws)
-            debug(f"❌ Error sending to client {ws.remote_address}: {e}")
-    
-    # Remove disconnected clients
-    for ws in disconnected_clients:
-        registry.remove_overlay(ws)
-    
-    # Log results
+    key = coalesce_key(data)
+    for ws in recipients:
+        registry.outbox(ws).put(msg, key)
+
     if data.get("type") == "transcription":
-        if successful_sends > 0:
-            info(f"✅ Successfully sent transcription to {successful_sends} client(s)")
-        if disconnected_clients:
-            info(f"🧹 Removed {len(disconnected_clients)} disconnected clients")
-    
-    # Log if we removed any clients
-    if disconnected_clients and DEBUGGING:
-        debug(f"🧹 Cleaned up {len(disconnected_clients)} disconnected clients")
+        info(f"✅ Queued transcription for {len(recipients)} client(s)")
+
+# Send overlay message to the clients subscribed to it (all of them if it isn't addressed).
+# Each client's outbox writer does the actual send, so one slow socket delays nobody else.
+async def send_overlay_to_clients(data: dict):
+    if DEBUGGING: debug("📤 Preparing to broadcast overlay:", data)
+    if _server_loop is not None and asyncio.get_running_loop() is not _server_loop:
+        # Called on a throwaway loop (e.g. send_overlay from a Flask thread):
+        # outboxes live on the server's loop
+        _server_loop.call_soon_threadsafe(_fan_out, data)
+        return
+    _fan_out(data)
 
 # WebSocket server entry point
 async def ws_main():
+    global _server_loop
+    loop = _server_loop = asyncio.get_running_loop()
+    publish_events.add_listener(
+        "ws", lambda event: asyncio.run_coroutine_threadsafe(send_overlay_to_clients(event), loop)
+    )
     async with websockets.serve(
         handler,
         "0.0.0.0",
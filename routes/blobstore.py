@@ -0,0 +1,232 @@
+"""
+blobstore.py – content-addressed storage for bucket media.
+
+When config.BUCKET_DEDUP_ENABLED is on, every media file that enters a bucket
+is hashed (SHA-256) and stored once under output/_blobs/<aa>/<digest><ext>.
+The bucket entry is a hardlink to that blob (or a reflink copy when the
+filesystem can't hardlink), so publishing, favouriting and saving the same
+image to several buckets costs one copy of the bytes.
+
+Reference counting uses the inode link count: a blob whose st_nlink has
+dropped back to 1 is referenced only by the store itself and can be removed.
+release() handles the common single-reference case eagerly and
+collect_garbage() sweeps anything left behind (called at the end of a purge).
+
+Bucket media must never be rewritten in place while dedup is on – replace
+files by writing a new path and renaming over the old one.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+
+import config
+from utils.logger import info, warning, debug
+
+BLOB_ROOT = Path("output").resolve() / "_blobs"
+HASH_CHUNK = 1024 * 1024
+DIGEST_CACHE_MAX = 4096
+
+_digest_lock = threading.Lock()
+_digest_cache: "OrderedDict[tuple, str]" = OrderedDict()
+
+# Linux FICLONE ioctl (btrfs, xfs, bcachefs); absent elsewhere
+_FICLONE = 0x40049409
+
+
+def enabled() -> bool:
+    return bool(getattr(config, "BUCKET_DEDUP_ENABLED", False))
+
+
+def hash_file(path: Path) -> str:
+    """
+    Stream *path* through SHA-256 and return the hex digest. Digests are
+    memoised per (device, inode, size, mtime), so hashing a bucket file, its
+    blob and the published pointer linked to it reads the bytes once.
+    """
+    key = _digest_key(path)
+    with _digest_lock:
+        digest = _digest_cache.get(key)
+        if digest is not None:
+            _digest_cache.move_to_end(key)
+            return digest
+
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+    _remember(key, digest)
+    return digest
+
+
+def _digest_key(path: Path) -> tuple:
+    st = os.stat(path)
+    return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+def _remember(key: tuple, digest: str):
+    with _digest_lock:
+        _digest_cache[key] = digest
+        _digest_cache.move_to_end(key)
+        while len(_digest_cache) > DIGEST_CACHE_MAX:
+            _digest_cache.popitem(last=False)
+
+
+def remember_digest(path: Path, digest: str):
+    """Record the digest of a file that was hashed while it was written."""
+    _remember(_digest_key(path), digest)
+
+
+def blob_path(digest: str, suffix: str = "") -> Path:
+    return BLOB_ROOT / digest[:2] / f"{digest}{suffix.lower()}"
+
+
+def _reflink(src: Path, dst: Path) -> bool:
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    try:
+        with open(src, "rb") as fs, open(dst, "wb") as fd:
+            fcntl.ioctl(fd.fileno(), _FICLONE, fs.fileno())
+        shutil.copystat(src, dst)
+        return True
+    except OSError:
+        dst.unlink(missing_ok=True)
+        return False
+
+
+def ingest(src: Path, digest: str | None = None) -> Path:
+    """
+    Make sure the content of *src* exists in the blob store and return the
+    blob path. New content is copied in (reflinked where the filesystem
+    allows), never hardlinked: *src* may be a temp download or another
+    bucket's file, and must not end up sharing the blob's inode.
+    """
+    digest = digest or hash_file(src)
+    blob = blob_path(digest, src.suffix)
+    if blob.exists():
+        return blob
+
+    blob.parent.mkdir(parents=True, exist_ok=True)
+    # Copy in under a temp name and link it into place so a concurrent ingest
+    # of the same content can't replace a blob that already has bucket links
+    # pointing at it.
+    tmp = blob.with_name(f".{uuid.uuid4().hex}.tmp")
+    try:
+        if not _reflink(src, tmp):
+            shutil.copy2(src, tmp)
+        try:
+            os.link(tmp, blob)
+        except FileExistsError:
+            pass
+    finally:
+        tmp.unlink(missing_ok=True)
+    return blob
+
+
+def _link_blob(blob: Path, dst: Path) -> bool:
+    try:
+        os.link(blob, dst)
+        debug(f"[blobstore] Linked {dst.name} -> {blob.name}")
+        return True
+    except FileNotFoundError:
+        raise
+    except OSError:
+        pass
+    if _reflink(blob, dst):
+        debug(f"[blobstore] Reflinked {dst.name} -> {blob.name}")
+        return True
+    return False
+
+
+def store(src: Path, dst: Path) -> Path:
+    """
+    Place the content of *src* at *dst*.
+
+    With dedup disabled this is shutil.copy2. With dedup enabled *dst*
+    becomes a hardlink to the content's blob (reflink, then plain copy as
+    fallbacks), so a second bucket holding the same bytes costs no space.
+    """
+    if not enabled():
+        shutil.copy2(src, dst)
+        return dst
+
+    # Two tries: collect_garbage() can remove a freshly ingested blob before
+    # it has been linked to, in which case ingesting again recreates it.
+    for _ in range(2):
+        try:
+            blob = ingest(src)
+        except OSError as e:
+            warning(f"[blobstore] Ingest failed for {src.name}, copying instead: {e}")
+            break
+        try:
+            if _link_blob(blob, dst):
+                return dst
+            break
+        except FileNotFoundError:
+            continue
+
+    shutil.copy2(src, dst)
+    return dst
+
+
+def release(path: Path) -> None:
+    """
+    Unlink a bucket media file. With dedup on, if that drops the last bucket
+    reference to its blob, remove the blob too (leftovers from a time dedup
+    was on are swept by collect_garbage()).
+    """
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return
+
+    blob = None
+    if enabled() and st.st_nlink == 2 and BLOB_ROOT.exists():
+        try:
+            candidate = blob_path(hash_file(path), path.suffix)
+            if candidate.exists() and os.path.samefile(candidate, path):
+                blob = candidate
+        except OSError:
+            blob = None
+
+    path.unlink(missing_ok=True)
+    if blob is not None:
+        blob.unlink(missing_ok=True)
+        debug(f"[blobstore] Released last reference to {blob.name}")
+
+
+def collect_garbage() -> dict:
+    """Remove blobs no longer linked from any bucket. Returns counts."""
+    removed = 0
+    freed = 0
+    if not BLOB_ROOT.exists():
+        return {"removed": 0, "bytes_freed": 0}
+
+    for shard in os.scandir(BLOB_ROOT):
+        if not shard.is_dir(follow_symlinks=False):
+            continue
+        for entry in os.scandir(shard.path):
+            try:
+                st = entry.stat(follow_symlinks=False)
+            except FileNotFoundError:
+                continue
+            if st.st_nlink <= 1:
+                try:
+                    os.unlink(entry.path)
+                    removed += 1
+                    freed += st.st_size
+                except FileNotFoundError:
+                    pass
+
+    if removed:
+        info(f"[blobstore] Collected {removed} unreferenced blobs ({freed} bytes)")
+    return {"removed": removed, "bytes_freed": freed}
@@ -18,7 +18,7 @@ app.register_blueprint(buckets_bp)
 
 from __future__ import annotations
 
-from flask import Blueprint, abort, jsonify, request, send_from_directory, url_for
+from flask import Blueprint, Response, abort, jsonify, request, send_from_directory, stream_with_context, url_for
 from werkzeug.utils import secure_filename
 import json
 import base64     # to send encoded thumbnails
@@ -32,14 +32,23 @@ from routes.bucketer import (
     purge_bucket,
     extract_metadata,
     bucket_path,
-    load_meta,
-    save_meta,
+    read_meta,
+    meta_transaction,
     infer_meta_from_file,
     allowed_file,
     unique_name,
     extract_json,
     copy_image_from_bucket_to_bucket
 )
+from routes.bucket_purge import start_purge_job, get_purge_job
+from routes import bucket_usage, phash, seq_order
+from routes.bucket_export import build_plan as build_export_plan, parse_since
+from routes.bucket_archive import (
+    archive_bucket,
+    search_archive,
+    restore_items,
+    POLICY_KEYS as ARCHIVE_POLICY_KEYS,
+)
 from routes.utils import (
     get_image_from_target,
     _load_json_once,
@@ -96,7 +105,7 @@ def list_items(bucket_id: str):
     if not dest:
         abort(400, "Invalid bucket_id or destination does not support buckets")
     
-    bucket_meta = load_meta(bucket_id)
+    bucket_meta = read_meta(bucket_id)
     
     # Get the paths for thumbnails
     thumb_dir = bucket_path(bucket_id) / "thumbnails"
@@ -136,8 +145,8 @@ def list_items(bucket_id: str):
             
             items_with_thumbnails.append(item)
         
-        # Add the enhanced items to the response
-        bucket_meta["items_with_thumbnails"] = items_with_thumbnails
+        # Add the enhanced items to the response (the cached meta is shared, don't mutate it)
+        return jsonify({**bucket_meta, "items_with_thumbnails": items_with_thumbnails})
     
     return jsonify(bucket_meta)
 
@@ -248,9 +257,8 @@ def publish(bucket_id: str, filename: str):
     if not res["success"]:
         abort(500, res.get("error", "publish failed"))
 
-    meta = load_meta(bucket_id)
-    meta["published_meta"] = res["meta"]
-    save_meta(bucket_id, meta)
+    with meta_transaction(bucket_id) as meta:
+        meta["published_meta"] = res["meta"]
     return jsonify(res)
 
 # Currently displayed
@@ -279,7 +287,7 @@ def published_info(bucket_id: str):
     if not dest:
         abort(400, "Invalid bucket_id or destination does not support buckets")
     
-    pm = load_meta(bucket_id).get("published_meta")
+    pm = read_meta(bucket_id).get("published_meta")
     if not pm:
         abort(404, "nothing published yet")
     filename    = pm["filename"]
@@ -304,12 +312,11 @@ def favorite(bucket_id: str, filename: str):
     if not dest:
         abort(400, "Invalid bucket_id or destination does not support buckets")
     
-    meta = load_meta(bucket_id)
-    # Use seq_to_filenames helper to handle both string and dict entries
-    if filename not in seq_to_filenames(meta.get("sequence", [])):
-        abort(404, "not in bucket")
-    meta.setdefault("favorites", []).append(filename)
-    save_meta(bucket_id, meta)
+    with meta_transaction(bucket_id) as meta:
+        # Use seq_to_filenames helper to handle both string and dict entries
+        if filename not in seq_to_filenames(meta.get("sequence", [])):
+            abort(404, "not in bucket")
+        meta.setdefault("favorites", []).append(filename)
     return jsonify({"status": "favorited"})
 
 
@@ -322,10 +329,9 @@ def unfavorite(bucket_id: str, filename: str):
     if not dest:
         abort(400, "Invalid bucket_id or destination does not support buckets")
     
-    meta = load_meta(bucket_id)
-    if filename in meta.get("favorites", []):
-        meta["favorites"].remove(filename)
-        save_meta(bucket_id, meta)
+    with meta_transaction(bucket_id) as meta:
+        if filename in meta.get("favorites", []):
+            meta["favorites"].remove(filename)
     return jsonify({"status": "unfavorited"})
 
 # -- delete ------------------------------------------------------------------
@@ -352,37 +358,39 @@ def delete_file(bucket_id: str, filename: str):
     except Exception as e:
         error(f"Failed to cleanup reference images for {filename}: {e}")
     
-    fp.unlink()
+    from routes.blobstore import release
+    sc = sidecar_path(fp)
+    thumb_fp = bucket_path(bucket_id) / "thumbnails" / f"{Path(filename).stem}{Path(filename).suffix}.jpg"
+    removed = bucket_usage.measure([fp, sc, thumb_fp])
+    release(fp)
 
     # remove side-car
-    sc = sidecar_path(fp)
     sc.unlink(missing_ok=True)
 
     # remove thumbnail
-    thumb_fp = bucket_path(bucket_id) / "thumbnails" / f"{Path(filename).stem}{Path(filename).suffix}.jpg"
     thumb_fp.unlink(missing_ok=True)
-
-    meta = load_meta(bucket_id)
-    # --- clean up sequence entries that can be strings or dicts ---
-    seq = meta.get("sequence", [])
-    new_seq = []
-    for entry in seq:
-        if isinstance(entry, dict):
-            if entry.get("file") != filename:
-                new_seq.append(entry)
-        else:
-            if entry != filename:
-                new_seq.append(entry)
-    if len(new_seq) != len(seq):
-        meta["sequence"] = new_seq
-
-    # Clean up favorites (array of filenames only)
-    favs = meta.get("favorites", [])
-    if filename in favs:
-        favs.remove(filename)
-        meta["favorites"] = favs
-
-    save_meta(bucket_id, meta)
+    phash.forget(bucket_id, [filename])
+
+    with meta_transaction(bucket_id) as meta:
+        bucket_usage.apply(meta, removed, sign=-1)
+        # --- clean up sequence entries that can be strings or dicts ---
+        seq = meta.get("sequence", [])
+        new_seq = []
+        for entry in seq:
+            if isinstance(entry, dict):
+                if entry.get("file") != filename:
+                    new_seq.append(entry)
+            else:
+                if entry != filename:
+                    new_seq.append(entry)
+        if len(new_seq) != len(seq):
+            meta["sequence"] = new_seq
+
+        # Clean up favorites (array of filenames only)
+        favs = meta.get("favorites", [])
+        if filename in favs:
+            favs.remove(filename)
+            meta["favorites"] = favs
 
     return jsonify({"status": "deleted"})
 
@@ -429,37 +437,36 @@ def move_to(bucket_id: str, filename: str):
     data = request.get_json()
     insert_after = data.get("insert_after")
     
-    meta = load_meta(bucket_id)
-    seq = meta.get("sequence", [])
-    filenames = seq_to_filenames(seq)
-    
-    # Verify the file exists in the sequence
-    if filename not in filenames:
-        abort(404, "file not in sequence")
-    
-    # Get the index of the file in the sequence
-    idx = filenames.index(filename)
-    # Get the actual entry
-    entry = seq[idx]
-    # Remove the file from its current position
-    seq.pop(idx)
-    
-    if insert_after:
-        # Verify insert_after file exists in sequence
-        if insert_after not in filenames:
-            abort(404, "insert_after file not in sequence")
-        # Find the index to insert after
-        insert_index = filenames.index(insert_after) + 1
-    else:
-        # Move to top
-        insert_index = 0
-    
-    # Insert the file at the new position
-    seq.insert(insert_index, entry)
-    
-    # Update the metadata
-    meta["sequence"] = seq
-    save_meta(bucket_id, meta)
+    with meta_transaction(bucket_id) as meta:
+        seq = meta.get("sequence", [])
+        filenames = seq_to_filenames(seq)
+    
+        # Verify the file exists in the sequence
+        if filename not in filenames:
+            abort(404, "file not in sequence")
+    
+        # Get the index of the file in the sequence
+        idx = filenames.index(filename)
+        # Get the actual entry
+        entry = seq[idx]
+        # Remove the file from its current position
+        seq.pop(idx)
+    
+        if insert_after:
+            # Verify insert_after file exists in sequence
+            if insert_after not in filenames:
+                abort(404, "insert_after file not in sequence")
+            # Find the index to insert after
+            insert_index = filenames.index(insert_after) + 1
+        else:
+            # Move to top
+            insert_index = 0
+    
+        # Insert the file at the new position
+        seq.insert(insert_index, entry)
+    
+        # Update the metadata
+        meta["sequence"] = seq
     
     return jsonify({
         "status": "moved",
@@ -477,26 +484,25 @@ def move_up(bucket_id: str, filename: str):
     if not dest:
         abort(400, "Invalid bucket_id or destination does not support buckets")
     
-    meta = load_meta(bucket_id)
-    seq = meta.get("sequence", [])
-    filenames = seq_to_filenames(seq)
+    with meta_transaction(bucket_id) as meta:
+        seq = meta.get("sequence", [])
+        filenames = seq_to_filenames(seq)
     
-    if filename not in filenames:
-        abort(404, "file not in sequence")
+        if filename not in filenames:
+            abort(404, "file not in sequence")
     
-    # Get the index in the filenames list
-    i = filenames.index(filename)
+        # Get the index in the filenames list
+        i = filenames.index(filename)
     
-    # Swap the entries in the original sequence
-    if i == 0:
-        # Move from first to last
-        seq.append(seq.pop(0))
-    else:
-        # Swap with previous item
-        seq[i - 1], seq[i] = seq[i], seq[i - 1]
+        # Swap the entries in the original sequence
+        if i == 0:
+            # Move from first to last
+            seq.append(seq.pop(0))
+        else:
+            # Swap with previous item
+            seq[i - 1], seq[i] = seq[i], seq[i - 1]
     
-    meta["sequence"] = seq
-    save_meta(bucket_id, meta)
+        meta["sequence"] = seq
     
     # Return the new index in the updated filenames list
     updated_filenames = seq_to_filenames(seq)
@@ -512,31 +518,58 @@ def move_down(bucket_id: str, filename: str):
     if not dest:
         abort(400, "Invalid bucket_id or destination does not support buckets")
     
-    meta = load_meta(bucket_id)
-    seq = meta.get("sequence", [])
-    filenames = seq_to_filenames(seq)
+    with meta_transaction(bucket_id) as meta:
+        seq = meta.get("sequence", [])
+        filenames = seq_to_filenames(seq)
     
-    if filename not in filenames:
-        abort(404, "file not in sequence")
+        if filename not in filenames:
+            abort(404, "file not in sequence")
     
-    # Get the index in the filenames list
-    i = filenames.index(filename)
+        # Get the index in the filenames list
+        i = filenames.index(filename)
     
-    # Swap the entries in the original sequence
-    if i == len(seq) - 1:
-        # Move from last to first
-        seq.insert(0, seq.pop())
-    else:
-        # Swap with next item
-        seq[i + 1], seq[i] = seq[i], seq[i + 1]
+        # Swap the entries in the original sequence
+        if i == len(seq) - 1:
+            # Move from last to first
+            seq.insert(0, seq.pop())
+        else:
+            # Swap with next item
+            seq[i + 1], seq[i] = seq[i], seq[i + 1]
     
-    meta["sequence"] = seq
-    save_meta(bucket_id, meta)
+        meta["sequence"] = seq
     
     # Return the new index in the updated filenames list
     updated_filenames = seq_to_filenames(seq)
     return jsonify({"status": "moved-down", "index": updated_filenames.index(filename)})
 
+@buckets_bp.route("/buckets/<bucket_id>/reorder", methods=["POST"])
+def reorder(bucket_id: str):
+    """
+    Move several files in one go, e.g. a multi-select drag:
+    {"filenames": [...], "insert_after": "x.jpg"}  (or "insert_before"; neither = top).
+    The files end up together, in the given order, in a single bucket.json write.
+    """
+    dests = _load_json_once("publish_destinations", "publish-destinations.json")
+    if not any(d["id"] == bucket_id and d.get("has_bucket", False) for d in dests):
+        abort(400, "Invalid bucket_id or destination does not support buckets")
+
+    data = request.get_json(silent=True) or {}
+    filenames = data.get("filenames")
+    if not filenames or not isinstance(filenames, list):
+        abort(400, "filenames list required")
+
+    with meta_transaction(bucket_id) as meta:
+        seq = meta.setdefault("sequence", [])
+        try:
+            index = seq_order.move(seq, filenames, insert_after=data.get("insert_after"),
+                                   insert_before=data.get("insert_before"))
+        except KeyError as e:
+            abort(404, f"{e.args[0]} not in sequence")
+        except ValueError as e:
+            abort(400, str(e))
+
+    return jsonify({"status": "reordered", "index": index, "moved": list(dict.fromkeys(filenames))})
+
 # -- raw file helper ---------------------------------------------------------
 
 @buckets_bp.route("/buckets/<bucket_id>/raw/<path:filename>")
@@ -561,7 +594,7 @@ def get_image_complete(bucket_id: str, filename: str):
         abort(400, "Invalid bucket_id or destination does not support buckets")
     
     # Get bucket metadata
-    meta = load_meta(bucket_id)
+    meta = read_meta(bucket_id)
     
     # Check if file exists
     bucket_dir = bucket_path(bucket_id)
@@ -633,17 +666,50 @@ def get_image_complete(bucket_id: str, filename: str):
 
 @buckets_bp.route("/buckets/<bucket_id>/purge", methods=["DELETE"])
 def purge_bucket_endpoint(bucket_id: str):
-    """Purge files from a bucket, optionally including favorites and filtering by age."""
+    """
+    Purge files from a bucket, optionally including favorites and filtering by age.
+
+    ?dry_run=true reports what would go (and reclaimable bytes) without deleting.
+    ?background=true starts a purge job and returns 202 with its job_id; poll
+    /buckets/purge-jobs/<job_id> for progress and the final result.
+    ?max_seconds=N limits how long one run may spend deleting.
+    """
     include_favorites = request.args.get("include_favorites", "false").lower() == "true"
+    dry_run = request.args.get("dry_run", "false").lower() == "true"
+    background = request.args.get("background", "false").lower() == "true"
     days = request.args.get("days")
     if days is not None:
         try:
             days = int(days)
         except ValueError:
             abort(400, "days parameter must be an integer")
+    max_seconds = request.args.get("max_seconds")
+    if max_seconds is not None:
+        try:
+            max_seconds = float(max_seconds)
+        except ValueError:
+            abort(400, "max_seconds parameter must be a number")
+    
+    if background and not dry_run:
+        dests = _load_json_once("publish_destinations", "publish-destinations.json")
+        if not any(d["id"] == bucket_id and d.get("has_bucket", False) for d in dests):
+            abort(400, "Invalid bucket_id or destination does not support buckets")
+        job = start_purge_job(
+            bucket_id,
+            include_favorites=include_favorites,
+            days=days,
+            max_seconds=max_seconds,
+        )
+        return jsonify(job), 202
     
     try:
-        result = purge_bucket(bucket_id, include_favorites=include_favorites, days=days)
+        result = purge_bucket(
+            bucket_id,
+            include_favorites=include_favorites,
+            days=days,
+            dry_run=dry_run,
+            max_seconds=max_seconds,
+        )
         return jsonify(result)
     except ValueError as e:
         abort(400, str(e))
@@ -651,6 +717,165 @@ def purge_bucket_endpoint(bucket_id: str):
         error(f"Error purging bucket {bucket_id}: {str(e)}")
         abort(500, str(e))
 
+@buckets_bp.route("/buckets/purge-jobs/<job_id>", methods=["GET"])
+def purge_job_status(job_id: str):
+    """Status, progress and (once finished) result of a background purge."""
+    job = get_purge_job(job_id)
+    if job is None:
+        abort(404, "unknown purge job")
+    return jsonify(job)
+
+# ───────────────────────────── cold-tier archive ────────────────────────────
+
+@buckets_bp.route("/buckets/<bucket_id>/archive", methods=["POST"])
+def archive_bucket_endpoint(bucket_id: str):
+    """
+    Move items outside the bucket's archive policy into its cold tier.
+    JSON body may override the policy (max_age_days, max_count, favorites_only);
+    ?dry_run=true lists what would move.
+    """
+    dests = _load_json_once("publish_destinations", "publish-destinations.json")
+    if not any(d["id"] == bucket_id and d.get("has_bucket", False) for d in dests):
+        abort(400, "Invalid bucket_id or destination does not support buckets")
+    
+    body = request.get_json(silent=True) or {}
+    policy = {k: body[k] for k in ARCHIVE_POLICY_KEYS if k in body} or None
+    dry_run = request.args.get("dry_run", "false").lower() == "true"
+    try:
+        return jsonify(archive_bucket(bucket_id, policy=policy, dry_run=dry_run))
+    except Exception as e:
+        error(f"Error archiving bucket {bucket_id}: {str(e)}")
+        abort(500, str(e))
+
+@buckets_bp.route("/buckets/<bucket_id>/archive", methods=["GET"])
+def search_archive_endpoint(bucket_id: str):
+    """Search archived items (?q=words&limit=&offset=)."""
+    limit = request.args.get("limit", default=100, type=int)
+    offset = request.args.get("offset", default=0, type=int)
+    return jsonify(search_archive(bucket_id, request.args.get("q", ""), limit=limit, offset=offset))
+
+@buckets_bp.route("/buckets/<bucket_id>/archive/restore", methods=["POST"])
+def restore_archive_endpoint(bucket_id: str):
+    """Restore archived items: {"filenames": [...]}."""
+    filenames = (request.get_json(silent=True) or {}).get("filenames")
+    if not filenames or not isinstance(filenames, list):
+        abort(400, "filenames list required")
+    return jsonify(restore_items(bucket_id, filenames))
+
+# ─────────────────────────────── disk usage ─────────────────────────────────
+
+@buckets_bp.route("/buckets/<bucket_id>/usage", methods=["GET"])
+def bucket_usage_endpoint(bucket_id: str):
+    """File count and bytes by type, quota state and free disk space."""
+    dests = _load_json_once("publish_destinations", "publish-destinations.json")
+    if not any(d["id"] == bucket_id and d.get("has_bucket", False) for d in dests):
+        abort(400, "Invalid bucket_id or destination does not support buckets")
+    usage = bucket_usage.get_usage(bucket_id)
+    return jsonify({"usage": usage, **bucket_usage.check(bucket_id, usage)})
+
+@buckets_bp.route("/buckets/<bucket_id>/usage/recount", methods=["POST"])
+def recount_bucket_usage(bucket_id: str):
+    """Rebuild the usage counters from disk (after files were changed by hand)."""
+    dests = _load_json_once("publish_destinations", "publish-destinations.json")
+    if not any(d["id"] == bucket_id and d.get("has_bucket", False) for d in dests):
+        abort(400, "Invalid bucket_id or destination does not support buckets")
+    usage = bucket_usage.recount(bucket_id)
+    return jsonify({"usage": usage, **bucket_usage.enforce(bucket_id, usage)})
+
+# ─────────────────────────────── ZIP export ─────────────────────────────────
+
+@buckets_bp.route("/buckets/<bucket_id>/export.zip", methods=["GET"])
+def export_bucket_zip(bucket_id: str):
+    """
+    Stream the bucket (media + sidecars) as a ZIP, generated on the fly.
+    Filters: ?files=a.jpg,b.mp4  ?favorites=true  ?batch=<batchId>
+             ?since=<epoch or ISO date>  ?sidecars=false
+    Honours Range / If-Range so interrupted downloads can resume.
+    """
+    dests = _load_json_once("publish_destinations", "publish-destinations.json")
+    if not any(d["id"] == bucket_id and d.get("has_bucket", False) for d in dests):
+        abort(400, "Invalid bucket_id or destination does not support buckets")
+
+    files = [f for f in request.args.get("files", "").split(",") if f] or None
+    try:
+        since = parse_since(request.args.get("since"))
+    except ValueError:
+        abort(400, "since must be epoch seconds or an ISO date")
+    plan = build_export_plan(
+        bucket_id,
+        files=files,
+        favorites_only=request.args.get("favorites", "false").lower() == "true",
+        batch_id=request.args.get("batch"),
+        since=since,
+        include_sidecars=request.args.get("sidecars", "true").lower() != "false",
+    )
+
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": f'"{plan.etag}"',
+        "Content-Disposition": f'attachment; filename="{bucket_id}.zip"',
+    }
+    start, stop, status = 0, plan.total_size, 200
+    rng = request.range
+    if rng is not None and (request.if_range.etag is None or request.if_range.etag == plan.etag) \
+            and not request.if_range.date:
+        span = rng.range_for_length(plan.total_size)
+        if span is None:
+            return Response(status=416, headers={"Content-Range": f"bytes */{plan.total_size}", **headers})
+        start, stop = span
+        status = 206
+        headers["Content-Range"] = f"bytes {start}-{stop - 1}/{plan.total_size}"
+    headers["Content-Length"] = str(stop - start)
+
+    def generate():
+        try:
+            yield from plan.iter_range(start, stop)
+        except OSError as e:
+            error(f"Export of {bucket_id} aborted: {e}")
+            raise
+
+    return Response(stream_with_context(generate()), status=status,
+                    mimetype="application/zip", headers=headers)
+
+# ──────────────────────────── perceptual similarity ─────────────────────────
+
+@buckets_bp.route("/buckets/<bucket_id>/similar/<path:filename>", methods=["GET"])
+def similar_items(bucket_id: str, filename: str):
+    """
+    Items that look like *filename* (?max_distance=&limit=&kind=ahash|dhash|phash).
+    ?scope=all searches every bucket instead of just this one.
+    """
+    dests = _load_json_once("publish_destinations", "publish-destinations.json")
+    bucket_ids = [d["id"] for d in dests if d.get("has_bucket", False)]
+    if bucket_id not in bucket_ids:
+        abort(400, "Invalid bucket_id or destination does not support buckets")
+
+    kind = request.args.get("kind", phash.DEFAULT_KIND)
+    max_distance = request.args.get("max_distance", default=phash.SIMILAR_DISTANCE, type=int)
+    limit = request.args.get("limit", default=50, type=int)
+    scope = bucket_ids if request.args.get("scope") == "all" else None
+    try:
+        return jsonify(phash.similar(bucket_id, filename, kind=kind, max_distance=max_distance,
+                                     limit=limit, buckets=scope))
+    except ValueError as e:
+        abort(400, str(e))
+    except FileNotFoundError:
+        abort(404, "file missing")
+
+@buckets_bp.route("/buckets/<bucket_id>/duplicates", methods=["GET"])
+def near_duplicate_items(bucket_id: str):
+    """Groups of near-identical items, oldest first (?max_distance=&kind=)."""
+    dests = _load_json_once("publish_destinations", "publish-destinations.json")
+    if not any(d["id"] == bucket_id and d.get("has_bucket", False) for d in dests):
+        abort(400, "Invalid bucket_id or destination does not support buckets")
+
+    kind = request.args.get("kind", phash.DEFAULT_KIND)
+    max_distance = request.args.get("max_distance", default=phash.DUPLICATE_DISTANCE, type=int)
+    try:
+        return jsonify(phash.near_duplicates(bucket_id, kind=kind, max_distance=max_distance))
+    except ValueError as e:
+        abort(400, str(e))
+
 @buckets_bp.route("/buckets/reindex", methods=["POST"])
 def reindex_all():
     """Reindex all buckets, optionally rebuilding metadata and thumbnails."""
@@ -698,7 +923,7 @@ def get_bucket_complete(bucket_id: str):
         abort(400, "Invalid bucket_id or destination does not support buckets")
     
     # Get bucket metadata
-    meta = load_meta(bucket_id)
+    meta = read_meta(bucket_id)
     
     # Get all files in the bucket
     bucket_dir = bucket_path(bucket_id)
@@ -721,6 +946,9 @@ def get_bucket_complete(bucket_id: str):
                 filenames_only.append(fname)
                 sequence_entries[fname] = {"file": fname}
     
+    # Sidecars parsed below, reused for the reference image lookup
+    parsed_sidecars = {}
+
     # Only show files that are in the sequence list
     for filename in filenames_only:
         file_path = bucket_dir / filename
@@ -733,6 +961,7 @@ def get_bucket_complete(bucket_id: str):
         if sidecar.exists():
             try:
                 file_meta = json.loads(sidecar.read_text("utf-8"))
+                parsed_sidecars[file_path.name] = file_meta
             except Exception as e:
                 warning(f"Failed to read sidecar for {file_path.name}: {e}")
         
@@ -752,17 +981,6 @@ def get_bucket_complete(bucket_id: str):
             or file_stats.st_mtime
         )
 
-        # Get reference images for this file
-        reference_images = []
-        try:
-            from routes.bucket_utils import ReferenceImageStorage
-            ref_storage = ReferenceImageStorage()
-            base_filename = file_path.stem
-            ref_images = ref_storage.get_reference_images(base_filename, bucket_id)
-            reference_images = [ref.to_dict(bucket_id) for ref in ref_images]  # Pass bucket_id for URL conversion
-        except Exception as e:
-            error(f"Failed to get reference images for {file_path.name}: {e}")
-        
         files.append({
             "filename": file_path.name,
             "size": file_stats.st_size,
@@ -777,9 +995,21 @@ def get_bucket_complete(bucket_id: str):
             "sequence_index": filenames_only.index(file_path.name),
             "thumbnail_url": f"/output/{bucket_id}/thumbnails/{file_path.stem}{file_path.suffix}.jpg",
             "raw_url": f"/output/{bucket_id}/{file_path.name}",
-            "reference_images": reference_images
+            "reference_images": []
         })
     
+    # Resolve reference images for every file from one directory scan
+    try:
+        from routes.bucket_utils import ReferenceImageStorage
+        refs_by_base = ReferenceImageStorage().get_reference_images_batch(
+            [Path(f["filename"]).stem for f in files], bucket_id, sidecars=parsed_sidecars
+        )
+        for f in files:
+            # Pass bucket_id for URL conversion
+            f["reference_images"] = [ref.to_dict(bucket_id) for ref in refs_by_base.get(Path(f["filename"]).stem, [])]
+    except Exception as e:
+        error(f"Failed to get reference images for bucket {bucket_id}: {e}")
+    
     # Sort files by sequence (using our normalised list)
     sequence_map = {f: i for i, f in enumerate(filenames_only)}
     files.sort(key=lambda f: sequence_map.get(f["filename"], float("inf")))
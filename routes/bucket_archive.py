@@ -0,0 +1,392 @@
+"""
+bucket_archive.py – cold tier for old bucket media.
+
+Buckets only ever grow; listings, reindexes and purges all pay for the full
+history. An archive run moves items that fall outside a bucket's policy out
+of the hot bucket into a zip pack under output/<bucket>/_archive/, together
+with their sidecar and thumbnail, and records them in
+output/<bucket>/_archive/index.json. The hot bucket.json, directory and
+thumbnails then only hold the working set.
+
+Policy (per destination, "archive" key in publish-destinations.json, or
+passed explicitly):
+
+    {"max_age_days": 30}       archive items older than 30 days
+    {"max_count": 500}         keep the newest 500 items hot
+    {"favorites_only": true}   keep only favourites hot
+
+Favourites and the currently published item are never archived.
+
+Policies are applied by schedule(), which _append_to_bucket calls after
+every ingest: a background archive_bucket() run starts once the hot
+sequence is over max_count, and otherwise at most every
+config.BUCKET_ARCHIVE_INTERVAL_S (for max_age_days). POST
+/buckets/<id>/archive runs it on demand.
+
+Archived items stay searchable (search_archive matches filename, prompt and
+other sidecar text held in the index) and restore_items() puts them back in
+the bucket with their original sequence entry.
+
+JPEG/PNG/MP4 are already compressed, so media are STORED in the pack;
+sidecars are DEFLATEd.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+import uuid
+import zipfile
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import config
+from routes import bucket_usage
+from utils.logger import info, warning, error, debug
+
+ARCHIVE_DIR = "_archive"
+INDEX_FILE = "index.json"
+POLICY_KEYS = ("max_age_days", "max_count", "favorites_only")
+_COMPRESSED_EXT = {".jpg", ".jpeg", ".png", ".webp", ".gif", ".mp4", ".mov", ".webm"}
+_SEARCH_TEXT_LIMIT = 2000
+
+_index_locks: Dict[str, threading.Lock] = {}
+_index_locks_guard = threading.Lock()
+
+
+def archive_dir(bucket: str) -> Path:
+    from routes.bucketer import bucket_path
+    return bucket_path(bucket) / ARCHIVE_DIR
+
+
+def load_index(bucket: str) -> Dict[str, Any]:
+    fp = archive_dir(bucket) / INDEX_FILE
+    if not fp.exists():
+        return {"items": {}, "packs": {}}
+    return json.loads(fp.read_text("utf-8"))
+
+
+def _save_index(bucket: str, index: Dict[str, Any]):
+    fp = archive_dir(bucket) / INDEX_FILE
+    fp.parent.mkdir(parents=True, exist_ok=True)
+    tmp = fp.with_name(f".{fp.name}.{uuid.uuid4().hex[:8]}.tmp")
+    tmp.write_text(json.dumps(index, indent=2), encoding="utf-8")
+    os.replace(tmp, fp)
+
+
+def policy_for(bucket: str) -> Dict[str, Any]:
+    """The bucket's configured archive policy ({} if none)."""
+    from routes.utils import _load_json_once
+    dests = _load_json_once("publish_destinations", "publish-destinations.json")
+    dest = next((d for d in dests if d["id"] == bucket), None) or {}
+    policy = dest.get("archive") or {}
+    return {k: policy[k] for k in POLICY_KEYS if k in policy}
+
+
+def _search_text(sidecar: Dict[str, Any]) -> str:
+    """Flatten the string values of a sidecar into one lowercase blob."""
+    parts: List[str] = []
+
+    def walk(v):
+        if isinstance(v, str):
+            parts.append(v)
+        elif isinstance(v, dict):
+            for x in v.values():
+                walk(x)
+        elif isinstance(v, list):
+            for x in v:
+                walk(x)
+
+    walk(sidecar)
+    return " ".join(parts).lower()[:_SEARCH_TEXT_LIMIT]
+
+
+def _kept(meta: Dict[str, Any]) -> set:
+    """Favourites and the published file: never archived."""
+    keep = set(meta.get("favorites", []))
+    published = (meta.get("published_meta") or {}).get("filename")
+    if published:
+        keep.add(published)
+    return keep
+
+
+def _index_lock(bucket: str) -> threading.Lock:
+    """Per-bucket lock serialising archive runs and restores (the index and packs)."""
+    with _index_locks_guard:
+        return _index_locks.setdefault(bucket, threading.Lock())
+
+
+def select_for_archive(meta: Dict[str, Any], bucket_dir: Path, policy: Dict[str, Any],
+                       now: Optional[float] = None) -> List[str]:
+    """Filenames (oldest first) that fall outside *policy*."""
+    from routes.utils import seq_to_filenames
+
+    now = now if now is not None else time.time()
+    names = seq_to_filenames(meta.get("sequence", []))
+    keep = _kept(meta)
+
+    chosen: set = set()
+    if policy.get("favorites_only"):
+        chosen.update(n for n in names if n not in keep)
+    max_count = policy.get("max_count")
+    if max_count is not None and len(names) > max_count:
+        # sequence is append-ordered: the head is the oldest
+        chosen.update(names[:len(names) - max_count])
+    max_age = policy.get("max_age_days")
+    if max_age is not None:
+        cutoff = now - max_age * 86400
+        for n in names:
+            try:
+                if (bucket_dir / n).stat().st_mtime < cutoff:
+                    chosen.add(n)
+            except FileNotFoundError:
+                pass
+
+    return [n for n in names if n in chosen and n not in keep and (bucket_dir / n).is_file()]
+
+
+def archive_bucket(bucket: str, policy: Optional[Dict[str, Any]] = None,
+                   dry_run: bool = False) -> Dict[str, Any]:
+    """
+    Move items outside the policy into a new pack in the bucket's cold tier.
+
+    bucket.json is only locked to pick the victims and, once the pack and
+    index are written, to drop them; writing the pack does not hold up
+    readers, publishes or ingests. Victims that became a favourite, got
+    published or left the sequence meanwhile stay hot.
+    """
+    from routes import blobstore
+    from routes.bucketer import bucket_path, meta_lock, meta_transaction, read_meta
+    from routes.utils import seq_to_filenames, sidecar_path
+
+    policy = policy if policy is not None else policy_for(bucket)
+    if not policy:
+        return {"status": "no_policy", "archived": []}
+
+    bdir = bucket_path(bucket)
+    with _index_lock(bucket):
+        with meta_lock(bucket):
+            meta = read_meta(bucket)
+            victims = select_for_archive(meta, bdir, policy)
+            if dry_run or not victims:
+                return {"status": "dry_run" if dry_run else "archived", "archived": victims, "policy": policy}
+            wanted = set(victims)
+            entries = {}
+            for entry in meta.get("sequence", []):
+                name = entry.get("file") if isinstance(entry, dict) else entry
+                if name in wanted:
+                    entries[name] = dict(entry) if isinstance(entry, dict) else entry
+
+        adir = archive_dir(bucket)
+        adir.mkdir(parents=True, exist_ok=True)
+        pack_name = f"{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}.zip"
+        pack_tmp = adir / f".{pack_name}.tmp"
+        index = load_index(bucket)
+        now = datetime.utcnow().isoformat() + "Z"
+
+        with zipfile.ZipFile(pack_tmp, "w") as zf:
+            for name in victims:
+                fp = bdir / name
+                sidecar = sidecar_path(fp)
+                thumb = bdir / "thumbnails" / f"{fp.stem}{fp.suffix}.jpg"
+                compress = zipfile.ZIP_STORED if fp.suffix.lower() in _COMPRESSED_EXT else zipfile.ZIP_DEFLATED
+                zf.write(fp, name, compress_type=compress)
+                sidecar_data = {}
+                if sidecar.exists():
+                    zf.write(sidecar, sidecar.name, compress_type=zipfile.ZIP_DEFLATED)
+                    try:
+                        sidecar_data = json.loads(sidecar.read_text("utf-8"))
+                    except Exception:
+                        sidecar_data = {}
+                if thumb.exists():
+                    zf.write(thumb, f"thumbnails/{thumb.name}", compress_type=zipfile.ZIP_STORED)
+                st = fp.stat()
+                index["items"][name] = {
+                    "pack": pack_name,
+                    "entry": entries.get(name, name),
+                    "size": st.st_size,
+                    "mtime": st.st_mtime,
+                    "archived_at": now,
+                    "prompt": sidecar_data.get("prompt") if isinstance(sidecar_data, dict) else None,
+                    "text": _search_text(sidecar_data),
+                }
+        os.replace(pack_tmp, adir / pack_name)
+        index["packs"][pack_name] = {"created_at": now, "live": len(victims)}
+        _save_index(bucket, index)
+
+        # Only now that the pack and index are durable, drop the hot copies –
+        # of the victims that still qualify
+        with meta_transaction(bucket) as meta:
+            present = set(seq_to_filenames(meta.get("sequence", [])))
+            keep = _kept(meta)
+            archived = [n for n in victims if n in present and n not in keep]
+            gone = set(archived)
+            removed = bucket_usage.empty()
+            for name in archived:
+                bucket_usage.add(removed, bucket_usage.measure(bucket_usage.item_paths(bdir, name)))
+            for name in archived:
+                fp = bdir / name
+                blobstore.release(fp)
+                sidecar_path(fp).unlink(missing_ok=True)
+                (bdir / "thumbnails" / f"{fp.stem}{fp.suffix}.jpg").unlink(missing_ok=True)
+            meta["sequence"] = [
+                e for e in meta.get("sequence", [])
+                if (e.get("file") if isinstance(e, dict) else e) not in gone
+            ]
+            bucket_usage.apply(meta, removed, sign=-1)
+
+        kept = [n for n in victims if n not in gone]
+        if kept:
+            for name in kept:
+                del index["items"][name]
+            if archived:
+                index["packs"][pack_name]["live"] = len(archived)
+            else:
+                (adir / pack_name).unlink(missing_ok=True)
+                del index["packs"][pack_name]
+            _save_index(bucket, index)
+            debug(f"[archive] {bucket}: {len(kept)} items changed while packing and stay hot")
+
+    archived_bytes = sum(index["items"][n]["size"] for n in archived)
+    if not archived:
+        return {"status": "archived", "archived": [], "policy": policy}
+    info(f"[archive] {bucket}: archived {len(archived)} items ({archived_bytes} bytes) into {pack_name}")
+    return {"status": "archived", "archived": archived, "pack": pack_name,
+            "bytes": archived_bytes, "policy": policy}
+
+
+_auto_lock = threading.Lock()
+_auto_running: set = set()
+_auto_last: Dict[str, float] = {}
+
+
+def schedule(bucket: str, hot_count: Optional[int] = None) -> bool:
+    """
+    Start a background archive_bucket() run for *bucket* if it has a policy
+    and one is due. *hot_count* is the sequence length, if the caller has it.
+    Returns True if a run was started.
+    """
+    if not getattr(config, "BUCKET_ARCHIVE_AUTO", False):
+        return False
+    try:
+        policy = policy_for(bucket)
+    except FileNotFoundError:
+        return False
+    if not policy:
+        return False
+
+    over_count = hot_count is not None and policy.get("max_count") is not None \
+        and hot_count > policy["max_count"]
+    now = time.monotonic()
+    with _auto_lock:
+        if bucket in _auto_running:
+            return False
+        last = _auto_last.get(bucket)
+        if not over_count and last is not None and now - last < config.BUCKET_ARCHIVE_INTERVAL_S:
+            return False
+        _auto_running.add(bucket)
+        _auto_last[bucket] = now
+    threading.Thread(target=_archive_in_background, args=(bucket, policy),
+                     name=f"archive-{bucket}", daemon=True).start()
+    return True
+
+
+def _archive_in_background(bucket: str, policy: Dict[str, Any]):
+    try:
+        archive_bucket(bucket, policy=policy)
+    except Exception as e:
+        error(f"[archive] Automatic archive of {bucket} failed: {e}")
+    finally:
+        with _auto_lock:
+            _auto_running.discard(bucket)
+
+
+def search_archive(bucket: str, query: str = "", limit: int = 100, offset: int = 0) -> Dict[str, Any]:
+    """Archived items whose filename or sidecar text contains every query word."""
+    index = load_index(bucket)
+    words = query.lower().split()
+    hits = []
+    for name, item in index["items"].items():
+        haystack = f"{name.lower()} {item.get('text', '')}"
+        if all(w in haystack for w in words):
+            hits.append({
+                "filename": name,
+                "prompt": item.get("prompt"),
+                "size": item.get("size"),
+                "archived_at": item.get("archived_at"),
+                "pack": item.get("pack"),
+            })
+    hits.sort(key=lambda h: h["archived_at"] or "", reverse=True)
+    return {"total": len(hits), "items": hits[offset:offset + limit]}
+
+
+def restore_items(bucket: str, filenames: List[str]) -> Dict[str, Any]:
+    """Put archived items back into the hot bucket (appended to the sequence)."""
+    from routes.bucketer import bucket_path, meta_lock, meta_transaction
+    from routes.utils import generate_thumbnail, seq_to_filenames
+
+    bdir = bucket_path(bucket)
+    adir = archive_dir(bucket)
+    restored, missing = [], []
+    with _index_lock(bucket), meta_lock(bucket):
+        index = load_index(bucket)
+        by_pack: Dict[str, List[str]] = {}
+        for name in filenames:
+            item = index["items"].get(name)
+            if item is None:
+                missing.append(name)
+            else:
+                by_pack.setdefault(item["pack"], []).append(name)
+
+        for pack, names in by_pack.items():
+            try:
+                with zipfile.ZipFile(adir / pack) as zf:
+                    members = set(zf.namelist())
+                    for name in names:
+                        zf.extract(name, bdir)
+                        for extra in (f"{name}.json", f"thumbnails/{Path(name).stem}{Path(name).suffix}.jpg"):
+                            if extra in members:
+                                zf.extract(extra, bdir)
+                        mtime = index["items"][name].get("mtime")
+                        if mtime:
+                            os.utime(bdir / name, (mtime, mtime))
+                        restored.append(name)
+            except (OSError, zipfile.BadZipFile, KeyError) as e:
+                error(f"[archive] Could not restore from {pack}: {e}")
+                missing.extend(n for n in names if n not in restored)
+
+        for name in restored:
+            thumb = bdir / "thumbnails" / f"{Path(name).stem}{Path(name).suffix}.jpg"
+            if not thumb.exists():
+                try:
+                    generate_thumbnail(bdir / name, thumb)
+                except Exception as e:
+                    warning(f"[archive] Thumbnail failed for restored {name}: {e}")
+
+        with meta_transaction(bucket) as meta:
+            seq = meta.setdefault("sequence", [])
+            present = set(seq_to_filenames(seq))
+            added = bucket_usage.empty()
+            for name in restored:
+                if name not in present:
+                    seq.append(index["items"][name]["entry"])
+                    bucket_usage.add(added, bucket_usage.measure(bucket_usage.item_paths(bdir, name)))
+            bucket_usage.apply(meta, added)
+
+        for name in restored:
+            item = index["items"].pop(name)
+            pack = index["packs"].get(item["pack"])
+            if pack is not None:
+                pack["live"] -= 1
+        for pack_name, pack in list(index["packs"].items()):
+            if pack["live"] <= 0:
+                (adir / pack_name).unlink(missing_ok=True)
+                del index["packs"][pack_name]
+                debug(f"[archive] Removed empty pack {pack_name}")
+        _save_index(bucket, index)
+
+    info(f"[archive] {bucket}: restored {len(restored)} items")
+    return {"status": "restored", "restored": restored, "missing": missing}
@@ -0,0 +1,352 @@
+"""
+bucket_export.py – stream a bucket (or part of it) as a ZIP download.
+
+The archive is never built on disk or in memory. build_plan() fixes the
+layout up front – every entry's offset and the total length are known
+before the first byte is sent – and ExportPlan.iter_range() produces any
+byte range of that archive on demand. That is what lets the endpoint send
+a Content-Length and answer Range requests, so an interrupted download of
+a large bucket resumes instead of starting over.
+
+Layout decisions that keep offsets computable without reading media:
+
+* media are STORED (JPEG/PNG/MP4 do not compress further) with a data
+  descriptor, so their CRC is computed while they stream;
+* sidecars are DEFLATEd; they are small, so their compressed size and CRC
+  are worked out while planning and the bytes regenerated when sent;
+* ZIP64 records are used only for entries/offsets past 4 GiB.
+
+CRCs of media skipped by a resumed range are needed for the central
+directory; they come from a small cache keyed by (path, mtime, size), or
+are computed by reading the file (local IO, not transfer).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from utils.logger import info, debug
+
+CHUNK_SIZE = 1 << 20
+ZIP64_LIMIT = 0xFFFFFFFF
+CRC_CACHE_SIZE = 4096
+
+_FLAG_DESCRIPTOR = 0x08
+_FLAG_UTF8 = 0x800
+_STORED, _DEFLATED = 0, 8
+_crc_lock = threading.Lock()
+_crc_cache: "OrderedDict[Tuple[str, int, int], int]" = OrderedDict()
+
+
+@dataclass
+class ExportEntry:
+    arcname: str
+    path: Path
+    mtime: float
+    size: int                       # uncompressed
+    method: int = _STORED
+    compressed_size: int = 0
+    crc: Optional[int] = None       # known up front for sidecars only
+    offset: int = 0
+    name_bytes: bytes = field(default=b"", repr=False)
+
+    @property
+    def streamed(self) -> bool:
+        """Media: CRC computed while sending, trailed by a data descriptor."""
+        return self.method == _STORED
+
+    @property
+    def zip64(self) -> bool:
+        return self.size >= ZIP64_LIMIT or self.compressed_size >= ZIP64_LIMIT
+
+    def local_header_len(self) -> int:
+        return 30 + len(self.name_bytes) + (20 if self.zip64 else 0)
+
+    def descriptor_len(self) -> int:
+        if not self.streamed:
+            return 0
+        return 24 if self.zip64 else 16
+
+    def total_len(self) -> int:
+        return self.local_header_len() + self.compressed_size + self.descriptor_len()
+
+    def central_extra(self) -> Tuple[List[int], bool]:
+        fields = []
+        if self.size >= ZIP64_LIMIT:
+            fields.append(self.size)
+        if self.compressed_size >= ZIP64_LIMIT:
+            fields.append(self.compressed_size)
+        if self.offset >= ZIP64_LIMIT:
+            fields.append(self.offset)
+        return fields, bool(fields)
+
+    def central_len(self) -> int:
+        fields, _ = self.central_extra()
+        return 46 + len(self.name_bytes) + (4 + 8 * len(fields) if fields else 0)
+
+
+def _field(value: int, marker: int = 0xFFFFFFFF) -> int:
+    """*value*, or the ZIP64 marker if it has to live in the extra field."""
+    return marker if value >= ZIP64_LIMIT else value
+
+
+def _dos_time(ts: float) -> Tuple[int, int]:
+    t = time.localtime(ts)
+    if t.tm_year < 1980:
+        return 0, (0 << 9) | (1 << 5) | 1
+    return (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2), \
+           ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+
+
+def _deflate(data: bytes) -> bytes:
+    co = zlib.compressobj(6, zlib.DEFLATED, -15)
+    return co.compress(data) + co.flush()
+
+
+def file_crc(path: Path, mtime_ns: int, size: int) -> int:
+    key = (str(path), mtime_ns, size)
+    crc = _cached_crc(key)
+    if crc is not None:
+        return crc
+    crc = 0
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            crc = zlib.crc32(chunk, crc)
+    _remember_crc(key, crc)
+    return crc
+
+
+def _cached_crc(key: Tuple[str, int, int]) -> Optional[int]:
+    with _crc_lock:
+        crc = _crc_cache.get(key)
+        if crc is not None:
+            _crc_cache.move_to_end(key)
+        return crc
+
+
+def _remember_crc(key: Tuple[str, int, int], crc: int):
+    with _crc_lock:
+        _crc_cache[key] = crc
+        _crc_cache.move_to_end(key)
+        while len(_crc_cache) > CRC_CACHE_SIZE:
+            _crc_cache.popitem(last=False)
+
+
+class ExportPlan:
+    """Fixed layout of one export archive."""
+
+    def __init__(self, entries: List[ExportEntry]):
+        self.entries = entries
+        offset = 0
+        for e in entries:
+            e.offset = offset
+            offset += e.total_len()
+        self.cd_offset = offset
+        self.cd_size = sum(e.central_len() for e in entries)
+        self.zip64_end = (len(entries) >= 0xFFFF or self.cd_offset >= ZIP64_LIMIT
+                          or self.cd_size >= ZIP64_LIMIT)
+        self.total_size = self.cd_offset + self.cd_size + (56 + 20 if self.zip64_end else 0) + 22
+        digest = hashlib.sha1()
+        for e in entries:
+            digest.update(f"{e.arcname}\0{e.size}\0{e.mtime}\0{e.crc}\n".encode("utf-8"))
+        self.etag = digest.hexdigest()[:32]
+        self._crcs: Dict[int, int] = {}
+
+    # ── headers ──────────────────────────────────────────────────────────
+
+    def _local_header(self, e: ExportEntry) -> bytes:
+        t, d = _dos_time(e.mtime)
+        flags = _FLAG_UTF8 | (_FLAG_DESCRIPTOR if e.streamed else 0)
+        crc = 0 if e.streamed else e.crc
+        csize = 0 if e.streamed else e.compressed_size
+        usize = 0 if e.streamed else e.size
+        extra = b""
+        if e.zip64:
+            extra = struct.pack("<HHQQ", 1, 16, usize, csize)
+            csize = usize = 0xFFFFFFFF
+        return struct.pack("<IHHHHHIIIHH", 0x04034B50, 45 if e.zip64 else 20, flags, e.method,
+                           t, d, crc, csize, usize, len(e.name_bytes), len(extra)) + e.name_bytes + extra
+
+    def _descriptor(self, e: ExportEntry, crc: int) -> bytes:
+        if e.zip64:
+            return struct.pack("<IIQQ", 0x08074B50, crc, e.compressed_size, e.size)
+        return struct.pack("<IIII", 0x08074B50, crc, e.compressed_size, e.size)
+
+    def _crc_for(self, i: int) -> int:
+        e = self.entries[i]
+        if e.crc is not None:
+            return e.crc
+        if i not in self._crcs:
+            st = e.path.stat()
+            self._crcs[i] = file_crc(e.path, st.st_mtime_ns, st.st_size)
+        return self._crcs[i]
+
+    def _central_directory(self) -> Iterator[bytes]:
+        for i, e in enumerate(self.entries):
+            t, d = _dos_time(e.mtime)
+            fields, z64 = e.central_extra()
+            extra = struct.pack(f"<HH{len(fields)}Q", 1, 8 * len(fields), *fields) if z64 else b""
+            flags = _FLAG_UTF8 | (_FLAG_DESCRIPTOR if e.streamed else 0)
+            yield struct.pack(
+                "<IHHHHHHIIIHHHHHII", 0x02014B50, (3 << 8) | 45, 45 if (e.zip64 or z64) else 20,
+                flags, e.method, t, d, self._crc_for(i),
+                _field(e.compressed_size), _field(e.size),
+                len(e.name_bytes), len(extra), 0, 0, 0, 0o100644 << 16,
+                _field(e.offset),
+            ) + e.name_bytes + extra
+
+    def _end_records(self) -> bytes:
+        count = len(self.entries)
+        out = b""
+        if self.zip64_end:
+            z64_offset = self.cd_offset + self.cd_size
+            out += struct.pack("<IQHHIIQQQQ", 0x06064B50, 44, 45, 45, 0, 0,
+                               count, count, self.cd_size, self.cd_offset)
+            out += struct.pack("<IIQI", 0x07064B50, 0, z64_offset, 1)
+        entries = 0xFFFF if count >= 0xFFFF else count
+        out += struct.pack("<IHHHHIIH", 0x06054B50, 0, 0, entries, entries,
+                           _field(self.cd_size), _field(self.cd_offset), 0)
+        return out
+
+    # ── streaming ────────────────────────────────────────────────────────
+
+    def _entry_chunks(self, i: int, start: int, stop: int) -> Iterator[bytes]:
+        """Bytes [start, stop) of entry *i*, relative to its local header."""
+        e = self.entries[i]
+        header = self._local_header(e)
+        if start < len(header):
+            yield header[start:stop]
+        data_start = len(header)
+        data_stop = data_start + e.compressed_size
+
+        if not e.streamed:
+            if start < data_stop and stop > data_start:
+                data = _deflate(e.path.read_bytes())
+                yield data[max(start - data_start, 0):stop - data_start]
+            return
+
+        need_descriptor = stop > data_stop
+        if start < data_stop and stop > data_start or need_descriptor:
+            st = e.path.stat()
+            key = (str(e.path), st.st_mtime_ns, st.st_size)
+            cached = _cached_crc(key) if (st.st_size == e.size) else None
+            # Reading from the top is only needed to finish a CRC we don't have
+            read_from = 0 if (need_descriptor and cached is None) else max(start - data_start, 0)
+            read_to = e.size if need_descriptor and cached is None else min(stop - data_start, e.size)
+            crc, pos = 0, read_from
+            with open(e.path, "rb") as f:
+                f.seek(read_from)
+                while pos < read_to:
+                    chunk = f.read(min(CHUNK_SIZE, read_to - pos))
+                    if not chunk:
+                        raise OSError(f"{e.path} shrank while being exported")
+                    crc = zlib.crc32(chunk, crc)
+                    lo = max(start - data_start - pos, 0)
+                    hi = min(stop - data_start - pos, len(chunk))
+                    if lo < hi:
+                        yield chunk[lo:hi]
+                    pos += len(chunk)
+            if need_descriptor:
+                if cached is None:
+                    _remember_crc(key, crc)
+                    cached = crc
+                self._crcs[i] = cached
+                desc = self._descriptor(e, cached)
+                yield desc[max(start - data_stop, 0):stop - data_stop]
+
+    def iter_range(self, start: int = 0, stop: Optional[int] = None) -> Iterator[bytes]:
+        """Archive bytes [start, stop)."""
+        stop = self.total_size if stop is None else min(stop, self.total_size)
+        for i, e in enumerate(self.entries):
+            lo, hi = e.offset, e.offset + e.total_len()
+            if hi <= start:
+                continue
+            if lo >= stop:
+                return
+            yield from self._entry_chunks(i, max(start - lo, 0), min(stop, hi) - lo)
+
+        if stop > self.cd_offset:
+            pos = self.cd_offset
+            for record in self._central_directory():
+                end = pos + len(record)
+                if end > start and pos < stop:
+                    yield record[max(start - pos, 0):stop - pos]
+                pos = end
+            tail = self._end_records()
+            if stop > pos:
+                yield tail[max(start - pos, 0):stop - pos]
+
+
+# ─── Planning ────────────────────────────────────────────────────────────────
+
+def select_files(meta: Dict[str, Any], files: Optional[Iterable[str]] = None,
+                 favorites_only: bool = False, batch_id: Optional[str] = None) -> List[str]:
+    """Bucket items to export, in sequence order."""
+    seq = meta.get("sequence", [])
+    wanted = set(files) if files else None
+    favorites = set(meta.get("favorites", []))
+    out = []
+    for entry in seq:
+        name = entry.get("file") if isinstance(entry, dict) else entry
+        if not name:
+            continue
+        if wanted is not None and name not in wanted:
+            continue
+        if favorites_only and name not in favorites:
+            continue
+        if batch_id and not (isinstance(entry, dict) and entry.get("batchId") == batch_id):
+            continue
+        out.append(name)
+    return out
+
+
+def build_plan(bucket: str, files: Optional[Iterable[str]] = None, favorites_only: bool = False,
+               batch_id: Optional[str] = None, since: Optional[float] = None,
+               include_sidecars: bool = True) -> ExportPlan:
+    """Lay out an export of *bucket*, filtered by the given criteria."""
+    from routes.bucketer import bucket_path, read_meta
+    from routes.utils import sidecar_path
+
+    bdir = bucket_path(bucket)
+    entries: List[ExportEntry] = []
+    for name in select_files(read_meta(bucket), files, favorites_only, batch_id):
+        fp = bdir / name
+        try:
+            st = fp.stat()
+        except FileNotFoundError:
+            debug(f"[export] {bucket}/{name} is in the sequence but missing on disk")
+            continue
+        if since is not None and st.st_mtime < since:
+            continue
+        entries.append(ExportEntry(arcname=name, path=fp, mtime=st.st_mtime, size=st.st_size,
+                                   compressed_size=st.st_size, name_bytes=name.encode("utf-8")))
+        sc = sidecar_path(fp)
+        if include_sidecars and sc.is_file():
+            raw = sc.read_bytes()
+            entries.append(ExportEntry(
+                arcname=sc.name, path=sc, mtime=sc.stat().st_mtime, size=len(raw),
+                method=_DEFLATED, compressed_size=len(_deflate(raw)), crc=zlib.crc32(raw),
+                name_bytes=sc.name.encode("utf-8"),
+            ))
+    plan = ExportPlan(entries)
+    info(f"[export] {bucket}: {len(entries)} entries, {plan.total_size} bytes")
+    return plan
+
+
+def parse_since(value: Optional[str]) -> Optional[float]:
+    """Epoch seconds or an ISO date/datetime."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
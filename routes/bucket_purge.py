@@ -0,0 +1,311 @@
+"""
+bucket_purge.py – the purge engine shared by the bucket API, the scheduler
+and scripts/purge_recent.py.
+
+A purge is planned from ONE directory scan of the bucket (plus one of its
+thumbnails/ folder) using set operations, so it costs O(files) rather than
+the old O(thumbnails × files) nested iterdir. The plan can be reported as a
+dry run (what would go, how many bytes come back) or executed in batches:
+each batch deletes its files and then drops them from bucket.json in a
+single meta transaction, so a run that stops early – budget exhausted,
+process killed – leaves the bucket consistent.
+
+Long purges (e.g. _recent) should go through start_purge_job(), which runs
+the purge on a daemon thread and exposes progress via get_purge_job().
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from utils.logger import info, error, debug
+
+THUMB_DIR = "thumbnails"
+BATCH_SIZE = 200
+
+
+@dataclass
+class PurgeCandidate:
+    filename: str
+    paths: List[Path]   # media, sidecar, thumbnail – whichever exist
+    bytes: int
+
+
+@dataclass
+class PurgePlan:
+    bucket: str
+    candidates: List[PurgeCandidate] = field(default_factory=list)
+    orphan_thumbnails: List[Path] = field(default_factory=list)
+    skipped: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def reclaimable_bytes(self) -> int:
+        orphan = 0
+        for p in self.orphan_thumbnails:
+            try:
+                orphan += p.stat().st_size
+            except OSError:
+                pass
+        return sum(c.bytes for c in self.candidates) + orphan
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "bucket": self.bucket,
+            "files": [c.filename for c in self.candidates],
+            "file_count": len(self.candidates),
+            "orphan_thumbnails": len(self.orphan_thumbnails),
+            "reclaimable_bytes": self.reclaimable_bytes,
+            "skipped": dict(self.skipped),
+        }
+
+
+def _scan(directory: Path) -> Dict[str, os.stat_result]:
+    """name -> stat for every regular file directly under *directory*."""
+    entries: Dict[str, os.stat_result] = {}
+    try:
+        with os.scandir(directory) as it:
+            for entry in it:
+                if entry.is_file(follow_symlinks=False):
+                    try:
+                        entries[entry.name] = entry.stat(follow_symlinks=False)
+                    except FileNotFoundError:
+                        pass
+    except FileNotFoundError:
+        pass
+    return entries
+
+
+def _freed_bytes(st: os.stat_result, pinned: Set[Tuple[int, int]]) -> int:
+    # A file a destination is showing (output/<dest>.<ext> is a hardlink to
+    # it) or a deduplicated file linked from other buckets frees nothing
+    if (st.st_dev, st.st_ino) in pinned:
+        return 0
+    return st.st_size if st.st_nlink <= 2 else 0
+
+
+def plan_purge(
+    bucket_dir: Path,
+    meta: Dict[str, Any],
+    include_favorites: bool = False,
+    older_than: Optional[float] = None,
+    min_age_seconds: float = 0,
+    now: Optional[float] = None,
+) -> PurgePlan:
+    """
+    Work out what a purge would remove without touching anything.
+
+    Args:
+        bucket_dir: the bucket's directory
+        meta: bucket.json contents (read-only)
+        include_favorites: also remove favourited files
+        older_than: only remove files whose mtime is before this timestamp
+        min_age_seconds: never remove files younger than this (still being written)
+    """
+    from routes import publish_pointer
+    from routes.utils import seq_to_filenames
+
+    now = now if now is not None else time.time()
+    plan = PurgePlan(bucket=bucket_dir.name)
+    files = _scan(bucket_dir)
+    pinned = publish_pointer.pinned(bucket_dir.parent)
+    thumbs = _scan(bucket_dir / THUMB_DIR)
+    favs = set(meta.get("favorites", []))
+
+    def skip(reason: str):
+        plan.skipped[reason] = plan.skipped.get(reason, 0) + 1
+
+    for fname in seq_to_filenames(meta.get("sequence", [])):
+        if not include_favorites and fname in favs:
+            skip("favorite")
+            continue
+        st = files.get(fname)
+        if st is None:
+            skip("missing")
+            continue
+        if older_than is not None and st.st_mtime > older_than:
+            skip("too_new")
+            continue
+        if min_age_seconds and now - st.st_mtime < min_age_seconds:
+            skip("in_progress")
+            continue
+
+        paths = [bucket_dir / fname]
+        freed = _freed_bytes(st, pinned)
+        sidecar = f"{fname}.json"
+        if sidecar in files:
+            paths.append(bucket_dir / sidecar)
+            freed += files[sidecar].st_size
+        thumb = f"{fname}.jpg"
+        if thumb in thumbs:
+            paths.append(bucket_dir / THUMB_DIR / thumb)
+            freed += thumbs[thumb].st_size
+        plan.candidates.append(PurgeCandidate(fname, paths, freed))
+
+    # Thumbnails are named <media filename>.jpg; anything whose media file
+    # won't exist after this purge is an orphan.
+    purged = {c.filename for c in plan.candidates}
+    surviving = set(files) - purged
+    orphans = {t for t in thumbs if t.endswith(".jpg")} - {f"{name}.jpg" for name in surviving | purged}
+    plan.orphan_thumbnails = [bucket_dir / THUMB_DIR / t for t in sorted(orphans)]
+    return plan
+
+
+def execute_plan(
+    bucket: str,
+    plan: PurgePlan,
+    clear_favorites: bool = False,
+    batch_size: int = BATCH_SIZE,
+    max_seconds: Optional[float] = None,
+    max_bytes: Optional[int] = None,
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Delete the plan's files in batches, updating bucket.json after each
+    batch. Stops early (complete=False) once max_seconds or max_bytes is
+    used up; re-running the purge picks up where it left off.
+    """
+    from routes import blobstore, bucket_usage
+    from routes.bucketer import meta_transaction
+
+    started = time.monotonic()
+    removed: List[str] = []
+    bytes_freed = 0
+    total = len(plan.candidates)
+    complete = True
+
+    def over_budget() -> bool:
+        if max_seconds is not None and time.monotonic() - started >= max_seconds:
+            return True
+        return max_bytes is not None and bytes_freed >= max_bytes
+
+    for start in range(0, total, batch_size):
+        batch = plan.candidates[start:start + batch_size]
+        done: List[str] = []
+        delta = bucket_usage.empty()
+        for cand in batch:
+            if over_budget():
+                complete = False
+                break
+            bucket_usage.add(delta, bucket_usage.measure(cand.paths))
+            media, *extras = cand.paths
+            blobstore.release(media)
+            for p in extras:
+                p.unlink(missing_ok=True)
+            done.append(cand.filename)
+            bytes_freed += cand.bytes
+
+        if done:
+            gone = set(done)
+            with meta_transaction(bucket) as meta:
+                meta["sequence"] = [
+                    entry for entry in meta.get("sequence", [])
+                    if (entry.get("file") if isinstance(entry, dict) else entry) not in gone
+                ]
+                meta["favorites"] = [f for f in meta.get("favorites", []) if f not in gone]
+                bucket_usage.apply(meta, delta, sign=-1)
+            removed.extend(done)
+            debug(f"[purge] {bucket}: removed batch of {len(done)} ({len(removed)}/{total})")
+            if progress:
+                progress({"done": len(removed), "total": total, "bytes_freed": bytes_freed})
+        if not complete:
+            info(f"[purge] {bucket}: budget used up after {len(removed)}/{total} files")
+            break
+
+    if complete and (plan.orphan_thumbnails or clear_favorites):
+        orphans = bucket_usage.measure(plan.orphan_thumbnails)
+        for thumb in plan.orphan_thumbnails:
+            thumb.unlink(missing_ok=True)
+        with meta_transaction(bucket) as meta:
+            bucket_usage.apply(meta, orphans, sign=-1)
+            if clear_favorites:
+                meta["favorites"] = []
+
+    if blobstore.enabled() and removed:
+        blobstore.collect_garbage()
+
+    return {
+        "removed": removed,
+        "bytes_freed": bytes_freed,
+        "complete": complete,
+        "remaining": total - len(removed),
+        "elapsed": round(time.monotonic() - started, 3),
+    }
+
+
+# ─── Background jobs ─────────────────────────────────────────────────────────
+
+_jobs: Dict[str, Dict[str, Any]] = {}
+_jobs_lock = threading.Lock()
+MAX_FINISHED_JOBS = 50
+
+
+def _prune_jobs():
+    finished = [j for j in _jobs.values() if j["state"] in ("done", "error")]
+    finished.sort(key=lambda j: j["finished_at"] or "")
+    for job in finished[:-MAX_FINISHED_JOBS]:
+        _jobs.pop(job["job_id"], None)
+
+
+def start_purge_job(bucket: str, **kwargs) -> Dict[str, Any]:
+    """
+    Run purge_bucket(bucket, **kwargs) on a background thread. Only one
+    purge per bucket runs at a time; asking again returns the running job.
+    """
+    from routes.bucketer import purge_bucket
+
+    with _jobs_lock:
+        for job in _jobs.values():
+            if job["bucket"] == bucket and job["state"] in ("queued", "running"):
+                return dict(job)
+        job_id = uuid.uuid4().hex[:12]
+        job = {
+            "job_id": job_id,
+            "bucket": bucket,
+            "state": "queued",
+            "progress": {"done": 0, "total": None, "bytes_freed": 0},
+            "result": None,
+            "error": None,
+            "started_at": datetime.utcnow().isoformat() + "Z",
+            "finished_at": None,
+        }
+        _jobs[job_id] = job
+        _prune_jobs()
+
+    def on_progress(p: Dict[str, Any]):
+        with _jobs_lock:
+            job["progress"] = dict(p)
+
+    def run():
+        with _jobs_lock:
+            job["state"] = "running"
+        try:
+            result = purge_bucket(bucket, progress=on_progress, **kwargs)
+            with _jobs_lock:
+                job["result"] = result
+                job["state"] = "done"
+        except Exception as e:
+            error(f"[purge] Background purge of {bucket} failed: {e}")
+            with _jobs_lock:
+                job["error"] = str(e)
+                job["state"] = "error"
+        finally:
+            with _jobs_lock:
+                job["finished_at"] = datetime.utcnow().isoformat() + "Z"
+
+    threading.Thread(target=run, name=f"purge-{bucket}", daemon=True).start()
+    info(f"[purge] Started background purge {job_id} for {bucket}")
+    with _jobs_lock:
+        return dict(job)
+
+
+def get_purge_job(job_id: str) -> Optional[Dict[str, Any]]:
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        return dict(job) if job else None
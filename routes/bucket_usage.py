@@ -0,0 +1,244 @@
+"""
+bucket_usage.py – per-bucket disk accounting and quotas.
+
+Each bucket.json carries a "usage" block:
+
+    {"images":     {"count": 812, "bytes": 1634201120},
+     "videos":     {"count": 40,  "bytes": 2094330011},
+     "thumbnails": {"count": 852, "bytes": 21800112},
+     "sidecars":   {"count": 852, "bytes": 3012200},
+     "total_bytes": 3753343443}
+
+It is kept current by the code paths that add or remove files
+(_append_to_bucket, copy/move between buckets, delete, purge, archive):
+they measure() the files they touched and apply() the delta inside the
+same meta transaction that edits the sequence, so accounting costs no
+extra write. A bucket without a usage block (or after files were dropped
+in by hand) gets one from recount(), the only place that walks the tree.
+
+Quotas come from the destination's "quota" entry in
+publish-destinations.json, falling back to config.BUCKET_QUOTA_*:
+
+    "quota": {"soft_bytes": 20e9, "hard_bytes": 25e9, "auto_evict": true}
+
+Passing the soft quota raises a warning alert, passing the hard quota an
+error alert and – with auto_evict – starts an oldest-first eviction (never
+favourites or the published item) back down to the soft quota. Free space
+on the output filesystem is checked at the same time and raises a critical
+alert below config.OUTPUT_MIN_FREE_BYTES.
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+import config
+from utils.alerts import alert
+from utils.logger import info, warning, error, debug
+
+CATEGORIES = ("images", "videos", "thumbnails", "sidecars")
+_VIDEO_EXT = {".mp4", ".mov", ".webm"}
+THUMB_DIR = "thumbnails"
+
+_evicting: set = set()
+_evicting_lock = threading.Lock()
+
+
+def category_of(path: Path) -> Optional[str]:
+    if path.parent.name == THUMB_DIR:
+        return "thumbnails"
+    suffix = path.suffix.lower()
+    from routes.bucketer import ALLOWED_EXT
+    if suffix == ".json":
+        # <media>.<ext>.json; bucket.json, phash.jsonl etc. are bookkeeping
+        return "sidecars" if Path(path.stem).suffix.lower() in ALLOWED_EXT else None
+    if suffix in _VIDEO_EXT:
+        return "videos"
+    return "images" if suffix in ALLOWED_EXT else None
+
+
+def empty() -> Dict[str, Any]:
+    usage: Dict[str, Any] = {c: {"count": 0, "bytes": 0} for c in CATEGORIES}
+    usage["total_bytes"] = 0
+    return usage
+
+
+def measure(paths: Iterable[Path]) -> Dict[str, Any]:
+    """Usage contributed by *paths* (missing files count as nothing)."""
+    delta = empty()
+    for p in paths:
+        cat = category_of(Path(p))
+        if cat is None:
+            continue
+        try:
+            size = os.stat(p).st_size
+        except OSError:
+            continue
+        delta[cat]["count"] += 1
+        delta[cat]["bytes"] += size
+        delta["total_bytes"] += size
+    return delta
+
+
+def add(total: Dict[str, Any], delta: Dict[str, Any]) -> Dict[str, Any]:
+    """Accumulate *delta* into *total* (both measure()-shaped)."""
+    for cat in CATEGORIES:
+        total[cat]["count"] += delta[cat]["count"]
+        total[cat]["bytes"] += delta[cat]["bytes"]
+    total["total_bytes"] += delta["total_bytes"]
+    return total
+
+
+def item_paths(bucket_dir: Path, filename: str) -> list:
+    """Media, sidecar and thumbnail paths of one bucket item."""
+    media = bucket_dir / filename
+    return [media, media.with_name(media.name + ".json"), bucket_dir / THUMB_DIR / f"{filename}.jpg"]
+
+
+def apply(meta: Dict[str, Any], delta: Dict[str, Any], sign: int = 1):
+    """
+    Add (sign=1) or subtract (sign=-1) *delta* from meta["usage"]. Call it
+    inside the meta transaction that records the change. Buckets without a
+    usage block are left alone – recount() establishes the baseline.
+    """
+    usage = meta.get("usage")
+    if not isinstance(usage, dict):
+        return
+    for cat in CATEGORIES:
+        slot = usage.setdefault(cat, {"count": 0, "bytes": 0})
+        slot["count"] = max(0, slot["count"] + sign * delta[cat]["count"])
+        slot["bytes"] = max(0, slot["bytes"] + sign * delta[cat]["bytes"])
+    usage["total_bytes"] = sum(usage[c]["bytes"] for c in CATEGORIES)
+
+
+def recount(bucket: str) -> Dict[str, Any]:
+    """Walk the bucket once and store the result as its usage baseline."""
+    from routes.bucketer import bucket_path, meta_transaction
+
+    bdir = bucket_path(bucket)
+    with meta_transaction(bucket) as meta:
+        paths = []
+        for directory in (bdir, bdir / THUMB_DIR):
+            try:
+                with os.scandir(directory) as it:
+                    paths.extend(Path(e.path) for e in it if e.is_file(follow_symlinks=False))
+            except FileNotFoundError:
+                pass
+        meta["usage"] = measure(paths)
+        usage = dict(meta["usage"])
+    debug(f"[usage] {bucket}: recounted {usage['total_bytes']} bytes")
+    return usage
+
+
+def get_usage(bucket: str) -> Dict[str, Any]:
+    from routes.bucketer import read_meta
+    usage = read_meta(bucket).get("usage")
+    return dict(usage) if isinstance(usage, dict) else recount(bucket)
+
+
+# ─── Quotas ──────────────────────────────────────────────────────────────────
+
+def quota_for(bucket: str) -> Dict[str, Any]:
+    from routes.utils import _load_json_once
+    dests = _load_json_once("publish_destinations", "publish-destinations.json")
+    dest = next((d for d in dests if d["id"] == bucket), None) or {}
+    quota = dest.get("quota") or {}
+    return {
+        "soft_bytes": quota.get("soft_bytes", config.BUCKET_QUOTA_SOFT_BYTES),
+        "hard_bytes": quota.get("hard_bytes", config.BUCKET_QUOTA_HARD_BYTES),
+        "auto_evict": quota.get("auto_evict", config.BUCKET_QUOTA_AUTO_EVICT),
+    }
+
+
+def check(bucket: str, usage: Optional[Dict[str, Any]] = None,
+          quota: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Compare the bucket against its quota and the output filesystem's free
+    space, raising alerts as needed. Returns the verdict.
+    """
+    from routes.bucketer import bucket_path
+
+    usage = usage if usage is not None else get_usage(bucket)
+    quota = quota if quota is not None else quota_for(bucket)
+    total = usage.get("total_bytes", 0)
+    soft, hard = quota.get("soft_bytes"), quota.get("hard_bytes")
+    state = "ok"
+    if hard is not None and total >= hard:
+        state = "hard"
+        alert("bucket.quota_hard", f"Bucket {bucket} is over its hard quota",
+              detail=f"{total} bytes used, hard quota {hard}",
+              context={"bucket": bucket, "bytes": total, "hard_bytes": hard},
+              dedup_key=f"bucket.quota_hard:{bucket}")
+    elif soft is not None and total >= soft:
+        state = "soft"
+        alert("bucket.quota_soft", f"Bucket {bucket} is over its soft quota",
+              detail=f"{total} bytes used, soft quota {soft}",
+              context={"bucket": bucket, "bytes": total, "soft_bytes": soft},
+              dedup_key=f"bucket.quota_soft:{bucket}")
+
+    free = None
+    try:
+        free = shutil.disk_usage(bucket_path(bucket)).free
+    except OSError:
+        pass
+    if free is not None and free < config.OUTPUT_MIN_FREE_BYTES:
+        alert("disk.low_space", f"Only {free // (1 << 20)} MB free on the output disk",
+              context={"bucket": bucket, "free_bytes": free},
+              dedup_key="disk.low_space")
+
+    return {"state": state, "bytes": total, "quota": quota, "disk_free_bytes": free}
+
+
+def enforce(bucket: str, usage: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """check(), and start an eviction if the hard quota is exceeded with auto_evict on."""
+    verdict = check(bucket, usage)
+    quota = verdict["quota"]
+    if verdict["state"] == "hard" and quota.get("auto_evict"):
+        target = quota.get("soft_bytes") or quota["hard_bytes"]
+        with _evicting_lock:
+            if bucket in _evicting:
+                return verdict
+            _evicting.add(bucket)
+        threading.Thread(target=_evict_in_background, args=(bucket, verdict["bytes"] - target),
+                         name=f"evict-{bucket}", daemon=True).start()
+        verdict["evicting"] = True
+    return verdict
+
+
+def _evict_in_background(bucket: str, excess: int):
+    try:
+        evict(bucket, excess)
+    except Exception as e:
+        error(f"[usage] Eviction in {bucket} failed: {e}")
+    finally:
+        with _evicting_lock:
+            _evicting.discard(bucket)
+
+
+def evict(bucket: str, excess: int) -> Dict[str, Any]:
+    """Delete the oldest items (not favourites, not published) until *excess* bytes are gone."""
+    from routes.bucket_purge import PurgePlan, plan_purge, execute_plan
+    from routes.bucketer import bucket_path, read_meta
+
+    meta = read_meta(bucket)
+    published = (meta.get("published_meta") or {}).get("filename")
+    plan = plan_purge(bucket_path(bucket), meta)
+    chosen, freed = [], 0
+    for cand in plan.candidates:     # sequence order: oldest first
+        if freed >= excess:
+            break
+        if cand.filename == published:
+            continue
+        chosen.append(cand)
+        freed += measure(cand.paths)["total_bytes"]
+    if not chosen:
+        warning(f"[usage] {bucket} is over quota but has nothing left to evict")
+        return {"removed": [], "bytes_freed": 0}
+
+    result = execute_plan(bucket, PurgePlan(bucket=plan.bucket, candidates=chosen))
+    info(f"[usage] {bucket}: evicted {len(result['removed'])} items to get back under quota")
+    return result
@@ -4,6 +4,7 @@ Bucket utilities for reference image persistence
 from typing import List, Dict, Any, Optional
 from pathlib import Path
 import json
+import os
 import shutil
 import base64
 from io import BytesIO
@@ -11,7 +12,7 @@ from PIL import Image
 import tempfile
 
 from utils.logger import info, error, warning, debug
-from routes.bucketer import bucket_path, load_meta, save_meta
+from routes.bucketer import bucket_path, read_meta, meta_transaction
 from routes.utils import generate_thumbnail, sidecar_path
 
 
@@ -148,6 +149,8 @@ class ReferenceImageStorage:
         
         return stored_references
     
+    MAIN_IMAGE_EXTS = ('.jpg', '.jpeg', '.png', '.webp')
+
     def get_reference_images(self, base_filename: str, bucket_id: str) -> List[ReferenceImageInfo]:
         """
         Retrieve reference images for a generated image
@@ -162,76 +165,74 @@ class ReferenceImageStorage:
         bucket_dir = bucket_path(bucket_id)
         if not bucket_dir.exists():
             return []
-            
-        # First try to load from sidecar file (preferred method)
-        from routes.utils import sidecar_path
-        
-        # Find the main image file to get its sidecar
-        main_image_path = None
-        for ext in ['.jpg', '.jpeg', '.png', '.webp']:
-            potential_path = bucket_dir / f"{base_filename}{ext}"
-            if potential_path.exists():
-                main_image_path = potential_path
-                break
-        
-        if main_image_path:
-            sidecar_file = sidecar_path(main_image_path)
-            if sidecar_file.exists():
-                try:
-                    with open(sidecar_file, 'r', encoding='utf-8') as f:
-                        sidecar_data = json.load(f)
-                    
-                    ref_data_list = sidecar_data.get("reference_images", [])
-                    stored_references = []
-                    
-                    for ref_data in ref_data_list:
-                        try:
-                            ref_info = ReferenceImageInfo.from_dict(ref_data)
-                            
-                            # Handle different path formats for backward compatibility
-                            stored_path = ref_info.stored_path
-                            thumbnail_path = ref_info.thumbnail_path
-                            
-                            # Remove bucket prefix if present (e.g., "_recent/filename" -> "filename")
-                            if stored_path.startswith(f'{bucket_id}/'):
-                                stored_path = stored_path[len(f'{bucket_id}/'):]
-                            elif stored_path.startswith('/'):
-                                # Absolute path - convert to relative by taking just the filename
-                                stored_path = Path(stored_path).name
-                            
-                            # Same for thumbnail path
-                            if thumbnail_path.startswith(f'{bucket_id}/'):
-                                thumbnail_path = thumbnail_path[len(f'{bucket_id}/'):]
-                            elif thumbnail_path.startswith('/'):
-                                # Absolute path - convert to relative
-                                thumbnail_path = f"thumbnails/{Path(thumbnail_path).name}"
-                            
-                            # Update the ref_info with corrected paths
-                            ref_info.stored_path = stored_path
-                            ref_info.thumbnail_path = thumbnail_path
-                            
-                            # Check if the file exists with the corrected path
-                            ref_path = bucket_dir / stored_path
-                            if ref_path.exists():
-                                stored_references.append(ref_info)
-                            else:
-                                warning(f"Reference image file not found: {ref_path}")
-                                
-                        except Exception as e:
-                            error(f"Failed to load reference image info: {e}")
-                            continue
-                    
-                    return stored_references
-                except Exception as e:
-                    error(f"Failed to read sidecar file {sidecar_file}: {e}")
-        
-        # Fallback to bucket metadata (legacy support)
-        meta = load_meta(bucket_id)
-        reference_images = meta.get("reference_images", {})
-        base_refs = reference_images.get(base_filename, [])
+        # A single lookup is cheaper with a few stats than a directory scan
+        exists = lambda name: (bucket_dir / name).exists()
+        return self._lookup([base_filename], bucket_id, exists, {})[base_filename]
+
+    def get_reference_images_batch(self, base_filenames: List[str], bucket_id: str,
+                                   sidecars: Optional[Dict[str, Dict[str, Any]]] = None
+                                   ) -> Dict[str, List[ReferenceImageInfo]]:
+        """
+        Resolve reference images for many generated images at once, from one
+        directory scan and at most one bucket.json load.
         
+        Args:
+            base_filenames: Filenames of the generated images (without extension)
+            bucket_id: The bucket ID where images are stored
+            sidecars: Optional already-parsed sidecars keyed by media filename
+                (e.g. {"foo.jpg": {...}}) so callers that have read them don't
+                pay for a second read
+            
+        Returns:
+            Dict mapping each base filename to its list of ReferenceImageInfo
+        """
+        bucket_dir = bucket_path(bucket_id)
+        if not bucket_dir.exists():
+            return {base: [] for base in base_filenames}
+        with os.scandir(bucket_dir) as it:
+            names = {entry.name for entry in it}
+        return self._lookup(base_filenames, bucket_id, names.__contains__, sidecars or {})
+
+    def _lookup(self, base_filenames: List[str], bucket_id: str, exists,
+                sidecars: Dict[str, Dict[str, Any]]) -> Dict[str, List[ReferenceImageInfo]]:
+        bucket_dir = bucket_path(bucket_id)
+        legacy = None
+        results: Dict[str, List[ReferenceImageInfo]] = {}
+
+        for base_filename in base_filenames:
+            if base_filename in results:
+                continue
+
+            # First try the main image's sidecar (preferred method)
+            main_name = next((f"{base_filename}{ext}" for ext in self.MAIN_IMAGE_EXTS
+                              if exists(f"{base_filename}{ext}")), None)
+            if main_name:
+                sidecar_data = sidecars.get(main_name)
+                if sidecar_data is None and exists(f"{main_name}.json"):
+                    sidecar_file = sidecar_path(bucket_dir / main_name)
+                    try:
+                        with open(sidecar_file, 'r', encoding='utf-8') as f:
+                            sidecar_data = json.load(f)
+                    except Exception as e:
+                        error(f"Failed to read sidecar file {sidecar_file}: {e}")
+                if sidecar_data is not None:
+                    results[base_filename] = self._resolve(
+                        sidecar_data.get("reference_images", []), bucket_id, exists)
+                    continue
+
+            # Fallback to bucket metadata (legacy support)
+            if legacy is None:
+                legacy = read_meta(bucket_id).get("reference_images", {})
+            results[base_filename] = self._resolve(legacy.get(base_filename, []), bucket_id, exists)
+
+        return results
+
+    @staticmethod
+    def _resolve(ref_data_list: List[Dict[str, Any]], bucket_id: str, exists) -> List[ReferenceImageInfo]:
+        """Build ReferenceImageInfo objects, normalising paths and dropping missing files."""
+        bucket_dir = bucket_path(bucket_id)
         stored_references = []
-        for ref_data in base_refs:
+        for ref_data in ref_data_list:
             try:
                 ref_info = ReferenceImageInfo.from_dict(ref_data)
                 
@@ -258,11 +259,11 @@ class ReferenceImageStorage:
                 ref_info.thumbnail_path = thumbnail_path
                 
                 # Check if the file exists with the corrected path
-                ref_path = bucket_dir / stored_path
-                if ref_path.exists():
+                found = exists(stored_path) if "/" not in stored_path else (bucket_dir / stored_path).exists()
+                if found:
                     stored_references.append(ref_info)
                 else:
-                    warning(f"Reference image file not found: {ref_path}")
+                    warning(f"Reference image file not found: {bucket_dir / stored_path}")
                     
             except Exception as e:
                 error(f"Failed to load reference image info: {e}")
@@ -303,12 +304,11 @@ class ReferenceImageStorage:
                 error(f"Failed to cleanup reference image {ref_info.index}: {e}")
         
         # Remove reference image metadata
-        meta = load_meta(bucket_id)
-        reference_images = meta.get("reference_images", {})
-        if base_filename in reference_images:
-            del reference_images[base_filename]
-            save_meta(bucket_id, meta)
-            info(f"Cleaned up reference image metadata for: {base_filename}")
+        with meta_transaction(bucket_id) as meta:
+            reference_images = meta.get("reference_images", {})
+            if base_filename in reference_images:
+                del reference_images[base_filename]
+                info(f"Cleaned up reference image metadata for: {base_filename}")
 
 
 def update_metadata_with_references(metadata: Dict[str, Any], reference_images: List[ReferenceImageInfo]) -> Dict[str, Any]:
@@ -0,0 +1,408 @@
+"""
+bucket_watcher.py – keep bucket.json and thumbnails in step with files that
+arrive in output/<bucket>/ outside the API (rsync, the media server, manual
+copies).
+
+Off by default (config.BUCKET_WATCHER_ENABLED). When on, one daemon thread
+watches the top level of every has_bucket destination's directory:
+
+• inotify (Linux, via libc – no extra dependency) when available,
+  otherwise a polling fallback that diffs one scandir per bucket against
+  the previous snapshot every BUCKET_WATCHER_POLL_S seconds.
+• Events are debounced per bucket (BUCKET_WATCHER_DEBOUNCE_S of quiet) and
+  then applied incrementally:
+    added / modified → sidecar (if missing) + thumbnail, appended to sequence
+    removed          → sidecar + thumbnail deleted, dropped from sequence/favourites
+  The sequence/favourites update is one meta_transaction per flush.
+
+Files written by the API itself also generate events. _append_to_bucket
+marks a file with ingesting() until its sequence entry exists, and flushes
+skip marked files; afterwards applying them is a no-op because they are
+already in the sequence with an up-to-date thumbnail.
+An inotify queue overflow falls back to a full reindex_bucket of that bucket.
+"""
+
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional, Set, Tuple
+
+import config
+from utils.logger import info, warning, error, debug
+
+# inotify(7) constants
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+
+WATCH_MASK = IN_CREATE | IN_CLOSE_WRITE | IN_MOVED_TO | IN_MOVED_FROM | IN_DELETE | IN_DELETE_SELF
+_EVENT_HEADER = struct.Struct("iIII")
+
+ADDED, MODIFIED, REMOVED = "added", "modified", "removed"
+RESYNC = "*"
+
+
+def _relevant(name: str) -> bool:
+    from routes.bucketer import ALLOWED_EXT
+    if name.startswith("."):        # rsync / our own temp files
+        return False
+    return Path(name).suffix.lower() in ALLOWED_EXT
+
+
+def _bucket_ids() -> Set[str]:
+    from routes.utils import _load_json_once
+    dests = _load_json_once("publish_destinations", "publish-destinations.json")
+    return {d["id"] for d in dests if d.get("has_bucket", False)}
+
+
+# ─── Backends ────────────────────────────────────────────────────────────────
+
+class _InotifyBackend:
+    """Linux inotify through libc. Raises OSError if unavailable."""
+
+    def __init__(self):
+        libname = ctypes.util.find_library("c")
+        if not libname:
+            raise OSError("libc not found")
+        self._libc = ctypes.CDLL(libname, use_errno=True)
+        if not hasattr(self._libc, "inotify_init1"):
+            raise OSError("inotify not supported")
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._wd_to_bucket: Dict[int, str] = {}
+        self._bucket_to_wd: Dict[str, int] = {}
+
+    def watch(self, bucket: str, directory: Path) -> bool:
+        if bucket in self._bucket_to_wd:
+            return True
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            return False
+        self._wd_to_bucket[wd] = bucket
+        self._bucket_to_wd[bucket] = wd
+        return True
+
+    def watched(self) -> Set[str]:
+        return set(self._bucket_to_wd)
+
+    def poll(self, timeout: float):
+        """Yield (bucket, name, kind) for events arriving within *timeout*."""
+        ready, _, _ = select.select([self._fd], [], [], max(timeout, 0))
+        if not ready:
+            return
+        try:
+            buf = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(buf):
+            wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(buf, offset)
+            offset += _EVENT_HEADER.size
+            name = buf[offset:offset + length].rstrip(b"\0").decode("utf-8", "surrogateescape")
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                for bucket in self._bucket_to_wd:
+                    yield bucket, "", RESYNC
+                continue
+            bucket = self._wd_to_bucket.get(wd)
+            if bucket is None:
+                continue
+            if mask & (IN_IGNORED | IN_DELETE_SELF):
+                # directory went away; re-added by the next refresh
+                self._wd_to_bucket.pop(wd, None)
+                self._bucket_to_wd.pop(bucket, None)
+                continue
+            if mask & IN_ISDIR or not name:
+                continue
+            if mask & (IN_DELETE | IN_MOVED_FROM):
+                yield bucket, name, REMOVED
+            elif mask & (IN_CREATE | IN_MOVED_TO):
+                yield bucket, name, ADDED
+            elif mask & IN_CLOSE_WRITE:
+                yield bucket, name, MODIFIED
+
+    def close(self):
+        os.close(self._fd)
+
+
+class _PollingBackend:
+    """Diff a scandir snapshot of each bucket every poll_interval seconds."""
+
+    def __init__(self, poll_interval: float):
+        self.poll_interval = poll_interval
+        self._dirs: Dict[str, Path] = {}
+        self._snapshots: Dict[str, Dict[str, Tuple[int, int]]] = {}
+        self._next_scan = 0.0
+
+    @staticmethod
+    def _snapshot(directory: Path) -> Dict[str, Tuple[int, int]]:
+        snap = {}
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    if entry.is_file(follow_symlinks=False) and _relevant(entry.name):
+                        try:
+                            st = entry.stat(follow_symlinks=False)
+                        except FileNotFoundError:
+                            continue
+                        snap[entry.name] = (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            pass
+        return snap
+
+    def watch(self, bucket: str, directory: Path) -> bool:
+        if bucket not in self._dirs:
+            self._dirs[bucket] = directory
+            self._snapshots[bucket] = self._snapshot(directory)
+        return True
+
+    def watched(self) -> Set[str]:
+        return set(self._dirs)
+
+    def poll(self, timeout: float):
+        wait = self._next_scan - time.monotonic()
+        if wait > 0:
+            time.sleep(min(wait, max(timeout, 0)))
+            if time.monotonic() < self._next_scan:
+                return
+        self._next_scan = time.monotonic() + self.poll_interval
+        for bucket, directory in self._dirs.items():
+            old = self._snapshots.get(bucket, {})
+            new = self._snapshot(directory)
+            self._snapshots[bucket] = new
+            for name in new.keys() - old.keys():
+                yield bucket, name, ADDED
+            for name in old.keys() - new.keys():
+                yield bucket, name, REMOVED
+            for name in new.keys() & old.keys():
+                if new[name] != old[name]:
+                    yield bucket, name, MODIFIED
+
+    def close(self):
+        pass
+
+
+# ─── Files the API is writing ────────────────────────────────────────────────
+
+_ingest_lock = threading.Lock()
+_ingesting: Dict[str, Set[str]] = {}
+
+
+@contextmanager
+def ingesting(bucket: str, name: str):
+    """Mark output/<bucket>/<name> as being added by the API; flushes leave it alone."""
+    with _ingest_lock:
+        _ingesting.setdefault(bucket, set()).add(name)
+    try:
+        yield
+    finally:
+        with _ingest_lock:
+            names = _ingesting.get(bucket)
+            if names is not None:
+                names.discard(name)
+                if not names:
+                    del _ingesting[bucket]
+
+
+def _being_ingested(bucket: str) -> Set[str]:
+    with _ingest_lock:
+        return set(_ingesting.get(bucket, ()))
+
+
+# ─── Applying changes ────────────────────────────────────────────────────────
+
+def apply_changes(bucket: str, changes: Dict[str, str]) -> Dict[str, list]:
+    """
+    Fold a debounced batch of {filename: kind} changes into the bucket's
+    sidecars, thumbnails, bucket.json and usage totals. New files are
+    measured into the usage in the same transaction; a file that was
+    removed or rewritten can no longer tell us its old size, so those
+    batches recount the bucket instead. Quotas are enforced afterwards.
+    """
+    from routes import bucket_usage
+    from routes.bucketer import bucket_path, extract_metadata, meta_transaction, reindex_bucket
+    from routes.utils import generate_thumbnail, seq_to_filenames, sidecar_path
+
+    if RESYNC in changes.values():
+        info(f"[watcher] Event queue overflowed; reindexing {bucket}")
+        reindex_bucket(bucket)
+        bucket_usage.enforce(bucket, bucket_usage.recount(bucket))
+        return {"added": [], "removed": [], "resynced": [bucket]}
+
+    bdir = bucket_path(bucket)
+    thumb_dir = bdir / "thumbnails"
+    busy = _being_ingested(bucket)
+    present, gone = [], []
+    for name, kind in changes.items():
+        if name in busy:
+            continue  # _append_to_bucket indexes it itself
+        fp = bdir / name
+        # The last event wins, but trust the filesystem over the event kind
+        if fp.is_file():
+            present.append((name, kind))
+        else:
+            gone.append(name)
+
+    for name, kind in present:
+        fp = bdir / name
+        thumb = thumb_dir / f"{fp.stem}{fp.suffix}.jpg"
+        try:
+            extract_metadata(fp, force_rebuild=False)
+            if kind == MODIFIED or not thumb.exists() or thumb.stat().st_mtime < fp.stat().st_mtime:
+                thumb_dir.mkdir(parents=True, exist_ok=True)
+                generate_thumbnail(fp, thumb)
+        except Exception as e:
+            warning(f"[watcher] Could not index {bucket}/{name}: {e}")
+
+    for name in gone:
+        fp = bdir / name
+        sidecar_path(fp).unlink(missing_ok=True)
+        (thumb_dir / f"{fp.stem}{fp.suffix}.jpg").unlink(missing_ok=True)
+
+    added: list = []
+    removed: list = []
+    with meta_transaction(bucket) as meta:
+        seq = meta.setdefault("sequence", [])
+        known = set(seq_to_filenames(seq))
+        as_dicts = all(isinstance(e, dict) for e in seq)
+        grown = bucket_usage.empty()
+        for name, _ in present:
+            if name not in known:
+                seq.append({"file": name} if as_dicts else name)
+                added.append(name)
+                bucket_usage.add(grown, bucket_usage.measure(bucket_usage.item_paths(bdir, name)))
+        bucket_usage.apply(meta, grown)
+        if gone:
+            gone_set = set(gone)
+            meta["sequence"] = [
+                e for e in seq
+                if (e.get("file") if isinstance(e, dict) else e) not in gone_set
+            ]
+            meta["favorites"] = [f for f in meta.get("favorites", []) if f not in gone_set]
+            removed = [n for n in gone if n in known]
+        usage = meta.get("usage")
+
+    resized = bool(gone) or any(name in known for name, _ in present)
+    if resized:
+        usage = bucket_usage.recount(bucket)
+    if added or resized:
+        bucket_usage.enforce(bucket, usage)
+    if added or removed:
+        info(f"[watcher] {bucket}: +{len(added)} -{len(removed)} files")
+    return {"added": added, "removed": removed, "resynced": []}
+
+
+# ─── Watcher thread ──────────────────────────────────────────────────────────
+
+class BucketWatcher:
+    def __init__(self, debounce: float, poll_interval: float, force_polling: bool = False):
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self._pending: Dict[str, Dict[str, str]] = {}
+        self._last_event: Dict[str, float] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.backend = None
+        if not force_polling:
+            try:
+                self.backend = _InotifyBackend()
+            except OSError as e:
+                debug(f"[watcher] inotify unavailable ({e}); polling instead")
+        if self.backend is None:
+            self.backend = _PollingBackend(poll_interval)
+
+    @property
+    def mode(self) -> str:
+        return "inotify" if isinstance(self.backend, _InotifyBackend) else "polling"
+
+    def refresh_watches(self):
+        from routes.bucketer import bucket_path
+        for bucket in _bucket_ids() - self.backend.watched():
+            directory = bucket_path(bucket)
+            if directory.is_dir() and not self.backend.watch(bucket, directory):
+                warning(f"[watcher] Could not watch {directory}")
+
+    def record(self, bucket: str, name: str, kind: str):
+        if kind != RESYNC and not _relevant(name):
+            return
+        pending = self._pending.setdefault(bucket, {})
+        if kind == RESYNC:
+            pending[RESYNC] = RESYNC
+        elif pending.get(name) == ADDED and kind == MODIFIED:
+            pass  # still a new file
+        else:
+            pending[name] = kind
+        self._last_event[bucket] = time.monotonic()
+
+    def flush_due(self, force: bool = False):
+        now = time.monotonic()
+        for bucket in list(self._pending):
+            if force or now - self._last_event.get(bucket, 0) >= self.debounce:
+                changes = self._pending.pop(bucket)
+                try:
+                    apply_changes(bucket, changes)
+                except Exception as e:
+                    error(f"[watcher] Failed to apply changes to {bucket}: {e}")
+
+    def _run(self):
+        info(f"[watcher] Watching bucket directories ({self.mode})")
+        last_refresh = 0.0
+        while not self._stop.is_set():
+            if time.monotonic() - last_refresh >= self.poll_interval:
+                self.refresh_watches()
+                last_refresh = time.monotonic()
+            timeout = self.debounce if self._pending else self.poll_interval
+            try:
+                for bucket, name, kind in self.backend.poll(timeout):
+                    self.record(bucket, name, kind)
+            except Exception as e:
+                error(f"[watcher] Watch backend error: {e}")
+                time.sleep(1)
+            self.flush_due()
+        self.flush_due(force=True)
+        self.backend.close()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="bucket-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+
+_watcher: Optional[BucketWatcher] = None
+
+
+def start_bucket_watcher() -> Optional[BucketWatcher]:
+    """Start the watcher thread if config.BUCKET_WATCHER_ENABLED (idempotent)."""
+    global _watcher
+    if not getattr(config, "BUCKET_WATCHER_ENABLED", False):
+        return None
+    if _watcher is None:
+        _watcher = BucketWatcher(
+            debounce=config.BUCKET_WATCHER_DEBOUNCE_S,
+            poll_interval=config.BUCKET_WATCHER_POLL_S,
+        )
+        _watcher.start()
+    return _watcher
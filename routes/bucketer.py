@@ -1,5 +1,6 @@
 from typing import Dict, Any, List
 from pathlib import Path
+from contextlib import contextmanager
 import json
 import base64
 from datetime import datetime, timedelta
@@ -11,8 +12,10 @@ import cv2
 import os
 import time
 import re
+import threading
 
 from utils.logger import info, error, warning, debug
+from routes import blobstore, bucket_archive, bucket_usage, bucket_watcher, mp4meta, phash
 from routes.utils import (
     sidecar_path,
     ensure_sidecar_for,
@@ -47,16 +50,125 @@ def publish_path(bucket: str, filename: str) -> Path:
 # Metadata helpers
 # ----------------------------------------------------------------------------
 
-def load_meta(bucket: str) -> Dict[str, Any]:
+# bucket.json is read on nearly every bucket / publish request and rewritten
+# from up to 64 waitress threads plus the scheduler loops. The file text and
+# its parsed form are cached per path and revalidated against
+# (mtime_ns, inode, size), so edits made outside this process (scripts,
+# rsync) are still picked up. All writes and read-modify-write transactions
+# hold the bucket's lock; writes go through a temp file + os.replace so a
+# reader never sees a half-written file.
+
+_meta_cache: Dict[str, Dict[str, Any]] = {}
+_meta_locks: Dict[str, threading.RLock] = {}
+_meta_locks_guard = threading.Lock()
+_meta_tx = threading.local()
+
+def meta_lock(bucket: str) -> threading.RLock:
+    """Per-bucket re-entrant lock guarding bucket.json."""
+    lock = _meta_locks.get(bucket)
+    if lock is None:
+        with _meta_locks_guard:
+            lock = _meta_locks.setdefault(bucket, threading.RLock())
+    return lock
+
+def _open_transactions() -> Dict[str, Dict[str, Any]]:
+    if not hasattr(_meta_tx, "open"):
+        _meta_tx.open = {}
+    return _meta_tx.open
+
+def _cached_meta_entry(bucket: str) -> Dict[str, Any] | None:
     fp = meta_path(bucket)
-    if fp.exists():
-        return json.loads(fp.read_text("utf-8"))
-    return {"sequence": [], "favorites": []}
+    cache_key = str(fp)
+    with meta_lock(bucket):
+        try:
+            st = fp.stat()
+        except FileNotFoundError:
+            _meta_cache.pop(cache_key, None)
+            return None
+        stamp = (st.st_mtime_ns, st.st_ino, st.st_size)
+        entry = _meta_cache.get(cache_key)
+        if entry is None or entry["stamp"] != stamp:
+            entry = {"stamp": stamp, "text": fp.read_text("utf-8"), "data": None}
+            _meta_cache[cache_key] = entry
+        return entry
+
+def read_meta(bucket: str) -> Dict[str, Any]:
+    """
+    Return the bucket metadata WITHOUT copying it. The dict is shared with
+    every other reader: treat it as read-only. Use load_meta() or
+    meta_transaction() when you need to change anything.
+    """
+    tx = _open_transactions().get(bucket)
+    if tx is not None:
+        return tx["meta"]
+    entry = _cached_meta_entry(bucket)
+    if entry is None:
+        return {"sequence": [], "favorites": []}
+    if entry["data"] is None:
+        entry["data"] = json.loads(entry["text"])
+    return entry["data"]
 
-def save_meta(bucket: str, meta: Dict[str, Any]):
+def load_meta(bucket: str) -> Dict[str, Any]:
+    """Return a private, mutable copy of the bucket metadata."""
+    tx = _open_transactions().get(bucket)
+    if tx is not None:
+        return tx["meta"]
+    entry = _cached_meta_entry(bucket)
+    if entry is None:
+        return {"sequence": [], "favorites": []}
+    return json.loads(entry["text"])
+
+def _write_meta(bucket: str, meta: Dict[str, Any]):
     p = meta_path(bucket)
     p.parent.mkdir(parents=True, exist_ok=True)
-    p.write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    text = json.dumps(meta, indent=2)
+    with meta_lock(bucket):
+        tmp = p.with_name(f".{p.name}.{uuid.uuid4().hex[:8]}.tmp")
+        tmp.write_text(text, encoding="utf-8")
+        os.replace(tmp, p)
+        st = p.stat()
+        _meta_cache[str(p)] = {
+            "stamp": (st.st_mtime_ns, st.st_ino, st.st_size),
+            "text": text,
+            "data": None,
+        }
+
+def save_meta(bucket: str, meta: Dict[str, Any]):
+    """
+    Persist bucket metadata. Inside a meta_transaction() for the same bucket
+    the write is deferred and batched into the transaction's single save.
+    """
+    tx = _open_transactions().get(bucket)
+    if tx is not None:
+        tx["meta"] = meta
+        return
+    _write_meta(bucket, meta)
+
+@contextmanager
+def meta_transaction(bucket: str):
+    """
+    Atomic read-modify-write of bucket.json:
+
+        with meta_transaction(bucket_id) as meta:
+            meta["favorites"].append(name)
+
+    Holds the bucket lock for the duration and saves once on a clean exit
+    (nothing is written if the block raises). load_meta/save_meta calls made
+    on this thread while the transaction is open share its working copy, so
+    helpers composed inside one transaction cost a single write.
+    """
+    with meta_lock(bucket):
+        open_tx = _open_transactions()
+        if bucket in open_tx:
+            yield open_tx[bucket]["meta"]
+            return
+        tx = {"meta": load_meta(bucket)}
+        open_tx[bucket] = tx
+        try:
+            yield tx["meta"]
+        finally:
+            open_tx.pop(bucket, None)
+        _write_meta(bucket, tx["meta"])
 
 def infer_meta_from_file(file_path: Path) -> dict:
     """
@@ -92,7 +204,20 @@ def infer_meta_from_file(file_path: Path) -> dict:
             info(f"[meta] Inferred image metadata for {file_path.name}")
             return meta
 
+        elif ext in {".mp4", ".mov"} and (probed := mp4meta.probe(file_path)):
+            meta = {
+                "width": probed["width"],
+                "height": probed["height"],
+                "duration": round(probed["duration"], 2) if probed["duration"] else None,
+                "fps": round(probed["fps"], 2) if probed["fps"] else 0,
+                "frame_count": probed["frame_count"],
+                "codec": probed["codec"],
+            }
+            info(f"[meta] Inferred video metadata for {file_path.name}")
+            return meta
+
         elif ext in {".mp4", ".mov", ".webm", ".mkv"}:
+            # Not ISO-BMFF (or unreadable moov) – let OpenCV have a go
             cap = cv2.VideoCapture(str(file_path))
             if not cap.isOpened():
                 warning(f"[meta] Could not open video file: {file_path}")
@@ -193,25 +318,10 @@ def reindex_bucket(publish_destination_id: str = None, rebuild_all_sidecars: boo
     for dest in dests:
         bucket_id = dest["id"]
         try:
-            meta = load_meta(bucket_id)
-            favs = set(meta.get("favorites", []))
-            seq = meta.get("sequence", [])
-            
             # Get all files in bucket
             files = [f for f in bucket_path(bucket_id).iterdir() if f.is_file() and f.suffix.lower() in ALLOWED_EXT]
             file_names = [f.name for f in files]
             
-            # Update sequence to include new files
-            for fname in file_names:
-                if fname not in seq:
-                    seq.append(fname)
-            
-            # Remove files from sequence that no longer exist
-            seq[:] = [f for f in seq if f in file_names]
-            
-            # Ensure favorites still exist
-            favs = [f for f in favs if f in file_names]
-            
             # Rebuild metadata sidecars
             if rebuild_all_sidecars:
                 extract_result = extract_json(bucket_id)
@@ -236,9 +346,25 @@ def reindex_bucket(publish_destination_id: str = None, rebuild_all_sidecars: boo
                     except Exception as e:
                         warning(f"Failed to rebuild thumbnail for {f.name}: {e}")
             
-            meta["sequence"] = seq
-            meta["favorites"] = list(favs)
-            save_meta(bucket_id, meta)
+            # Reconcile sequence/favorites under the bucket lock so items
+            # added while sidecars and thumbnails were rebuilt aren't lost
+            with meta_transaction(bucket_id) as meta:
+                favs = set(meta.get("favorites", []))
+                seq = meta.get("sequence", [])
+                
+                # Update sequence to include new files
+                for fname in file_names:
+                    if fname not in seq:
+                        seq.append(fname)
+                
+                # Remove files from sequence that no longer exist
+                seq[:] = [f for f in seq if f in file_names]
+                
+                # Ensure favorites still exist
+                favs = [f for f in favs if f in file_names]
+                
+                meta["sequence"] = seq
+                meta["favorites"] = list(favs)
             
             reindexed.append({
                 "bucket_id": bucket_id,
@@ -254,7 +380,15 @@ def reindex_bucket(publish_destination_id: str = None, rebuild_all_sidecars: boo
         "buckets": reindexed
     }
 
-def purge_bucket(publish_destination_id: str, include_favorites: bool = False, days: int = None) -> Dict[str, Any]:
+def purge_bucket(
+    publish_destination_id: str,
+    include_favorites: bool = False,
+    days: int = None,
+    dry_run: bool = False,
+    max_seconds: float = None,
+    max_bytes: int = None,
+    progress=None,
+) -> Dict[str, Any]:
     """
     Purge files from a bucket, optionally including favorites and filtering by age.
     
@@ -262,12 +396,16 @@ def purge_bucket(publish_destination_id: str, include_favorites: bool = False, d
         publish_destination_id: The bucket to purge
         include_favorites: If True, remove all files including favorites. If False, keep favorites.
         days: If specified, only remove files older than this many days. If None, remove all files.
+        dry_run: If True, only report what would be removed and how many bytes it frees.
+        max_seconds / max_bytes: Optional per-run budget; the purge stops between
+            files once either is used up and reports complete=False.
+        progress: Optional callback receiving {"done", "total", "bytes_freed"} per batch.
     
     Returns:
         Dict with status and details of what was purged
     """
     from routes.utils import _load_json_once
-    from datetime import datetime, timedelta
+    from routes.bucket_purge import plan_purge, execute_plan
     
     # Verify this is a valid destination with has_bucket=true
     dests = _load_json_once("publish_destinations", "publish-destinations.json")
@@ -275,91 +413,33 @@ def purge_bucket(publish_destination_id: str, include_favorites: bool = False, d
     if not dest:
         raise ValueError("Invalid bucket_id or destination does not support buckets")
     
-    info(f"[purge] running purge for {publish_destination_id}")
-    meta = load_meta(publish_destination_id)
-    favs = set(meta.get("favorites", []))
-    seq = meta.get("sequence", [])
-    
-    # Get a list of just the filenames from the sequence
-    filenames = seq_to_filenames(seq)
-    
-    # Create a mapping of filenames to their sequence entries for favorite checking
-    filename_to_entry = {}
-    for entry in seq:
-        if isinstance(entry, dict):
-            filename_to_entry[entry["file"]] = entry
-        else:
-            filename_to_entry[entry] = entry
-
-    # Calculate cutoff time if days is specified
-    cutoff_time = None
-    if days is not None:
-        cutoff_time = datetime.now() - timedelta(days=days)
-
-    removed = []
-    # Remove media + side-cars + matching thumbs
-    # Create a copy of the sequence to iterate over while we modify the original
-    for i, fname in enumerate(filenames):
-        # Skip favorites unless include_favorites is True
-        if not include_favorites and fname in favs:
-            info(f"[purge] Skipping favorite file: {fname}")
-            continue
-            
-        fp = bucket_path(publish_destination_id) / fname
-        
-        # Skip if file doesn't exist
-        if not fp.exists():
-            warning(f"[purge] File does not exist, skipping: {fname}")
-            continue
-            
-        # Check file age if days parameter is specified
-        if cutoff_time is not None:
-            file_mtime = datetime.fromtimestamp(fp.stat().st_mtime)
-            if file_mtime > cutoff_time:
-                info(f"[purge] File is too new, skipping: {fname} (modified {file_mtime})")
-                continue
-        
-        # Remove the file and related files
-        info(f"[purge] Removing file: {fname}")
-        fp.unlink(missing_ok=True)
-        sidecar_path(fp).unlink(missing_ok=True)
-        # remove its thumbnail
-        thumb_fp = bucket_path(publish_destination_id) / "thumbnails" / f"{Path(fname).stem}{Path(fname).suffix}.jpg"
-        thumb_fp.unlink(missing_ok=True)
-        
-        # Add to the removed list
-        removed.append(fname)
-
-    # Remove entries from the sequence that were removed
-    if removed:
-        # Create a set of removed filenames for faster lookup
-        removed_set = set(removed)
-        # Filter out removed entries, handling both string and dict formats
-        meta["sequence"] = [
-            entry for entry in seq 
-            if (entry["file"] if isinstance(entry, dict) else entry) not in removed_set
-        ]
-
-    # Delete any orphaned thumbnails
-    thumb_dir = bucket_path(publish_destination_id) / "thumbnails"
-    if thumb_dir.exists():
-        for thumb in thumb_dir.iterdir():
-            if thumb.is_file() and thumb.suffix == ".jpg":
-                stem = thumb.stem
-                if not any(f.stem == stem for f in bucket_path(publish_destination_id).iterdir() if f.is_file()):
-                    thumb.unlink()
-
-    # Update metadata
-    if include_favorites:
-        meta["favorites"] = []
-    save_meta(publish_destination_id, meta)
-
-    info(f"[purge] Completed purge for {publish_destination_id}. Removed {len(removed)} files: {removed}")
+    info(f"[purge] running {'dry-run ' if dry_run else ''}purge for {publish_destination_id}")
+    cutoff = time.time() - days * 86400 if days is not None else None
+    plan = plan_purge(
+        bucket_path(publish_destination_id),
+        read_meta(publish_destination_id),
+        include_favorites=include_favorites,
+        older_than=cutoff,
+    )
+    
+    if dry_run:
+        return {"status": "dry_run", "days_filter": days, **plan.report()}
+    
+    result = execute_plan(
+        publish_destination_id,
+        plan,
+        clear_favorites=include_favorites,
+        max_seconds=max_seconds,
+        max_bytes=max_bytes,
+        progress=progress,
+    )
+    
+    info(f"[purge] Completed purge for {publish_destination_id}. Removed {len(result['removed'])} files")
     return {
         "status": "purged",
-        "removed": removed,
         "favorites_removed": include_favorites,
-        "days_filter": days
+        "days_filter": days,
+        **result,
     }
 
 def extract_metadata(file_path: Path, force_rebuild: bool = False) -> bool:
@@ -458,104 +538,128 @@ def _append_to_bucket(screen: str, published_path: Path, batch_id: str = None, m
         
         target_path = bucket_dir / target_name
 
-    # copy media + side-car
-    shutil.copy2(published_path, target_path)
-    sc_src, sc_dst = sidecar_path(published_path), sidecar_path(target_path)
-    
-    # Handle sidecar creation/copying
-    if sc_src.exists():
-        # If source sidecar exists, copy it
-        shutil.copy2(sc_src, sc_dst)
-        debug(f"Copied sidecar: {sc_src} -> {sc_dst}")
-    elif metadata:
-        # If we have metadata but no source sidecar, create a new one
-        try:
-            with open(sc_dst, 'w', encoding='utf-8') as f:
-                # Ensure metadata is JSON serializable. Fall back to string conversion for unsupported types.
-                try:
-                    json.dump(metadata, f, indent=2, ensure_ascii=False, default=str)
-                except TypeError as te:
-                    # As a fallback, convert everything to string representation
-                    from routes.utils import truncate_element
-                    safe_meta = truncate_element(metadata)
-                    json.dump(safe_meta, f, indent=2, ensure_ascii=False, default=str)
-            debug(f"Created new sidecar with provided metadata: {sc_dst}")
-        except Exception as e:
-            warning(f"Failed to create sidecar with provided metadata: {e}")
-    else:
-        # Try to extract metadata from the file itself
+    # The bucket watcher leaves the file alone until its sequence entry exists
+    with bucket_watcher.ingesting(screen, target_path.name):
+        # copy media + side-car (media goes through the blob store so identical
+        # content shared across buckets is stored once when dedup is enabled)
+        blobstore.store(published_path, target_path)
+        sc_src, sc_dst = sidecar_path(published_path), sidecar_path(target_path)
+    
+        # Handle sidecar creation/copying
+        if sc_src.exists():
+            # If source sidecar exists, copy it
+            shutil.copy2(sc_src, sc_dst)
+            debug(f"Copied sidecar: {sc_src} -> {sc_dst}")
+        elif metadata:
+            # If we have metadata but no source sidecar, create a new one
+            try:
+                with open(sc_dst, 'w', encoding='utf-8') as f:
+                    # Ensure metadata is JSON serializable. Fall back to string conversion for unsupported types.
+                    try:
+                        json.dump(metadata, f, indent=2, ensure_ascii=False, default=str)
+                    except TypeError as te:
+                        # As a fallback, convert everything to string representation
+                        from routes.utils import truncate_element
+                        safe_meta = truncate_element(metadata)
+                        json.dump(safe_meta, f, indent=2, ensure_ascii=False, default=str)
+                debug(f"Created new sidecar with provided metadata: {sc_dst}")
+            except Exception as e:
+                warning(f"Failed to create sidecar with provided metadata: {e}")
+        else:
+            # Try to extract metadata from the file itself
+            try:
+                extract_metadata(target_path)
+                debug(f"Extracted metadata for: {target_path}")
+            except Exception as e:
+                warning(f"Failed to extract metadata for {target_path.name}: {e}")
+
+        # now generate the thumbnail for *that* bucket copy
+        from routes.publisher import generate_thumbnail
+        thumb_dir = bucket_dir / "thumbnails"
+        thumb_dir.mkdir(parents=True, exist_ok=True)
+        thumb_path = thumb_dir / f"{target_path.stem}{target_path.suffix}.jpg"
         try:
-            extract_metadata(target_path)
-            debug(f"Extracted metadata for: {target_path}")
+            generate_thumbnail(target_path, thumb_path)
         except Exception as e:
-            warning(f"Failed to extract metadata for {target_path.name}: {e}")
-
-    # update bucket metadata
-    meta = load_meta(screen)
-    
-    # Create the entry for sequence.json
-    sequence_entry = {
-        "file": target_path.name
-    }
+            warning(f"Bucket thumbnail failed for {target_path.name}: {e}")
+
+        # update bucket metadata
+        added = bucket_usage.measure([target_path, sc_dst, thumb_path])
+        with meta_transaction(screen) as meta:
+            bucket_usage.apply(meta, added)
+            # Create the entry for sequence.json
+            sequence_entry = {
+                "file": target_path.name
+            }
     
-    # Add batchId to the entry if provided
-    if batch_id:
-        sequence_entry["batchId"] = batch_id
+            # Add batchId to the entry if provided
+            if batch_id:
+                sequence_entry["batchId"] = batch_id
         
-    # Update the sequence
-    seq = meta.setdefault("sequence", [])
-    # Ensure we're storing the filename and batch ID separately in the metadata
-    if isinstance(seq, list):
-        if batch_id:
-            # Clean batch_id to remove any file extensions
-            clean_batch_id = batch_id
-            if '.' in clean_batch_id:
-                clean_batch_id = clean_batch_id.split('.')[0]
+            # Update the sequence
+            seq = meta.setdefault("sequence", [])
+            existing = _seq_index(seq, target_path.name) if isinstance(seq, list) else None
+            # Ensure we're storing the filename and batch ID separately in the metadata
+            if existing is not None:
+                # Already listed (e.g. by the bucket watcher): update it in place
+                if batch_id:
+                    entry = seq[existing]
+                    entry = dict(entry) if isinstance(entry, dict) else {"file": entry}
+                    entry["batchId"] = batch_id.split('.')[0]
+                    seq[existing] = entry
+            elif isinstance(seq, list):
+                if batch_id:
+                    # Clean batch_id to remove any file extensions
+                    clean_batch_id = batch_id
+                    if '.' in clean_batch_id:
+                        clean_batch_id = clean_batch_id.split('.')[0]
                 
-            if all(isinstance(item, dict) for item in seq):
-                # Dictionary format - add a new entry
-                sequence_entry = {
-                    "file": target_path.name,
-                    "batchId": clean_batch_id
-                }
-                seq.append(sequence_entry)
-            else:
-                # Simple string format - convert to dictionary format
-                # First convert existing entries if needed
-                new_seq = []
-                for item in seq:
-                    if isinstance(item, str):
-                        new_seq.append({"file": item})
+                    if all(isinstance(item, dict) for item in seq):
+                        # Dictionary format - add a new entry
+                        sequence_entry = {
+                            "file": target_path.name,
+                            "batchId": clean_batch_id
+                        }
+                        seq.append(sequence_entry)
                     else:
-                        new_seq.append(item)
-                new_seq.append({
-                    "file": target_path.name,
-                    "batchId": clean_batch_id
-                })
-                meta["sequence"] = new_seq
-        else:
-            # No batch_id, simpler handling
-            if all(isinstance(item, dict) for item in seq):
-                seq.append({"file": target_path.name})
+                        # Simple string format - convert to dictionary format
+                        # First convert existing entries if needed
+                        new_seq = []
+                        for item in seq:
+                            if isinstance(item, str):
+                                new_seq.append({"file": item})
+                            else:
+                                new_seq.append(item)
+                        new_seq.append({
+                            "file": target_path.name,
+                            "batchId": clean_batch_id
+                        })
+                        meta["sequence"] = new_seq
+                else:
+                    # No batch_id, simpler handling
+                    if all(isinstance(item, dict) for item in seq):
+                        seq.append({"file": target_path.name})
+                    else:
+                        seq.append(target_path.name)
             else:
-                seq.append(target_path.name)
-    else:
-        # Fallback if sequence is not a list
-        meta["sequence"] = [{"file": target_path.name, "batchId": batch_id}] if batch_id else [target_path.name]
-        
-    save_meta(screen, meta)
-    
-    # now generate the thumbnail for *that* bucket copy
-    from routes.publisher import generate_thumbnail
-    thumb_dir = bucket_dir / "thumbnails"
-    thumb_dir.mkdir(parents=True, exist_ok=True)
-    thumb_path = thumb_dir / f"{target_path.stem}{target_path.suffix}.jpg"
-    try:
-        generate_thumbnail(target_path, thumb_path)
-    except Exception as e:
-        warning(f"Bucket thumbnail failed for {target_path.name}: {e}")
+                # Fallback if sequence is not a list
+                meta["sequence"] = [{"file": target_path.name, "batchId": batch_id}] if batch_id else [target_path.name]
+            usage = meta.get("usage")
+            hot_count = len(meta["sequence"])
+    bucket_usage.enforce(screen, usage)
+    bucket_archive.schedule(screen, hot_count)
+
+    # perceptual hashes for near-duplicate / similarity queries
+    phash.record(screen, target_path)
     return target_path
 
+def _seq_index(seq: list, name: str):
+    """Index of *name*'s entry in a bucket sequence, or None."""
+    for i, entry in enumerate(seq):
+        if (entry.get("file") if isinstance(entry, dict) else entry) == name:
+            return i
+    return None
+
 def _extract_exif_json(img_path: Path) -> dict[str, Any] | None:
     """Extract EXIF metadata from an image file."""
     try:
@@ -577,24 +681,6 @@ def _extract_exif_json(img_path: Path) -> dict[str, Any] | None:
         warning(f"Failed to extract EXIF from {img_path}: {e}")
         return None
 
-def _extract_mp4_comment_json(video_path: Path) -> dict[str, Any] | None:
-    """Extract comment metadata from an MP4 file."""
-    try:
-        cmd = ["ffprobe", "-v", "quiet", "-print_format", "json", "-show_format", str(video_path)]
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        if result.returncode != 0:
-            return None
-
-        data = json.loads(result.stdout)
-        comment = data.get("format", {}).get("tags", {}).get("comment")
-        if not comment:
-            return None
-
-        return json.loads(comment)
-    except Exception as e:
-        warning(f"Failed to extract comment from {video_path}: {e}")
-        return None 
-
 def preserve_timestamp_name(original_filename: str, force_unique: bool = True) -> str:
     """
     Generate a new filename while preserving the timestamp from the original if it exists.
@@ -669,7 +755,7 @@ def copy_image_from_bucket_to_bucket(source_publish_destination: str, target_pub
 
     # Copy main file
     try:
-        shutil.copy2(src_path, dst_path)
+        blobstore.store(src_path, dst_path)
         debug(f"[copy_image_from_bucket_to_bucket] Copied main file: {src_path} -> {dst_path}")
     except Exception as e:
         error(f"[copy_image_from_bucket_to_bucket] Failed to copy main file: {str(e)}")
@@ -717,12 +803,14 @@ def copy_image_from_bucket_to_bucket(source_publish_destination: str, target_pub
 
     # Update destination metadata
     try:
-        dmeta = load_meta(target_publish_destination)
-        # Add the new file to the sequence with the correct format
-        dmeta.setdefault("sequence", []).append({
-            "file": target_filename
-        })
-        save_meta(target_publish_destination, dmeta)
+        added = bucket_usage.measure([dst_path, sc_dst, dst_thumb_path])
+        with meta_transaction(target_publish_destination) as dmeta:
+            # Add the new file to the sequence with the correct format
+            dmeta.setdefault("sequence", []).append({
+                "file": target_filename
+            })
+            bucket_usage.apply(dmeta, added)
+            usage = dmeta.get("usage")
         debug(f"[copy_image_from_bucket_to_bucket] Updated destination metadata: added {target_filename} to sequence")
     except Exception as e:
         error(f"[copy_image_from_bucket_to_bucket] Failed to update destination metadata: {str(e)}")
@@ -739,6 +827,7 @@ def copy_image_from_bucket_to_bucket(source_publish_destination: str, target_pub
             error(f"[copy_image_from_bucket_to_bucket] Failed to delete source files: {str(e)}")
             raise
 
+    bucket_usage.enforce(target_publish_destination, usage)
     return {
         "status": "copied" if copy else "moved",
         "filename": target_filename
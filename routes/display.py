@@ -1,11 +1,15 @@
 from __future__ import annotations
 import asyncio
+import hashlib
 import json
 import ast
 import os
+import threading
+from collections import OrderedDict
 from pathlib import Path
 from flask import Blueprint, jsonify, abort, request
-from routes.utils import findfile, dict_substitute, _load_json_once
+import config
+from routes.utils import findfile, dict_substitute, _load_json_once, build_schema_subs, get_qr, schema_subs_version
 from routes.display_utils import compute_mask
 from overlay_ws_server import send_overlay_to_clients
 from utils.logger import log_to_console, info, error, warning, debug, console_logs
@@ -182,6 +186,75 @@ def mask(dest_id: str):
     
     return jsonify(payload)
 
+# Overlay templates read from disk: {path: (mtime, html)}
+_overlay_sources = {}
+
+# Rendered overlays, most recent last:
+# {(template key, schema subs version, screen, substitutions hash): html}
+_rendered_overlays = OrderedDict()
+_overlay_lock = threading.Lock()
+
+
+def _overlay_template(html: str) -> tuple:
+    """(cache key, markup) for an overlay given as a file name or as inline HTML."""
+    file_path = findfile(html)
+    if not file_path:
+        return html, html
+    try:
+        mtime = os.path.getmtime(file_path)
+    except OSError:
+        return html, html
+    cached = _overlay_sources.get(file_path)
+    if cached is None or cached[0] != mtime:
+        with open(file_path, "r", encoding="utf-8") as f:
+            cached = (mtime, f.read())
+        _overlay_sources[file_path] = cached
+    return (file_path, mtime), cached[1]
+
+
+def _substitutions_hash(substitutions: dict) -> str | None:
+    try:
+        encoded = json.dumps(substitutions, sort_keys=True, default=str)
+    except (TypeError, ValueError):
+        return None  # e.g. mixed key types; render without caching
+    return hashlib.sha1(encoded.encode("utf-8")).hexdigest()
+
+
+def _render_overlay(template_key, html_content: str, screens, substitutions: dict) -> str:
+    """
+    Render an overlay with the schema substitutions, the screen's QR code and
+    *substitutions* on top. Memoised: repeated progress updates with the same
+    values are a dict lookup.
+    """
+    # Automatically add common contextual substitutions
+    auto_subs = build_schema_subs()
+    primary_screen = screens[0] if screens else None
+
+    subs_hash = _substitutions_hash(substitutions)
+    key = (template_key, schema_subs_version(), primary_screen, subs_hash) if subs_hash else None
+    if key is not None:
+        with _overlay_lock:
+            cached = _rendered_overlays.get(key)
+            if cached is not None:
+                _rendered_overlays.move_to_end(key)
+                return cached
+
+    # Add screen-specific contextual substitutions
+    if primary_screen:
+        auto_subs['QR_BASE64'] = get_qr(publish=primary_screen)
+        auto_subs['SCREEN_NAME'] = primary_screen
+
+    # Merge with provided substitutions (provided ones take precedence)
+    final_html = dict_substitute(html_content, {**auto_subs, **substitutions})
+
+    if key is not None:
+        with _overlay_lock:
+            _rendered_overlays[key] = final_html
+            while len(_rendered_overlays) > config.OVERLAY_RENDER_CACHE_MAX:
+                _rendered_overlays.popitem(last=False)
+    return final_html
+
+
 def send_overlay(
     html: str,
     screens: list[str] = None,
@@ -192,12 +265,7 @@ def send_overlay(
     fadein=0,
     job_id=None
 ):
-    file_path = findfile(html)
-    if file_path and os.path.exists(file_path):
-        with open(file_path, "r", encoding="utf-8") as f:
-            html_content = f.read()
-    else:
-        html_content = html
+    template_key, html_content = _overlay_template(html)
 
     # JINJA2 substitution using dict_substitute
     if substitutions:
@@ -205,23 +273,7 @@ def send_overlay(
             if isinstance(substitutions, str):
                 substitutions = ast.literal_eval(substitutions)
             if isinstance(substitutions, dict):
-                # Automatically add common contextual substitutions
-                from routes.utils import build_schema_subs, get_qr
-                auto_subs = build_schema_subs()
-                
-                # Add screen-specific contextual substitutions
-                if screens and len(screens) > 0:
-                    primary_screen = screens[0]
-                    auto_subs['QR_BASE64'] = get_qr(publish=primary_screen)
-                    auto_subs['SCREEN_NAME'] = primary_screen
-                    
-                    # Get screen display name from destinations
-                    destinations = auto_subs.get('ALL_DESTINATIONS', [])  # This comes from build_schema_subs
-                    # Could add more contextual info here
-                
-                # Merge with provided substitutions (provided ones take precedence)
-                final_subs = {**auto_subs, **substitutions}
-                final_html = dict_substitute(html_content, final_subs)
+                final_html = _render_overlay(template_key, html_content, screens, substitutions)
             else:
                 warning("Substitutions is not a dict, skipping templating")
                 final_html = html_content
@@ -0,0 +1,206 @@
+"""
+display_prefetch.py – work out and pre-stage what a bucket display shows next.
+
+display_from_bucket used to find the current image in the favourites with
+a linear scan, pick Random with random.choice (repeats included), then
+hash, read the sidecar and render the display variant while the screen
+waited. Each destination now keeps a plan:
+
+    • a filename → position index of its favourites, rebuilt only when
+      bucket.json changes, so Next/Previous is a dictionary lookup
+    • a shuffle bag for Random: the favourites in a uniformly shuffled
+      order, drawn one at a time, so nothing repeats until every favourite
+      has been shown (and never twice in a row across a reshuffle). The
+      next draw is known in advance, so it can be staged like Next/Previous
+
+After each display, schedule() stages the next DISPLAY_PREFETCH_DEPTH items
+in each direction plus the next random draw on a background thread: the
+file is hashed (which leaves it in the page cache and its digest memoised
+for the pointer swap), its image variant is rendered (videos are only
+normalized once actually published) and its sidecar metadata is read. The following Next press or scheduled advance then publishes without
+touching anything cold.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import random
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import config
+from routes import blobstore, bucketer, display_variants
+from routes.keyed_drain import KeyedDrain
+from routes.utils import sidecar_path
+from utils.logger import debug, warning
+
+
+@dataclass
+class _Staged:
+    digest: str
+    metadata: Optional[Dict[str, Any]]
+    sidecar_mtime_ns: Optional[int]
+
+
+@dataclass
+class _Plan:
+    favorites: Optional[List[str]] = None     # the list read_meta returned; identity marks staleness
+    index: Dict[str, int] = field(default_factory=dict)
+    bag: List[str] = field(default_factory=list)
+    last_random: Optional[str] = None
+    staged: Dict[str, _Staged] = field(default_factory=dict)
+
+
+_lock = threading.Lock()
+_plans: Dict[str, _Plan] = {}
+
+
+def _plan(dest_id: str, favorites: List[str]) -> _Plan:
+    """The plan for *dest_id*, re-indexed if *favorites* changed. Call with _lock held."""
+    plan = _plans.setdefault(dest_id, _Plan())
+    if plan.favorites is not favorites:
+        plan.favorites = favorites
+        plan.index = {}
+        for i, name in enumerate(favorites):
+            plan.index.setdefault(name, i)
+        for i, name in enumerate(favorites):
+            plan.index.setdefault(os.path.basename(name), i)
+        members = set(favorites)
+        plan.bag = [name for name in plan.bag if name in members]
+        plan.staged = {k: v for k, v in plan.staged.items() if k in members}
+    return plan
+
+
+def _refill(plan: _Plan, current: Optional[str]):
+    bag = list(plan.favorites)
+    random.shuffle(bag)
+    # bag is drawn from the end; don't open a new round with what's on screen
+    if len(bag) > 1 and bag[-1] in (current, plan.last_random):
+        bag[0], bag[-1] = bag[-1], bag[0]
+    plan.bag = bag
+
+
+def _peek_random(plan: _Plan, current: Optional[str]) -> Optional[str]:
+    if not plan.favorites:
+        return None
+    if not plan.bag:
+        _refill(plan, current)
+    return plan.bag[-1]
+
+
+def _step(plan: _Plan, current: Optional[str], offset: int) -> str:
+    pos = plan.index.get(current, -1) if current is not None else -1
+    if pos < 0:
+        return plan.favorites[0]
+    return plan.favorites[(pos + offset) % len(plan.favorites)]
+
+
+def choose(dest_id: str, mode: str, favorites: List[str], current: Optional[str]) -> str:
+    """
+    The favourite to show for *mode* ("Next", "Previous" or "Random") when
+    *current* is on screen. Next/Previous fall back to the first favourite
+    if *current* isn't one. *favorites* must be non-empty.
+    """
+    with _lock:
+        plan = _plan(dest_id, favorites)
+        if mode == "Random":
+            name = _peek_random(plan, current)
+            plan.bag.pop()
+            plan.last_random = name
+            return name
+        return _step(plan, current, 1 if mode == "Next" else -1)
+
+
+def candidates(dest_id: str, favorites: List[str], current: Optional[str]) -> List[str]:
+    """What *dest_id* is likely to show next, most likely first."""
+    if not favorites:
+        return []
+    with _lock:
+        plan = _plan(dest_id, favorites)
+        names = [_step(plan, current, 1), _step(plan, current, -1)]
+        for k in range(2, config.DISPLAY_PREFETCH_DEPTH + 1):
+            names += [_step(plan, current, k), _step(plan, current, -k)]
+        names.append(_peek_random(plan, current))
+    return list(dict.fromkeys(n for n in names if n != current))
+
+
+def _sidecar_mtime(path: Path) -> Optional[int]:
+    try:
+        return sidecar_path(path).stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+def _stage_file(dest_id: str, path: Path) -> _Staged:
+    digest = blobstore.hash_file(path)
+    if hasattr(os, "posix_fadvise"):
+        # Hashed earlier and possibly evicted since: ask for readahead again
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        finally:
+            os.close(fd)
+    if path.suffix.lower() not in display_variants.VIDEO_EXTENSIONS:
+        # Transcodes are left to the publish that needs them
+        display_variants.render(path, dest_id, digest)
+    mtime = _sidecar_mtime(path)
+    metadata = None
+    if mtime is not None:
+        try:
+            metadata = json.loads(sidecar_path(path).read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            warning(f"[prefetch] Unreadable sidecar for {path.name}: {e}")
+    return _Staged(digest=digest, metadata=metadata, sidecar_mtime_ns=mtime)
+
+
+def stage(dest_id: str, current: Optional[str]):
+    """Stage *dest_id*'s likely next items now (schedule() runs this in the background)."""
+    favorites = bucketer.read_meta(dest_id).get("favorites", [])
+    bucket_dir = bucketer.bucket_path(dest_id)
+    names = candidates(dest_id, favorites, current)
+    if not names:
+        return
+    with _lock:
+        plan = _plans[dest_id]
+        plan.staged = {k: v for k, v in plan.staged.items() if k in names}
+    for name in names:
+        with _lock:
+            done = name in _plans[dest_id].staged
+        if done:
+            continue
+        path = bucket_dir / name
+        try:
+            staged = _stage_file(dest_id, path)
+        except OSError as e:
+            debug(f"[prefetch] Could not stage {name} for {dest_id}: {e}")
+            continue
+        with _lock:
+            plan = _plans.get(dest_id)
+            if plan is not None and name in plan.index:
+                plan.staged[name] = staged
+        debug(f"[prefetch] Staged {name} for {dest_id}")
+
+
+def metadata_for(dest_id: str, filename: str) -> Optional[Dict[str, Any]]:
+    """Sidecar metadata read while staging *filename*, if the sidecar hasn't changed since."""
+    with _lock:
+        plan = _plans.get(dest_id)
+        staged = plan.staged.get(filename) if plan else None
+    if staged is None or staged.metadata is None:
+        return None
+    if _sidecar_mtime(bucketer.bucket_path(dest_id) / filename) != staged.sidecar_mtime_ns:
+        return None
+    return staged.metadata
+
+
+# dest -> current filename to stage around; a newer display replaces a queued one
+_work = KeyedDrain("prefetch", lambda: config.DISPLAY_PREFETCH_WORKERS, stage)
+
+
+def schedule(dest_id: str, current: Optional[str]):
+    """Stage around *current* in the background; newer calls replace queued ones."""
+    if config.DISPLAY_PREFETCH_ENABLED:
+        _work.submit(dest_id, current)
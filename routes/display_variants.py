@@ -0,0 +1,345 @@
+"""
+display_variants.py – right-sized copies of published images per display.
+
+publish_to_destination copies the source as-is, so a 4K generation used to
+be shipped to a 1080p portrait panel and scaled by the browser or TV. At
+publish time we now also render a variant for the destination:
+
+    • sized to the destination's maxwidth × maxheight from
+      publish-destinations.json (which also gives its orientation), either
+      cropped to fill ("variant_fit": "cover", the default) or fitted
+      inside ("contain"); sources smaller than the panel are never upscaled
+    • encoded with the format/quality of the destination's "device_class"
+      (config.DISPLAY_VARIANT_PROFILES)
+    • cached as output/_variants/<source-hash>-<w>x<h>-<fit>-q<q>.<ext>,
+      so republishing the same image is a cache hit
+
+Videos get a normalized copy instead (routes/video_normalize.py), cached
+as output/_variants/<source-hash>-faststart.mp4 when the moov atom only needs
+moving to the front, or <source-hash>-h264-<kbps>k.mp4 when the video is
+over the destination's "video_max_kbps" (else its device class's) or isn't
+H.264 and local ffmpeg is there to transcode it. Publishing never waits on
+that: render_for_publish() only hands back a video variant that is already
+cached, so the original goes out at once, and normalize_later() makes the
+copy on a background worker (config.VIDEO_NORMALIZE_WORKERS) and emits a
+second publish event pointing displays at it.
+
+The publish event points display pages at the variant; the full-size
+output/<dest>.<ext> file is still written for everything else that reads it.
+"""
+
+from __future__ import annotations
+
+import os
+import stat
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+import config
+from routes import bucketer, video_normalize
+from routes.blobstore import hash_file
+from routes.keyed_drain import KeyedDrain
+from routes.utils import _load_json_once
+from utils.logger import debug, warning
+
+VARIANT_DIRNAME = "_variants"
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp"}
+VIDEO_EXTENSIONS = {".mp4"}
+_EXTENSIONS = {"JPEG": ".jpg", "WEBP": ".webp", "PNG": ".png"}
+
+_lock = threading.Lock()
+_pruning: set = set()                         # (directory, suffixes) with a prune running
+
+
+def _destination(dest_id: str) -> Optional[Dict[str, Any]]:
+    """*dest_id*'s entry, or None if it is unknown or takes originals."""
+    dests = _load_json_once("publish_destinations", "publish-destinations.json") or []
+    dest = next((d for d in dests if d.get("id") == dest_id), None)
+    if not dest or dest.get("headless") or dest.get("variants") is False:
+        return None
+    return dest
+
+
+def _profile(dest: Dict[str, Any]) -> Dict[str, Any]:
+    profiles = config.DISPLAY_VARIANT_PROFILES
+    return profiles.get(dest.get("device_class")) or profiles[config.DISPLAY_VARIANT_DEFAULT_CLASS]
+
+
+def spec_for(dest_id: str) -> Optional[Dict[str, Any]]:
+    """Variant parameters for *dest_id*, or None if it should get the original."""
+    if not config.DISPLAY_VARIANTS_ENABLED:
+        return None
+    dest = _destination(dest_id)
+    if dest is None:
+        return None
+    width, height = dest.get("maxwidth"), dest.get("maxheight")
+    if not width or not height:
+        return None
+    profile = _profile(dest)
+    return {
+        "width": int(width),
+        "height": int(height),
+        "fit": "contain" if dest.get("variant_fit") == "contain" else "cover",
+        "format": profile["format"],
+        "quality": int(profile["quality"]),
+    }
+
+
+def video_spec_for(dest_id: str) -> Optional[Dict[str, Any]]:
+    """Video normalization parameters for *dest_id*, or None if it should get the original."""
+    if not config.VIDEO_NORMALIZE_ENABLED:
+        return None
+    dest = _destination(dest_id)
+    if dest is None:
+        return None
+    return {"max_kbps": dest.get("video_max_kbps") or _profile(dest).get("video_max_kbps")}
+
+
+def _video_plan(source: Path, digest: str, spec: Dict[str, Any]) -> Optional[Tuple[str, bool]]:
+    """(variant name, needs transcoding) for a video, or None if the original will do."""
+    probe = video_normalize.inspect(source)
+    if probe is None:
+        return None
+    cap = spec["max_kbps"]
+    over_cap = bool(cap) and probe["kbps"] > cap * config.VIDEO_BITRATE_TOLERANCE
+    foreign = probe["codec"] is not None and probe["codec"] not in config.VIDEO_PLAYABLE_CODECS
+    if (over_cap or foreign) and video_normalize.ffmpeg():
+        return (f"{digest[:16]}-h264-{cap}k.mp4" if cap else f"{digest[:16]}-h264.mp4"), True
+    if not probe["fast_start"]:
+        return f"{digest[:16]}-faststart.mp4", False
+    return None
+
+
+def variant_dir(dest_id: str) -> Path:
+    return Path(bucketer.bucket_path(dest_id)).parent / VARIANT_DIRNAME
+
+
+def variant_name(digest: str, spec: Dict[str, Any]) -> str:
+    return (f"{digest[:16]}-{spec['width']}x{spec['height']}-{spec['fit']}"
+            f"-q{spec['quality']}{_EXTENSIONS[spec['format']]}")
+
+
+def url_for(path: Path) -> str:
+    return f"/output/{VARIANT_DIRNAME}/{path.name}"
+
+
+def existing(dest_id: str, source: Path, digest: str) -> Optional[Path]:
+    """The already-rendered variant of *source* for *dest_id*, if there is one."""
+    if source.suffix.lower() in VIDEO_EXTENSIONS:
+        spec = video_spec_for(dest_id)
+        plan = _video_plan(source, digest, spec) if spec else None
+        path = variant_dir(dest_id) / plan[0] if plan else None
+        return path if path and path.exists() else None
+    spec = spec_for(dest_id)
+    if spec is None or source.suffix.lower() not in IMAGE_EXTENSIONS:
+        return None
+    path = variant_dir(dest_id) / variant_name(digest, spec)
+    return path if path.exists() else None
+
+
+def _resize(img: Image.Image, spec: Dict[str, Any]) -> Image.Image:
+    width, height = spec["width"], spec["height"]
+    if spec["fit"] == "contain":
+        img = img.copy()
+        img.thumbnail((width, height), Image.LANCZOS)
+        return img
+    # Cover: crop to the panel's aspect ratio, shrinking the box rather than upscaling
+    scale = max(width / img.width, height / img.height)
+    if scale > 1:
+        width, height = max(1, round(width / scale)), max(1, round(height / scale))
+    return ImageOps.fit(img, (width, height), Image.LANCZOS)
+
+
+def _prune(directory: Path, suffixes, limit: int):
+    """
+    Drop all but the *limit* most recently used files with *suffixes* from
+    *directory*, never one a display is currently pointed at.
+    """
+    from routes import publish_events                 # late import = no circular deps
+
+    shown = publish_events.displayed_urls()
+    files = []
+    for path in directory.iterdir():
+        if path.name.startswith(".") or path.suffix not in suffixes or url_for(path) in shown:
+            continue
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            continue                                  # pruned or replaced by another render
+        if stat.S_ISREG(st.st_mode):
+            files.append((st.st_mtime, path))
+    files.sort(reverse=True)
+    for _, path in files[limit:]:
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+
+def _prune_soon(directory: Path, suffixes, limit: int):
+    """_prune() on a background thread, unless one is already running for *directory*."""
+    key = (directory, frozenset(suffixes))
+    with _lock:
+        if key in _pruning:
+            return
+        _pruning.add(key)
+    threading.Thread(target=_prune_in_background, args=(key, limit),
+                     name="variant-prune", daemon=True).start()
+
+
+def _prune_in_background(key: Tuple[Path, frozenset], limit: int):
+    try:
+        _prune(key[0], key[1], limit)
+    except Exception as e:
+        warning(f"[variants] Could not prune {key[0]}: {e}")
+    finally:
+        with _lock:
+            _pruning.discard(key)
+
+
+def decode(source: Path) -> Optional[Image.Image]:
+    """
+    *source* decoded and EXIF-oriented, for render(decoded=...) when one
+    image is published to several destinations. None for non-images.
+    """
+    if source.suffix.lower() not in IMAGE_EXTENSIONS:
+        return None
+    try:
+        with Image.open(source) as img:
+            img = ImageOps.exif_transpose(img)
+            img.load()
+            return img
+    except Exception as e:
+        warning(f"[variants] Could not decode {source.name}: {e}")
+        return None
+
+
+def _write(img: Image.Image, spec: Dict[str, Any], path: Path):
+    img = _resize(img, spec)
+    keep_alpha = spec["format"] != "JPEG" and img.mode in ("RGBA", "LA", "P")
+    img = img.convert("RGBA" if keep_alpha else "RGB")
+    options = {"optimize": True} if spec["format"] == "JPEG" else {}
+    img.save(path, spec["format"], quality=spec["quality"], **options)
+
+
+def render(source: Path, dest_id: str, digest: str,
+           decoded: Optional[Image.Image] = None) -> Optional[Path]:
+    """
+    Variant of *source* (whose SHA-256 is *digest*) for *dest_id*, rendered
+    now unless it is already cached. None if the destination takes originals
+    or *source* is not a still image. *decoded* is decode(source), if the
+    caller already has it. Videos are normalized instead (see _render_video).
+    """
+    if source.suffix.lower() in VIDEO_EXTENSIONS:
+        return _render_video(source, dest_id, digest)
+    spec = spec_for(dest_id)
+    if spec is None or source.suffix.lower() not in IMAGE_EXTENSIONS:
+        return None
+    out = variant_dir(dest_id) / variant_name(digest, spec)
+    if out.exists():
+        os.utime(out)                   # keep it at the front of the LRU
+        return out
+
+    out.parent.mkdir(parents=True, exist_ok=True)
+    # Screens sharing a spec share the output; a group publish renders them at once
+    tmp = out.with_name(f".{out.name}.{threading.get_ident()}.tmp")
+    try:
+        if decoded is None:
+            with Image.open(source) as img:
+                _write(ImageOps.exif_transpose(img), spec, tmp)
+        else:
+            _write(decoded, spec, tmp)
+        os.replace(tmp, out)
+    except Exception as e:
+        warning(f"[variants] Could not render {source.name} for {dest_id}: {e}")
+        tmp.unlink(missing_ok=True)
+        return None
+    debug(f"[variants] {source.name} -> {out.name} for {dest_id}")
+    _prune_soon(out.parent, set(_EXTENSIONS.values()), config.DISPLAY_VARIANT_CACHE_MAX)
+    return out
+
+
+def _render_video(source: Path, dest_id: str, digest: str) -> Optional[Path]:
+    spec = video_spec_for(dest_id)
+    plan = _video_plan(source, digest, spec) if spec else None
+    if plan is None:
+        return None
+    name, transcode = plan
+    out = variant_dir(dest_id) / name
+    if out.exists():
+        os.utime(out)
+        return out
+
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_name(f".{out.name}.{threading.get_ident()}.tmp")
+    try:
+        if transcode:
+            done = video_normalize.transcode(source, tmp, spec["max_kbps"])
+        else:
+            done = video_normalize.faststart(source, tmp)
+        if not done:
+            tmp.unlink(missing_ok=True)
+            return None
+        os.replace(tmp, out)
+    except Exception as e:
+        warning(f"[variants] Could not normalize {source.name} for {dest_id}: {e}")
+        tmp.unlink(missing_ok=True)
+        return None
+    debug(f"[variants] {source.name} -> {out.name} for {dest_id}")
+    _prune_soon(out.parent, VIDEO_EXTENSIONS, config.VIDEO_VARIANT_CACHE_MAX)
+    return out
+
+
+
+def render_for_publish(source: Path, dest_id: str, digest: str,
+                       decoded: Optional[Image.Image] = None) -> Optional[Path]:
+    """
+    render() for the publish path, which must not wait on ffmpeg: a video's
+    variant is returned only if it is already cached. publish_events queues
+    the rest with normalize_later() once the original has gone out.
+    """
+    if source.suffix.lower() not in VIDEO_EXTENSIONS:
+        return render(source, dest_id, digest, decoded=decoded)
+    return existing(dest_id, source, digest)
+
+
+def normalize_later(dest_id: str, source: Path, digest: str):
+    """
+    Normalize the video *source* (just published to *dest_id*) on a
+    background worker, then emit a second publish event pointing displays at
+    the variant. Newer calls for a destination replace queued ones.
+    """
+    if source.suffix.lower() not in VIDEO_EXTENSIONS:
+        return
+    spec = video_spec_for(dest_id)
+    plan = _video_plan(source, digest, spec) if spec else None
+    if plan is None or (variant_dir(dest_id) / plan[0]).exists():
+        return
+    _work.submit(dest_id, (source, digest))
+
+
+def _normalize_published(dest_id: str, source: Path, digest: str):
+    from routes import publish_events                 # late import = no circular deps
+
+    # Pin the published inode: a republish may swap output/<dest>.mp4 under us
+    pin = source.with_name(f".{source.stem}.{threading.get_ident()}.pin{source.suffix}")
+    try:
+        os.link(source, pin)
+    except OSError as e:
+        debug(f"[variants] {source.name} for {dest_id} is gone before normalizing: {e}")
+        return
+    try:
+        if hash_file(pin) != digest:
+            return                                    # republished; that publish queued its own
+        variant = _render_video(pin, dest_id, digest)
+    finally:
+        pin.unlink(missing_ok=True)
+    if variant is not None:
+        publish_events.emit_variant(dest_id, source, digest, url_for(variant))
+
+
+_work = KeyedDrain("video-variants", lambda: config.VIDEO_NORMALIZE_WORKERS,
+                   lambda dest_id, item: _normalize_published(dest_id, *item))
@@ -62,20 +62,9 @@ def jpg_from_mp4():
             # Download from remote URL
             try:
                 info(f"Downloading video from URL: {file_path}")
-                import requests
-                import tempfile
-                
-                response = requests.get(file_path, stream=True, timeout=(10, 120))
-                response.raise_for_status()
-                
-                # Create temp file with the right extension
-                temp_fd, temp_path = tempfile.mkstemp(suffix='.mp4')
-                os.close(temp_fd)
-                
-                # Save the content to the temp file
-                with open(temp_path, 'wb') as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        f.write(chunk)
+                from routes import http_client
+
+                temp_path = str(http_client.download(file_path, suffix='.mp4').path)
                 
                 debug(f"Downloaded video to temporary file: {temp_path}")
                 file_path = temp_path
@@ -9,9 +9,9 @@ import time
 import uuid
 import json
 from PIL import Image
-from io import BytesIO
 
 from utils.logger import info, error, warning, debug
+from routes import http_client
 from routes.bucketer import _append_to_bucket
 from routes.scheduler_utils import throw_event
 from routes.utils import safe_cast
@@ -73,12 +73,17 @@ def save_to_recent(img_url, batch_id, metadata=None, reference_sources=None):
     Returns the target path if successful, None otherwise.
     """
     try:
-        response = requests.get(img_url)
-        if response.status_code != 200:
-            error(f"[save_to_recent] Failed to download image from {img_url}: {response.status_code}")
+        try:
+            download = http_client.download(img_url)
+        except requests.RequestException as e:
+            error(f"[save_to_recent] Failed to download image from {img_url}: {e}")
             return None
         info(f"[save_to_recent] Downloaded image from {img_url}, converting to JPEG")
-        img = Image.open(BytesIO(response.content)).convert("RGB")
+        try:
+            with Image.open(download.path) as original:
+                img = original.convert("RGB")
+        finally:
+            download.path.unlink(missing_ok=True)
         with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as temp_file:
             img.save(temp_file, format="JPEG", quality=90)
             temp_file.flush()
@@ -0,0 +1,122 @@
+"""
+http_client.py – one pooled HTTP session for outgoing fetches.
+
+Publishing a URL, saving a generation result, fetching reference images and
+pulling RunPod outputs used to call requests.get() bare: a new connection
+(and TLS handshake) per fetch, no timeout, no retry, and response.content
+held whole in memory – a few concurrent video downloads spiked the process
+by hundreds of MB. Everything now goes through session():
+
+    • keep-alive connections pooled per host (HTTP_POOL_SIZE)
+    • connect/read timeouts applied unless the caller passes its own
+    • idempotent requests retried with exponential backoff on connection
+      errors and 429/5xx responses (honouring Retry-After)
+
+download() streams a response to a temporary file in HTTP_DOWNLOAD_CHUNK
+pieces, hashing as it goes; the digest is handed to the blob store so the
+publish that follows doesn't read the file again.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import tempfile
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import config
+from routes import blobstore
+from utils.logger import debug
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_lock = threading.Lock()
+_session: Optional[requests.Session] = None
+
+
+class _TimeoutSession(requests.Session):
+    """A Session that applies the configured timeouts when none are given."""
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", (config.HTTP_CONNECT_TIMEOUT_S, config.HTTP_READ_TIMEOUT_S))
+        return super().request(method, url, **kwargs)
+
+
+def _build() -> requests.Session:
+    retry = Retry(
+        total=config.HTTP_RETRIES,
+        backoff_factor=config.HTTP_RETRY_BACKOFF_S,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset({"GET", "HEAD", "OPTIONS"}),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=config.HTTP_POOL_SIZE,
+                          pool_maxsize=config.HTTP_POOL_SIZE, max_retries=retry)
+    session = _TimeoutSession()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def session() -> requests.Session:
+    """The shared session, created on first use."""
+    global _session
+    with _lock:
+        if _session is None:
+            _session = _build()
+        return _session
+
+
+def reset():
+    """Drop the shared session (and its pooled connections)."""
+    global _session
+    with _lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return session().get(url, **kwargs)
+
+
+@dataclass
+class Download:
+    path: Path
+    digest: str
+    size: int
+    content_type: str
+
+
+def download(url: str, suffix: str = "", directory: Optional[Path] = None) -> Download:
+    """
+    Stream *url* into a new temporary file (in *directory*, default the
+    system temp dir) and return it with its SHA-256. The caller owns the
+    file. Raises requests.HTTPError for error responses.
+    """
+    h = hashlib.sha256()
+    size = 0
+    fd, name = tempfile.mkstemp(suffix=suffix, prefix=".download-", dir=directory)
+    path = Path(name)
+    try:
+        with os.fdopen(fd, "wb") as f, get(url, stream=True) as response:
+            response.raise_for_status()
+            content_type = response.headers.get("Content-Type", "")
+            for chunk in response.iter_content(chunk_size=config.HTTP_DOWNLOAD_CHUNK):
+                f.write(chunk)
+                h.update(chunk)
+                size += len(chunk)
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+    digest = h.hexdigest()
+    blobstore.remember_digest(path, digest)
+    debug(f"[http_client] {url.split('?', 1)[0]} -> {path.name} ({size} bytes)")
+    return Download(path=path, digest=digest, size=size, content_type=content_type)
@@ -0,0 +1,94 @@
+"""
+keyed_drain.py – background work queued per key, one drain at a time.
+
+Several modules run work off the request path with the same shape: work is
+queued under a key (a bucket, a destination), at most one task drains a
+key at a time so its work stays in order, and a bounded thread pool runs
+the drains.
+
+    _work = KeyedDrain("prefetch", lambda: config.DISPLAY_PREFETCH_WORKERS, stage)
+    _work.submit(dest_id, current)
+
+Work submitted while a key already has some waiting is folded into it by
+*merge* (default: the newer item replaces the older one). Pool is the lazily
+created executor on its own, for queues with their own scheduling
+(publish_queue).
+"""
+
+from __future__ import annotations
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from utils.logger import warning
+
+
+class Pool:
+    """A ThreadPoolExecutor created on first use, sized by *workers()* at that point."""
+
+    def __init__(self, name: str, workers: Callable[[], int]):
+        self.name = name
+        self._workers = workers
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def submit(self, fn: Callable, *args):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=max(1, int(self._workers())),
+                                                    thread_name_prefix=self.name)
+            executor = self._executor
+        return executor.submit(fn, *args)
+
+
+class KeyedDrain:
+    """
+    run(key, item) for each submitted item on a background pool, one drain
+    per key. *merge(waiting, new)* folds a submission into the item already
+    waiting for its key.
+    """
+
+    def __init__(self, name: str, workers: Callable[[], int], run: Callable[[Hashable, Any], Any],
+                 merge: Optional[Callable[[Any, Any], Any]] = None):
+        self.name = name
+        self.pool = Pool(name, workers)
+        self._run = run
+        self._merge = merge
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._pending: Dict[Hashable, Any] = {}
+        self._active: set = set()           # keys with a drain task scheduled or running
+
+    def submit(self, key: Hashable, item: Any):
+        with self._lock:
+            if self._merge is not None and key in self._pending:
+                item = self._merge(self._pending[key], item)
+            self._pending[key] = item
+            start = key not in self._active
+            self._active.add(key)
+        if start:
+            self.pool.submit(self._drain, key)
+
+    def waiting(self, key: Hashable) -> Any:
+        """The item queued for *key* and not yet started, or None."""
+        with self._lock:
+            return self._pending.get(key)
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Block until nothing is queued or running. False on timeout."""
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._active, timeout)
+
+    def _drain(self, key: Hashable):
+        while True:
+            with self._lock:
+                if key not in self._pending:
+                    self._active.discard(key)
+                    self._idle.notify_all()
+                    return
+                item = self._pending.pop(key)
+            try:
+                self._run(key, item)
+            except Exception as e:
+                warning(f"[{self.name}] Work for {key} failed: {e}")
@@ -0,0 +1,217 @@
+"""
+metadata_embed.py – attach EXIF to images without re-encoding them.
+
+Generated images arrive as finished JPEG/PNG/WebP files; all we add is the
+generation metadata (as JSON in the EXIF UserComment). Decoding and
+re-encoding to do that costs CPU and a generation of JPEG loss, so instead
+the EXIF block is spliced into the container:
+
+    JPEG  an APP1 "Exif" segment after SOI/APP0, replacing any existing one
+    PNG   an eXIf chunk after IHDR, replacing any existing one
+    WebP  an EXIF chunk in an extended (VP8X) RIFF container; simple
+          VP8/VP8L files are promoted to VP8X
+
+Only the header area is parsed; the compressed image data is copied
+through unchanged with shutil.copyfileobj.
+"""
+
+from __future__ import annotations
+
+import json
+import shutil
+import struct
+import zlib
+from pathlib import Path
+from typing import BinaryIO, Optional
+
+import piexif
+import piexif.helper
+
+_EXIF_HEADER = b"Exif\x00\x00"
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+_MAX_SEGMENT = 0xFFFF - 2
+
+
+class MetadataTooLarge(ValueError):
+    """The EXIF block does not fit the container (JPEG APP1 is capped at 64 KiB)."""
+
+
+def build_exif(metadata: dict) -> bytes:
+    """EXIF block (with the "Exif\\0\\0" header) carrying *metadata* as JSON in UserComment."""
+    comment = json.dumps(metadata, ensure_ascii=False, indent=None)
+    exif_dict = {"0th": {}, "Exif": {}, "GPS": {}, "1st": {}, "thumbnail": None}
+    exif_dict["Exif"][piexif.ExifIFD.UserComment] = piexif.helper.UserComment.dump(comment, encoding="unicode")
+    return piexif.dump(exif_dict)
+
+
+def sniff(head: bytes) -> Optional[str]:
+    """Container format from the first bytes of a file."""
+    if head[:3] == b"\xff\xd8\xff":
+        return "jpeg"
+    if head[:8] == _PNG_SIGNATURE:
+        return "png"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+def _read_exact(src: BinaryIO, n: int) -> bytes:
+    data = src.read(n)
+    if len(data) != n:
+        raise ValueError("truncated image")
+    return data
+
+
+# ─── JPEG ────────────────────────────────────────────────────────────────────
+
+def _jpeg(src: BinaryIO, dst: BinaryIO, exif: bytes):
+    if len(exif) > _MAX_SEGMENT:
+        raise MetadataTooLarge(f"EXIF block is {len(exif)} bytes; JPEG allows {_MAX_SEGMENT}")
+    if _read_exact(src, 2) != b"\xff\xd8":
+        raise ValueError("not a JPEG")
+    dst.write(b"\xff\xd8")
+    app1 = b"\xff\xe1" + struct.pack(">H", len(exif) + 2) + exif
+    inserted = False
+
+    while True:
+        marker = _read_exact(src, 2)
+        if marker[0] != 0xFF:
+            raise ValueError("corrupt JPEG marker")
+        code = marker[1]
+        if code in (0xDA, 0xD9) or not 0xE0 <= code <= 0xEF:
+            # First non-APPn segment: headers are over, the rest is copied verbatim
+            if not inserted:
+                dst.write(app1)
+            dst.write(marker)
+            break
+        length_bytes = _read_exact(src, 2)
+        body = _read_exact(src, struct.unpack(">H", length_bytes)[0] - 2)
+        if code == 0xE1 and body.startswith(_EXIF_HEADER):
+            continue                        # replaced by ours
+        if code != 0xE0 and not inserted:
+            dst.write(app1)                 # after JFIF APP0, before the rest
+            inserted = True
+        dst.write(marker + length_bytes + body)
+    shutil.copyfileobj(src, dst)
+
+
+# ─── PNG ─────────────────────────────────────────────────────────────────────
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+def _png(src: BinaryIO, dst: BinaryIO, exif: bytes):
+    if _read_exact(src, 8) != _PNG_SIGNATURE:
+        raise ValueError("not a PNG")
+    dst.write(_PNG_SIGNATURE)
+    tiff = exif[len(_EXIF_HEADER):] if exif.startswith(_EXIF_HEADER) else exif
+    inserted = False
+    while True:
+        head = src.read(8)
+        if len(head) < 8:
+            break
+        length, kind = struct.unpack(">I4s", head)
+        if kind == b"eXIf":
+            src.seek(length + 4, 1)         # replaced by ours
+            continue
+        if not inserted and kind != b"IHDR":
+            dst.write(_png_chunk(b"eXIf", tiff))
+            inserted = True
+        dst.write(head)
+        shutil.copyfileobj(_Limited(src, length + 4), dst)
+
+
+class _Limited:
+    """File-like view of the next *n* bytes of *src* (for copyfileobj)."""
+
+    def __init__(self, src: BinaryIO, n: int):
+        self.src, self.left = src, n
+
+    def read(self, size: int = -1) -> bytes:
+        if self.left <= 0:
+            return b""
+        size = self.left if size is None or size < 0 else min(size, self.left)
+        data = self.src.read(size)
+        self.left -= len(data)
+        return data
+
+
+# ─── WebP ────────────────────────────────────────────────────────────────────
+
+def _webp_canvas(kind: bytes, data: bytes):
+    """(width, height, has_alpha) from a simple-format VP8/VP8L chunk."""
+    if kind == b"VP8 ":
+        w, h = struct.unpack("<HH", data[6:10])
+        return w & 0x3FFF, h & 0x3FFF, False
+    if kind == b"VP8L":
+        bits = struct.unpack("<I", data[1:5])[0]
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1, bool(bits >> 28 & 1)
+    raise ValueError(f"unexpected WebP chunk {kind!r}")
+
+
+def _webp(src: BinaryIO, dst: BinaryIO, exif: bytes):
+    header = _read_exact(src, 12)
+    if header[:4] != b"RIFF" or header[8:12] != b"WEBP":
+        raise ValueError("not a WebP")
+    riff_size = struct.unpack("<I", header[4:8])[0]
+    end = 8 + riff_size
+    tiff = exif[len(_EXIF_HEADER):] if exif.startswith(_EXIF_HEADER) else exif
+
+    # Walk the chunk headers; only the first bytes of VP8X/VP8/VP8L are read
+    chunks = []                      # (kind, payload offset, size, head of payload)
+    while src.tell() < end:
+        kind, size = struct.unpack("<4sI", _read_exact(src, 8))
+        offset = src.tell()
+        head = src.read(min(size, 16)) if kind in (b"VP8X", b"VP8 ", b"VP8L") else b""
+        chunks.append((kind, offset, size, head))
+        src.seek(offset + size + (size & 1))
+    if not chunks:
+        raise ValueError("empty WebP")
+
+    if chunks[0][0] == b"VP8X":
+        vp8x = bytearray(chunks[0][3][:10])
+        vp8x[0] |= 0x08              # EXIF flag
+        body = chunks[1:]
+    else:
+        width, height, alpha = _webp_canvas(chunks[0][0], chunks[0][3])
+        vp8x = bytearray([0x08 | (0x10 if alpha else 0), 0, 0, 0])
+        vp8x += (width - 1).to_bytes(3, "little") + (height - 1).to_bytes(3, "little")
+        body = chunks
+    body = [c for c in body if c[0] != b"EXIF"]
+    # EXIF goes after the image data but before any XMP
+    split = next((i for i, c in enumerate(body) if c[0] == b"XMP "), len(body))
+    exif_chunk = b"EXIF" + struct.pack("<I", len(tiff)) + tiff + (b"\x00" if len(tiff) & 1 else b"")
+
+    total = 4 + 8 + len(vp8x) + len(exif_chunk) + sum(8 + size + (size & 1) for _, _, size, _ in body)
+    dst.write(b"RIFF" + struct.pack("<I", total) + b"WEBP")
+    dst.write(b"VP8X" + struct.pack("<I", len(vp8x)) + bytes(vp8x))
+    for i, (kind, offset, size, _) in enumerate(body):
+        if i == split:
+            dst.write(exif_chunk)
+        dst.write(kind + struct.pack("<I", size))
+        src.seek(offset)
+        shutil.copyfileobj(_Limited(src, size + (size & 1)), dst)
+    if split == len(body):
+        dst.write(exif_chunk)
+
+
+# ─── Entry point ─────────────────────────────────────────────────────────────
+
+_WRITERS = {"jpeg": _jpeg, "png": _png, "webp": _webp}
+
+
+def embed_exif(src_path: Path, dst_path: Path, exif: bytes) -> str:
+    """
+    Write *src_path* to *dst_path* with *exif* spliced in. Returns the
+    container format. Raises ValueError for unsupported or corrupt input
+    (MetadataTooLarge if the block cannot fit).
+    """
+    with open(src_path, "rb") as src:
+        fmt = sniff(src.read(16))
+        if fmt is None:
+            raise ValueError(f"{src_path} is not a JPEG, PNG or WebP file")
+        src.seek(0)
+        with open(dst_path, "wb") as dst:
+            _WRITERS[fmt](src, dst, exif)
+    return fmt
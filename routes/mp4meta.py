@@ -0,0 +1,300 @@
+"""
+mp4meta.py – pure-Python MP4 / QuickTime (ISO-BMFF) metadata reader.
+
+Replaces the per-file ffprobe subprocess. Only box headers are read while
+walking the file; payloads are read just for the handful of small boxes we
+need (mvhd, tkhd, mdhd, hdlr, stsd, stts and the udta/meta/ilst tags), each
+capped at MAX_BOX_READ, so large sample tables and mdat are never touched.
+
+    probe(path) -> {
+        "duration": 12.5, "width": 1920, "height": 1080, "codec": "avc1",
+        "fps": 30.0, "frame_count": 375, "tags": {"comment": "..."},
+    }
+
+Results are cached by (path, mtime_ns, size).
+"""
+
+from __future__ import annotations
+
+import struct
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterator, Optional, Tuple
+
+from utils.logger import debug
+
+MAX_BOX_READ = 1024 * 1024
+CACHE_SIZE = 2048
+
+# Boxes that only hold other boxes
+_CONTAINERS = {b"moov", b"trak", b"mdia", b"minf", b"stbl", b"udta"}
+
+# iTunes-style ilst atom names -> tag names (matches ffprobe's format tags)
+_ILST_NAMES = {
+    b"\xa9cmt": "comment",
+    b"\xa9nam": "title",
+    b"\xa9ART": "artist",
+    b"\xa9day": "date",
+    b"\xa9too": "encoder",
+    b"desc": "description",
+}
+
+_cache: "OrderedDict[str, Tuple[Tuple[int, int], Optional[Dict[str, Any]]]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+# ─── Box walking ─────────────────────────────────────────────────────────────
+
+def _iter_boxes(f: BinaryIO, start: int, end: int) -> Iterator[Tuple[bytes, int, int]]:
+    """Yield (type, payload_start, payload_end) for each box in [start, end)."""
+    pos = start
+    while pos + 8 <= end:
+        f.seek(pos)
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        size, box_type = struct.unpack(">I4s", header)
+        header_len = 8
+        if size == 1:
+            ext = f.read(8)
+            if len(ext) < 8:
+                return
+            size = struct.unpack(">Q", ext)[0]
+            header_len = 16
+        elif size == 0:
+            size = end - pos
+        if size < header_len or pos + size > end:
+            return
+        yield box_type, pos + header_len, pos + size
+        pos += size
+
+
+def _read(f: BinaryIO, start: int, end: int) -> bytes:
+    f.seek(start)
+    return f.read(min(end - start, MAX_BOX_READ))
+
+
+def _full_box(payload: bytes) -> Tuple[int, bytes]:
+    """Split a FullBox payload into (version, body)."""
+    return (payload[0] if payload else 0), payload[4:]
+
+
+# ─── Box parsers ─────────────────────────────────────────────────────────────
+
+def _parse_time_header(payload: bytes) -> Tuple[int, int]:
+    """(timescale, duration) from an mvhd or mdhd payload."""
+    version, body = _full_box(payload)
+    if version == 1:
+        timescale, duration = struct.unpack_from(">IQ", body, 16)
+    else:
+        timescale, duration = struct.unpack_from(">II", body, 8)
+    return timescale, duration
+
+
+def _parse_tkhd_size(payload: bytes) -> Tuple[int, int]:
+    # width/height are the last 8 bytes, 16.16 fixed point
+    if len(payload) < 8:
+        return 0, 0
+    w, h = struct.unpack_from(">II", payload, len(payload) - 8)
+    return w >> 16, h >> 16
+
+
+def _parse_stsd(payload: bytes) -> Tuple[Optional[str], int, int]:
+    """Codec fourcc and coded size of the first visual sample entry."""
+    _, body = _full_box(payload)
+    if len(body) < 4 + 8 + 28:
+        return None, 0, 0
+    entry_type = body[8:12]
+    codec = entry_type.decode("latin-1").strip()
+    # SampleEntry(8 bytes) + pre_defined/reserved(16) then width, height
+    width, height = struct.unpack_from(">HH", body, 12 + 24)
+    return codec, width, height
+
+
+def _parse_stts_frames(payload: bytes) -> int:
+    _, body = _full_box(payload)
+    if len(body) < 4:
+        return 0
+    count = struct.unpack_from(">I", body)[0]
+    count = min(count, (len(body) - 4) // 8)
+    return sum(struct.unpack_from(">I", body, 4 + i * 8)[0] for i in range(count))
+
+
+def _data_atom_text(f: BinaryIO, start: int, end: int) -> Optional[str]:
+    """Text of the first 'data' child of an ilst item."""
+    for box_type, p0, p1 in _iter_boxes(f, start, end):
+        if box_type == b"data":
+            raw = _read(f, p0, p1)
+            # 4 bytes type indicator + 4 bytes locale
+            return raw[8:].decode("utf-8", errors="replace")
+    return None
+
+
+def _parse_meta(f: BinaryIO, start: int, end: int, tags: Dict[str, str]) -> None:
+    """udta/meta: iTunes ilst items, or mdta keys + ilst (ffmpeg use_metadata_tags)."""
+    # 'meta' is a FullBox in MP4 but a plain box in QuickTime; sniff for hdlr.
+    f.seek(start)
+    head = f.read(8)
+    if len(head) == 8 and head[4:8] != b"hdlr":
+        start += 4
+
+    keys: list[str] = []
+    ilst = None
+    for box_type, p0, p1 in _iter_boxes(f, start, end):
+        if box_type == b"keys":
+            _, body = _full_box(_read(f, p0, p1))
+            if len(body) < 4:
+                continue
+            count = struct.unpack_from(">I", body)[0]
+            off = 4
+            for _ in range(count):
+                if off + 8 > len(body):
+                    break
+                size = struct.unpack_from(">I", body, off)[0]
+                if size < 8:
+                    break
+                keys.append(body[off + 8:off + size].decode("utf-8", errors="replace"))
+                off += size
+        elif box_type == b"ilst":
+            ilst = (p0, p1)
+
+    if ilst is None:
+        return
+    for item_type, p0, p1 in _iter_boxes(f, *ilst):
+        name = _ILST_NAMES.get(item_type)
+        if name is None and keys:
+            index = struct.unpack(">I", item_type)[0]
+            if 1 <= index <= len(keys):
+                name = keys[index - 1].rsplit(".", 1)[-1]
+        if name is None:
+            continue
+        text = _data_atom_text(f, p0, p1)
+        if text is not None:
+            tags.setdefault(name, text)
+
+
+def _parse_udta(f: BinaryIO, start: int, end: int, tags: Dict[str, str]) -> None:
+    for box_type, p0, p1 in _iter_boxes(f, start, end):
+        if box_type == b"meta":
+            _parse_meta(f, p0, p1, tags)
+        elif box_type in _ILST_NAMES:
+            # QuickTime user-data text: 2 bytes length, 2 bytes language, text
+            raw = _read(f, p0, p1)
+            if len(raw) >= 4:
+                length = struct.unpack_from(">H", raw)[0]
+                tags.setdefault(_ILST_NAMES[box_type], raw[4:4 + length].decode("utf-8", errors="replace"))
+
+
+def _parse_trak(f: BinaryIO, start: int, end: int) -> Dict[str, Any]:
+    trak: Dict[str, Any] = {}
+    stack = [(start, end)]
+    while stack:
+        s, e = stack.pop()
+        for box_type, p0, p1 in _iter_boxes(f, s, e):
+            if box_type in _CONTAINERS:
+                stack.append((p0, p1))
+            elif box_type == b"tkhd":
+                trak["tkhd_size"] = _parse_tkhd_size(_read(f, p0, p1))
+            elif box_type == b"mdhd":
+                trak["timescale"], trak["duration"] = _parse_time_header(_read(f, p0, p1))
+            elif box_type == b"hdlr":
+                trak.setdefault("handler", _read(f, p0, p1)[8:12])
+            elif box_type == b"stsd":
+                trak["stsd"] = _parse_stsd(_read(f, p0, p1))
+            elif box_type == b"stts":
+                trak["frames"] = _parse_stts_frames(_read(f, p0, p1))
+    return trak
+
+
+def _parse(path: Path) -> Optional[Dict[str, Any]]:
+    with open(path, "rb") as f:
+        f.seek(0, 2)
+        file_size = f.tell()
+
+        moov = None
+        for box_type, p0, p1 in _iter_boxes(f, 0, file_size):
+            if box_type == b"moov":
+                moov = (p0, p1)
+                break
+        if moov is None:
+            return None
+
+        result: Dict[str, Any] = {
+            "duration": None, "width": 0, "height": 0, "codec": None,
+            "fps": None, "frame_count": 0, "tags": {},
+        }
+        video = None
+        for box_type, p0, p1 in _iter_boxes(f, *moov):
+            if box_type == b"mvhd":
+                timescale, duration = _parse_time_header(_read(f, p0, p1))
+                if timescale:
+                    result["duration"] = round(duration / timescale, 3)
+            elif box_type == b"trak" and video is None:
+                trak = _parse_trak(f, p0, p1)
+                if trak.get("handler") == b"vide":
+                    video = trak
+            elif box_type == b"udta":
+                _parse_udta(f, p0, p1, result["tags"])
+            elif box_type == b"meta":
+                _parse_meta(f, p0, p1, result["tags"])
+
+    if video is None and result["duration"] is None and not result["tags"]:
+        # empty or truncated moov – nothing we can vouch for
+        return None
+
+    if video:
+        codec, width, height = video.get("stsd", (None, 0, 0))
+        if not (width and height):
+            width, height = video.get("tkhd_size", (0, 0))
+        result.update(codec=codec, width=width, height=height, frame_count=video.get("frames", 0))
+        timescale = video.get("timescale")
+        if timescale and video.get("duration"):
+            track_seconds = video["duration"] / timescale
+            if result["duration"] is None:
+                result["duration"] = round(track_seconds, 3)
+            if result["frame_count"]:
+                result["fps"] = round(result["frame_count"] / track_seconds, 3)
+    return result
+
+
+# ─── Public API ──────────────────────────────────────────────────────────────
+
+def probe(path: Path | str) -> Optional[Dict[str, Any]]:
+    """
+    Stream info and metadata tags for an MP4/MOV file, or None when the file
+    is missing or not ISO-BMFF. Cached by (path, mtime, size); treat the
+    returned dict as read-only.
+    """
+    path = Path(path)
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    key = str(path.resolve())
+    stamp = (st.st_mtime_ns, st.st_size)
+
+    with _cache_lock:
+        hit = _cache.get(key)
+        if hit is not None and hit[0] == stamp:
+            _cache.move_to_end(key)
+            return hit[1]
+
+    try:
+        result = _parse(path)
+    except (OSError, struct.error) as e:
+        debug(f"[mp4meta] Could not parse {path.name}: {e}")
+        result = None
+
+    with _cache_lock:
+        _cache[key] = (stamp, result)
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return result
+
+
+def comment(path: Path | str) -> Optional[str]:
+    """The container's comment tag (what ffprobe reports as format.tags.comment)."""
+    meta = probe(path)
+    return meta["tags"].get("comment") if meta else None
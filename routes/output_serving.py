@@ -0,0 +1,181 @@
+"""
+output_serving.py – conditional, cache-friendly serving of /output.
+
+Display pages and thumbnails hit /output constantly, and most of those
+requests are revalidations of files that have not changed. Each file's
+validators (size, mtime, ETag, MIME type) are kept in an in-memory stat
+cache, so a conditional request for an unchanged file is answered with 304
+from a dictionary lookup:
+
+    • published pointer files (output/<dest>.<ext>) get the content hash
+      computed once at publish time as their ETag; the publish event that
+      carries the hash also refreshes the cache entry, so displays see a
+      new publish immediately
+    • other files get an mtime/size ETag, re-checked against the disk at
+      most every OUTPUT_STAT_TTL_S seconds
+    • bucket media named <YYYYMMDD-HHMMSS>-<uid>.<ext> and display variants
+      under _variants/ are never rewritten in place and are served
+      "immutable" for a year; everything else is "no-cache" (always
+      revalidate, which is the cheap path)
+
+Range requests (MP4 seeking) are handled by send_file.
+"""
+
+from __future__ import annotations
+
+import mimetypes
+import os
+import re
+import stat as stat_module
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from flask import Response, abort, request, send_file
+from werkzeug.security import safe_join
+
+import config
+from routes import publish_events
+from routes.publish_pointer import changed_ns
+from routes.display_variants import VARIANT_DIRNAME
+from utils.logger import debug
+
+IMMUTABLE_NAME = re.compile(r"^\d{8}-\d{6}-[0-9a-f]{8}\.[A-Za-z0-9]+$")
+CACHE_IMMUTABLE = "public, max-age=31536000, immutable"
+CACHE_REVALIDATE = "no-cache"
+
+
+@dataclass
+class _Entry:
+    path: str
+    size: int
+    mtime_ns: int
+    etag: str
+    mimetype: str
+    immutable: bool
+    checked: float
+
+
+_lock = threading.Lock()
+_cache: "OrderedDict[str, _Entry]" = OrderedDict()
+_root: Optional[str] = None
+
+
+def init(output_root: str):
+    """Serve from *output_root* and keep pointer-file ETags in step with publishes."""
+    global _root
+    _root = os.path.abspath(output_root)
+    publish_events.add_listener("output_serving", _on_publish)
+
+
+def clear():
+    with _lock:
+        _cache.clear()
+
+
+def _is_immutable(relpath: str) -> bool:
+    if relpath.startswith(f"{VARIANT_DIRNAME}/"):
+        return True                     # named by source hash and render settings
+    parts = relpath.split("/")
+    return len(parts) == 2 and bool(IMMUTABLE_NAME.match(parts[1]))
+
+
+def _store(relpath: str, entry: _Entry):
+    with _lock:
+        _cache[relpath] = entry
+        _cache.move_to_end(relpath)
+        while len(_cache) > config.OUTPUT_STAT_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def _make_entry(relpath: str, path: str, st: os.stat_result, etag: Optional[str] = None) -> _Entry:
+    return _Entry(
+        path=path,
+        size=st.st_size,
+        mtime_ns=changed_ns(st),         # pointer files are swapped links; ctime moves, mtime may not
+        etag=etag or f"{changed_ns(st):x}-{st.st_size:x}",
+        mimetype=mimetypes.guess_type(path)[0] or "application/octet-stream",
+        immutable=_is_immutable(relpath),
+        checked=time.monotonic(),
+    )
+
+
+def _on_publish(event: Dict[str, Any]):
+    """Publish-event listener: adopt the content hash as the pointer file's ETag."""
+    if _root is None:
+        return
+    relpath = event["source_url"].split("?", 1)[0].rsplit("/", 1)[-1]
+    path = os.path.join(_root, relpath)
+    try:
+        st = os.stat(path)
+    except OSError:
+        invalidate(relpath)
+        return
+    _store(relpath, _make_entry(relpath, path, st, etag=event["hash"]))
+
+
+def invalidate(relpath: str):
+    with _lock:
+        _cache.pop(relpath, None)
+
+
+def lookup(relpath: str) -> Optional[_Entry]:
+    """Cached validators for output/<relpath>, or None if it is not a file."""
+    now = time.monotonic()
+    with _lock:
+        entry = _cache.get(relpath)
+    if entry and (entry.immutable or now - entry.checked < config.OUTPUT_STAT_TTL_S):
+        return entry
+
+    path = safe_join(_root, relpath) if _root else None
+    if path is None:
+        return None
+    try:
+        st = os.stat(path)
+    except OSError:
+        invalidate(relpath)
+        return None
+    if not stat_module.S_ISREG(st.st_mode):
+        return None
+    if entry and entry.size == st.st_size and entry.mtime_ns == changed_ns(st):
+        entry.checked = now            # unchanged: keep its (possibly content-hash) ETag
+        return entry
+    entry = _make_entry(relpath, path, st)
+    _store(relpath, entry)
+    return entry
+
+
+def _not_modified(entry: _Entry) -> bool:
+    if request.if_none_match:
+        return request.if_none_match.contains(entry.etag)
+    since = request.if_modified_since
+    return since is not None and int(since.timestamp()) >= entry.mtime_ns // 1_000_000_000
+
+
+def serve(relpath: str) -> Response:
+    """Response for GET/HEAD /output/<relpath>."""
+    entry = lookup(relpath)
+    if entry is None:
+        abort(404)
+    cache_control = CACHE_IMMUTABLE if entry.immutable else CACHE_REVALIDATE
+
+    if _not_modified(entry):
+        response = Response(status=304)
+        response.set_etag(entry.etag)
+    else:
+        try:
+            response = send_file(
+                entry.path,
+                mimetype=entry.mimetype,
+                conditional=True,
+                etag=entry.etag,
+                last_modified=entry.mtime_ns / 1e9,
+            )
+        except FileNotFoundError:
+            debug(f"[output] {relpath} vanished after it was cached")
+            invalidate(relpath)
+            abort(404)
+    response.headers["Cache-Control"] = cache_control
+    return response
@@ -0,0 +1,436 @@
+"""
+phash.py – perceptual-hash similarity index for buckets.
+
+Generation loops often produce near-identical outputs. Every item that goes
+into a bucket through _append_to_bucket gets three 64-bit perceptual hashes:
+
+    ahash   8×8 greyscale, bit = pixel > mean            (cheap, coarse)
+    dhash   9×8 greyscale, bit = pixel > right neighbour (gradients)
+    phash   32×32 DCT, bit = low-frequency coeff > median (most robust)
+
+They are kept next to bucket.json in output/<bucket>/phash.jsonl, an
+append-only log of {"file": name, "ahash": "<hex>", ...} lines (and
+{"file": name, "removed": true} when an item goes), so recording an item
+costs one appended line however big the bucket is. The log is replayed into
+memory once per process and compacted when most of it is superseded lines.
+Videos are hashed on their first frame.
+
+Hashing happens off the ingest path: record() queues the file for a
+background worker. Queries go through a BK-tree per (bucket, kind), built
+from the in-memory index and extended as entries arrive, so a "similar to
+X" lookup touches a handful of nodes instead of every item. Queries only use
+what is already indexed; items missing from the index (older buckets, files
+dropped in by hand) are queued for hashing and show up in later queries.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+import config
+from routes.keyed_drain import KeyedDrain
+from utils.logger import info, warning, debug
+
+INDEX_FILE = "phash.jsonl"
+LEGACY_INDEX_FILE = "phash.json"
+COMPACT_MIN_LINES = 256     # compact once the log is this long and over half superseded
+HASH_KINDS = ("ahash", "dhash", "phash")
+DEFAULT_KIND = "phash"
+DUPLICATE_DISTANCE = 6      # out of 64 bits
+SIMILAR_DISTANCE = 12
+
+_IMAGE_EXT = {".jpg", ".jpeg", ".png", ".webp"}
+_locks: Dict[str, threading.Lock] = {}
+_locks_guard = threading.Lock()
+_indexes: Dict[str, "_Index"] = {}      # bucket -> in-memory index (under _lock(bucket))
+
+
+
+# ─── Hashing ─────────────────────────────────────────────────────────────────
+
+def _bits_to_int(bits: np.ndarray) -> int:
+    value = 0
+    for bit in bits.flatten():
+        value = (value << 1) | int(bit)
+    return value
+
+
+def ahash(img: Image.Image) -> int:
+    px = np.asarray(img.convert("L").resize((8, 8), Image.LANCZOS), dtype=np.float32)
+    return _bits_to_int(px > px.mean())
+
+
+def dhash(img: Image.Image) -> int:
+    px = np.asarray(img.convert("L").resize((9, 8), Image.LANCZOS), dtype=np.float32)
+    return _bits_to_int(px[:, 1:] > px[:, :-1])
+
+
+def phash(img: Image.Image) -> int:
+    px = np.asarray(img.convert("L").resize((32, 32), Image.LANCZOS), dtype=np.float32)
+    low = cv2.dct(px)[:8, :8]
+    return _bits_to_int(low > np.median(low))
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def _open(path: Path) -> Optional[Image.Image]:
+    if path.suffix.lower() in _IMAGE_EXT:
+        img = Image.open(path)
+        img.draft("L", (64, 64))    # JPEG: decode at reduced scale
+        return img
+    cap = cv2.VideoCapture(str(path))
+    try:
+        ok, frame = cap.read()
+    finally:
+        cap.release()
+    if not ok:
+        return None
+    return Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+
+
+def compute(path: Path) -> Optional[Dict[str, str]]:
+    """All three hashes of *path* as 16-char hex strings (None if unreadable)."""
+    try:
+        img = _open(Path(path))
+        if img is None:
+            return None
+        with img:
+            img.load()
+            return {
+                "ahash": f"{ahash(img):016x}",
+                "dhash": f"{dhash(img):016x}",
+                "phash": f"{phash(img):016x}",
+            }
+    except Exception as e:
+        warning(f"[phash] Could not hash {path}: {e}")
+        return None
+
+
+# ─── BK-tree ─────────────────────────────────────────────────────────────────
+
+class BKTree:
+    """
+    Burkhard-Keller tree over 64-bit hashes with hamming distance.
+    Identical hashes share a node.
+    """
+
+    def __init__(self):
+        self._root: Optional[list] = None     # [hash, [names], {distance: child}]
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, h: int, name: str):
+        self._size += 1
+        if self._root is None:
+            self._root = [h, [name], {}]
+            return
+        node = self._root
+        while True:
+            d = hamming(h, node[0])
+            if d == 0:
+                node[1].append(name)
+                return
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = [h, [name], {}]
+                return
+            node = child
+
+    def search(self, h: int, radius: int) -> List[Tuple[int, str]]:
+        """(distance, name) for every entry within *radius*, closest first."""
+        out: List[Tuple[int, str]] = []
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node = stack.pop()
+            d = hamming(h, node[0])
+            if d <= radius:
+                out.extend((d, n) for n in node[1])
+            for edge, child in node[2].items():
+                if d - radius <= edge <= d + radius:
+                    stack.append(child)
+        out.sort()
+        return out
+
+
+# ─── Per-bucket index ────────────────────────────────────────────────────────
+
+class _Index:
+    """A bucket's replayed log: entries plus the BK-trees built from them so far."""
+
+    def __init__(self, entries: Dict[str, Dict[str, str]], lines: int, stamp: Tuple[int, int]):
+        self.entries = entries
+        self.lines = lines
+        self.stamp = stamp
+        self.trees: Dict[str, BKTree] = {}
+
+
+def _lock(bucket: str) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(bucket, threading.Lock())
+
+
+def index_path(bucket: str) -> Path:
+    from routes.bucketer import bucket_path
+    return bucket_path(bucket) / INDEX_FILE
+
+
+def _stamp(fp: Path) -> Tuple[int, int]:
+    try:
+        st = fp.stat()
+        return (st.st_size, st.st_mtime_ns)
+    except FileNotFoundError:
+        return (0, 0)
+
+
+def _replay(bucket: str) -> _Index:
+    fp = index_path(bucket)
+    entries: Dict[str, Dict[str, str]] = {}
+    lines = 0
+    try:
+        with open(fp, "r", encoding="utf-8") as f:
+            for line in f:
+                lines += 1
+                try:
+                    rec = json.loads(line)
+                    name = rec.pop("file")
+                except (ValueError, KeyError, AttributeError):
+                    continue  # a torn last line from a crash
+                if rec.get("removed"):
+                    entries.pop(name, None)
+                else:
+                    entries[name] = rec
+    except FileNotFoundError:
+        legacy = fp.with_name(LEGACY_INDEX_FILE)
+        try:
+            entries = json.loads(legacy.read_text("utf-8"))
+        except FileNotFoundError:
+            pass
+        except ValueError as e:
+            warning(f"[phash] Ignoring unreadable index {legacy}: {e}")
+    return _Index(entries, lines, _stamp(fp))
+
+
+def _current(bucket: str) -> _Index:
+    """The bucket's index, replayed if the log changed under us. Call with _lock(bucket) held."""
+    idx = _indexes.get(bucket)
+    if idx is None or idx.stamp != _stamp(index_path(bucket)):
+        idx = _indexes[bucket] = _replay(bucket)
+    return idx
+
+
+def load_index(bucket: str) -> Dict[str, Dict[str, str]]:
+    with _lock(bucket):
+        return dict(_current(bucket).entries)
+
+
+def _append(bucket: str, idx: _Index, records: List[Dict[str, Any]]):
+    """Append *records* to the log (compacting it if due). Call with _lock(bucket) held."""
+    fp = index_path(bucket)
+    if idx.lines + len(records) >= COMPACT_MIN_LINES and idx.lines + len(records) > 2 * len(idx.entries):
+        tmp = fp.with_name(f".{fp.name}.{uuid.uuid4().hex[:8]}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            for name, hashes in idx.entries.items():
+                f.write(json.dumps({"file": name, **hashes}, separators=(",", ":")) + "\n")
+        os.replace(tmp, fp)
+        idx.lines = len(idx.entries)
+        debug(f"[phash] Compacted index for {bucket} ({idx.lines} entries)")
+    else:
+        with open(fp, "a", encoding="utf-8") as f:
+            for rec in records:
+                f.write(json.dumps(rec, separators=(",", ":")) + "\n")
+        idx.lines += len(records)
+    idx.stamp = _stamp(fp)
+
+
+def _store(bucket: str, hashed: Dict[str, Dict[str, str]], dropped: Iterable[str]):
+    with _lock(bucket):
+        idx = _current(bucket)
+        dropped = [n for n in dropped if n in idx.entries]
+        for name in dropped:
+            del idx.entries[name]
+        if dropped:
+            idx.trees.clear()        # BK-trees can't delete; rebuilt on the next query
+        for name, hashes in hashed.items():
+            if name in idx.entries:
+                idx.trees.clear()
+            idx.entries[name] = hashes
+            for kind, tree in idx.trees.items():
+                tree.add(int(hashes[kind], 16), name)
+        records = [{"file": n, **h} for n, h in hashed.items()] + [{"file": n, "removed": True} for n in dropped]
+        if records:
+            _append(bucket, idx, records)
+
+
+def _hash_batch(bucket: str, batch: Dict[str, Optional[Path]]):
+    """Hash a queued {filename: path, or None to drop} batch into the bucket's index."""
+    hashed = {}
+    for name, path in batch.items():
+        if path is not None:
+            hashes = compute(path) if path.is_file() else None
+            if hashes is not None:
+                hashed[name] = hashes
+    try:
+        _store(bucket, hashed, [n for n, p in batch.items() if p is None])
+    except OSError as e:
+        warning(f"[phash] Could not update index for {bucket}: {e}")
+    if len(hashed) > 1:
+        info(f"[phash] {bucket}: hashed {len(hashed)} items")
+
+
+# bucket -> {filename: path, or None to drop}; later batches for a bucket fold into the waiting one
+_work = KeyedDrain("phash", lambda: config.PHASH_WORKERS, _hash_batch,
+                   merge=lambda waiting, new: {**waiting, **new})
+
+
+def _enqueue(bucket: str, items: Dict[str, Optional[Path]]):
+    if items:
+        _work.submit(bucket, dict(items))
+
+
+def wait_idle(timeout: Optional[float] = None) -> bool:
+    """Block until no hashing is queued or running (tests, shutdown). False on timeout."""
+    return _work.wait_idle(timeout)
+
+
+def record(bucket: str, path: Path):
+    """Queue *path* to be hashed into the bucket's index. Never raises."""
+    path = Path(path)
+    _enqueue(bucket, {path.name: path})
+
+
+def forget(bucket: str, filenames: Iterable[str]):
+    try:
+        _store(bucket, {}, list(filenames))
+    except OSError as e:
+        warning(f"[phash] Could not update index for {bucket}: {e}")
+
+
+def sync_index(bucket: str) -> List[str]:
+    """
+    Queue whatever it takes to bring the index in line with the bucket
+    sequence – hash items with no entry yet, drop entries for items that are
+    gone – and return the live filenames. Doesn't wait for the hashing.
+    """
+    from routes.bucketer import bucket_path, read_meta
+    from routes.utils import seq_to_filenames
+
+    bdir = bucket_path(bucket)
+    live = seq_to_filenames(read_meta(bucket).get("sequence", []))
+    with _lock(bucket):
+        entries = _current(bucket).entries
+        missing = {n: bdir / n for n in live if n not in entries}
+        live_set = set(live)
+        missing.update((n, None) for n in entries if n not in live_set)
+    queued = _work.waiting(bucket) or {}
+    missing = {n: p for n, p in missing.items() if n not in queued}
+    _enqueue(bucket, missing)
+    return live
+
+
+def _tree(bucket: str, kind: str) -> Tuple[Dict[str, Dict[str, str]], BKTree, set]:
+    """(live indexed entries, BK-tree, live filenames) – whatever is indexed right now."""
+    live = set(sync_index(bucket))
+    with _lock(bucket):
+        idx = _current(bucket)
+        tree = idx.trees.get(kind)
+        if tree is None:
+            tree = BKTree()
+            for name, hashes in idx.entries.items():
+                tree.add(int(hashes[kind], 16), name)
+            idx.trees[kind] = tree
+            debug(f"[phash] Built {kind} tree for {bucket} ({len(tree)} items)")
+        index = {n: h for n, h in idx.entries.items() if n in live}
+    return index, tree, live
+
+
+def _search(bucket: str, tree: BKTree, h: int, radius: int) -> List[Tuple[int, str]]:
+    # the background worker may be adding to the tree
+    with _lock(bucket):
+        return tree.search(h, radius)
+
+
+def _check_kind(kind: str):
+    if kind not in HASH_KINDS:
+        raise ValueError(f"Unknown hash kind {kind!r}; expected one of {', '.join(HASH_KINDS)}")
+
+
+# ─── Queries ─────────────────────────────────────────────────────────────────
+
+def similar(bucket: str, filename: str, kind: str = DEFAULT_KIND,
+            max_distance: int = SIMILAR_DISTANCE, limit: int = 50,
+            buckets: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    """
+    Items whose *kind* hash is within *max_distance* bits of *filename*'s,
+    searched in *buckets* (default: just *bucket*). The item itself is
+    excluded. An item that hasn't been hashed yet answers with no matches
+    and "pending": True.
+    """
+    _check_kind(kind)
+    index, own_tree, live = _tree(bucket, kind)
+    hashes = index.get(filename)
+    if hashes is None:
+        if filename not in live:
+            raise FileNotFoundError(filename)
+        return {"filename": filename, "kind": kind, "max_distance": max_distance,
+                "total": 0, "items": [], "pending": True}
+    target = int(hashes[kind], 16)
+
+    matches = []
+    for other in (buckets or [bucket]):
+        tree, other_live = (own_tree, live) if other == bucket else _tree(other, kind)[1:]
+        for distance, name in _search(other, tree, target, max_distance):
+            if name not in other_live or (other == bucket and name == filename):
+                continue
+            matches.append({"bucket": other, "filename": name, "distance": distance})
+    matches.sort(key=lambda m: m["distance"])
+    return {"filename": filename, "kind": kind, "max_distance": max_distance,
+            "total": len(matches), "items": matches[:limit]}
+
+
+def near_duplicates(bucket: str, kind: str = DEFAULT_KIND,
+                    max_distance: int = DUPLICATE_DISTANCE) -> Dict[str, Any]:
+    """
+    Groups of items within *max_distance* bits of each other (transitively),
+    each listed in sequence order so the first entry is the oldest copy.
+    """
+    from routes.bucketer import read_meta
+    from routes.utils import seq_to_filenames
+
+    _check_kind(kind)
+    index, tree, _ = _tree(bucket, kind)
+    parent = {name: name for name in index}
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for name, hashes in index.items():
+        for _, other in _search(bucket, tree, int(hashes[kind], 16), max_distance):
+            if other not in parent:
+                continue
+            ra, rb = find(name), find(other)
+            if ra != rb:
+                parent[rb] = ra
+
+    groups: Dict[str, List[str]] = {}
+    for name in seq_to_filenames(read_meta(bucket).get("sequence", [])):
+        if name in parent:
+            groups.setdefault(find(name), []).append(name)
+    dupes = [g for g in groups.values() if len(g) > 1]
+    return {"kind": kind, "max_distance": max_distance, "groups": dupes,
+            "redundant": sum(len(g) - 1 for g in dupes)}
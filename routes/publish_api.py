@@ -37,12 +37,19 @@ def unified_publish_image():
        - source_url: Full URL to the image (including auth params)
        - metadata: Optional metadata about the image
        - skip_bucket: Whether to skip saving to bucket (default: false)
+
+    With "async": true the publish is queued (routes/publish_queue.py) and the
+    response is 202 with the job; poll /publish/jobs/<job_id> for the result.
     """
     try:
         data = request.get_json()
         dest_bucket_id = data.get('dest_bucket_id')
         
         info(f"[unified_publish_image] RECEIVED: {data}")
+        publish = publish_to_destination
+        if data.get('async'):
+            from routes import publish_queue
+            publish = publish_queue.submit
         
         # Validate destination exists
         if not dest_bucket_id:
@@ -75,7 +82,7 @@ def unified_publish_image():
             else:
                 info(f"[unified_publish_image] Same-bucket publishing detected: {src_bucket_id} -> {dest_bucket_id}")
                 
-            result = publish_to_destination(
+            result = publish(
                 source=src_path,
                 publish_destination_id=dest_bucket_id,
                 # Metadata will be automatically loaded from sidecar by publish_to_destination
@@ -91,7 +98,7 @@ def unified_publish_image():
             info(f"[unified_publish_image] Using external URL publishing: {source_url[:100]}... -> {dest_bucket_id}")
             
             # External URLs should be treated as cross-bucket mode
-            result = publish_to_destination(
+            result = publish(
                 source=source_url,
                 publish_destination_id=dest_bucket_id,
                 metadata=metadata,
@@ -103,6 +110,9 @@ def unified_publish_image():
             error("[unified_publish_image] Missing required parameters")
             return jsonify({"error": "Missing required parameters: either (src_bucket_id + filename) or source_url"}), 400
             
+        if data.get('async'):
+            info(f"[unified_publish_image] Queued as job {result.id}")
+            return jsonify(result.to_dict()), 202
         info(f"[unified_publish_image] Result: {result}")
         return jsonify(result)
         
@@ -503,4 +513,71 @@ def get_publish_history_endpoint(publish_destination_id: str):
         
     except Exception as e:
         error(f"[history] Error getting history info for {publish_destination_id}: {e}")
-        return jsonify({"success": False, "error": f"Failed to get history info: {str(e)}"}), 500 
\ No newline at end of file
+        return jsonify({"success": False, "error": f"Failed to get history info: {str(e)}"}), 500 
+
+@publish_api.route('/publish/events/<publish_destination_id>', methods=['GET'])
+def wait_for_publish_endpoint(publish_destination_id: str):
+    """
+    Long-poll fallback for display pages that cannot use the WebSocket relay.
+
+    Returns the destination's latest "published" event as soon as its version
+    is newer than ?since= (immediately if it already is), or 204 No Content
+    after ?timeout= seconds (capped at publish_events.LONG_POLL_TIMEOUT).
+    """
+    from routes import publish_events
+
+    try:
+        get_destination(publish_destination_id)
+    except KeyError as e:
+        return jsonify({"error": str(e)}), 404
+
+    since = request.args.get("since", 0, type=int)
+    timeout = request.args.get("timeout", publish_events.LONG_POLL_TIMEOUT, type=float)
+    event = publish_events.wait(publish_destination_id, since, max(0.0, min(timeout, publish_events.LONG_POLL_TIMEOUT)))
+    if event is None:
+        return "", 204
+    return jsonify(event)
+
+
+@publish_api.route('/publish/<publish_destination_id>/rollback', methods=['POST'])
+def rollback_publish_endpoint(publish_destination_id: str):
+    """
+    Swap the destination back to the file it showed before the last publish.
+
+    Only the published file is swapped; history, sidecar and overlay are left
+    alone (use /undo for a full republish). Calling it again swaps forward.
+    """
+    from routes import display_variants, publish_events, publish_pointer
+    from routes.blobstore import hash_file
+
+    try:
+        get_destination(publish_destination_id)
+        pointer = publish_pointer.rollback(publish_destination_id)
+    except (KeyError, FileNotFoundError) as e:
+        return jsonify({"error": str(e)}), 404
+    digest = hash_file(pointer)
+    variant = display_variants.render_for_publish(pointer, publish_destination_id, digest)
+    return jsonify(publish_events.emit(
+        publish_destination_id, pointer, digest=digest,
+        display_url=display_variants.url_for(variant) if variant else None,
+    ))
+
+
+@publish_api.route('/publish/jobs', methods=['GET'])
+def list_publish_jobs_endpoint():
+    """Queued, running and recently finished background publishes (?dest= to filter)."""
+    from routes import publish_queue
+
+    return jsonify([job.to_dict() for job in publish_queue.jobs(request.args.get("dest"))])
+
+
+@publish_api.route('/publish/jobs/<job_id>', methods=['GET'])
+def get_publish_job_endpoint(job_id: str):
+    """Status of one background publish; ?wait=<seconds> blocks until it finishes."""
+    from routes import publish_events, publish_queue
+
+    wait = min(request.args.get("wait", 0, type=float), publish_events.LONG_POLL_TIMEOUT)
+    job = publish_queue.wait(job_id, wait) if wait > 0 else publish_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown publish job '{job_id}'"}), 404
+    return jsonify(job.to_dict())
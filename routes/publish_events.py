@@ -0,0 +1,202 @@
+"""
+publish_events.py – push notifications when a destination gets new media.
+
+Display pages used to notice a publish by HEAD-polling /output/<dest>.jpg,
+.JPG and .mp4 every second. Instead, every publish that moves a
+destination's pointer now emits one "published" event:
+
+    {"type": "published", "dest": "lounge", "screens": ["lounge"],
+     "version": 1760000000000, "url": "/output/_variants/3f2a…-1920x1080-cover-q82.webp",
+     "source_url": "/output/lounge.jpg?v=3f2a…", "hash": "<sha256>",
+     "media_type": "image", "published_at": "…Z"}
+
+"url" is what the display should load: the destination's right-sized variant
+(routes/display_variants.py) when there is one, otherwise the published file
+itself. "hash" is the SHA-256 of the published file. A video whose
+normalized copy isn't cached yet is sent as the original, and a second event
+with the same hash follows once a background worker has made the copy.
+
+Events go out over the overlay WebSocket relay (overlay_ws_server registers
+itself as a listener). A page that (re)connects sends
+
+    {"type": "subscribe", "screens": ["lounge"], "since": {"lounge": <version>}}
+
+and is sent whatever it missed. Where the socket is unavailable, pages fall
+back to GET /api/publish/events/<dest>?since=<version>, which long-polls.
+
+Versions are millisecond timestamps, strictly increasing per destination, so
+a last-seen version from before a server restart still compares correctly.
+After a restart the current event is rebuilt from the file on disk.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Set, Tuple
+
+from routes import display_variants, publish_pointer
+from routes.blobstore import hash_file
+from utils.logger import debug, warning
+
+VIDEO_EXTENSIONS = {".mp4"}
+LONG_POLL_TIMEOUT = 25.0
+
+_cond = threading.Condition()
+_latest: Dict[str, Dict[str, Any]] = {}
+_listeners: Dict[str, Callable[[Dict[str, Any]], Any]] = {}
+
+
+def add_listener(name: str, callback: Callable[[Dict[str, Any]], Any]):
+    """Register *callback* for every emitted event; re-registering a name replaces it."""
+    _listeners[name] = callback
+
+
+def remove_listener(name: str):
+    _listeners.pop(name, None)
+
+
+def _event(dest_id: str, path: Path, version: int, digest: str,
+           display_url: Optional[str] = None) -> Dict[str, Any]:
+    source_url = f"/output/{path.name}?v={digest[:12]}"
+    return {
+        "type": "published",
+        "dest": dest_id,
+        "screens": [dest_id],
+        "version": version,
+        "url": display_url or source_url,
+        "source_url": source_url,
+        "hash": digest,
+        "media_type": "video" if path.suffix.lower() in VIDEO_EXTENSIONS else "image",
+        "published_at": datetime.utcfromtimestamp(version / 1000).isoformat() + "Z",
+    }
+
+
+def emit(dest_id: str, path: Path, digest: Optional[str] = None,
+         display_url: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Record that *path* is now what *dest_id* displays and notify subscribers.
+    Pass *digest* if the file's SHA-256 is already known, and *display_url*
+    if displays should load a variant rather than *path* itself.
+    """
+    return emit_many([(dest_id, path, digest, display_url)])[0]
+
+
+def emit_many(items: List[Tuple[str, Path, Optional[str], Optional[str]]]) -> List[Dict[str, Any]]:
+    """
+    emit() for several destinations at once – (dest_id, path, digest,
+    display_url) tuples – waking long-pollers once rather than per item.
+    """
+    items = [(dest_id, Path(path), digest or hash_file(path), display_url)
+             for dest_id, path, digest, display_url in items]
+    events = []
+    with _cond:
+        now = int(time.time() * 1000)
+        for dest_id, path, digest, display_url in items:
+            version = now
+            prev = _latest.get(dest_id)
+            if prev and version <= prev["version"]:
+                version = prev["version"] + 1
+            event = _event(dest_id, path, version, digest, display_url)
+            _latest[dest_id] = event
+            events.append(event)
+        _cond.notify_all()
+    _notify(events)
+    for dest_id, path, digest, display_url in items:
+        if display_url is None:
+            # Videos go out as-is first; a follow-up event brings the variant
+            display_variants.normalize_later(dest_id, path, digest)
+    return events
+
+
+def emit_variant(dest_id: str, path: Path, digest: str, display_url: str) -> Optional[Dict[str, Any]]:
+    """
+    Point *dest_id*'s displays at a variant of *path* that was rendered after
+    it was published. Nothing is emitted if *dest_id* has been sent anything
+    other than *digest* since.
+    """
+    with _cond:
+        prev = _latest.get(dest_id)
+        if prev is None or prev["hash"] != digest:
+            return None
+        version = max(int(time.time() * 1000), prev["version"] + 1)
+        event = _event(dest_id, Path(path), version, digest, display_url)
+        _latest[dest_id] = event
+        _cond.notify_all()
+    _notify([event])
+    return event
+
+
+def _notify(events: List[Dict[str, Any]]):
+    for event in events:
+        for name, callback in list(_listeners.items()):
+            try:
+                callback(event)
+            except Exception as e:
+                warning(f"[publish_events] listener {name} failed: {e}")
+        debug(f"[publish_events] {event['dest']} v{event['version']} -> {event['url']}")
+
+
+def _from_disk(dest_id: str) -> Optional[Dict[str, Any]]:
+    """Rebuild the current event from the file output/<dest>.<ext> points at."""
+    path = publish_pointer.current(dest_id)
+    if path is None:
+        return None
+    try:
+        changed = publish_pointer.changed_ns(path.stat())
+        digest = hash_file(path)
+    except OSError:
+        return None
+    variant = display_variants.existing(dest_id, path, digest)
+    return _event(dest_id, path, changed // 1_000_000, digest,
+                  display_variants.url_for(variant) if variant else None)
+
+
+def latest(dest_id: str) -> Optional[Dict[str, Any]]:
+    """The most recent event for *dest_id*, or None if nothing was ever published."""
+    with _cond:
+        event = _latest.get(dest_id)
+    if event is not None:
+        return event
+    event = _from_disk(dest_id)
+    if event is None:
+        return None
+    with _cond:
+        # A real emit() that raced us wins
+        return _latest.setdefault(dest_id, event)
+
+
+def displayed_urls() -> Set[str]:
+    """The URLs displays are currently pointed at."""
+    with _cond:
+        return {event["url"] for event in _latest.values()}
+
+
+def missed(screens: Iterable[str], since: Mapping[str, Any]) -> List[Dict[str, Any]]:
+    """Current events for *screens* newer than the client's last-seen versions."""
+    events = []
+    for dest_id in screens:
+        event = latest(dest_id)
+        if event and event["version"] > int(since.get(dest_id) or 0):
+            events.append(event)
+    return events
+
+
+def wait(dest_id: str, since: int = 0, timeout: float = LONG_POLL_TIMEOUT) -> Optional[Dict[str, Any]]:
+    """
+    Block until *dest_id* has an event newer than *since* and return it, or
+    return None after *timeout* seconds.
+    """
+    latest(dest_id)
+    deadline = time.monotonic() + timeout
+    with _cond:
+        while True:
+            event = _latest.get(dest_id)
+            if event and event["version"] > since:
+                return event
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            _cond.wait(remaining)
@@ -0,0 +1,147 @@
+"""
+publish_pointer.py – atomically swap what output/<dest>.<ext> points at.
+
+Publishing used to shutil.copy2 the whole media file over
+output/<dest>.<ext>, touch it, and leave other extensions behind. A display
+fetching mid-copy could get a torn file, and every publish of a video cost
+a full copy. Instead:
+
+    1. a hardlink to the source is created next to the pointer under a temp
+       name – no bytes are copied when the source is already under output/
+       (with config.BUCKET_DEDUP_ENABLED the link is to the source's blob in
+       routes/blobstore.py instead)
+    2. the temp name is os.replace()d over output/<dest>.<ext> – readers see
+       either the old file or the new one, never a partial one
+    3. the file that was showing is kept as
+       output/_pointers/<dest>.previous.<ext>, so rollback() is the same
+       O(1) swap; pointers with other extensions are then removed
+
+If the filesystem can't hardlink, the temp file is a copy – still atomic,
+just not free.
+
+Because a pointer shares its inode with the source, its mtime is the
+content's, not the publish time; the inode change time moves on every swap,
+so changed_ns() (the later of the two) is what orders publishes.
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+import threading
+import uuid
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from routes import blobstore, bucketer
+from utils.logger import debug
+
+MEDIA_EXTENSIONS = (".jpg", ".JPG", ".jpeg", ".png", ".webp", ".mp4")
+POINTER_DIRNAME = "_pointers"
+
+_locks: Dict[str, threading.Lock] = defaultdict(threading.Lock)
+
+
+def output_dir(dest_id: str) -> Path:
+    return Path(bucketer.bucket_path(dest_id)).parent
+
+
+def changed_ns(st: os.stat_result) -> int:
+    return max(st.st_mtime_ns, st.st_ctime_ns)
+
+
+def _pointer_files(dest_id: str) -> List[Path]:
+    out = output_dir(dest_id)
+    return [p for p in (out / f"{dest_id}{ext}" for ext in MEDIA_EXTENSIONS) if p.is_file()]
+
+
+def _previous_files(dest_id: str) -> List[Path]:
+    keep = output_dir(dest_id) / POINTER_DIRNAME
+    return sorted(keep.glob(f"{dest_id}.previous.*")) if keep.is_dir() else []
+
+
+def current(dest_id: str) -> Optional[Path]:
+    """The file *dest_id* is showing (the most recently swapped one if several exist)."""
+    files = _pointer_files(dest_id)
+    return max(files, key=lambda p: changed_ns(p.stat())) if files else None
+
+
+def previous(dest_id: str) -> Optional[Path]:
+    files = _previous_files(dest_id)
+    return files[0] if files else None
+
+
+def pinned(out: Path) -> Set[Tuple[int, int]]:
+    """
+    (device, inode) of every file under *out* that a destination is showing
+    or keeps for rollback. Bucket files sharing one of these inodes free no
+    bytes when they are deleted.
+    """
+    keys: Set[Tuple[int, int]] = set()
+    for directory in (out, out / POINTER_DIRNAME):
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    if entry.name.endswith(MEDIA_EXTENSIONS) and entry.is_file(follow_symlinks=False):
+                        try:
+                            st = entry.stat(follow_symlinks=False)
+                        except FileNotFoundError:
+                            continue
+                        keys.add((st.st_dev, st.st_ino))
+        except FileNotFoundError:
+            pass
+    return keys
+
+
+def _stage(src: Path, dst: Path) -> Path:
+    """A link to *src* (or a copy if links aren't possible) in *dst*'s directory."""
+    tmp = dst.with_name(f".{dst.name}.{uuid.uuid4().hex[:8]}.tmp")
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copy2(src, tmp)
+    return tmp
+
+
+def _install(dest_id: str, target: Path, ext: str) -> Path:
+    out = output_dir(dest_id)
+    pointer = out / f"{dest_id}{ext}"
+    with _locks[dest_id]:
+        staged = _stage(target, pointer)
+        try:
+            showing = current(dest_id)
+            if showing is not None and not os.path.samefile(showing, staged):
+                keep = out / POINTER_DIRNAME / f"{dest_id}.previous{showing.suffix}"
+                keep.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(_stage(showing, keep), keep)
+                for stale in _previous_files(dest_id):
+                    if stale.name != keep.name:
+                        stale.unlink(missing_ok=True)
+            os.replace(staged, pointer)
+        except BaseException:
+            staged.unlink(missing_ok=True)
+            raise
+        for stale in _pointer_files(dest_id):
+            if stale.name != pointer.name and not os.path.samefile(stale, pointer):
+                stale.unlink(missing_ok=True)
+    debug(f"[publish_pointer] {pointer.name} -> {target.name}")
+    return pointer
+
+
+def swap(dest_id: str, source: Path, ext: Optional[str] = None, digest: Optional[str] = None) -> Path:
+    """
+    Point output/<dest_id><ext> at the content of *source* and return the
+    pointer path. *digest* is the source's SHA-256 if already known.
+    """
+    source = Path(source)
+    target = blobstore.ingest(source, digest) if blobstore.enabled() else source
+    return _install(dest_id, target, ext or source.suffix)
+
+
+def rollback(dest_id: str) -> Path:
+    """Swap back to the previously published file (calling it again swaps forward)."""
+    prev = previous(dest_id)
+    if prev is None:
+        raise FileNotFoundError(f"No previous publish kept for '{dest_id}'")
+    return _install(dest_id, prev, prev.suffix)
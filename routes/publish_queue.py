@@ -0,0 +1,230 @@
+"""
+publish_queue.py – run publishes in the background.
+
+publish_to_destination() does everything inline – download, convert, copy,
+thumbnail, history, overlay – so a slow download used to hold up whichever
+thread called it (a waitress request thread, the scheduler loop). submit()
+queues the publish instead and returns a job at once:
+
+    • publishes to the same destination run one at a time, in order
+    • newest wins: when a publish arrives for a screen that still has
+      publishes waiting, those stop updating the screen. A waiting publish
+      that only moves the pointer is dropped ("superseded"); one that also
+      saves into a bucket still runs, but with update_published=False and
+      silent=True, so the save is not lost
+    • at most config.PUBLISH_QUEUE_WORKERS publishes run at once
+    • get()/jobs() report status; wait() blocks for a result
+
+submit_group() queues a publish_to_group() fan-out to several screens as
+one job. It takes its place in every member screen's queue and runs once it
+reaches the front of all of them, so it is ordered against single publishes
+to those screens and takes part in newest-wins for each one: a newer publish
+to one member drops (or demotes) just that member.
+
+Callers that need the result straight away (generation threads that read
+the saved filename back) keep calling publish_to_destination() directly.
+"""
+
+from __future__ import annotations
+
+import threading
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, Set
+
+import config
+from routes.keyed_drain import Pool
+from routes.publisher import expand_targets, publish_to_destination, publish_to_group
+from utils.logger import debug, error, info
+
+QUEUED, RUNNING, DONE, FAILED, SUPERSEDED = "queued", "running", "done", "failed", "superseded"
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat() + "Z"
+
+
+@dataclass
+class PublishJob:
+    id: str
+    dest: str
+    kwargs: Dict[str, Any]
+    dests: List[str] = field(default_factory=list)      # member screens whose queues it is in
+    demoted: Set[str] = field(default_factory=set)      # members it saves to but no longer shows on
+    status: str = QUEUED
+    submitted_at: str = field(default_factory=_now)
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
+    superseded_by: Optional[str] = None
+    finished: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "dest": self.dest,
+            # URLs can carry auth parameters; never echo those back
+            "source": str(self.kwargs.get("source", "")).split("?", 1)[0],
+            "status": self.status,
+            "updates_screen": self.kwargs.get("update_published", True),
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "superseded_by": self.superseded_by,
+        }
+
+
+_lock = threading.Lock()
+_pending: Dict[str, Deque[PublishJob]] = {}
+_active: set = set()                  # destinations with a publish running
+_jobs: "OrderedDict[str, PublishJob]" = OrderedDict()
+_pool = Pool("publish", lambda: config.PUBLISH_QUEUE_WORKERS)
+
+
+def _only_moves_pointer(kwargs: Dict[str, Any]) -> bool:
+    return bool(kwargs.get("blank") or kwargs.get("skip_bucket") is True
+                or kwargs.get("is_history_navigation"))
+
+
+def _supersede(queue: Deque[PublishJob], newer: PublishJob, dest_id: str):
+    """Stop *queue*'s waiting publishes from updating *dest_id*; *newer* will."""
+    for job in list(queue):
+        if not job.kwargs.get("update_published", True) or dest_id in job.demoted:
+            continue
+        job.superseded_by = newer.id
+        if _only_moves_pointer(job.kwargs):
+            queue.remove(job)
+            job.dests.remove(dest_id)
+            if not job.dests:
+                job.status = SUPERSEDED
+                job.finished_at = _now()
+                job.finished.set()
+            elif "targets" in job.kwargs:
+                job.kwargs["targets"] = list(job.dests)
+        else:
+            job.demoted.add(dest_id)
+            if job.demoted.issuperset(job.dests):
+                job.kwargs.update(update_published=False, silent=True)
+        debug(f"[publish_queue] {job.id} for {dest_id} superseded by {newer.id}")
+
+
+def _remember(job: PublishJob):
+    _jobs[job.id] = job
+    while len(_jobs) > config.PUBLISH_QUEUE_HISTORY:
+        oldest_id = next(iter(_jobs))
+        if _jobs[oldest_id].status in (QUEUED, RUNNING):
+            break
+        _jobs.popitem(last=False)
+
+
+def submit(source, publish_destination_id: str, **kwargs) -> PublishJob:
+    """Queue publish_to_destination(source, publish_destination_id, **kwargs)."""
+    job = PublishJob(id=uuid.uuid4().hex[:12], dest=publish_destination_id, dests=[publish_destination_id],
+                     kwargs={"source": source, "publish_destination_id": publish_destination_id, **kwargs})
+    return _enqueue(job)
+
+
+def submit_group(source, targets, **kwargs) -> PublishJob:
+    """
+    Queue publish_to_group(source, targets, **kwargs). The job is named
+    "<id>+<id>…" and queues behind earlier publishes to each of its members.
+    """
+    dest_ids = expand_targets(targets)
+    job = PublishJob(id=uuid.uuid4().hex[:12], dest="+".join(sorted(dest_ids)), dests=list(dest_ids),
+                     kwargs={"source": source, "targets": dest_ids, **kwargs})
+    return _enqueue(job)
+
+
+def _enqueue(job: PublishJob) -> PublishJob:
+    with _lock:
+        if job.kwargs.get("update_published", True):
+            for dest_id in job.dests:
+                if dest_id in _pending:
+                    _supersede(_pending[dest_id], job, dest_id)
+        for dest_id in job.dests:
+            _pending.setdefault(dest_id, deque()).append(job)
+        _remember(job)
+        ready = _ready()
+    for other in ready:
+        _pool.submit(_drain, other)
+    return job
+
+
+def _ready() -> List[PublishJob]:
+    """
+    Take the jobs that can start now – at the front of every member's queue,
+    with none of those members busy – off the queues. Call with _lock held.
+    """
+    ready = []
+    for queue in list(_pending.values()):
+        job = queue[0] if queue else None
+        if job is None or any(d in _active or _pending[d][0] is not job for d in job.dests):
+            continue
+        for dest_id in job.dests:
+            _pending[dest_id].popleft()
+            if not _pending[dest_id]:
+                del _pending[dest_id]
+        _active.update(job.dests)
+        job.status = RUNNING
+        job.started_at = _now()
+        ready.append(job)
+    return ready
+
+
+def _run(job: PublishJob) -> Dict[str, Any]:
+    if "targets" not in job.kwargs:
+        return publish_to_destination(**job.kwargs)
+    demoted = [d for d in job.dests if d in job.demoted]
+    if not demoted or job.kwargs.get("update_published", True) is False:
+        return publish_to_group(**job.kwargs)
+    # Some members have newer publishes waiting: only save to those
+    shown = publish_to_group(**{**job.kwargs, "targets": [d for d in job.dests if d not in job.demoted]})
+    saved = publish_to_group(**{**job.kwargs, "targets": demoted, "update_published": False, "silent": True})
+    return {"success": shown.get("success") or saved.get("success"),
+            "results": {**shown.get("results", {}), **saved.get("results", {})}}
+
+
+def _drain(job: PublishJob):
+    """Run *job*, then whatever was waiting for its destinations."""
+    while job is not None:
+        try:
+            result = _run(job)
+        except Exception as e:
+            result = {"success": False, "error": str(e)}
+        with _lock:
+            job.result = result
+            job.status = DONE if result.get("success") else FAILED
+            job.finished_at = _now()
+            _active.difference_update(job.dests)
+            ready = _ready()
+        job.finished.set()
+        if job.status == FAILED:
+            error(f"[publish_queue] {job.id} to {job.dest} failed: {result.get('error')}")
+        else:
+            info(f"[publish_queue] {job.id} to {job.dest} done")
+        for other in ready[1:]:
+            _pool.submit(_drain, other)
+        job = ready[0] if ready else None
+
+
+def get(job_id: str) -> Optional[PublishJob]:
+    with _lock:
+        return _jobs.get(job_id)
+
+
+def jobs(dest_id: Optional[str] = None) -> List[PublishJob]:
+    """Known jobs, newest first, optionally for one destination (group jobs included)."""
+    with _lock:
+        return [j for j in reversed(_jobs.values())
+                if dest_id is None or j.dest == dest_id or dest_id in j.dests]
+
+
+def wait(job_id: str, timeout: Optional[float] = None) -> Optional[PublishJob]:
+    """Block until the job has finished (or *timeout* passes) and return it."""
+    job = get(job_id)
+    if job is not None:
+        job.finished.wait(timeout)
+    return job
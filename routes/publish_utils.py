@@ -4,89 +4,166 @@ Publish history utilities for managing undo/redo stacks.
 This module provides utilities for managing publication history stacks
 for destinations, enabling undo/redo functionality while gracefully
 handling cases where no history exists.
+
+Each destination's history lives in its own append-only log,
+output/<dest>/publish_history.jsonl, one JSON record per line:
+
+    {"push": {...entry...}}   a new publish (drops anything newer than the cursor)
+    {"cursor": n}             undo/redo moved the cursor n entries back from newest
+
+The log is replayed into memory once per process; after that a publish,
+undo or redo is one appended line and never reads or rewrites bucket.json.
+When the log holds PUBLISH_HISTORY_COMPACT_SLACK more lines than live
+entries it is rewritten (atomically) as just the live entries and cursor.
+A destination without a log is seeded from the history_stack that older
+versions kept in bucket.json's published_meta.
 """
 
+from collections import deque
 from typing import Dict, Any, List, Optional, Tuple
 from pathlib import Path
 import json
+import os
+import threading
+import uuid
 from datetime import datetime
 
+import config
 from utils.logger import info, error, warning, debug
-from routes.bucketer import load_meta, save_meta
+from routes import bucketer
+from routes.bucketer import load_meta, meta_transaction
 from routes.publisher import get_published_info
 
 # Configuration
-DEFAULT_MAX_STACK_SIZE = 99
+HISTORY_FILENAME = "publish_history.jsonl"
+
+
+class _HistoryLog:
+    """One destination's history: entries oldest → newest and a cursor (0 = newest)."""
+
+    def __init__(self, destination_id: str, max_size: int):
+        self.destination_id = destination_id
+        self.path = bucketer.bucket_path(destination_id) / HISTORY_FILENAME
+        self.entries: deque = deque(maxlen=max_size)
+        self.pointer = 0
+        self.lines = 0
+        self.lock = threading.Lock()
+        if self.path.exists():
+            self._replay()
+        else:
+            self._seed()
+
+    def _apply(self, record: Dict[str, Any]):
+        if "push" in record:
+            for _ in range(min(self.pointer, len(self.entries))):
+                self.entries.pop()                     # truncate future history
+            self.entries.append(record["push"])        # deque drops the oldest past maxlen
+            self.pointer = 0
+        elif "cursor" in record:
+            self.pointer = max(0, min(int(record["cursor"]), len(self.entries) - 1))
+
+    def _replay(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                self.lines += 1
+                try:
+                    self._apply(json.loads(line))
+                except (ValueError, TypeError) as e:
+                    # A torn final line from a crash mid-append; the rest is intact
+                    warning(f"[history] Skipping bad record in {self.path}: {e}")
+
+    def _seed(self):
+        """Import the history_stack kept in bucket.json, or start from what's published."""
+        published_meta = load_meta(self.destination_id).get("published_meta") or {}
+        stack = published_meta.get("history_stack")
+        if stack:
+            for entry in reversed(stack):
+                self.entries.append(entry)
+            self.pointer = min(published_meta.get("current_pointer", 0), len(self.entries) - 1)
+            info(f"[history] Moved {len(stack)} history entries for {self.destination_id} out of bucket.json")
+        else:
+            current_published = get_published_info(self.destination_id)
+            if current_published and current_published.get("published"):
+                self.entries.append({
+                    "filename": current_published["published"],
+                    "published_at": current_published.get("published_at", ""),
+                    "raw_url": current_published.get("raw_url", ""),
+                    "thumbnail_url": current_published.get("thumbnail_url", ""),
+                    "metadata": current_published.get("meta", {})
+                })
+                info(f"[history] Initialized history for {self.destination_id} with current image")
+            else:
+                info(f"[history] Initialized empty history for {self.destination_id}")
+        self.compact()
+        if "history_stack" in published_meta:
+            with meta_transaction(self.destination_id) as meta:
+                meta.get("published_meta", {}).pop("history_stack", None)
+                meta.get("published_meta", {}).pop("current_pointer", None)
+
+    def compact(self):
+        """Rewrite the log as the live entries plus the cursor."""
+        records = [{"push": entry} for entry in self.entries]
+        if self.pointer:
+            records.append({"cursor": self.pointer})
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f".{self.path.name}.{uuid.uuid4().hex[:8]}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(r, ensure_ascii=False) + "\n" for r in records)
+        os.replace(tmp, self.path)
+        self.lines = len(records)
+        debug(f"[history] Compacted {self.path.name} for {self.destination_id} to {self.lines} records")
+
+    def append(self, record: Dict[str, Any]):
+        self._apply(record)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.lines += 1
+        if self.lines > len(self.entries) + config.PUBLISH_HISTORY_COMPACT_SLACK:
+            self.compact()
+
+    def at(self, pointer: int) -> Optional[Dict[str, Any]]:
+        """The entry *pointer* steps back from the newest."""
+        if 0 <= pointer < len(self.entries):
+            return self.entries[-1 - pointer]
+        return None
+
+
+_logs: Dict[str, _HistoryLog] = {}
+_logs_guard = threading.Lock()
+
+
+def _history_log(destination_id: str, max_size: int) -> _HistoryLog:
+    with _logs_guard:
+        log = _logs.get(destination_id)
+        if log is None:
+            log = _logs[destination_id] = _HistoryLog(destination_id, max_size)
+        elif log.entries.maxlen != max_size:
+            log.entries = deque(log.entries, maxlen=max_size)
+        return log
 
 
 class PublishHistoryManager:
     """Manages publication history stack for a destination."""
     
-    def __init__(self, destination_id: str, max_stack_size: int = DEFAULT_MAX_STACK_SIZE):
+    def __init__(self, destination_id: str, max_stack_size: Optional[int] = None):
         self.destination_id = destination_id
-        self.max_stack_size = max_stack_size
-    
-    def _get_history_data(self) -> Dict[str, Any]:
-        """Get current history data from bucket metadata, creating if needed."""
-        try:
-            meta = load_meta(self.destination_id)
-            
-            # Initialize history structure if it doesn't exist
-            if "published_meta" not in meta:
-                meta["published_meta"] = {}
-            
-            published_meta = meta["published_meta"]
-            
-            # If no history stack exists, initialize with current published image if available
-            if "history_stack" not in published_meta:
-                published_meta["history_stack"] = []
-                published_meta["current_pointer"] = 0
-                
-                # Try to get current published image to seed the stack
-                current_published = get_published_info(self.destination_id)
-                if current_published and current_published.get("published"):
-                    initial_entry = {
-                        "filename": current_published["published"],
-                        "published_at": current_published.get("published_at", ""),
-                        "raw_url": current_published.get("raw_url", ""),
-                        "thumbnail_url": current_published.get("thumbnail_url", ""),
-                        "metadata": current_published.get("meta", {})
-                    }
-                    published_meta["history_stack"].append(initial_entry)
-                    info(f"[history] Initialized history stack for {self.destination_id} with current image")
-                else:
-                    info(f"[history] Initialized empty history stack for {self.destination_id}")
-                
-                # Save the initialized structure
-                save_meta(self.destination_id, meta)
-            
-            return published_meta
-            
-        except Exception as e:
-            error(f"[history] Error getting history data for {self.destination_id}: {e}")
-            # Return minimal structure on error
-            return {
-                "history_stack": [],
-                "current_pointer": 0
-            }
-    
-    def _save_history_data(self, history_data: Dict[str, Any]) -> bool:
-        """Save history data back to bucket metadata."""
-        try:
-            meta = load_meta(self.destination_id)
-            # Merge history data with existing published_meta instead of overwriting
-            if "published_meta" not in meta:
-                meta["published_meta"] = {}
-            
-            # Update only the history-related fields
-            meta["published_meta"]["history_stack"] = history_data.get("history_stack", [])
-            meta["published_meta"]["current_pointer"] = history_data.get("current_pointer", 0)
-            
-            save_meta(self.destination_id, meta)
-            return True
-        except Exception as e:
-            error(f"[history] Error saving history data for {self.destination_id}: {e}")
-            return False
+        self.max_stack_size = max_stack_size or config.PUBLISH_HISTORY_MAX
+
+    def _log(self) -> _HistoryLog:
+        return _history_log(self.destination_id, self.max_stack_size)
+
+    def _state(self, log: _HistoryLog, success: bool = True, **extra) -> Dict[str, Any]:
+        size = len(log.entries)
+        return {
+            "success": success,
+            **extra,
+            "current_image": log.at(log.pointer),
+            "pointer_position": log.pointer,
+            "stack_size": size,
+            "can_undo": log.pointer < size - 1,
+            "can_redo": log.pointer > 0
+        }
     
     def push_new_image(self, image_info: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -100,17 +177,6 @@ class PublishHistoryManager:
             Dictionary with operation result and current state
         """
         try:
-            history_data = self._get_history_data()
-            stack = history_data["history_stack"]
-            pointer = history_data["current_pointer"]
-            
-            # Remove all entries above current pointer (truncate future history)
-            # Only truncate if we're not at the newest image (pointer > 0)
-            if pointer > 0:
-                stack = stack[:pointer + 1]
-                debug(f"[history] Truncated future history for {self.destination_id}, new stack size: {len(stack)}")
-            
-            # Add new image at the front (index 0)
             new_entry = {
                 "filename": image_info["filename"],
                 "published_at": image_info.get("published_at", datetime.utcnow().isoformat() + "Z"),
@@ -118,36 +184,33 @@ class PublishHistoryManager:
                 "thumbnail_url": image_info.get("thumbnail_url", ""),
                 "metadata": image_info.get("metadata", {})
             }
-            
-            # Insert at beginning and adjust indices
-            stack.insert(0, new_entry)
-            
-            # Trim stack if it exceeds max size
-            if len(stack) > self.max_stack_size:
-                stack = stack[:self.max_stack_size]
-                debug(f"[history] Trimmed stack to {self.max_stack_size} entries for {self.destination_id}")
-            
-            # Reset pointer to 0 (newest image)
-            history_data["history_stack"] = stack
-            history_data["current_pointer"] = 0
-            
-            # Save changes
-            if self._save_history_data(history_data):
-                info(f"[history] Added new image to history for {self.destination_id}, stack size: {len(stack)}")
-                return {
-                    "success": True,
-                    "current_image": new_entry,
-                    "pointer_position": 0,
-                    "stack_size": len(stack),
-                    "can_undo": len(stack) > 1,
-                    "can_redo": False
-                }
-            else:
-                return {"success": False, "error": "Failed to save history data"}
-                
+            log = self._log()
+            with log.lock:
+                log.append({"push": new_entry})
+                info(f"[history] Added new image to history for {self.destination_id}, stack size: {len(log.entries)}")
+                return self._state(log)
         except Exception as e:
             error(f"[history] Error pushing new image for {self.destination_id}: {e}")
             return {"success": False, "error": str(e)}
+
+    def _move(self, step: int) -> Dict[str, Any]:
+        log = self._log()
+        with log.lock:
+            if not log.entries:
+                return {
+                    "success": False,
+                    "error": "No history available",
+                    "can_undo": False,
+                    "can_redo": False
+                }
+            new_pointer = log.pointer + step
+            if new_pointer >= len(log.entries):
+                return self._state(log, success=False, error="Already at oldest image")
+            if new_pointer < 0:
+                return self._state(log, success=False, error="Already at newest image")
+            log.append({"cursor": new_pointer})
+            info(f"[history] {'Undo' if step > 0 else 'Redo'} for {self.destination_id}, moved to pointer {new_pointer}")
+            return self._state(log)
     
     def undo(self) -> Dict[str, Any]:
         """
@@ -157,49 +220,7 @@ class PublishHistoryManager:
             Dictionary with operation result and current state
         """
         try:
-            history_data = self._get_history_data()
-            stack = history_data["history_stack"]
-            pointer = history_data["current_pointer"]
-            
-            # Check if we can undo
-            if len(stack) == 0:
-                return {
-                    "success": False,
-                    "error": "No history available",
-                    "can_undo": False,
-                    "can_redo": False
-                }
-            
-            if pointer >= len(stack) - 1:
-                return {
-                    "success": False,
-                    "error": "Already at oldest image",
-                    "current_image": stack[pointer] if pointer < len(stack) else None,
-                    "pointer_position": pointer,
-                    "stack_size": len(stack),
-                    "can_undo": False,
-                    "can_redo": pointer > 0
-                }
-            
-            # Move pointer back (to older image)
-            new_pointer = pointer + 1
-            history_data["current_pointer"] = new_pointer
-            
-            # Save changes
-            if self._save_history_data(history_data):
-                current_image = stack[new_pointer]
-                info(f"[history] Undo for {self.destination_id}, moved to pointer {new_pointer}")
-                return {
-                    "success": True,
-                    "current_image": current_image,
-                    "pointer_position": new_pointer,
-                    "stack_size": len(stack),
-                    "can_undo": new_pointer < len(stack) - 1,
-                    "can_redo": new_pointer > 0
-                }
-            else:
-                return {"success": False, "error": "Failed to save history data"}
-                
+            return self._move(1)
         except Exception as e:
             error(f"[history] Error during undo for {self.destination_id}: {e}")
             return {"success": False, "error": str(e)}
@@ -212,49 +233,7 @@ class PublishHistoryManager:
             Dictionary with operation result and current state
         """
         try:
-            history_data = self._get_history_data()
-            stack = history_data["history_stack"]
-            pointer = history_data["current_pointer"]
-            
-            # Check if we can redo
-            if len(stack) == 0:
-                return {
-                    "success": False,
-                    "error": "No history available",
-                    "can_undo": False,
-                    "can_redo": False
-                }
-            
-            if pointer <= 0:
-                return {
-                    "success": False,
-                    "error": "Already at newest image",
-                    "current_image": stack[0] if len(stack) > 0 else None,
-                    "pointer_position": pointer,
-                    "stack_size": len(stack),
-                    "can_undo": len(stack) > 1,
-                    "can_redo": False
-                }
-            
-            # Move pointer forward (to newer image)
-            new_pointer = pointer - 1
-            history_data["current_pointer"] = new_pointer
-            
-            # Save changes
-            if self._save_history_data(history_data):
-                current_image = stack[new_pointer]
-                info(f"[history] Redo for {self.destination_id}, moved to pointer {new_pointer}")
-                return {
-                    "success": True,
-                    "current_image": current_image,
-                    "pointer_position": new_pointer,
-                    "stack_size": len(stack),
-                    "can_undo": new_pointer < len(stack) - 1,
-                    "can_redo": new_pointer > 0
-                }
-            else:
-                return {"success": False, "error": "Failed to save history data"}
-                
+            return self._move(-1)
         except Exception as e:
             error(f"[history] Error during redo for {self.destination_id}: {e}")
             return {"success": False, "error": str(e)}
@@ -262,15 +241,9 @@ class PublishHistoryManager:
     def get_current_image(self) -> Optional[Dict[str, Any]]:
         """Get the image at the current pointer position."""
         try:
-            history_data = self._get_history_data()
-            stack = history_data["history_stack"]
-            pointer = history_data["current_pointer"]
-            
-            if len(stack) == 0 or pointer >= len(stack):
-                return None
-            
-            return stack[pointer]
-            
+            log = self._log()
+            with log.lock:
+                return log.at(log.pointer)
         except Exception as e:
             error(f"[history] Error getting current image for {self.destination_id}: {e}")
             return None
@@ -278,16 +251,15 @@ class PublishHistoryManager:
     def get_stack_info(self) -> Dict[str, Any]:
         """Get current stack status and navigation info."""
         try:
-            history_data = self._get_history_data()
-            stack = history_data["history_stack"]
-            pointer = history_data["current_pointer"]
-            
+            log = self._log()
+            with log.lock:
+                state = self._state(log)
             return {
-                "current_pointer": pointer,
-                "stack_size": len(stack),
-                "can_undo": pointer < len(stack) - 1,
-                "can_redo": pointer > 0,
-                "current_image": stack[pointer] if pointer < len(stack) else None
+                "current_pointer": state["pointer_position"],
+                "stack_size": state["stack_size"],
+                "can_undo": state["can_undo"],
+                "can_redo": state["can_redo"],
+                "current_image": state["current_image"]
             }
             
         except Exception as e:
@@ -20,11 +20,11 @@ import uuid
 import os
 import logging
 import tempfile
-import random
 import re 
 import sys
+from concurrent.futures import ThreadPoolExecutor
 
-import requests
+import config
 from utils.logger import info, error, warning, debug
 from routes.utils import (
     _load_json_once, 
@@ -41,11 +41,13 @@ from routes.utils import (
 )
 
 
+from routes import display_prefetch, display_variants, http_client, publish_events, publish_pointer
+from routes.blobstore import hash_file
 from routes.bucketer import (
     _append_to_bucket,
     bucket_path,
-    load_meta,
-    save_meta
+    read_meta,
+    meta_transaction
 )
 
 
@@ -89,6 +91,106 @@ def get_destination(dest_id: str) -> dict[str, Any]:
             return d
     raise KeyError(f"Unknown publish_destination_id '{dest_id}'")
 
+def _metadata_from_file(source_path: Path) -> dict:
+    """Metadata for a local media file: its sidecar, else embedded EXIF/MP4 comment, else {}."""
+    metadata = None
+
+    # Check for sidecar file and read metadata if it exists
+    from routes.utils import sidecar_path
+    sidecar_file = sidecar_path(source_path)
+    if sidecar_file.exists():
+        try:
+            metadata = json.loads(sidecar_file.read_text("utf-8"))
+            info(f"[publish_to_destination] Loaded metadata from sidecar: {sidecar_file}")
+        except Exception as e:
+            warning(f"[publish_to_destination] Failed to read sidecar for {source_path.name}: {e}")
+
+    # If still no metadata, try to extract it directly from the file
+    if metadata is None:
+        file_suffix = source_path.suffix.lower()
+        if file_suffix in ['.jpg', '.jpeg', '.png']:
+            try:
+                metadata = _extract_exif_json(source_path)
+                if metadata:
+                    info(f"[publish_to_destination] Extracted EXIF metadata from {source_path.name}")
+            except Exception as e:
+                warning(f"[publish_to_destination] Failed to extract EXIF from {source_path.name}: {e}")
+        elif file_suffix in ['.mp4', '.webm', '.mov']:
+            try:
+                metadata = _extract_mp4_comment_json(source_path)
+                if metadata:
+                    info(f"[publish_to_destination] Extracted metadata from video {source_path.name}")
+            except Exception as e:
+                warning(f"[publish_to_destination] Failed to extract metadata from video {source_path.name}: {e}")
+
+    # Initialize metadata as empty dict if all extraction methods failed
+    if metadata is None:
+        metadata = {}
+        info(f"[publish_to_destination] No metadata found for {source_path.name}, using empty metadata")
+    return metadata
+
+
+def _download_remote(source: str, directory: Path) -> Path:
+    """
+    Download *source* into a temp file in *directory* (normally output/, so
+    publishing can hardlink it) and return its path. Stills that aren't
+    JPEG are converted to JPEG. The caller deletes the file.
+    """
+    # Detect the correct file extension for the downloaded content
+    from urllib.parse import urlparse, unquote
+    parsed_url = urlparse(source)
+    # Get last segment of the path (ignoring query/fragment) and unquote it
+    path_tail = Path(unquote(parsed_url.path)).name  # e.g. "image.jpg"
+    ext = Path(path_tail).suffix.lower()
+
+    valid_exts = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.mp4', '.webm', '.mov'}
+    file_extension = ext if ext in valid_exts else ''
+
+    # Stream to a temp file (hashed on the way) rather than holding it in memory
+    download = http_client.download(source, suffix=file_extension, directory=directory)
+    temp_path = download.path
+
+    # Fallback: look at Content-Type header
+    if not file_extension:
+        content_type = download.content_type.lower()
+        if 'video' in content_type:
+            file_extension = '.mp4'
+        elif 'image/jpeg' in content_type:
+            file_extension = '.jpg'
+        elif 'image/png' in content_type:
+            file_extension = '.png'
+        elif 'image/gif' in content_type:
+            file_extension = '.gif'
+        elif 'image/webp' in content_type:
+            file_extension = '.webp'
+        else:
+            # Default safe fallback
+            file_extension = '.jpg'
+        temp_path = temp_path.rename(temp_path.with_suffix(file_extension))
+
+    debug(f"Determined file extension: {file_extension} (url='{path_tail}', content-type='{download.content_type}')")
+
+    # If the file is an image but not already JPEG, convert to JPEG for consistency
+    image_exts = {'.png', '.gif', '.webp', '.jpeg'}
+    is_video   = file_extension in {'.mp4', '.webm', '.mov'}
+
+    if file_extension in image_exts and not is_video:
+        try:
+            from PIL import Image
+
+            with Image.open(temp_path) as original:
+                img = original.convert('RGB')
+            with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg', prefix='.download-', dir=directory) as temp_file:
+                img.save(temp_file, format='JPEG', quality=95)
+            temp_path.unlink()
+            temp_path = Path(temp_file.name)
+            debug(f"Image converted to JPEG for publishing (original ext {file_extension}) -> {temp_path.name}")
+            file_extension = '.jpg'  # normalise
+        except Exception as e:
+            warning(f"JPEG conversion failed ({file_extension}), falling back to original content: {e}")
+    return temp_path
+
+
 # ─── Public wrapper ─────────────────────────────────────────────────────
 def publish_to_destination(
     source: str | Path,
@@ -160,42 +262,7 @@ def publish_to_destination(
         
         # Check for metadata. If none provided, try to get it from sidecar if source is a local file
         if metadata is None and not is_url:
-            # Convert string path to Path object if needed
-            source_path = Path(source) if isinstance(source, str) else source
-            
-            # Check for sidecar file and read metadata if it exists
-            from routes.utils import sidecar_path
-            sidecar_file = sidecar_path(source_path)
-            if sidecar_file.exists():
-                try:
-                    import json
-                    metadata = json.loads(sidecar_file.read_text("utf-8"))
-                    info(f"[publish_to_destination] Loaded metadata from sidecar: {sidecar_file}")
-                except Exception as e:
-                    warning(f"[publish_to_destination] Failed to read sidecar for {source_path.name}: {e}")
-            
-            # If still no metadata, try to extract it directly from the file
-            if metadata is None:
-                file_suffix = source_path.suffix.lower()
-                if file_suffix in ['.jpg', '.jpeg', '.png']:
-                    try:
-                        metadata = _extract_exif_json(source_path)
-                        if metadata:
-                            info(f"[publish_to_destination] Extracted EXIF metadata from {source_path.name}")
-                    except Exception as e:
-                        warning(f"[publish_to_destination] Failed to extract EXIF from {source_path.name}: {e}")
-                elif file_suffix in ['.mp4', '.webm', '.mov']:
-                    try:
-                        metadata = _extract_mp4_comment_json(source_path)
-                        if metadata:
-                            info(f"[publish_to_destination] Extracted metadata from video {source_path.name}")
-                    except Exception as e:
-                        warning(f"[publish_to_destination] Failed to extract metadata from video {source_path.name}: {e}")
-            
-            # Initialize metadata as empty dict if all extraction methods failed
-            if metadata is None:
-                metadata = {}
-                info(f"[publish_to_destination] No metadata found for {source_path.name}, using empty metadata")
+            metadata = _metadata_from_file(Path(source) if isinstance(source, str) else source)
         
         # Default skip_bucket behavior if not specified
         if skip_bucket is None:
@@ -270,65 +337,7 @@ def publish_to_destination(
 
                 # If we get here, we need to download the remote URL
                 info(f"[publish_to_destination] Downloading remote URL: {source}")
-                response = requests.get(source, stream=True)
-                response.raise_for_status()
-                
-                # --------------------------------------------------
-                # Detect the correct file extension for the downloaded content
-                # --------------------------------------------------
-                from urllib.parse import urlparse, unquote
-                parsed_url = urlparse(source)
-                # Get last segment of the path (ignoring query/fragment) and unquote it
-                path_tail = Path(unquote(parsed_url.path)).name  # e.g. "image.jpg"
-                ext = Path(path_tail).suffix.lower()
-
-                valid_exts = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.mp4', '.webm', '.mov'}
-                file_extension = ext if ext in valid_exts else ''
-
-                # Fallback: look at Content-Type header
-                if not file_extension:
-                    content_type = response.headers.get('Content-Type', '').lower()
-                    if 'video' in content_type:
-                        file_extension = '.mp4'
-                    elif 'image/jpeg' in content_type:
-                        file_extension = '.jpg'
-                    elif 'image/png' in content_type:
-                        file_extension = '.png'
-                    elif 'image/gif' in content_type:
-                        file_extension = '.gif'
-                    elif 'image/webp' in content_type:
-                        file_extension = '.webp'
-                    else:
-                        # Default safe fallback
-                        file_extension = '.jpg'
-
-                debug(f"Determined file extension: {file_extension} (url='{path_tail}', content-type='{response.headers.get('Content-Type', '')}')")
-                
-                # If the file is an image but not already JPEG, convert to JPEG for consistency
-                image_exts = {'.png', '.gif', '.webp', '.jpeg'}
-                is_video   = file_extension in {'.mp4', '.webm', '.mov'}
-
-                if file_extension in image_exts and not is_video:
-                    try:
-                        from PIL import Image
-                        from io import BytesIO
-
-                        img = Image.open(BytesIO(response.content)).convert('RGB')
-                        with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as temp_file:
-                            img.save(temp_file, format='JPEG', quality=95)
-                            temp_path = Path(temp_file.name)
-                        debug(f"Image converted to JPEG for publishing (original ext {file_extension}) -> {temp_path.name}")
-                        file_extension = '.jpg'  # normalise
-                    except Exception as e:
-                        warning(f"JPEG conversion failed ({file_extension}), falling back to original content: {e}")
-                        with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as temp_file:
-                            temp_file.write(response.content)
-                            temp_path = Path(temp_file.name)
-                else:
-                    # Create a temporary file with determined extension (video or already jpg)
-                    with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as temp_file:
-                        temp_file.write(response.content)
-                        temp_path = Path(temp_file.name)
+                temp_path = _download_remote(source, Path(bucket_path(publish_destination_id)).parent)
                 
                 # Publish the downloaded file
                 result = _publish_to_destination(
@@ -377,14 +386,137 @@ def publish_to_destination(
         error(f"Publish failed: {e}")
         return {"success": False, "error": str(e)}
 
+# ─── Group fan-out ───────────────────────────────────────────────────────
+def expand_targets(targets: str | list[str]) -> list[str]:
+    """
+    Destination IDs for *targets*: destination IDs, group names or
+    'global', in order, each destination once.
+    """
+    destinations = _load_json_once("destination", "publish-destinations.json")
+    ids = []
+    for scope in [targets] if isinstance(targets, str) else targets:
+        if scope == "global":
+            ids += [d["id"] for d in destinations]
+        elif any(d["id"] == scope for d in destinations):
+            ids.append(scope)
+        else:
+            ids += [d["id"] for d in destinations if scope in d.get("groups", [])]
+    return list(dict.fromkeys(ids))
+
+
+def _local_bucket_file(source: str) -> Optional[Path]:
+    """The bucket file an /api/buckets/<id>/raw/<name> URL (relative or absolute) points at."""
+    match = re.match(r'(?:https?://.*?)?/api/buckets/([^/]+)/raw/([^/]+)', source)
+    if match:
+        local_path = bucket_path(match.group(1)) / match.group(2)
+        if local_path.exists():
+            return local_path
+    return None
+
+
+def publish_to_group(
+    source: str | Path,
+    targets: str | list[str],
+    metadata: dict | None = None,
+    skip_bucket: bool | None = None,
+    silent: bool = False,
+    batch_id: str | None = None,
+    update_published: bool = True,
+) -> dict:
+    """
+    Publish one image to several destinations (IDs, group names or 'global').
+
+    Unlike calling publish_to_destination per screen, the source is fetched,
+    read for metadata, hashed and decoded once; each destination's bucket
+    copy, pointer and display variant are then written in parallel
+    (config.GROUP_PUBLISH_WORKERS) from that shared work, and displays are
+    told in one batch with a single overlay for every screen.
+
+    Returns:
+        dict with overall success and a per-destination "results" dict
+    """
+    dest_ids = expand_targets(targets)
+    if not dest_ids:
+        return {"success": False, "error": f"No destinations for {targets}", "results": {}}
+    info(f"[publish_to_group] PARAMS: source={source}, dests={dest_ids}")
+
+    temp_path = None
+    try:
+        is_url = isinstance(source, str) and source.startswith(('http://', 'https://', '/api/'))
+        if is_url:
+            source_path = _local_bucket_file(source)
+            if source_path is None:
+                if source.startswith('/api/'):
+                    return {"success": False, "error": f"No such bucket file: {source}", "results": {}}
+                temp_path = source_path = _download_remote(source, Path(bucket_path(dest_ids[0])).parent)
+        else:
+            source_path = Path(source)
+            if metadata is None:
+                metadata = _metadata_from_file(source_path)
+        metadata = metadata or {}
+
+        digest = hash_file(source_path)
+        decoded = display_variants.decode(source_path)
+        events = []
+
+        def publish_one(dest_id: str) -> dict:
+            dest = get_destination(dest_id)
+            dest_skip, cross_bucket = skip_bucket, is_url
+            if dest_skip is None:
+                dest_skip = (not is_url) and str(source_path).find(dest.get('file', dest_id)) >= 0
+            if not is_url:
+                cross_bucket = (not str(source_path).startswith(str(bucket_path(dest_id)))
+                                and '/bucket_' in str(source_path))
+            return _publish_to_destination(
+                source=source_path,
+                publish_destination_id=dest_id,
+                metadata=metadata,
+                skip_bucket=dest_skip,
+                silent=True,
+                cross_bucket_mode=cross_bucket,
+                batch_id=batch_id,
+                update_published=update_published,
+                digest=digest,
+                decoded_image=decoded,
+                events=events,
+            )
+
+        def guarded(dest_id: str) -> dict:
+            try:
+                return publish_one(dest_id)
+            except Exception as e:
+                return {"success": False, "error": str(e)}
+
+        workers = max(1, min(config.GROUP_PUBLISH_WORKERS, len(dest_ids)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="group-publish") as pool:
+            results = dict(zip(dest_ids, pool.map(guarded, dest_ids)))
+
+        if events:
+            publish_events.emit_many(events)
+        published = [d for d in dest_ids if results[d].get("success")]
+        if published and update_published and not silent and metadata:
+            _send_overlay_prompt(published, metadata)
+
+        for dest_id, result in results.items():
+            if not result.get("success"):
+                warning(f"[publish_to_group] {dest_id} failed: {result.get('error')}")
+        return {"success": bool(published), "results": results}
+    except Exception as e:
+        error(f"Group publish failed: {e}")
+        return {"success": False, "error": str(e), "results": {}}
+    finally:
+        if temp_path is not None:
+            temp_path.unlink(missing_ok=True)
+
 # ─── overlay helper ────────────────────────────────────────────────────────
-def _send_overlay_prompt(screen_id: str, metadata: dict[str, Any]) -> None:
+def _send_overlay_prompt(screen_id: str | list[str], metadata: dict[str, Any]) -> None:
     """
-    Fire an overlay to the given screen with whatever fields we can find
-    in the metadata dict.  Missing keys are simply rendered blank.
+    Fire an overlay to the given screen (or screens, in one send) with
+    whatever fields we can find in the metadata dict.  Missing keys are
+    simply rendered blank.
     """
     from routes.display import send_overlay           # late import = no circular deps
-    dest = get_destination(screen_id)                 # already cached by _load_json_once
+    screens = [screen_id] if isinstance(screen_id, str) else list(screen_id)
 
     substitutions = {
         "PROMPT_TEXT"   : metadata.get("prompt", ""),
@@ -399,7 +531,7 @@ def _send_overlay_prompt(screen_id: str, metadata: dict[str, Any]) -> None:
 
     send_overlay(
         html="overlay_prompt.html.j2",
-        screens=[screen_id],
+        screens=screens,
         substitutions=substitutions,
         duration=30_000,        # 30 s
         clear=True
@@ -481,29 +613,26 @@ def _record_publish(bucket: str, filename: str, when: str, source_metadata: dict
             warning(f"[history] Failed to record new publish in history: {e}")
     
     # Always update the legacy published_meta for backward compatibility
-    meta = load_meta(bucket)
-    
-    # Merge with existing published_meta instead of overwriting
-    if "published_meta" not in meta:
-        meta["published_meta"] = {}
-    
-    # Update the current published image info without destroying history
-    meta["published_meta"]["filename"] = filename
-    meta["published_meta"]["published_at"] = when
-    meta["published_meta"]["raw_url"] = raw_url
-    meta["published_meta"]["thumbnail_url"] = thumbnail_url
-    
-    if source_metadata:
-        meta["published_meta"]["metadata"] = source_metadata
-    
+    with meta_transaction(bucket) as meta:
+        # Merge with existing published_meta instead of overwriting
+        if "published_meta" not in meta:
+            meta["published_meta"] = {}
+
+        # Update the current published image info without destroying history
+        meta["published_meta"]["filename"] = filename
+        meta["published_meta"]["published_at"] = when
+        meta["published_meta"]["raw_url"] = raw_url
+        meta["published_meta"]["thumbnail_url"] = thumbnail_url
+
+        if source_metadata:
+            meta["published_meta"]["metadata"] = source_metadata
+
     # When this is history navigation, don't touch the history fields
     # (they were already updated by the history manager)
     if not is_history_navigation:
         # This is a regular publish, so the history fields should be updated by record_new_publish above
         pass
-        
-    save_meta(bucket, meta)
-    
+
     base_output_dir = Path(bucket_dir).parent
     published_info_path = base_output_dir / f"{bucket}{extension}.json"
     
@@ -558,8 +687,17 @@ def _publish_to_destination(
     batch_id: str | None = None,
     update_published: bool = True,
     is_history_navigation: bool = False,
+    digest: str | None = None,
+    decoded_image=None,
+    events: list | None = None,
 ) -> dict:
-    """Internal helper for publish_to_destination."""
+    """
+    Internal helper for publish_to_destination.
+
+    publish_to_group passes the source's *digest* and *decoded_image* so
+    they're computed once for every destination, and an *events* list to
+    collect display notifications into instead of emitting them one by one.
+    """
     try:
         dest = get_destination(publish_destination_id)
 
@@ -617,25 +755,13 @@ def _publish_to_destination(
             display_path = base_output_dir / f"{dest['id']}{file_extension}"
         else:
             display_path = source_filepath
-            
             debug(f"Same-bucket publishing - source file is already in place at {display_path}")
-            
-            # Only copy to direct output path if we're updating the published pointer
-            if update_published:
-                direct_output_path = base_output_dir / f"{dest['id']}{file_extension}"
-                debug(f"Same-bucket publishing - also copying to direct output path: {direct_output_path}")
-                
-                try:
-                    shutil.copy2(source_filepath, direct_output_path)
-                    direct_output_path.touch()
-                except Exception as e:
-                    error(f"Failed to copy to direct output path: {e}")
         
-        # Only copy to display path if we're updating the published pointer
-        if update_published and source_filepath != display_path:
-            display_path.parent.mkdir(parents=True, exist_ok=True)
-            shutil.copy2(source_filepath, display_path)
-            display_path.touch()
+        # Only swap output/<dest>.<ext> if we're updating the published pointer:
+        # an atomic rename of a link to the content-addressed blob, no copy
+        if update_published:
+            digest = digest or hash_file(source_filepath)
+            publish_pointer.swap(dest['id'], source_filepath, file_extension, digest)
 
         effective_metadata = None
         
@@ -671,6 +797,19 @@ def _publish_to_destination(
                 is_history_navigation=is_history_navigation
             )
 
+            try:
+                output_file = base_output_dir / f"{dest['id']}{file_extension}"
+                variant = display_variants.render_for_publish(output_file, publish_destination_id, digest,
+                                                              decoded=decoded_image)
+                event = (publish_destination_id, output_file, digest,
+                         display_variants.url_for(variant) if variant else None)
+                if events is not None:
+                    events.append(event)
+                else:
+                    publish_events.emit(*event)
+            except OSError as e:
+                warning(f"Could not notify displays of publish to {publish_destination_id}: {e}")
+
             if not silent and effective_metadata:
                 _send_overlay_prompt(publish_destination_id, effective_metadata)
 
@@ -709,62 +848,61 @@ def get_published_info(publish_destination_id: str) -> dict:
         if bucket_meta_path and os.path.exists(bucket_meta_path):
             debug(f"Bucket meta exists, attempting to read")
             try:
-                with open(bucket_meta_path, 'r') as f:
-                    bucket_meta = json.load(f)
-                    debug(f"Bucket meta loaded successfully")
+                bucket_meta = read_meta(publish_destination_id)
+                debug(f"Bucket meta loaded successfully")
                     
-                    if "published_meta" in bucket_meta and bucket_meta["published_meta"]:
-                        published_meta = bucket_meta["published_meta"]
-                        published_file = published_meta.get("filename")
-                        published_at = published_meta.get("published_at", "")
-                        raw_url = published_meta.get("raw_url")
-                        thumbnail_url = published_meta.get("thumbnail_url")
+                if "published_meta" in bucket_meta and bucket_meta["published_meta"]:
+                    published_meta = bucket_meta["published_meta"]
+                    published_file = published_meta.get("filename")
+                    published_at = published_meta.get("published_at", "")
+                    raw_url = published_meta.get("raw_url")
+                    thumbnail_url = published_meta.get("thumbnail_url")
                         
-                        debug(f"Found published file in published_meta: {published_file}")
-                        debug(f"URLs from published_meta: raw_url={raw_url}, thumbnail_url={thumbnail_url}")
+                    debug(f"Found published file in published_meta: {published_file}")
+                    debug(f"URLs from published_meta: raw_url={raw_url}, thumbnail_url={thumbnail_url}")
                         
-                        from routes.bucketer import bucket_path as get_bucket_path
-                        bucket_dir = get_bucket_path(publish_destination_id)
-                        base_output_dir = Path(bucket_dir).parent
+                    from routes.bucketer import bucket_path as get_bucket_path
+                    bucket_dir = get_bucket_path(publish_destination_id)
+                    base_output_dir = Path(bucket_dir).parent
                         
-                        file_ext = Path(published_file).suffix if published_file else ".jpg"
+                    file_ext = Path(published_file).suffix if published_file else ".jpg"
                         
-                        published_info_path = base_output_dir / f"{publish_destination_id}{file_ext}.json"
-                        meta = {}
+                    published_info_path = base_output_dir / f"{publish_destination_id}{file_ext}.json"
+                    meta = {}
                         
-                        if published_info_path.exists():
-                            try:
-                                with open(published_info_path, 'r') as f:
-                                    meta = json.load(f)
-                                    debug(f"Using metadata from published info file at {published_info_path}")
-                            except Exception as e:
-                                debug(f"Error reading published info file: {e}")
+                    if published_info_path.exists():
+                        try:
+                            with open(published_info_path, 'r') as f:
+                                meta = json.load(f)
+                                debug(f"Using metadata from published info file at {published_info_path}")
+                        except Exception as e:
+                            debug(f"Error reading published info file: {e}")
                                 
-                                try:
-                                    published_source_path = bucket_dir / published_file
-                                    if published_source_path.exists():
-                                        source_sidecar = sidecar_path(published_source_path)
-                                        if source_sidecar.exists():
-                                            with open(source_sidecar, 'r') as f:
-                                                meta = json.load(f)
-                                                debug(f"Using metadata from source sidecar: {source_sidecar}")
-                                except Exception as nested_e:
-                                    debug(f"Error reading source sidecar: {nested_e}")
+                            try:
+                                published_source_path = bucket_dir / published_file
+                                if published_source_path.exists():
+                                    source_sidecar = sidecar_path(published_source_path)
+                                    if source_sidecar.exists():
+                                        with open(source_sidecar, 'r') as f:
+                                            meta = json.load(f)
+                                            debug(f"Using metadata from source sidecar: {source_sidecar}")
+                            except Exception as nested_e:
+                                debug(f"Error reading source sidecar: {nested_e}")
                         
-                        if not meta and "metadata" in published_meta:
-                            meta = published_meta.get("metadata", {})
-                            debug(f"Using metadata from published_meta")
+                    if not meta and "metadata" in published_meta:
+                        meta = dict(published_meta.get("metadata", {}))
+                        debug(f"Using metadata from published_meta")
                         
-                        return {
-                            "published": published_file,
-                            "published_at": published_at,
-                            "raw_url": raw_url,
-                            "thumbnail_url": thumbnail_url,
-                            "meta": meta
-                        }
+                    return {
+                        "published": published_file,
+                        "published_at": published_at,
+                        "raw_url": raw_url,
+                        "thumbnail_url": thumbnail_url,
+                        "meta": meta
+                    }
                     
-                    else:
-                        debug(f"No published_meta in bucket_meta or it's empty")
+                else:
+                    debug(f"No published_meta in bucket_meta or it's empty")
             except Exception as e:
                 error(f"Error reading bucket metadata for {publish_destination_id}: {e}")
         else:
@@ -816,8 +954,7 @@ def get_published_info(publish_destination_id: str) -> dict:
                 thumbnail_url = "/static/placeholder.jpg"
             
             try:
-                from routes.bucketer import load_meta
-                bucket_meta = load_meta(publish_destination_id)
+                bucket_meta = read_meta(publish_destination_id)
                 if "published_meta" in bucket_meta and bucket_meta["published_meta"]:
                     debug(f"Replacing raw_name with published_meta filename")
                     raw_name = bucket_meta["published_meta"]["filename"]
@@ -876,8 +1013,7 @@ def display_from_bucket(
             silent=silent
         )
 
-    from routes.bucket_api import load_meta
-    meta = load_meta(publish_destination_id)
+    meta = read_meta(publish_destination_id)
     favorites = meta.get("favorites", [])
     debug(f"Found {len(favorites)} favorites in bucket {publish_destination_id}")
     
@@ -889,36 +1025,9 @@ def display_from_bucket(
     current_image = published_info.get("published")
     debug(f"Current published image for {publish_destination_id}: {current_image}")
     
-    if mode == "Next" or mode == "Previous":
-        debug(f"{mode} mode - checking if current image {current_image} is in favorites")
-        
-        current_pos = -1
-        
-        if current_image in favorites:
-            current_pos = favorites.index(current_image)
-            debug(f"Found current image directly at position {current_pos}")
-        else:
-            for i, fav in enumerate(favorites):
-                if os.path.basename(fav) == current_image:
-                    current_pos = i
-                    debug(f"Found current image by basename at position {current_pos}")
-                    break
-        
-        if current_pos >= 0:
-            if mode == "Next":
-                next_pos = (current_pos + 1) % len(favorites)
-                filename = favorites[next_pos]
-                debug(f"Current image found at position {current_pos} in favorites. Next position is {next_pos}, filename: {filename}")
-            else:  # mode == "Previous"
-                prev_pos = (current_pos - 1) % len(favorites)
-                filename = favorites[prev_pos]
-                debug(f"Current image found at position {current_pos} in favorites. Previous position is {prev_pos}, filename: {filename}")
-        else:
-            filename = favorites[0]
-            debug(f"Current image not found in favorites. Using first favorite: {filename}")
-    else:  # mode == "Random"
-        filename = random.choice(favorites)
-        debug(f"Random mode - selected: {filename}")
+    # Indexed lookup / shuffle-bag draw; see routes/display_prefetch.py
+    filename = display_prefetch.choose(publish_destination_id, mode, favorites, current_image)
+    debug(f"{mode} mode - current image {current_image}, selected: {filename}")
 
     from routes.bucket_api import bucket_path
     image_path = bucket_path(publish_destination_id) / filename
@@ -931,9 +1040,12 @@ def display_from_bucket(
     result = publish_to_destination(
         source=image_path,
         publish_destination_id=publish_destination_id,
+        metadata=display_prefetch.metadata_for(publish_destination_id, filename),
         skip_bucket=True,
         silent=silent
     )
     
     debug(f"publish_to_destination result: {'success' if result.get('success') else 'failed'}")
+    if result.get("success"):
+        display_prefetch.schedule(publish_destination_id, filename)
     return result
@@ -237,8 +237,8 @@ def device_sync(publish_destination: str, debug_mode: bool = False, timeout: int
 
     # Check if we have any images to sync
     try:
-        from routes.bucketer import load_meta, bucket_path  # lazy import – heavy modules
-        meta = load_meta(publish_destination)
+        from routes.bucketer import read_meta, bucket_path  # lazy import – heavy modules
+        meta = read_meta(publish_destination)
         fav_set = set(meta.get("favorites", []))
         seq_raw = meta.get("sequence", [])
         filenames = seq_to_filenames(seq_raw)
@@ -264,8 +264,8 @@ def device_sync(publish_destination: str, debug_mode: bool = False, timeout: int
 
             # 1) Collect JPG favourites in bucket order --------------------
             try:
-                from routes.bucketer import load_meta, bucket_path  # lazy import – heavy modules
-                meta = load_meta(publish_destination)
+                from routes.bucketer import read_meta, bucket_path  # lazy import – heavy modules
+                meta = read_meta(publish_destination)
                 log_debug(f"Loaded meta: {meta}")
             except Exception as e:
                 error(f"[device_sync] Failed to load bucket meta: {e}")
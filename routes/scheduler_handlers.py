@@ -13,7 +13,7 @@ from routes.bucketer import purge_bucket as bucketer_purge_bucket, _append_to_bu
 import routes.openai
 from time import time
 import os
-from routes.publisher import publish_to_destination
+from routes.publisher import publish_to_destination, publish_to_group
 import uuid
 import traceback
 
@@ -1678,6 +1678,7 @@ def handle_publish(instruction, context, now, output, publish_destination):
             - source: Image path(s) or Jinja expression to publish
             - targets: List of destination IDs (default: current destination)
             - silent: Whether to suppress overlays (default: False)
+            - wait: Publish inline instead of through the background queue (default: False)
         context: The current context
         now: Current datetime
         output: List to append log messages to
@@ -1686,7 +1687,7 @@ def handle_publish(instruction, context, now, output, publish_destination):
     Returns:
         bool: False (don't unload the schedule)
     """
-    from routes.publisher import publish_to_destination
+    from routes import publish_queue
     
     # Get images from source
     source = instruction.get("source")
@@ -1712,6 +1713,8 @@ def handle_publish(instruction, context, now, output, publish_destination):
     
     # Get silent flag
     silent = instruction.get("silent", False)
+    # Queue by default so a slow download does not hold up the scheduler loop
+    wait = instruction.get("wait", False)
     
     # Validate we have images to publish
     if not images:
@@ -1726,31 +1729,61 @@ def handle_publish(instruction, context, now, output, publish_destination):
         msg += " (silent mode)"
     log_schedule(msg, publish_destination, now, output)
     
-    # Publish each image to each target
+    # Several targets: fetch and decode each image once and fan it out
     published_count = 0
-    for target in targets:
+    if len(targets) > 1:
         for image_path in images:
             try:
-                # Call publish_to_destination
-                result = publish_to_destination(
-                    source=image_path,
-                    publish_destination_id=target,
-                    silent=silent
-                )
-                
-                if result.get("success"):
+                if not wait:
+                    job = publish_queue.submit_group(image_path, targets, silent=silent)
                     published_count += 1
-                    debug(f"Published {image_path} to {target}")
-                else:
-                    warning(f"Failed to publish {image_path} to {target}: {result.get('error', 'Unknown error')}")
-                    
+                    debug(f"Queued {image_path} to {targets} as publish job {job.id}")
+                    continue
+
+                result = publish_to_group(source=image_path, targets=targets, silent=silent)
+                for target, target_result in result.get("results", {}).items():
+                    if target_result.get("success"):
+                        published_count += 1
+                        debug(f"Published {image_path} to {target}")
+                    else:
+                        warning(f"Failed to publish {image_path} to {target}: {target_result.get('error', 'Unknown error')}")
+                if not result.get("results"):
+                    warning(f"Failed to publish {image_path} to {targets}: {result.get('error', 'Unknown error')}")
+
             except Exception as e:
-                error_msg = f"Error publishing {image_path} to {target}: {str(e)}"
+                error_msg = f"Error publishing {image_path} to {targets}: {str(e)}"
                 log_schedule(error_msg, publish_destination, now, output)
                 error(f"Traceback: {traceback.format_exc()}")
+    else:
+        # Publish each image to each target
+        for target in targets:
+            for image_path in images:
+                try:
+                    if not wait:
+                        job = publish_queue.submit(image_path, target, silent=silent)
+                        published_count += 1
+                        debug(f"Queued {image_path} to {target} as publish job {job.id}")
+                        continue
+
+                    result = publish_to_destination(
+                        source=image_path,
+                        publish_destination_id=target,
+                        silent=silent
+                    )
+                
+                    if result.get("success"):
+                        published_count += 1
+                        debug(f"Published {image_path} to {target}")
+                    else:
+                        warning(f"Failed to publish {image_path} to {target}: {result.get('error', 'Unknown error')}")
+                    
+                except Exception as e:
+                    error_msg = f"Error publishing {image_path} to {target}: {str(e)}"
+                    log_schedule(error_msg, publish_destination, now, output)
+                    error(f"Traceback: {traceback.format_exc()}")
     
     # Log final result
-    success_msg = f"Successfully published {published_count} image(s)"
+    success_msg = f"Successfully {'published' if wait else 'queued'} {published_count} image(s)"
     log_schedule(success_msg, publish_destination, now, output)
     
     return False  # Don't unload the schedule
@@ -0,0 +1,58 @@
+"""
+seq_order.py – batch moves within a bucket sequence.
+
+The bucket's "sequence" list is the order: move-up, move-down and move-to
+each shift one item per request, so a multi-select drag used to cost one
+request and one bucket.json rewrite per item. move() places a whole
+selection in one pass over the list, and POST /buckets/<id>/reorder applies
+it inside a single meta_transaction.
+
+Entries are left exactly as they are (plain filenames or dicts).
+"""
+
+from __future__ import annotations
+
+from typing import Any, Iterable, List, Optional
+
+
+def _name(entry) -> str:
+    return entry["file"] if isinstance(entry, dict) else entry
+
+
+def move(seq: List[Any], filenames: Iterable[str], insert_after: Optional[str] = None,
+         insert_before: Optional[str] = None) -> int:
+    """
+    Move *filenames* (kept in the given order) to sit together after
+    *insert_after*, or before *insert_before*, or at the top if neither is
+    given. Returns the index of the first moved entry.
+
+    Raises KeyError for names not in the sequence and ValueError if the
+    anchor is one of the moved items.
+    """
+    names = list(dict.fromkeys(filenames))
+    moving = set(names)
+    if insert_after in moving or insert_before in moving:
+        raise ValueError("cannot anchor a move on an item being moved")
+
+    found, rest = {}, []
+    for entry in seq:
+        name = _name(entry)
+        if name in moving:
+            found.setdefault(name, entry)
+        else:
+            rest.append(entry)
+    missing = [n for n in names if n not in found]
+    if missing:
+        raise KeyError(missing[0])
+
+    anchor = insert_after if insert_after is not None else insert_before
+    if anchor is None:
+        at = 0
+    else:
+        at = next((i for i, e in enumerate(rest) if _name(e) == anchor), None)
+        if at is None:
+            raise KeyError(anchor)
+        if insert_after is not None:
+            at += 1
+    seq[:] = rest[:at] + [found[n] for n in names] + rest[at:]
+    return at
@@ -1,12 +1,15 @@
 import os
 import difflib
 import json
+import threading
+from collections import OrderedDict
+from functools import lru_cache
 from PIL import Image
 import io
 import base64
 from werkzeug.utils import secure_filename
 from werkzeug.datastructures import FileStorage
-import requests
+from routes import http_client
 from utils.logger import log_to_console, info, error, warning, debug, console_logs
 from io import BytesIO
 import re
@@ -17,6 +20,7 @@ from urllib.parse import urlencode, urlparse
 from pathlib import Path
 from flask import url_for
 from typing import Any
+import config
 
 # image processing
 from PIL import Image
@@ -219,6 +223,7 @@ def resolve_runtime_value(category, input_value, return_key="id", match_key=None
 def reset_cache():
     """Clear the cached JSON data."""
     _json_cache.clear()
+    invalidate_schema_subs()
 
 
 def encode_image_uploads(image_files, max_file_size_mb=5):
@@ -347,7 +352,7 @@ def encode_reference_urls(reference_urls, max_file_size_mb=5, bucket_id=None):
                     image = Image.open(BytesIO(image_data)).convert("RGB")
             else:
                 # For regular URLs, use requests
-                response = requests.get(url, timeout=10)
+                response = http_client.get(url, timeout=10)
                 response.raise_for_status()
                 
                 content_type = response.headers.get("Content-Type", "")
@@ -386,6 +391,48 @@ def encode_reference_urls(reference_urls, max_file_size_mb=5, bucket_id=None):
     return result
 
 
+def _tojson(val):
+    return json.dumps(val)
+
+
+# Shared Jinja environments: templates are compiled once and, with
+# auto_reload, recompiled only when their file's mtime changes.
+_file_envs = {}  # {template_dir: Environment}
+_inline_env = None
+_inline_templates = OrderedDict()  # {source: compiled Template}, most recent last
+_cache_lock = threading.Lock()
+
+
+def _file_env(template_dir: str) -> Environment:
+    with _cache_lock:
+        env = _file_envs.get(template_dir)
+        if env is None:
+            env = Environment(loader=FileSystemLoader(template_dir), auto_reload=True)
+            env.filters['tojson'] = _tojson
+            _file_envs[template_dir] = env
+        return env
+
+
+def _inline_template(source: str):
+    """Compiled template for an inline string, reused while it stays in the LRU."""
+    global _inline_env
+    with _cache_lock:
+        template = _inline_templates.get(source)
+        if template is not None:
+            _inline_templates.move_to_end(source)
+            return template
+        if _inline_env is None:
+            # Use a loader so {% include %} still works in string templates
+            _inline_env = Environment(loader=FileSystemLoader(SEARCH_PATHS), auto_reload=True)
+            _inline_env.filters['tojson'] = _tojson
+    template = _inline_env.from_string(source)
+    with _cache_lock:
+        _inline_templates[source] = template
+        while len(_inline_templates) > config.TEMPLATE_CACHE_MAX:
+            _inline_templates.popitem(last=False)
+    return template
+
+
 def dict_substitute(template_or_file: str, substitutions: dict = None) -> str:
     substitutions = substitutions or {}
     filepath = findfile(template_or_file)
@@ -394,11 +441,8 @@ def dict_substitute(template_or_file: str, substitutions: dict = None) -> str:
         template_name = os.path.basename(filepath)
         template_dir = os.path.dirname(filepath)
 
-        env = Environment(loader=FileSystemLoader(template_dir))
-        env.filters['tojson'] = lambda val: json.dumps(val)
-
         try:
-            template = env.get_template(template_name)
+            template = _file_env(template_dir).get_template(template_name)
             return template.render(substitutions)
         except TemplateNotFound:
             error(f"[dict_substitute] Template not found: {template_name}")
@@ -407,11 +451,8 @@ def dict_substitute(template_or_file: str, substitutions: dict = None) -> str:
             error(f"[dict_substitute] Render error: {e}")
             return ""
     else:
-        # NEW: Use a loader so {% include %} still works in string templates
-        env = Environment(loader=FileSystemLoader(SEARCH_PATHS))
-        env.filters['tojson'] = lambda val: json.dumps(val)
         try:
-            template = env.from_string(template_or_file)
+            template = _inline_template(template_or_file)
             return template.render(substitutions)
         except Exception as e:
             error(f"[dict_substitute] Inline render error: {e}")
@@ -424,7 +465,62 @@ def dict_substitute(template_or_file: str, substitutions: dict = None) -> str:
 # Dynamic schema substitutions from config
 # ------------------------------------------------------------------------------
     
+_schema_subs_cache = {"sources": None, "subs": None, "version": 0}
+
+
+def invalidate_schema_subs():
+    """Drop the cached build_schema_subs() result; the next call rebuilds it."""
+    with _cache_lock:
+        _schema_subs_cache["sources"] = None
+
+
+def _schema_sources():
+    """What build_schema_subs() depends on: the loaded JSON objects and the reasoners dir mtime."""
+    try:
+        reasoners_mtime = os.path.getmtime(os.path.join(SCRIPT_DIR, "data", "reasoners"))
+    except OSError:
+        reasoners_mtime = None
+    return (
+        _load_json_once("workflow", "workflows.json"),
+        _load_json_once("refiner", "refiners.json"),
+        _load_json_once("destination", "publish-destinations.json"),
+        reasoners_mtime,
+    )
+
+
+def _same_sources(a, b) -> bool:
+    # _load_json_once hands back the same object until its file changes
+    return a is not None and all(x is y for x, y in zip(a[:3], b[:3])) and a[3] == b[3]
+
+
+def schema_subs_version() -> int:
+    """Bumped whenever build_schema_subs() rebuilds, so callers can key caches on it."""
+    return _schema_subs_cache["version"]
+
+
 def build_schema_subs():
+    """
+    Cached _build_schema_subs(): rebuilt only when one of the config JSON
+    files or the reasoners directory changes on disk, or after
+    invalidate_schema_subs(). Returns a shallow copy, so callers can add
+    their own keys.
+    """
+    try:
+        sources = _schema_sources()
+    except Exception:
+        return _build_schema_subs()  # logs the failure and returns what it could build
+
+    with _cache_lock:
+        if _same_sources(_schema_subs_cache["sources"], sources):
+            return dict(_schema_subs_cache["subs"])
+
+    subs = _build_schema_subs()
+    with _cache_lock:
+        _schema_subs_cache.update(sources=sources, subs=subs, version=_schema_subs_cache["version"] + 1)
+    return dict(subs)
+
+
+def _build_schema_subs():
     """
     Dynamically construct a substitutions dictionary for Jinja2 templates
     from the contents of your core config JSON files. Includes enum values,
@@ -763,14 +859,19 @@ def get_qr(publish=None, run=False, refiner=None, prompt=None):
 
     full_url = f"{base_url}?{query_string}" if query_string else base_url
 
-    # Generate QR code image and encode as base64
+    return _qr_data_uri(full_url)
+
+
+@lru_cache(maxsize=config.QR_CACHE_MAX)
+def _qr_data_uri(payload: str) -> str:
+    """PNG QR code for *payload* as a data URI, memoised by payload."""
     qr = qrcode.QRCode(
         version=None,
         error_correction=qrcode.constants.ERROR_CORRECT_M,
         box_size=10,
         border=3
     )
-    qr.add_data(full_url)
+    qr.add_data(payload)
     qr.make(fit=True)
 
     img = qr.make_image(fill_color="black", back_color="white")
@@ -785,13 +886,9 @@ def get_qr(publish=None, run=False, refiner=None, prompt=None):
 
 def save_video_with_metadata(url: str, img_metadata: dict, save_path: Path):
     # Download the video
-    response = requests.get(url, stream=True)
-    response.raise_for_status()
-
     save_path.parent.mkdir(parents=True, exist_ok=True)
-    with open(save_path, "wb") as f:
-        for chunk in response.iter_content(chunk_size=8192):
-            f.write(chunk)
+    download = http_client.download(url, directory=save_path.parent)
+    os.replace(download.path, save_path)
 
     info(f"Saved MP4 to {save_path}")
 
@@ -805,21 +902,40 @@ def save_video_with_metadata(url: str, img_metadata: dict, save_path: Path):
     info(f"Saved metadata to {metadata_path}")
 
 def save_jpeg_with_metadata(url: str, img_metadata: dict, save_path: Path):
-    response = requests.get(url)
-    response.raise_for_status()
-    img = Image.open(BytesIO(response.content)).convert("RGB")
-
-    # Build EXIF with JSON-formatted metadata
-    exif_dict = {"0th": {}, "Exif": {}, "GPS": {}, "1st": {}, "thumbnail": None}
-
-    comment = json.dumps(img_metadata, ensure_ascii=False, indent=None)
-    user_comment = piexif.helper.UserComment.dump(comment, encoding="unicode")
-    exif_dict["Exif"][piexif.ExifIFD.UserComment] = user_comment
+    """
+    Download *url* straight to disk and splice the metadata in as EXIF
+    without re-encoding (see routes/metadata_embed.py). Only when the
+    download's format doesn't match *save_path* (e.g. a PNG saved as .jpg)
+    is the image decoded and re-encoded.
+    """
+    from routes import metadata_embed
 
-    exif_bytes = piexif.dump(exif_dict)
     save_path.parent.mkdir(parents=True, exist_ok=True)
-    img.save(save_path, "JPEG", exif=exif_bytes, quality=95)
-    info(f"Saved JPEG with metadata to {save_path}")
+    tmp_path = http_client.download(url, directory=save_path.parent).path
+    try:
+        exif_bytes = metadata_embed.build_exif(img_metadata)
+        with open(tmp_path, "rb") as f:
+            fmt = metadata_embed.sniff(f.read(16))
+        wanted = {".jpg": "jpeg", ".jpeg": "jpeg", ".png": "png", ".webp": "webp"}.get(save_path.suffix.lower())
+
+        if fmt is not None and fmt == wanted:
+            out_tmp = save_path.with_name(f".{save_path.name}.tmp")
+            try:
+                metadata_embed.embed_exif(tmp_path, out_tmp, exif_bytes)
+            except metadata_embed.MetadataTooLarge as e:
+                # Keep the image as downloaded; the metadata goes to the sidecar only
+                warning(f"{e}; saving {save_path.name} without embedded metadata")
+                os.replace(tmp_path, out_tmp)
+                sidecar_path(save_path).write_text(
+                    json.dumps(img_metadata, ensure_ascii=False, indent=2), encoding="utf-8")
+            os.replace(out_tmp, save_path)
+            info(f"Saved {fmt.upper()} with metadata to {save_path}")
+        else:
+            img = Image.open(tmp_path).convert("RGB")
+            img.save(save_path, "JPEG", exif=exif_bytes, quality=95)
+            info(f"Saved JPEG with metadata to {save_path} (re-encoded from {fmt or 'unknown format'})")
+    finally:
+        tmp_path.unlink(missing_ok=True)
 
 # THESE NEED TESTING
 
@@ -847,14 +963,9 @@ def _extract_exif_json(img_path: Path) -> dict[str, Any] | None:
 
 def _extract_mp4_comment_json(video_path: Path) -> dict[str, Any] | None:
     """Extract comment metadata from an MP4 file."""
+    from routes import mp4meta
     try:
-        cmd = ["ffprobe", "-v", "quiet", "-print_format", "json", "-show_format", str(video_path)]
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        if result.returncode != 0:
-            return None
-
-        data = json.loads(result.stdout)
-        comment = data.get("format", {}).get("tags", {}).get("comment")
+        comment = mp4meta.comment(video_path)
         if not comment:
             return None
 
@@ -0,0 +1,193 @@
+"""
+video_normalize.py – make published MP4s start playing straight away.
+
+Workflow outputs often have their moov atom (the sample index) after the
+media data, so a display browser or TV has to fetch most of the file before
+it can show the first frame; codecs and bitrates also vary by workflow.
+
+    inspect(path) -> {"fast_start": False, "codec": "avc1", "kbps": 14200}
+
+    • faststart(src, dst) moves moov in front of mdat – a pure remux in
+      Python, no re-encode: the moov box is copied verbatim apart from its
+      stco/co64 chunk offsets, which shift by the moov size. Falls back to
+      "ffmpeg -c copy -movflags +faststart" if the offsets would overflow
+      32 bits or the moov is compressed
+    • transcode(src, dst, max_kbps) re-encodes to H.264/AAC with local
+      ffmpeg, capped at max_kbps, fast-start and with the metadata tags kept
+
+Both write *dst* only; choosing what a destination needs and caching the
+result by source hash is display_variants' job. ffmpeg is optional: without
+it, videos are only remuxed.
+"""
+
+from __future__ import annotations
+
+import io
+import shutil
+import struct
+import subprocess
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
+
+import config
+from routes import mp4meta
+from routes.mp4meta import _iter_boxes
+from utils.logger import debug, warning
+
+COPY_CHUNK = 1024 * 1024
+
+# moov children that hold (or lead to) the chunk offset tables
+_OFFSET_CONTAINERS = {b"trak", b"mdia", b"minf", b"stbl"}
+
+_warned_no_ffmpeg = False
+
+
+def _top_level(f: BinaryIO, size: int) -> List[Tuple[bytes, int, int]]:
+    """(type, box_start, box_end) for each top-level box."""
+    boxes, pos = [], 0
+    for box_type, _, end in _iter_boxes(f, 0, size):
+        boxes.append((box_type, pos, end))
+        pos = end
+    return boxes
+
+
+def _layout(f: BinaryIO, size: int) -> Optional[Tuple[List[Tuple[bytes, int, int]], int, Optional[int]]]:
+    """(boxes, index of moov, index of the first mdat) or None if there is no moov."""
+    boxes = _top_level(f, size)
+    types = [t for t, _, _ in boxes]
+    if b"moov" not in types:
+        return None
+    mdat = types.index(b"mdat") if b"mdat" in types else None
+    return boxes, types.index(b"moov"), mdat
+
+
+def inspect(path: Path) -> Optional[Dict[str, Any]]:
+    """Fast-start state, codec and overall bitrate of an MP4, or None if it isn't one."""
+    path = Path(path)
+    try:
+        size = path.stat().st_size
+        with open(path, "rb") as f:
+            layout = _layout(f, size)
+    except OSError:
+        return None
+    if layout is None:
+        return None
+    boxes, moov, mdat = layout
+    fragmented = any(t == b"moof" for t, _, _ in boxes)
+    meta = mp4meta.probe(path) or {}
+    duration = meta.get("duration") or 0
+    return {
+        "fast_start": fragmented or mdat is None or moov < mdat,
+        "codec": meta.get("codec"),
+        "kbps": int(size * 8 / duration / 1000) if duration else 0,
+    }
+
+
+def _shift_offsets(f: BinaryIO, moov: bytearray, start: int, end: int,
+                   lo: int, hi: int, delta: int) -> bool:
+    """
+    Add *delta* to every chunk offset in [lo, hi) under moov[start:end]
+    (*f* reads the same bytes). False if one no longer fits in stco.
+    """
+    for box_type, p0, p1 in _iter_boxes(f, start, end):
+        if box_type in _OFFSET_CONTAINERS:
+            if not _shift_offsets(f, moov, p0, p1, lo, hi, delta):
+                return False
+        elif box_type in (b"stco", b"co64"):
+            fmt, width = (">I", 4) if box_type == b"stco" else (">Q", 8)
+            count = struct.unpack_from(">I", moov, p0 + 4)[0]
+            for pos in range(p0 + 8, min(p0 + 8 + count * width, p1), width):
+                offset = struct.unpack_from(fmt, moov, pos)[0]
+                if lo <= offset < hi:
+                    offset += delta
+                    if width == 4 and offset > 0xFFFFFFFF:
+                        return False
+                    struct.pack_into(fmt, moov, pos, offset)
+    return True
+
+
+def _copy_range(src: BinaryIO, dst: BinaryIO, start: int, end: int):
+    src.seek(start)
+    remaining = end - start
+    while remaining > 0:
+        chunk = src.read(min(COPY_CHUNK, remaining))
+        if not chunk:
+            break
+        dst.write(chunk)
+        remaining -= len(chunk)
+
+
+def _remux(src: Path, dst: Path) -> bool:
+    size = src.stat().st_size
+    with open(src, "rb") as f:
+        layout = _layout(f, size)
+        if layout is None:
+            return False
+        boxes, moov_index, mdat_index = layout
+        if mdat_index is None or moov_index < mdat_index:
+            return False
+        _, moov_start, moov_end = boxes[moov_index]
+        f.seek(moov_start)
+        moov = bytearray(f.read(moov_end - moov_start))
+        if b"cmov" in moov:
+            return False
+        insert_at = boxes[mdat_index][1]
+        # Everything from the first mdat up to the old moov moves down by len(moov)
+        header = 16 if struct.unpack_from(">I", moov)[0] == 1 else 8
+        if not _shift_offsets(io.BytesIO(bytes(moov)), moov, header, len(moov),
+                              insert_at, moov_start, len(moov)):
+            return False
+        with open(dst, "wb") as out:
+            _copy_range(f, out, 0, insert_at)
+            out.write(moov)
+            _copy_range(f, out, insert_at, moov_start)
+            _copy_range(f, out, moov_end, size)
+    return True
+
+
+def ffmpeg() -> Optional[str]:
+    """Path of the local ffmpeg, or None (warned about once)."""
+    global _warned_no_ffmpeg
+    path = shutil.which(config.FFMPEG_PATH)
+    if path is None and not _warned_no_ffmpeg:
+        _warned_no_ffmpeg = True
+        warning(f"[video] {config.FFMPEG_PATH} not found; videos are only remuxed, not transcoded")
+    return path
+
+
+def _run_ffmpeg(src: Path, dst: Path, codec_args: List[str]) -> bool:
+    binary = ffmpeg()
+    if binary is None:
+        return False
+    cmd = [binary, "-nostdin", "-loglevel", "error", "-y", "-i", str(src),
+           "-map_metadata", "0", *codec_args,
+           "-movflags", "+faststart+use_metadata_tags", "-f", "mp4", str(dst)]
+    try:
+        subprocess.run(cmd, check=True, capture_output=True, timeout=config.VIDEO_TRANSCODE_TIMEOUT_S)
+    except subprocess.CalledProcessError as e:
+        warning(f"[video] ffmpeg failed on {src.name}: {e.stderr.decode(errors='replace').strip()[-300:]}")
+        return False
+    except subprocess.TimeoutExpired:
+        warning(f"[video] ffmpeg timed out on {src.name}")
+        return False
+    return True
+
+
+def faststart(src: Path, dst: Path) -> bool:
+    """Write *src* to *dst* with moov first, without re-encoding. False if that wasn't possible."""
+    if _remux(Path(src), Path(dst)):
+        debug(f"[video] Remuxed {Path(src).name} for fast start")
+        return True
+    return _run_ffmpeg(Path(src), Path(dst), ["-c", "copy"])
+
+
+def transcode(src: Path, dst: Path, max_kbps: Optional[int]) -> bool:
+    """Re-encode *src* to fast-start H.264/AAC at no more than *max_kbps* (if given)."""
+    rate = (["-b:v", f"{max_kbps}k", "-maxrate", f"{max_kbps}k", "-bufsize", f"{2 * max_kbps}k"]
+            if max_kbps else ["-crf", "23"])
+    args = ["-c:v", "libx264", "-preset", config.VIDEO_TRANSCODE_PRESET, "-pix_fmt", "yuv420p",
+            *rate, "-c:a", "aac", "-b:a", "128k"]
+    if not _run_ffmpeg(Path(src), Path(dst), args):
+        return False
+    debug(f"[video] Transcoded {Path(src).name} at {max_kbps or 'source'} kbps")
+    return True
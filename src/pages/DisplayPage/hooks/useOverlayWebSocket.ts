@@ -1,5 +1,7 @@
 // src/pages/DisplayPage/hooks/useOverlayWebSocket.ts
-import { useEffect } from "react";
+import { useEffect, useRef } from "react";
+import type { PublishEvent } from "@/utils/api";
+import type { PublishChannel } from "./usePublishEvents";
 
 const WS_HOST = import.meta.env.VITE_WS_HOST;
 
@@ -28,24 +30,49 @@ function generateId(): string {
 
 export default function useOverlayWebSocket(
   screenId: string | undefined,
-  setOverlays: React.Dispatch<React.SetStateAction<Overlay[]>>
+  setOverlays: React.Dispatch<React.SetStateAction<Overlay[]>>,
+  publish?: PublishChannel
 ) {
+  const publishRef = useRef(publish);
+  publishRef.current = publish;
+
   useEffect(() => {
     if (!screenId) return;
 
     let socket: WebSocket | null = null;
+    let closed = false;
     let reconnectAttempts = 0;
     let reconnectTimeout: ReturnType<typeof setTimeout>;
 
     const connect = () => {
-      socket = new WebSocket(WS_HOST);
+      if (closed) return;
+      try {
+        socket = new WebSocket(WS_HOST);
+      } catch (err) {
+        console.error("🔴 WebSocket unavailable:", err);
+        publishRef.current?.onSocketState(false);
+        reconnectAttempts++;
+        reconnectTimeout = setTimeout(connect, Math.min(10000, 1000 * 2 ** reconnectAttempts));
+        return;
+      }
 
       socket.onopen = () => {
         reconnectAttempts = 0;
         console.log("🟢 WebSocket connected to", WS_HOST);
+        // Only this screen's (and its groups') overlays, plus unaddressed ones;
+        // "since" gets us any publish we missed while disconnected
+        const publishChannel = publishRef.current;
+        socket?.send(JSON.stringify({
+          type: "subscribe",
+          topics: [screenId],
+          ...(publishChannel ? { since: { [screenId]: publishChannel.since() } } : {}),
+        }));
+        publishChannel?.onSocketState(true);
       };
 
       socket.onclose = () => {
+        if (closed) return;
+        publishRef.current?.onSocketState(false);
         console.warn("🔌 WebSocket closed, attempting to reconnect...");
         reconnectAttempts++;
         const delay = Math.min(10000, 1000 * 2 ** reconnectAttempts);
@@ -60,7 +87,11 @@ export default function useOverlayWebSocket(
       socket.onmessage = (event) => {
         console.log("📬 WS message received:", event.data);
         try {
-          const msg: OverlayMessage = JSON.parse(event.data);
+          const msg: OverlayMessage & { type?: string } = JSON.parse(event.data);
+          if (msg.type === "published") {
+            publishRef.current?.onPublished(msg as unknown as PublishEvent);
+            return;
+          }
           if (msg.screens && msg.screens.length > 0 && !msg.screens.includes(screenId)) {
             console.log(`🛑 Message not for this screen: ${screenId}`);
             return;
@@ -108,6 +139,7 @@ export default function useOverlayWebSocket(
     connect();
 
     return () => {
+      closed = true;
       socket?.close();
       clearTimeout(reconnectTimeout);
     };
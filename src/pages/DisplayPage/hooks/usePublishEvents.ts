@@ -0,0 +1,87 @@
+// src/pages/DisplayPage/hooks/usePublishEvents.ts
+import { useEffect, useMemo, useRef, useState } from "react";
+import apiService, { PublishEvent } from "@/utils/api";
+
+/**
+ * What useOverlayWebSocket needs to carry publish events on its socket:
+ * the last version seen (sent with "subscribe" so missed events are
+ * replayed), where to hand "published" messages, and whether the socket is
+ * up (long-polling covers the gaps).
+ */
+export interface PublishChannel {
+  since: () => number;
+  onPublished: (event: PublishEvent) => void;
+  onSocketState: (open: boolean) => void;
+}
+
+/**
+ * Follows what is published to a screen. The server pushes "published"
+ * events over the display's overlay WebSocket (see PublishChannel); while
+ * that socket is down we long-poll the publish events endpoint instead.
+ */
+export default function usePublishEvents(screenId: string | undefined) {
+  const [currentSrc, setCurrentSrc] = useState<string | null>(null);
+  const [videoKey, setVideoKey] = useState<string>("initial");
+  const [lastModified, setLastModified] = useState<number>(0);
+  const [fileType, setFileType] = useState<string | null>(null);
+  const [fileName, setFileName] = useState<string | null>(null);
+  const versionRef = useRef<number>(0);
+  const socketOpenRef = useRef<boolean>(false);
+  const startPollRef = useRef<() => void>(() => {});
+
+  const apply = (event: PublishEvent) => {
+    if (event.type !== "published" || event.dest !== screenId) return;
+    if (event.version <= versionRef.current) return;
+    versionRef.current = event.version;
+    const name = event.url.split("?")[0].split("/").pop() || null;
+    setFileName(name);
+    setFileType(name ? name.split(".").pop() || null : null);
+    setLastModified(event.version);
+    setCurrentSrc(event.url);
+    setVideoKey(`${Date.now()}`);
+  };
+  const applyRef = useRef(apply);
+  applyRef.current = apply;
+
+  useEffect(() => {
+    if (!screenId) return;
+
+    let cancelled = false;
+    let polling = false;
+    const abort = new AbortController();
+
+    const longPoll = async () => {
+      if (polling) return;
+      polling = true;
+      while (!cancelled && !socketOpenRef.current) {
+        try {
+          const event = await apiService.waitForPublish(screenId, versionRef.current, abort.signal);
+          if (event) applyRef.current(event);
+        } catch (err) {
+          if (cancelled) break;
+          console.warn("Publish long-poll failed, retrying:", err);
+          await new Promise((resolve) => setTimeout(resolve, 5000));
+        }
+      }
+      polling = false;
+    };
+    startPollRef.current = longPoll;
+
+    return () => {
+      cancelled = true;
+      abort.abort();
+      startPollRef.current = () => {};
+    };
+  }, [screenId]);
+
+  const channel = useMemo<PublishChannel>(() => ({
+    since: () => versionRef.current,
+    onPublished: (event) => applyRef.current(event),
+    onSocketState: (open) => {
+      socketOpenRef.current = open;
+      if (!open) startPollRef.current();
+    },
+  }), []);
+
+  return { currentSrc, videoKey, lastModified, fileType, fileName, channel };
+}
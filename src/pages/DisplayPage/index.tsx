@@ -1,7 +1,6 @@
 import { useEffect, useRef, useState } from "react";
 import { useParams, useSearchParams, useNavigate } from "react-router-dom";
-import useBaseFileName from "./hooks/useBaseFileName";
-import useFilePolling from "./hooks/useFilePolling";
+import usePublishEvents from "./hooks/usePublishEvents";
 import { MediaDisplay } from "./MediaDisplay";
 import { OverlayContainer } from "./OverlayContainer";
 import useOverlayWebSocket from "./hooks/useOverlayWebSocket";
@@ -15,9 +14,7 @@ export default function DisplayPage() {
   const { screenId } = useParams();
   const [searchParams] = useSearchParams();
   const navigate = useNavigate();
-  const baseFileName = useBaseFileName(screenId);
-  const filePolling = useFilePolling(baseFileName);
-  const { currentSrc, videoKey: pollingVideoKey, lastModified, fileType, fileName } = filePolling;
+  const { currentSrc, videoKey: pollingVideoKey, lastModified, fileType, fileName, channel: publishChannel } = usePublishEvents(screenId);
 
   const [videoKey, setVideoKey] = useState(pollingVideoKey);
   const [overlays, setOverlays] = useState([]);
@@ -34,7 +31,7 @@ export default function DisplayPage() {
   const [nextEvent, setNextEvent] = useState<any>(null);
   const nextEventIntervalRef = useRef<NodeJS.Timeout | null>(null);
 
-  useOverlayWebSocket(screenId, setOverlays);
+  useOverlayWebSocket(screenId, setOverlays, publishChannel);
 
   // Check for nomask parameter
   const noMask = searchParams.has('nomask');
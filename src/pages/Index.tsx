@@ -503,6 +503,8 @@ const Index = () => {
       ws.onopen = () => {
         console.log('WebSocket connection established');
         setWsConnected(true);
+        // Messages addressed to the index page, plus unaddressed ones
+        ws.send(JSON.stringify({ type: 'subscribe', topics: ['index'] }));
         addConsoleLog({
           type: 'success',
           message: 'WebSocket connection established'
@@ -50,6 +50,18 @@ export interface PublishDestination {
   groups?: string[];
 }
 
+// Pushed over the WebSocket relay (or returned by the long-poll endpoint) when a destination publishes
+export interface PublishEvent {
+  type: 'published';
+  dest: string;
+  screens: string[];
+  version: number;
+  url: string;
+  hash: string;
+  media_type: 'image' | 'video';
+  published_at: string;
+}
+
 // Type for image generation params
 interface GenerateImageParams {
   prompt: string;
@@ -1385,17 +1397,32 @@ export class Api {
     if (days !== undefined) {
       url.searchParams.append('days', days.toString());
     }
-    
+    // Large buckets take longer than an HTTP request should; run as a job and poll
+    url.searchParams.append('background', 'true');
+
     const response = await fetch(url.toString(), {
       method: 'DELETE',
     });
-    
+
     if (!response.ok) {
       const errorText = await response.text();
       throw new Error(`Failed to purge bucket: ${errorText}`);
     }
-    
-    const result = await response.json();
+
+    let job = await response.json();
+    while (job.state === 'queued' || job.state === 'running') {
+      await new Promise(resolve => setTimeout(resolve, 1000));
+      const poll = await fetch(`${this.apiUrl}/buckets/purge-jobs/${job.job_id}`);
+      if (!poll.ok) {
+        throw new Error(`Failed to check purge progress: ${poll.statusText}`);
+      }
+      job = await poll.json();
+    }
+    if (job.state === 'error') {
+      throw new Error(job.error || 'Failed to purge bucket');
+    }
+
+    const result = job.result;
     if (result.status !== 'purged') {
       throw new Error(result.error || 'Failed to purge bucket');
     }
@@ -1460,6 +1487,45 @@ export class Api {
     return await response.json();
   }
 
+  // Move several images (multi-select) so they sit together after targetFilename (null = top)
+  async reorderInBucket(
+    bucketId: string,
+    filenames: string[],
+    targetFilename: string | null = null
+  ): Promise<{ status: string; index: number; moved: string[] }> {
+    const response = await fetch(`${this.apiUrl}/buckets/${bucketId}/reorder`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify({ filenames, insert_after: targetFilename }),
+    });
+    if (!response.ok) {
+      throw new Error(`Failed to reorder images: ${response.statusText}`);
+    }
+    return await response.json();
+  }
+
+  // Long-poll for the next publish to a destination (fallback when the WebSocket relay is unavailable).
+  // Resolves with the "published" event, or null if nothing newer than `since` arrived before the timeout.
+  async waitForPublish(
+    destinationId: string,
+    since: number = 0,
+    signal?: AbortSignal
+  ): Promise<PublishEvent | null> {
+    const response = await fetch(
+      `${this.apiUrl}/publish/events/${encodeURIComponent(destinationId)}?since=${since}`,
+      { signal }
+    );
+    if (response.status === 204) {
+      return null;
+    }
+    if (!response.ok) {
+      throw new Error(`Failed to wait for publish: ${response.statusText}`);
+    }
+    return await response.json();
+  }
+
   // File operations - for use with scheduler scripts and config files
   async listFiles(directory: string): Promise<string[]> {
     if (this.mockMode) {
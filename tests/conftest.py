@@ -356,4 +356,22 @@ def test_schedule():
                 ]
             }
         ]
-    } 
\ No newline at end of file
+    } 
+
+# -----------------------------------------------------------------------------
+# Output directory: buckets, blobs and publish events under tmp_path
+# -----------------------------------------------------------------------------
+
+@pytest.fixture
+def output(tmp_path, monkeypatch):
+    """Point buckets and the blob store at *tmp_path* and start with no publish
+    events. Test modules that need more (destinations, caches) extend it with
+    their own ``output`` fixture."""
+    from routes import blobstore, bucketer, publish_events, publisher
+
+    monkeypatch.setattr(bucketer, "bucket_path", lambda name: tmp_path / name)
+    monkeypatch.setattr(publisher, "bucket_path", bucketer.bucket_path)
+    monkeypatch.setattr(blobstore, "BLOB_ROOT", tmp_path / "_blobs")
+    monkeypatch.setattr(publish_events, "_latest", {})
+    monkeypatch.setattr(publish_events, "_listeners", {})
+    return tmp_path
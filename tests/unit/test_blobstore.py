@@ -0,0 +1,101 @@
+"""Unit tests for the content-addressed bucket blob store (routes/blobstore.py)."""
+
+import os
+
+import pytest
+
+import config
+from routes import blobstore
+
+
+@pytest.fixture
+def store_root(tmp_path, monkeypatch):
+    monkeypatch.setattr(blobstore, "BLOB_ROOT", tmp_path / "_blobs")
+    monkeypatch.setattr(config, "BUCKET_DEDUP_ENABLED", True)
+    return tmp_path
+
+
+def test_store_copies_when_disabled(tmp_path, monkeypatch):
+    monkeypatch.setattr(blobstore, "BLOB_ROOT", tmp_path / "_blobs")
+    monkeypatch.setattr(config, "BUCKET_DEDUP_ENABLED", False)
+    src = tmp_path / "a.jpg"
+    src.write_bytes(b"image-bytes")
+    dst = tmp_path / "b.jpg"
+
+    blobstore.store(src, dst)
+
+    assert dst.read_bytes() == b"image-bytes"
+    assert not os.path.samefile(src, dst)
+    assert not (tmp_path / "_blobs").exists()
+
+
+def test_identical_content_shares_one_blob(store_root):
+    (store_root / "bucket_a").mkdir()
+    (store_root / "bucket_b").mkdir()
+    src = store_root / "source.jpg"
+    src.write_bytes(b"same content")
+
+    a = blobstore.store(src, store_root / "bucket_a" / "one.jpg")
+    b = blobstore.store(src, store_root / "bucket_b" / "two.jpg")
+
+    blob = blobstore.blob_path(blobstore.hash_file(src), ".jpg")
+    assert blob.exists()
+    assert os.path.samefile(a, b)
+    assert os.path.samefile(a, blob)
+
+
+def test_release_removes_blob_with_last_reference(store_root):
+    src = store_root / "source.mp4"
+    src.write_bytes(b"video")
+    dst = blobstore.store(src, store_root / "copy.mp4")
+    blob = blobstore.blob_path(blobstore.hash_file(dst), ".mp4")
+
+    blobstore.release(dst)
+
+    assert not dst.exists()
+    assert not blob.exists()
+
+
+def test_release_keeps_blob_still_in_use(store_root):
+    src = store_root / "source.jpg"
+    src.write_bytes(b"shared")
+    first = blobstore.store(src, store_root / "first.jpg")
+    second = blobstore.store(src, store_root / "second.jpg")
+    src.unlink()
+
+    blobstore.release(first)
+
+    assert second.read_bytes() == b"shared"
+    assert blobstore.blob_path(blobstore.hash_file(second), ".jpg").exists()
+
+
+def test_collect_garbage_sweeps_orphans(store_root):
+    src = store_root / "source.jpg"
+    src.write_bytes(b"orphan")
+    blob = blobstore.ingest(src)
+    assert not os.path.samefile(src, blob)    # sources are copied in, never linked
+
+    result = blobstore.collect_garbage()
+
+    assert result["removed"] == 1
+    assert result["bytes_freed"] == len(b"orphan")
+    assert not blob.exists()
+
+
+def test_store_reingests_a_blob_collected_before_linking(store_root, monkeypatch):
+    src = store_root / "source.jpg"
+    src.write_bytes(b"racy")
+    real_ingest = blobstore.ingest
+
+    def ingest_then_collect(path, digest=None):
+        blob = real_ingest(path, digest)
+        if not hasattr(ingest_then_collect, "done"):
+            ingest_then_collect.done = True
+            blobstore.collect_garbage()               # a purge finishing in between
+        return blob
+
+    monkeypatch.setattr(blobstore, "ingest", ingest_then_collect)
+    dst = blobstore.store(src, store_root / "kept.jpg")
+
+    assert dst.read_bytes() == b"racy"
+    assert os.path.samefile(dst, blobstore.blob_path(blobstore.hash_file(src), ".jpg"))
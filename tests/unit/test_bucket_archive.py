@@ -0,0 +1,126 @@
+"""Unit tests for the cold-tier bucket archive (routes/bucket_archive.py)."""
+
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from routes import bucketer, bucket_archive
+
+
+@pytest.fixture
+def bucket(tmp_path, monkeypatch):
+    monkeypatch.setattr(bucketer, "bucket_path", lambda name: tmp_path / name)
+    monkeypatch.setattr(bucketer, "meta_path", lambda name: tmp_path / name / "bucket.json")
+    bucketer._meta_cache.clear()
+    bdir = tmp_path / "screen"
+    (bdir / "thumbnails").mkdir(parents=True)
+    old = time.time() - 40 * 86400
+    names = ["1.jpg", "2.jpg", "3.jpg", "4.jpg", "5.jpg"]
+    for i, name in enumerate(names):
+        (bdir / name).write_bytes(f"image-{i}".encode())
+        (bdir / f"{name}.json").write_text(json.dumps({"prompt": f"a cat number {i}"}))
+        (bdir / "thumbnails" / f"{name}.jpg").write_bytes(b"thumb")
+        if i < 3:
+            os.utime(bdir / name, (old, old))
+    bucketer.save_meta("screen", {
+        "sequence": [{"file": "1.jpg", "batchId": "b"}] + names[1:],
+        "favorites": ["2.jpg"],
+        "published_meta": {"filename": "3.jpg"},
+    })
+    return bdir
+
+
+def test_select_respects_favorites_and_published(bucket):
+    meta = bucketer.read_meta("screen")
+    assert bucket_archive.select_for_archive(meta, bucket, {"max_age_days": 30}) == ["1.jpg"]
+    assert bucket_archive.select_for_archive(meta, bucket, {"max_count": 2}) == ["1.jpg"]
+    assert bucket_archive.select_for_archive(meta, bucket, {"favorites_only": True}) == ["1.jpg", "4.jpg", "5.jpg"]
+
+
+def test_archive_search_and_restore_round_trip(bucket):
+    result = bucket_archive.archive_bucket("screen", policy={"favorites_only": True})
+
+    assert result["archived"] == ["1.jpg", "4.jpg", "5.jpg"]
+    assert not (bucket / "1.jpg").exists()
+    assert not (bucket / "thumbnails" / "4.jpg.jpg").exists()
+    assert bucketer.read_meta("screen")["sequence"] == ["2.jpg", "3.jpg"]
+
+    found = bucket_archive.search_archive("screen", "cat 3")
+    assert [h["filename"] for h in found["items"]] == ["4.jpg"]
+    assert found["items"][0]["prompt"] == "a cat number 3"
+
+    restored = bucket_archive.restore_items("screen", ["1.jpg", "nope.jpg"])
+    assert restored["restored"] == ["1.jpg"]
+    assert restored["missing"] == ["nope.jpg"]
+    assert (bucket / "1.jpg").read_bytes() == b"image-0"
+    assert json.loads((bucket / "1.jpg.json").read_text())["prompt"] == "a cat number 0"
+    assert (bucket / "thumbnails" / "1.jpg.jpg").exists()
+    assert bucketer.read_meta("screen")["sequence"][-1] == {"file": "1.jpg", "batchId": "b"}
+
+    # Last items out of a pack delete it
+    bucket_archive.restore_items("screen", ["4.jpg", "5.jpg"])
+    assert bucket_archive.load_index("screen") == {"items": {}, "packs": {}}
+    assert not list((bucket / "_archive").glob("*.zip"))
+
+
+def test_bucket_json_stays_writable_while_the_pack_is_written(bucket, monkeypatch):
+    real_search_text = bucket_archive._search_text
+    edits = []
+
+    def favourite_4():
+        with bucketer.meta_transaction("screen") as meta:
+            meta["favorites"].append("4.jpg")
+        edits.append("4.jpg")
+
+    def search_text(sidecar):
+        if not edits:
+            editor = threading.Thread(target=favourite_4)
+            editor.start()
+            editor.join(5)
+        return real_search_text(sidecar)
+
+    monkeypatch.setattr(bucket_archive, "_search_text", search_text)
+    result = bucket_archive.archive_bucket("screen", policy={"favorites_only": True})
+
+    assert edits == ["4.jpg"]                     # not blocked by the archive run
+    assert result["archived"] == ["1.jpg", "5.jpg"]
+    assert (bucket / "4.jpg").exists()
+    assert bucketer.read_meta("screen")["sequence"] == ["2.jpg", "3.jpg", "4.jpg"]
+    index = bucket_archive.load_index("screen")
+    assert sorted(index["items"]) == ["1.jpg", "5.jpg"]
+    assert [p["live"] for p in index["packs"].values()] == [2]
+
+
+def test_dry_run_and_no_policy(bucket, monkeypatch):
+    monkeypatch.setattr(bucket_archive, "policy_for", lambda b: {})
+    assert bucket_archive.archive_bucket("screen")["status"] == "no_policy"
+
+    result = bucket_archive.archive_bucket("screen", policy={"max_count": 1}, dry_run=True)
+    assert result["status"] == "dry_run"
+    assert result["archived"] == ["1.jpg", "4.jpg"]
+    assert (bucket / "1.jpg").exists()
+
+
+def test_schedule_runs_in_the_background_when_due(bucket, monkeypatch):
+    monkeypatch.setattr(bucket_archive, "policy_for", lambda b: {"max_count": 3})
+    monkeypatch.setattr(bucket_archive, "_auto_last", {})
+    runs = []
+    monkeypatch.setattr(bucket_archive, "archive_bucket", lambda b, policy: runs.append((b, policy)))
+
+    def settle():
+        deadline = time.monotonic() + 2
+        while bucket_archive._auto_running and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    assert bucket_archive.schedule("screen", hot_count=2)          # first ingest: due
+    settle()
+    assert not bucket_archive.schedule("screen", hot_count=3)      # within the interval
+    assert bucket_archive.schedule("screen", hot_count=4)          # over max_count: now
+    settle()
+    assert runs == [("screen", {"max_count": 3})] * 2
+
+    monkeypatch.setattr(bucket_archive, "policy_for", lambda b: {})
+    assert not bucket_archive.schedule("screen", hot_count=99)
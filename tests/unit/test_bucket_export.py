@@ -0,0 +1,104 @@
+"""Unit tests for streaming ZIP export (routes/bucket_export.py)."""
+
+import io
+import json
+import os
+import zipfile
+
+import pytest
+from flask import Flask
+
+from routes import bucketer, bucket_export
+import routes.bucket_api as bucket_api
+
+
+@pytest.fixture
+def bucket(tmp_path, monkeypatch):
+    monkeypatch.setattr(bucketer, "bucket_path", lambda name: tmp_path / name)
+    monkeypatch.setattr(bucketer, "meta_path", lambda name: tmp_path / name / "bucket.json")
+    bucketer._meta_cache.clear()
+    bucket_export._crc_cache.clear()
+    bdir = tmp_path / "screen"
+    bdir.mkdir()
+    (bdir / "a.jpg").write_bytes(os.urandom(300_000))
+    (bdir / "a.jpg.json").write_text(json.dumps({"prompt": "a red fox " * 50}))
+    (bdir / "b.mp4").write_bytes(os.urandom(5000))
+    (bdir / "c.png").write_bytes(b"png" * 10)
+    (bdir / "c.png.json").write_text(json.dumps({"prompt": "über"}))
+    os.utime(bdir / "a.jpg", (1_600_000_000, 1_600_000_000))
+    bucketer.save_meta("screen", {
+        "sequence": ["a.jpg", {"file": "b.mp4", "batchId": "run1"}, "c.png", "gone.jpg"],
+        "favorites": ["c.png"],
+    })
+    return bdir
+
+
+def _full(plan):
+    return b"".join(plan.iter_range())
+
+
+def test_export_is_a_valid_zip_with_sidecars(bucket):
+    plan = bucket_export.build_plan("screen")
+    data = _full(plan)
+    assert len(data) == plan.total_size
+
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        assert zf.testzip() is None
+        assert zf.namelist() == ["a.jpg", "a.jpg.json", "b.mp4", "c.png", "c.png.json"]
+        assert zf.read("a.jpg") == (bucket / "a.jpg").read_bytes()
+        assert json.loads(zf.read("c.png.json"))["prompt"] == "über"
+        assert zf.getinfo("a.jpg").compress_type == zipfile.ZIP_STORED
+        assert zf.getinfo("a.jpg.json").compress_type == zipfile.ZIP_DEFLATED
+        assert zf.getinfo("a.jpg").date_time[:3] == (2020, 9, 13)
+
+
+def test_any_range_matches_the_full_archive(bucket):
+    full = _full(bucket_export.build_plan("screen"))
+    bucket_export._crc_cache.clear()
+    cuts = [0, 1, 40, 1000, 300_050, 300_100, len(full) - 30, len(full)]
+    for start in cuts:
+        for stop in cuts:
+            if start < stop:
+                plan = bucket_export.build_plan("screen")   # fresh plan, as a resumed request would be
+                assert b"".join(plan.iter_range(start, stop)) == full[start:stop], (start, stop)
+
+
+def test_filters(bucket):
+    names = lambda **kw: [e.arcname for e in bucket_export.build_plan("screen", **kw).entries]
+    assert names(favorites_only=True) == ["c.png", "c.png.json"]
+    assert names(batch_id="run1") == ["b.mp4"]
+    assert names(files=["a.jpg", "b.mp4"], include_sidecars=False) == ["a.jpg", "b.mp4"]
+    assert names(since=1_700_000_000) == ["b.mp4", "c.png", "c.png.json"]
+
+
+def test_zip64_records(bucket, monkeypatch):
+    monkeypatch.setattr(bucket_export, "ZIP64_LIMIT", 4096)
+    plan = bucket_export.build_plan("screen")
+    assert plan.zip64_end
+    with zipfile.ZipFile(io.BytesIO(_full(plan))) as zf:
+        assert zf.testzip() is None
+        assert zf.read("c.png.json") == (bucket / "c.png.json").read_bytes()
+
+
+def test_endpoint_supports_resume(bucket, monkeypatch):
+    monkeypatch.setattr(bucket_api, "_load_json_once", lambda *a: [{"id": "screen", "has_bucket": True}])
+    app = Flask(__name__)
+    app.register_blueprint(bucket_api.buckets_bp)
+    client = app.test_client()
+
+    full = client.get("/buckets/screen/export.zip?favorites=true")
+    assert full.status_code == 200
+    assert int(full.headers["Content-Length"]) == len(full.data)
+    etag = full.headers["ETag"].strip('"')
+
+    part = client.get("/buckets/screen/export.zip?favorites=true",
+                      headers={"Range": "bytes=20-", "If-Range": f'"{etag}"'})
+    assert part.status_code == 206
+    assert part.data == full.data[20:]
+    assert part.headers["Content-Range"] == f"bytes 20-{len(full.data) - 1}/{len(full.data)}"
+
+    stale = client.get("/buckets/screen/export.zip?favorites=true",
+                       headers={"Range": "bytes=20-", "If-Range": '"other"'})
+    assert stale.status_code == 200
+
+    assert client.get("/buckets/screen/export.zip", headers={"Range": "bytes=999999999-"}).status_code == 416
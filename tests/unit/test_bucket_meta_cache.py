@@ -0,0 +1,83 @@
+"""Unit tests for the cached, lock-protected bucket.json layer in routes/bucketer.py."""
+
+import json
+import os
+import threading
+
+import pytest
+
+from routes import bucketer
+
+
+@pytest.fixture
+def bucket(tmp_path, monkeypatch):
+    monkeypatch.setattr(bucketer, "bucket_path", lambda name: tmp_path / name)
+    monkeypatch.setattr(bucketer, "meta_path", lambda name: tmp_path / name / "bucket.json")
+    bucketer._meta_cache.clear()
+    bucketer.save_meta("screen", {"sequence": ["a.jpg"], "favorites": []})
+    return "screen"
+
+
+def test_read_meta_is_cached_until_file_changes(bucket, tmp_path):
+    first = bucketer.read_meta(bucket)
+    assert bucketer.read_meta(bucket) is first
+
+    # External writer (another process, a script) replaces the file
+    fp = tmp_path / bucket / "bucket.json"
+    fp.write_text(json.dumps({"sequence": ["a.jpg", "b.jpg"], "favorites": []}))
+    st = fp.stat()
+    os.utime(fp, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+
+    assert bucketer.read_meta(bucket)["sequence"] == ["a.jpg", "b.jpg"]
+
+
+def test_load_meta_returns_private_copy(bucket):
+    meta = bucketer.load_meta(bucket)
+    meta["sequence"].append("b.jpg")
+
+    assert bucketer.read_meta(bucket)["sequence"] == ["a.jpg"]
+
+
+def test_transaction_writes_once_and_nests(bucket, monkeypatch):
+    writes = []
+    real_write = bucketer._write_meta
+    monkeypatch.setattr(bucketer, "_write_meta", lambda b, m: (writes.append(b), real_write(b, m)))
+
+    with bucketer.meta_transaction(bucket) as meta:
+        meta["favorites"].append("a.jpg")
+        with bucketer.meta_transaction(bucket) as inner:
+            assert inner is meta
+            inner["sequence"].append("b.jpg")
+        # legacy helpers share the open transaction's working copy
+        legacy = bucketer.load_meta(bucket)
+        legacy["published_meta"] = {"filename": "a.jpg"}
+        bucketer.save_meta(bucket, legacy)
+
+    assert writes == [bucket]
+    on_disk = json.loads(bucketer.meta_path(bucket).read_text())
+    assert on_disk["sequence"] == ["a.jpg", "b.jpg"]
+    assert on_disk["favorites"] == ["a.jpg"]
+    assert on_disk["published_meta"] == {"filename": "a.jpg"}
+
+
+def test_transaction_discards_changes_on_error(bucket):
+    with pytest.raises(RuntimeError):
+        with bucketer.meta_transaction(bucket) as meta:
+            meta["sequence"].clear()
+            raise RuntimeError("boom")
+
+    assert bucketer.read_meta(bucket)["sequence"] == ["a.jpg"]
+
+
+def test_concurrent_appends_are_not_lost(bucket):
+    def add(i):
+        with bucketer.meta_transaction(bucket) as meta:
+            meta["sequence"].append(f"{i}.jpg")
+
+    threads = [threading.Thread(target=add, args=(i,)) for i in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(bucketer.read_meta(bucket)["sequence"]) == 21
@@ -0,0 +1,102 @@
+"""Unit tests for the set-based purge engine (routes/bucket_purge.py)."""
+
+import os
+import time
+
+import pytest
+
+from routes import bucketer, bucket_purge
+
+
+@pytest.fixture
+def bucket(tmp_path, monkeypatch):
+    monkeypatch.setattr(bucketer, "bucket_path", lambda name: tmp_path / name)
+    monkeypatch.setattr(bucketer, "meta_path", lambda name: tmp_path / name / "bucket.json")
+    bucketer._meta_cache.clear()
+
+    bdir = tmp_path / "screen"
+    (bdir / "thumbnails").mkdir(parents=True)
+    old = time.time() - 10 * 86400
+    for name in ("a.jpg", "b.mp4", "c.jpg", "fav.jpg"):
+        (bdir / name).write_bytes(b"x" * 100)
+        (bdir / f"{name}.json").write_text("{}")
+        (bdir / "thumbnails" / f"{name}.jpg").write_bytes(b"t" * 10)
+        os.utime(bdir / name, (old, old))
+    os.utime(bdir / "c.jpg", None)  # fresh
+    (bdir / "thumbnails" / "gone.png.jpg").write_bytes(b"t" * 10)
+    bucketer.save_meta("screen", {
+        "sequence": ["a.jpg", {"file": "b.mp4", "batchId": "x"}, "c.jpg", "fav.jpg", "missing.jpg"],
+        "favorites": ["fav.jpg"],
+    })
+    return "screen", bdir
+
+
+def test_plan_uses_age_favorites_and_finds_orphans(bucket):
+    name, bdir = bucket
+    plan = bucket_purge.plan_purge(bdir, bucketer.read_meta(name), older_than=time.time() - 86400)
+
+    report = plan.report()
+    assert report["files"] == ["a.jpg", "b.mp4"]
+    assert report["skipped"] == {"too_new": 1, "favorite": 1, "missing": 1}
+    assert plan.orphan_thumbnails == [bdir / "thumbnails" / "gone.png.jpg"]
+    assert report["reclaimable_bytes"] == 2 * (100 + 2 + 10) + 10
+
+
+def test_dry_run_deletes_nothing(bucket, monkeypatch):
+    name, bdir = bucket
+    monkeypatch.setattr("routes.utils._load_json_once", lambda *a: [{"id": name, "has_bucket": True}])
+
+    result = bucketer.purge_bucket(name, dry_run=True)
+
+    assert result["status"] == "dry_run"
+    assert result["file_count"] == 3
+    assert (bdir / "a.jpg").exists()
+    assert len(bucketer.read_meta(name)["sequence"]) == 5
+
+
+def test_purge_removes_files_and_sequence_entries(bucket, monkeypatch):
+    name, bdir = bucket
+    monkeypatch.setattr("routes.utils._load_json_once", lambda *a: [{"id": name, "has_bucket": True}])
+
+    result = bucketer.purge_bucket(name, days=1)
+
+    assert result["status"] == "purged"
+    assert result["removed"] == ["a.jpg", "b.mp4"]
+    assert result["complete"] is True
+    assert not (bdir / "a.jpg").exists()
+    assert not (bdir / "a.jpg.json").exists()
+    assert not (bdir / "thumbnails" / "b.mp4.jpg").exists()
+    assert not (bdir / "thumbnails" / "gone.png.jpg").exists()
+    assert (bdir / "thumbnails" / "c.jpg.jpg").exists()
+    meta = bucketer.read_meta(name)
+    assert meta["sequence"] == ["c.jpg", "fav.jpg", "missing.jpg"]
+    assert meta["favorites"] == ["fav.jpg"]
+
+
+def test_budget_stops_early_and_next_run_resumes(bucket):
+    name, bdir = bucket
+    plan = bucket_purge.plan_purge(bdir, bucketer.read_meta(name), include_favorites=True)
+    progress = []
+
+    first = bucket_purge.execute_plan(name, plan, batch_size=1, max_bytes=1, progress=progress.append)
+
+    assert first["complete"] is False
+    assert first["removed"] == ["a.jpg"]
+    assert progress == [{"done": 1, "total": 4, "bytes_freed": 112}]
+    assert (bdir / "thumbnails" / "gone.png.jpg").exists()  # orphans wait for a complete run
+
+    plan = bucket_purge.plan_purge(bdir, bucketer.read_meta(name), include_favorites=True)
+    second = bucket_purge.execute_plan(name, plan, clear_favorites=True)
+
+    assert second["complete"] is True
+    assert second["removed"] == ["b.mp4", "c.jpg", "fav.jpg"]
+    assert bucketer.read_meta(name) == {"sequence": ["missing.jpg"], "favorites": []}
+
+
+def test_a_published_file_frees_nothing(bucket):
+    name, bdir = bucket
+    os.link(bdir / "a.jpg", bdir.parent / "screen.jpg")      # output/screen.jpg points at a.jpg
+    plan = bucket_purge.plan_purge(bdir, bucketer.read_meta(name), older_than=time.time() - 86400)
+
+    freed = {c.filename: c.bytes for c in plan.candidates}
+    assert freed == {"a.jpg": 2 + 10, "b.mp4": 100 + 2 + 10}
@@ -0,0 +1,96 @@
+"""Unit tests for per-bucket disk accounting and quotas (routes/bucket_usage.py)."""
+
+import pytest
+
+from routes import bucketer, bucket_usage, bucket_purge
+
+
+@pytest.fixture
+def bucket(tmp_path, monkeypatch):
+    monkeypatch.setattr(bucketer, "bucket_path", lambda name: tmp_path / name)
+    monkeypatch.setattr(bucketer, "meta_path", lambda name: tmp_path / name / "bucket.json")
+    monkeypatch.setattr("routes.publisher.generate_thumbnail", lambda src, dst: dst.write_bytes(b"t" * 10))
+    monkeypatch.setattr(bucketer.phash, "record", lambda bucket, path: None)
+    monkeypatch.setattr(bucket_usage, "quota_for", lambda b: {"soft_bytes": None, "hard_bytes": None, "auto_evict": False})
+    bucketer._meta_cache.clear()
+    bdir = tmp_path / "screen"
+    (bdir / "thumbnails").mkdir(parents=True)
+    (bdir / "old.jpg").write_bytes(b"x" * 1000)
+    (bdir / "old.jpg.json").write_text("{}")
+    (bdir / "thumbnails" / "old.jpg.jpg").write_bytes(b"t" * 10)
+    bucketer.save_meta("screen", {"sequence": ["old.jpg"]})
+    return bdir
+
+
+@pytest.fixture
+def alerts(monkeypatch):
+    raised = []
+    monkeypatch.setattr(bucket_usage, "alert", lambda category, summary, **kw: raised.append(category))
+    return raised
+
+
+def _incoming(tmp_path, name, size):
+    src = tmp_path / name
+    src.write_bytes(b"v" * size)
+    return src
+
+
+def test_recount_splits_by_type(bucket):
+    (bucket / "clip.mp4").write_bytes(b"m" * 500)
+    usage = bucket_usage.recount("screen")
+
+    assert usage["images"] == {"count": 1, "bytes": 1000}
+    assert usage["videos"] == {"count": 1, "bytes": 500}
+    assert usage["sidecars"] == {"count": 1, "bytes": 2}
+    assert usage["thumbnails"] == {"count": 1, "bytes": 10}
+    assert usage["total_bytes"] == 1512
+    assert bucketer.read_meta("screen")["usage"] == usage
+
+
+def test_counters_follow_append_and_purge_without_rescans(bucket, tmp_path, monkeypatch):
+    bucket_usage.recount("screen")
+    monkeypatch.setattr(bucket_usage, "recount", lambda b: pytest.fail("should not rescan"))
+
+    target = bucketer._append_to_bucket("screen", _incoming(tmp_path, "new.mp4", 300), metadata={"prompt": "p"})
+    usage = bucketer.read_meta("screen")["usage"]
+    assert usage["videos"] == {"count": 1, "bytes": 300}
+    assert usage["thumbnails"]["count"] == 2
+    assert usage["sidecars"]["count"] == 2
+
+    plan = bucket_purge.plan_purge(bucket, bucketer.read_meta("screen"))
+    bucket_purge.execute_plan("screen", plan)
+
+    assert bucketer.read_meta("screen")["usage"] == bucket_usage.empty()
+    assert not target.exists()
+
+
+def test_quota_alerts_and_eviction(bucket, tmp_path, alerts, monkeypatch):
+    bucket_usage.recount("screen")
+    quota = {"soft_bytes": 1200, "hard_bytes": 2000, "auto_evict": True}
+    monkeypatch.setattr(bucket_usage, "quota_for", lambda b: quota)
+    monkeypatch.setattr(bucket_usage.threading, "Thread",
+                        lambda target, args, **kw: type("T", (), {"start": lambda self: target(*args)})())
+    with bucketer.meta_transaction("screen") as meta:
+        meta["favorites"] = ["old.jpg"]
+
+    bucketer._append_to_bucket("screen", _incoming(tmp_path, "a.jpg", 200))
+    assert alerts == ["bucket.quota_soft"]
+
+    bucketer._append_to_bucket("screen", _incoming(tmp_path, "b.jpg", 200))
+    bucketer._append_to_bucket("screen", _incoming(tmp_path, "c.jpg", 600))
+    assert "bucket.quota_hard" in alerts
+
+    # oldest non-favourites went first, until back under the soft quota
+    meta = bucketer.read_meta("screen")
+    names = [e["file"] if isinstance(e, dict) else e for e in meta["sequence"]]
+    assert names[0] == "old.jpg"
+    assert len(names) < 4
+    assert meta["usage"]["total_bytes"] < quota["soft_bytes"]
+    assert meta["usage"] == bucket_usage.recount("screen")
+
+
+def test_low_disk_space_alert(bucket, alerts, monkeypatch):
+    monkeypatch.setattr(bucket_usage.config, "OUTPUT_MIN_FREE_BYTES", 1 << 62)
+    verdict = bucket_usage.check("screen")
+    assert verdict["state"] == "ok"
+    assert alerts == ["disk.low_space"]
@@ -0,0 +1,144 @@
+"""Unit tests for the filesystem-driven bucket index updates (routes/bucket_watcher.py)."""
+
+import time
+
+import pytest
+from PIL import Image
+
+from routes import bucketer, bucket_watcher
+
+
+@pytest.fixture
+def bucket(tmp_path, monkeypatch):
+    monkeypatch.setattr(bucketer, "bucket_path", lambda name: tmp_path / name)
+    monkeypatch.setattr(bucketer, "meta_path", lambda name: tmp_path / name / "bucket.json")
+    monkeypatch.setattr(bucket_watcher, "_bucket_ids", lambda: {"screen"})
+    bucketer._meta_cache.clear()
+    bdir = tmp_path / "screen"
+    bdir.mkdir()
+    bucketer.save_meta("screen", {"sequence": [{"file": "old.jpg", "batchId": "b1"}], "favorites": ["old.jpg"]})
+    Image.new("RGB", (32, 32)).save(bdir / "old.jpg")
+    return bdir
+
+
+def _drain(watcher, seconds=1.0):
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        for event in watcher.backend.poll(0.1):
+            watcher.record(*event)
+    watcher.flush_due(force=True)
+
+
+def test_apply_changes_adds_and_removes(bucket):
+    Image.new("RGB", (32, 32), "red").save(bucket / "new.jpg")
+    (bucket / "old.jpg").unlink()
+
+    result = bucket_watcher.apply_changes("screen", {"new.jpg": "added", "old.jpg": "removed"})
+
+    assert result["added"] == ["new.jpg"]
+    assert result["removed"] == ["old.jpg"]
+    assert (bucket / "thumbnails" / "new.jpg.jpg").exists()
+    meta = bucketer.read_meta("screen")
+    assert meta["sequence"] == [{"file": "new.jpg"}] and meta["favorites"] == []
+
+
+def test_apply_changes_is_idempotent_for_known_files(bucket):
+    bucket_watcher.apply_changes("screen", {"old.jpg": "added"})
+    bucket_watcher.apply_changes("screen", {"old.jpg": "added"})
+
+    assert bucketer.read_meta("screen")["sequence"] == [{"file": "old.jpg", "batchId": "b1"}]
+
+
+def test_string_sequences_stay_strings(bucket):
+    bucketer.save_meta("screen", {"sequence": ["old.jpg"]})
+    Image.new("RGB", (32, 32), "red").save(bucket / "new.jpg")
+    bucket_watcher.apply_changes("screen", {"new.jpg": "added"})
+    assert bucketer.read_meta("screen")["sequence"] == ["old.jpg", "new.jpg"]
+
+
+def test_files_being_ingested_are_left_to_the_api(bucket, monkeypatch):
+    monkeypatch.setattr(bucketer.phash, "record", lambda *a: None)
+    src = bucket.parent / "published.jpg"
+    Image.new("RGB", (32, 32), "green").save(src)
+    real_store = bucketer.blobstore.store
+
+    def store_then_flush(s, dst):
+        real_store(s, dst)
+        flushed.append(bucket_watcher.apply_changes("screen", {dst.name: "added"}))   # mid-ingest flush
+        return dst
+
+    flushed = []
+    monkeypatch.setattr(bucketer.blobstore, "store", store_then_flush)
+    target = bucketer._append_to_bucket("screen", src, batch_id="b2")
+
+    assert flushed[0]["added"] == []
+    seq = bucketer.read_meta("screen")["sequence"]
+    assert [e["file"] for e in seq] == ["old.jpg", target.name]
+    assert seq[-1]["batchId"] == "b2"
+
+
+def test_append_updates_an_entry_that_is_already_listed(bucket, monkeypatch):
+    monkeypatch.setattr(bucketer.phash, "record", lambda *a: None)
+    src = bucket.parent / "published.jpg"
+    Image.new("RGB", (32, 32), "green").save(src)
+    real_store = bucketer.blobstore.store
+
+    def store_and_list(s, dst):
+        real_store(s, dst)
+        with bucketer.meta_transaction("screen") as meta:        # e.g. a reindex in between
+            meta["sequence"].append({"file": dst.name})
+        return dst
+
+    monkeypatch.setattr(bucketer.blobstore, "store", store_and_list)
+    target = bucketer._append_to_bucket("screen", src, batch_id="b3")
+
+    assert bucketer.read_meta("screen")["sequence"][1:] == [{"file": target.name, "batchId": "b3"}]
+
+
+def test_record_ignores_sidecars_and_temp_files():
+    watcher = bucket_watcher.BucketWatcher(debounce=0, poll_interval=1, force_polling=True)
+    watcher.record("screen", "a.jpg.json", "added")
+    watcher.record("screen", ".a.jpg.XyZ12", "added")
+    watcher.record("screen", "bucket.json", "modified")
+    assert watcher._pending == {}
+
+
+@pytest.mark.parametrize("force_polling", [True, False])
+def test_watcher_picks_up_external_copies(bucket, force_polling):
+    watcher = bucket_watcher.BucketWatcher(debounce=0.05, poll_interval=0.1, force_polling=force_polling)
+    if not force_polling and watcher.mode != "inotify":
+        pytest.skip("inotify not available")
+    watcher.refresh_watches()
+
+    Image.new("RGB", (32, 32), "blue").save(bucket / "copied.jpg")
+    _drain(watcher)
+
+    assert bucketer.read_meta("screen")["sequence"][-1] == {"file": "copied.jpg"}
+    assert (bucket / "thumbnails" / "copied.jpg.jpg").exists()
+
+    (bucket / "copied.jpg").unlink()
+    _drain(watcher)
+
+    assert {"file": "copied.jpg"} not in bucketer.read_meta("screen")["sequence"]
+    watcher.backend.close()
+
+
+def test_usage_follows_files_added_and_removed_out_of_band(bucket, monkeypatch):
+    from routes import bucket_usage
+
+    checked = []
+    monkeypatch.setattr(bucket_usage, "enforce", lambda b, usage=None: checked.append(usage["total_bytes"]))
+    bucket_usage.recount("screen")
+    before = bucketer.read_meta("screen")["usage"]["total_bytes"]
+
+    Image.new("RGB", (32, 32), "red").save(bucket / "new.jpg")
+    bucket_watcher.apply_changes("screen", {"new.jpg": "added"})
+    grown = bucket_usage.measure(bucket_usage.item_paths(bucket, "new.jpg"))["total_bytes"]
+    assert grown > (bucket / "new.jpg").stat().st_size                # media, sidecar and thumbnail
+    assert bucketer.read_meta("screen")["usage"]["total_bytes"] == before + grown
+    assert checked == [before + grown]
+
+    (bucket / "new.jpg").unlink()
+    bucket_watcher.apply_changes("screen", {"new.jpg": "removed"})
+    assert bucketer.read_meta("screen")["usage"] == bucket_usage.recount("screen")
+    assert checked[-1] == bucketer.read_meta("screen")["usage"]["total_bytes"] < before + grown
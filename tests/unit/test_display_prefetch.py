@@ -0,0 +1,84 @@
+"""Unit tests for bucket display prefetching (routes/display_prefetch.py)."""
+
+import json
+import os
+
+import pytest
+from PIL import Image
+
+from routes import blobstore, bucketer, display_prefetch, display_variants, publisher
+
+DESTS = [{"id": "screen", "maxwidth": 320, "maxheight": 180}]
+
+
+@pytest.fixture
+def bucket(output, monkeypatch):
+    monkeypatch.setattr(display_variants, "_load_json_once", lambda *a: DESTS)
+    monkeypatch.setattr(display_prefetch, "_plans", {})
+    directory = output / "screen"
+    directory.mkdir()
+    names = [f"{i}.jpg" for i in range(5)]
+    for i, name in enumerate(names):
+        Image.new("RGB", (640, 360), (i * 40, 0, 0)).save(directory / name, "JPEG")
+        (directory / f"{name}.json").write_text(json.dumps({"prompt": f"image {i}"}))
+    bucketer.save_meta("screen", {"sequence": names, "favorites": names})
+    return directory
+
+
+def test_next_previous_and_fallback(bucket):
+    favorites = ["a.jpg", "sub/b.jpg", "c.jpg"]
+    assert display_prefetch.choose("screen", "Next", favorites, "c.jpg") == "a.jpg"
+    assert display_prefetch.choose("screen", "Previous", favorites, "a.jpg") == "c.jpg"
+    assert display_prefetch.choose("screen", "Next", favorites, "b.jpg") == "c.jpg"     # by basename
+    assert display_prefetch.choose("screen", "Next", favorites, "gone.jpg") == "a.jpg"
+
+
+def test_random_shows_everything_before_repeating(bucket):
+    favorites = [f"{i}.jpg" for i in range(7)]
+    shown, current = [], None
+    for _ in range(70):
+        display_prefetch.candidates("screen", favorites, current)
+        predicted = display_prefetch._plans["screen"].bag[-1]
+        current = display_prefetch.choose("screen", "Random", favorites, current)
+        assert current == predicted                  # the pre-drawn item is what gets shown
+        shown.append(current)
+
+    for start in range(0, 70, 7):
+        assert sorted(shown[start:start + 7]) == favorites
+    assert all(a != b for a, b in zip(shown, shown[1:]))
+
+
+def test_stage_renders_variants_and_reads_sidecars(bucket, monkeypatch):
+    display_prefetch.stage("screen", "2.jpg")
+
+    staged = display_prefetch._plans["screen"].staged
+    random_pick = display_prefetch._plans["screen"].bag[-1]
+    assert {"3.jpg", "1.jpg", random_pick} <= set(staged)
+    for name in staged:
+        digest = staged[name].digest
+        assert display_variants.existing("screen", bucket / name, digest) is not None
+    assert display_prefetch.metadata_for("screen", "3.jpg") == {"prompt": "image 3"}
+
+    monkeypatch.setattr(blobstore.hashlib, "sha256", None)      # digests are memoised
+    assert blobstore.hash_file(bucket / "3.jpg") == staged["3.jpg"].digest
+
+    (bucket / "3.jpg.json").write_text(json.dumps({"prompt": "edited"}))
+    os.utime(bucket / "3.jpg.json", ns=(1, 1))
+    assert display_prefetch.metadata_for("screen", "3.jpg") is None
+
+
+def test_display_from_bucket_uses_the_plan(bucket, monkeypatch):
+    calls, scheduled = [], []
+    monkeypatch.setattr(publisher, "read_meta", bucketer.read_meta)
+    monkeypatch.setattr(publisher, "get_published_info", lambda d: {"published": "4.jpg"})
+    monkeypatch.setattr(publisher, "publish_to_destination", lambda **kw: calls.append(kw) or {"success": True})
+    monkeypatch.setattr(display_prefetch, "schedule", lambda dest, current: scheduled.append(current))
+    import routes.bucket_api as bucket_api
+    monkeypatch.setattr(bucket_api, "bucket_path", bucketer.bucket_path)
+
+    display_prefetch.stage("screen", "4.jpg")
+    assert publisher.display_from_bucket("screen", "Next")["success"]
+
+    assert calls[0]["source"] == bucket / "0.jpg"
+    assert calls[0]["metadata"] == {"prompt": "image 0"}
+    assert scheduled == ["0.jpg"]
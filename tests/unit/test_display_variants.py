@@ -0,0 +1,94 @@
+"""Unit tests for per-display image variants (routes/display_variants.py)."""
+
+import os
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+from routes import display_variants, publish_events, publisher
+
+DESTS = [
+    {"id": "portrait", "maxwidth": 1080, "maxheight": 1920},
+    {"id": "tv", "maxwidth": 400, "maxheight": 300, "device_class": "tv", "variant_fit": "contain"},
+    {"id": "plain"},
+]
+
+
+@pytest.fixture
+def output(output, monkeypatch):
+    monkeypatch.setattr(display_variants, "_load_json_once", lambda *a: DESTS)
+    return output
+
+
+def _source(path, size=(3840, 2160)):
+    Image.new("RGB", size, (200, 30, 30)).save(path, "JPEG")
+    return path
+
+
+def test_cover_variant_matches_panel_orientation(output):
+    src = _source(output / "portrait.jpg")
+    out = display_variants.render(src, "portrait", "ab" * 32)
+
+    assert out.parent == output / "_variants"
+    assert out.name == f"{'ab' * 8}-1080x1920-cover-q82.webp"
+    with Image.open(out) as img:
+        assert img.format == "WEBP" and img.size == (1080, 1920)
+
+    mtime = out.stat().st_mtime_ns
+    assert display_variants.render(src, "portrait", "ab" * 32) == out       # cache hit
+    assert out.stat().st_mtime_ns >= mtime
+    assert display_variants.existing("portrait", src, "ab" * 32) == out
+
+
+def test_contain_profile_and_no_upscaling(output):
+    src = _source(output / "tv.jpg")
+    with Image.open(display_variants.render(src, "tv", "cd" * 32)) as img:
+        assert img.format == "JPEG" and img.size == (400, 225)
+
+    small = _source(output / "small.jpg", size=(540, 540))
+    with Image.open(display_variants.render(small, "portrait", "ef" * 32)) as img:
+        assert img.size == (304, 540)       # cropped to 9:16, not enlarged
+
+
+def test_destinations_without_a_size_and_videos_get_originals(output):
+    src = _source(output / "plain.jpg")
+    assert display_variants.render(src, "plain", "00" * 32) is None
+    video = output / "portrait.mp4"
+    video.write_bytes(b"\x00" * 64)
+    assert display_variants.render(video, "portrait", "00" * 32) is None
+
+
+def test_publish_points_displays_at_the_variant(output, monkeypatch):
+    monkeypatch.setattr(publisher, "get_destination", lambda d: {"id": d})
+    monkeypatch.setattr(publisher, "_record_publish", lambda **kw: None)
+    (output / "portrait").mkdir()
+    src = _source(output / "incoming.jpg")
+
+    assert publisher._publish_to_destination(src, "portrait", {}, skip_bucket=True, silent=True, cross_bucket_mode=True)["success"]
+
+    event = publish_events.latest("portrait")
+    assert event["url"].startswith("/output/_variants/") and event["url"].endswith("-1080x1920-cover-q82.webp")
+    assert event["source_url"].startswith("/output/portrait.jpg?v=")
+    assert (output / "portrait.jpg").read_bytes() == src.read_bytes()
+
+    # After a restart the event is rebuilt from disk and still finds the variant
+    monkeypatch.setattr(publish_events, "_latest", {})
+    assert publish_events.latest("portrait")["url"] == event["url"]
+
+
+def test_prune_keeps_what_displays_show_and_skips_vanished_files(output, monkeypatch):
+    variants = output / "_variants"
+    variants.mkdir()
+    for i, name in enumerate(["old.webp", "shown.webp", "new.webp"]):
+        (variants / name).write_bytes(b"x")
+        os.utime(variants / name, (1000 + i, 1000 + i))
+    os.utime(variants / "shown.webp", (1, 1))                     # least recently used
+    publish_events.emit("portrait", _source(output / "portrait.jpg", size=(8, 8)), "00" * 32,
+                        "/output/_variants/shown.webp")
+
+    real_iterdir = Path.iterdir
+    monkeypatch.setattr(Path, "iterdir", lambda self: iter([*real_iterdir(self), self / "gone.webp"]))
+    display_variants._prune(variants, {".webp"}, 1)
+
+    assert sorted(p.name for p in real_iterdir(variants)) == ["new.webp", "shown.webp"]
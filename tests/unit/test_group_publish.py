@@ -0,0 +1,101 @@
+"""Unit tests for group fan-out publishing (publisher.publish_to_group)."""
+
+import shutil
+
+import pytest
+from PIL import Image
+
+from routes import blobstore, display_variants, publish_events, publisher
+
+DESTS = [
+    {"id": "portrait", "maxwidth": 1080, "maxheight": 1920, "groups": ["lobby"]},
+    {"id": "tv", "maxwidth": 400, "maxheight": 300, "device_class": "tv", "groups": ["lobby", "bar"]},
+    {"id": "plain", "groups": ["bar"]},
+]
+
+
+@pytest.fixture
+def output(output, monkeypatch):
+    monkeypatch.setattr(display_variants, "_load_json_once", lambda *a: DESTS)
+    monkeypatch.setattr(publisher, "_load_json_once", lambda *a: DESTS)
+    monkeypatch.setattr(publisher, "get_destination", lambda d: {"id": d})
+    monkeypatch.setattr(publisher, "_record_publish", lambda **kw: None)
+    return output
+
+
+@pytest.fixture
+def overlays(monkeypatch):
+    sent = []
+    monkeypatch.setattr(publisher, "_send_overlay_prompt", lambda screens, meta: sent.append(list(screens)))
+    return sent
+
+
+def _source(path):
+    Image.new("RGB", (1920, 1080), (20, 120, 200)).save(path, "JPEG")
+    return path
+
+
+def test_expand_targets(monkeypatch):
+    monkeypatch.setattr(publisher, "_load_json_once", lambda *a: DESTS)
+    assert publisher.expand_targets("lobby") == ["portrait", "tv"]
+    assert publisher.expand_targets(["plain", "lobby", "bar"]) == ["plain", "portrait", "tv"]
+    assert publisher.expand_targets("global") == ["portrait", "tv", "plain"]
+    assert publisher.expand_targets("nowhere") == []
+
+
+def test_decodes_once_and_notifies_in_one_batch(output, overlays, monkeypatch):
+    src = _source(output / "shot.jpg")
+    opened, batches, seen = [], [], []
+    real_open, real_emit_many = display_variants.Image.open, publish_events.emit_many
+    monkeypatch.setattr(display_variants.Image, "open", lambda *a, **k: opened.append(a) or real_open(*a, **k))
+    monkeypatch.setattr(publish_events, "emit_many", lambda items: batches.append(items) or real_emit_many(items))
+    publish_events.add_listener("test", seen.append)
+
+    result = publisher.publish_to_group(src, ["lobby", "plain"], metadata={"prompt": "sea"}, skip_bucket=True)
+
+    assert result["success"] and set(result["results"]) == {"portrait", "tv", "plain"}
+    assert len(opened) == 1
+    assert len(batches) == 1 and {e[0] for e in batches[0]} == {"portrait", "tv", "plain"}
+    assert {e["dest"] for e in seen} == {"portrait", "tv", "plain"}
+    assert overlays == [["portrait", "tv", "plain"]]
+
+    portrait = publish_events.latest("portrait")
+    assert portrait["url"].startswith("/output/_variants/") and portrait["url"].endswith("-1080x1920-cover-q82.webp")
+    assert publish_events.latest("plain")["url"].startswith("/output/plain.jpg?v=")
+    assert publish_events.latest("tv")["hash"] == blobstore.hash_file(src)
+
+
+def test_url_is_downloaded_once_and_cleaned_up(output, overlays, monkeypatch):
+    original = _source(output / "remote.jpg")
+    downloads = []
+
+    def fake_download(url, directory):
+        downloads.append(url)
+        path = directory / ".download-1.jpg"
+        shutil.copy(original, path)
+        return path
+
+    monkeypatch.setattr(publisher, "_download_remote", fake_download)
+    result = publisher.publish_to_group("https://example.com/a.jpg", "lobby", skip_bucket=True, silent=True)
+
+    assert result["success"] and downloads == ["https://example.com/a.jpg"]
+    assert not (output / ".download-1.jpg").exists()
+    assert (output / "portrait.jpg").read_bytes() == original.read_bytes()
+    assert overlays == []
+
+
+def test_one_failure_does_not_stop_the_rest(output, overlays, monkeypatch):
+    src = _source(output / "shot.jpg")
+
+    def get_destination(dest_id):
+        if dest_id == "tv":
+            raise KeyError(dest_id)
+        return {"id": dest_id}
+
+    monkeypatch.setattr(publisher, "get_destination", get_destination)
+    result = publisher.publish_to_group(src, "global", metadata={"prompt": "x"}, skip_bucket=True)
+
+    assert result["success"]
+    assert not result["results"]["tv"]["success"]
+    assert result["results"]["portrait"]["success"] and result["results"]["plain"]["success"]
+    assert overlays == [["portrait", "plain"]]
@@ -0,0 +1,85 @@
+"""Unit tests for the pooled HTTP client (routes/http_client.py) against a local server."""
+
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+import config
+from routes import blobstore, http_client
+
+PAYLOAD = bytes(range(256)) * 4096          # 1 MiB
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"           # keep-alive
+
+    def do_GET(self):
+        server = self.server
+        server.peers.add(self.client_address)
+        if self.path == "/flaky" and server.failures_left > 0:
+            server.failures_left -= 1
+            self._reply(503, b"busy")
+        elif self.path in ("/video.mp4", "/flaky"):
+            self._reply(200, PAYLOAD, "video/mp4")
+        else:
+            self._reply(404, b"missing")
+
+    def _reply(self, status, body, content_type="text/plain"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(config, "HTTP_RETRY_BACKOFF_S", 0)
+    http_client.reset()
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    httpd.peers, httpd.failures_left = set(), 0
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd, f"http://127.0.0.1:{httpd.server_address[1]}"
+    http_client.reset()
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_download_streams_to_a_temp_file_and_hashes(server, tmp_path, monkeypatch):
+    _, base = server
+    download = http_client.download(f"{base}/video.mp4", suffix=".mp4", directory=tmp_path)
+
+    assert download.path.parent == tmp_path and download.path.suffix == ".mp4"
+    assert download.path.read_bytes() == PAYLOAD
+    assert download.size == len(PAYLOAD) and download.content_type == "video/mp4"
+    assert download.digest == hashlib.sha256(PAYLOAD).hexdigest()
+
+    monkeypatch.setattr(blobstore.hashlib, "sha256", None)   # publish must not re-read it
+    assert blobstore.hash_file(download.path) == download.digest
+
+
+def test_connections_are_reused(server, tmp_path):
+    httpd, base = server
+    for _ in range(3):
+        http_client.download(f"{base}/video.mp4", directory=tmp_path)
+    assert len(httpd.peers) == 1
+
+
+def test_retries_server_errors(server, tmp_path):
+    httpd, base = server
+    httpd.failures_left = 2
+    assert http_client.download(f"{base}/flaky", directory=tmp_path).size == len(PAYLOAD)
+
+
+def test_failed_download_leaves_no_file(server, tmp_path):
+    _, base = server
+    with pytest.raises(requests.HTTPError):
+        http_client.download(f"{base}/nope.jpg", directory=tmp_path)
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,47 @@
+"""Unit tests for the shared background work queue (routes/keyed_drain.py)."""
+
+import threading
+import time
+
+from routes import keyed_drain
+
+
+def test_pool_builds_one_executor_under_concurrent_submits(monkeypatch):
+    built = []
+    real_executor = keyed_drain.ThreadPoolExecutor
+
+    def slow_executor(**kwargs):
+        built.append(kwargs["max_workers"])
+        time.sleep(0.05)                        # widen the window a racy check would lose
+        return real_executor(**kwargs)
+
+    monkeypatch.setattr(keyed_drain, "ThreadPoolExecutor", slow_executor)
+    pool = keyed_drain.Pool("test", lambda: 2)
+    threads = [threading.Thread(target=pool.submit, args=(lambda: None,)) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    assert built == [2]
+
+
+def test_work_is_merged_per_key_and_run_in_order():
+    gate = threading.Event()
+    runs = []
+
+    def run(key, item):
+        if item == ["first"]:
+            gate.wait(5)
+        runs.append((key, item))
+
+    work = keyed_drain.KeyedDrain("test", lambda: 2, run, merge=lambda waiting, new: waiting + new)
+    work.submit("a", ["first"])
+    time.sleep(0.05)                            # "first" is running, the rest queue behind it
+    work.submit("a", ["second"])
+    work.submit("a", ["third"])
+    assert work.waiting("a") == ["second", "third"]
+    gate.set()
+
+    assert work.wait_idle(5)
+    assert runs == [("a", ["first"]), ("a", ["second", "third"])]
+    assert work.waiting("a") is None
@@ -0,0 +1,103 @@
+"""Unit tests for lossless EXIF embedding (routes/metadata_embed.py)."""
+
+import io
+import json
+
+import numpy as np
+import piexif
+import piexif.helper
+import pytest
+from PIL import Image
+
+from routes import http_client, metadata_embed
+import routes.utils as utils
+
+META = {"prompt": "a lighthouse at dusk", "seed": 42, "ünïcode": True}
+
+
+def _image(mode="RGB"):
+    rng = np.random.default_rng(0)
+    px = rng.integers(0, 256, (48, 64, len(mode)), dtype=np.uint8)
+    return Image.fromarray(px, mode)
+
+
+def _comment(img):
+    exif = img.getexif().get_ifd(piexif.ImageIFD.ExifTag)
+    raw = exif[piexif.ExifIFD.UserComment]
+    return json.loads(piexif.helper.UserComment.load(raw))
+
+
+@pytest.mark.parametrize("fmt,kwargs,mode", [
+    ("JPEG", {"quality": 80}, "RGB"),
+    ("JPEG", {"quality": 80, "exif": piexif.dump({"0th": {piexif.ImageIFD.Make: b"old"}})}, "RGB"),
+    ("PNG", {}, "RGB"),
+    ("WEBP", {"quality": 70}, "RGB"),
+    ("WEBP", {"lossless": True}, "RGBA"),
+    ("WEBP", {"quality": 70, "icc_profile": b"\x00" * 128}, "RGB"),   # already VP8X
+])
+def test_embed_keeps_pixels_and_adds_metadata(tmp_path, fmt, kwargs, mode):
+    src, dst = tmp_path / "src", tmp_path / "dst"
+    _image(mode).save(src, fmt, **kwargs)
+
+    assert metadata_embed.embed_exif(src, dst, metadata_embed.build_exif(META)) == fmt.lower()
+
+    with Image.open(src) as a, Image.open(dst) as b:
+        assert b.format == fmt
+        assert b.size == a.size
+        assert np.array_equal(np.asarray(a), np.asarray(b))
+        assert _comment(b) == META
+        if "icc_profile" in kwargs:
+            assert b.info.get("icc_profile") == kwargs["icc_profile"]
+
+
+def test_jpeg_scan_data_is_copied_byte_for_byte(tmp_path):
+    src, dst = tmp_path / "a.jpg", tmp_path / "b.jpg"
+    _image().save(src, "JPEG", quality=90)
+    metadata_embed.embed_exif(src, dst, metadata_embed.build_exif(META))
+
+    a, b = src.read_bytes(), dst.read_bytes()
+    assert a[a.index(b"\xff\xda"):] == b[b.index(b"\xff\xda"):]
+    assert b.count(b"Exif\x00\x00") == 1
+
+
+def test_oversized_metadata_is_rejected_for_jpeg(tmp_path):
+    src = tmp_path / "a.jpg"
+    _image().save(src, "JPEG")
+    with pytest.raises(metadata_embed.MetadataTooLarge):
+        metadata_embed.embed_exif(src, tmp_path / "b.jpg", metadata_embed.build_exif({"p": "x" * 70000}))
+
+
+class _FakeResponse:
+    def __init__(self, data):
+        self.data = data
+        self.headers = {"Content-Type": "image/jpeg"}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self.data), chunk_size):
+            yield self.data[i:i + chunk_size]
+
+
+def test_save_jpeg_with_metadata_streams_without_reencoding(tmp_path, monkeypatch):
+    buf = io.BytesIO()
+    _image().save(buf, "JPEG", quality=75)
+    original = buf.getvalue()
+    monkeypatch.setattr(http_client, "get", lambda url, stream=False: _FakeResponse(original))
+    monkeypatch.setattr(Image.Image, "save", lambda *a, **k: pytest.fail("re-encoded"))
+
+    out = tmp_path / "out" / "img.jpg"
+    utils.save_jpeg_with_metadata("http://x/img.jpg", META, out)
+
+    data = out.read_bytes()
+    assert data[data.index(b"\xff\xda"):] == original[original.index(b"\xff\xda"):]
+    with Image.open(out) as img:
+        assert _comment(img) == META
+    assert [p.name for p in out.parent.iterdir()] == ["img.jpg"]
@@ -0,0 +1,105 @@
+"""Unit tests for the pure-Python MP4 metadata reader (routes/mp4meta.py)."""
+
+import json
+import os
+import struct
+
+import pytest
+
+from routes import mp4meta
+from routes.utils import _extract_mp4_comment_json
+
+
+def box(kind: bytes, payload: bytes = b"") -> bytes:
+    return struct.pack(">I4s", 8 + len(payload), kind) + payload
+
+
+def full_box(kind: bytes, payload: bytes, version: int = 0) -> bytes:
+    return box(kind, bytes([version, 0, 0, 0]) + payload)
+
+
+def make_mp4(comment: str | None, width=640, height=360, frames=90, timescale=30000, frame_delta=1000) -> bytes:
+    mvhd = full_box(b"mvhd", struct.pack(">IIII", 0, 0, 1000, frames * 1000 * frame_delta // timescale) + b"\0" * 80)
+    tkhd = full_box(b"tkhd", b"\0" * 72 + struct.pack(">II", width << 16, height << 16))
+    mdhd = full_box(b"mdhd", struct.pack(">IIII", 0, 0, timescale, frames * frame_delta) + b"\0" * 4)
+    hdlr = full_box(b"hdlr", b"\0" * 4 + b"vide" + b"\0" * 12 + b"VideoHandler\0")
+    entry = box(b"avc1", b"\0" * 6 + struct.pack(">H", 1) + b"\0" * 16 + struct.pack(">HH", width, height) + b"\0" * 50)
+    stsd = full_box(b"stsd", struct.pack(">I", 1) + entry)
+    stts = full_box(b"stts", struct.pack(">III", 1, frames, frame_delta))
+    stco = full_box(b"stco", struct.pack(">I", 0))
+    stbl = box(b"stbl", stsd + stts + stco)
+    minf = box(b"minf", box(b"vmhd", b"\0" * 12) + stbl)
+    trak = box(b"trak", tkhd + box(b"mdia", mdhd + hdlr + minf))
+
+    udta = b""
+    if comment is not None:
+        data = box(b"data", struct.pack(">II", 1, 0) + comment.encode("utf-8"))
+        ilst = box(b"ilst", box(b"\xa9cmt", data))
+        meta = full_box(b"meta", full_box(b"hdlr", b"\0" * 4 + b"mdirappl" + b"\0" * 9) + ilst)
+        udta = box(b"udta", meta)
+
+    ftyp = box(b"ftyp", b"isom\0\0\x02\0isomiso2avc1mp41")
+    return ftyp + box(b"moov", mvhd + trak + udta) + box(b"mdat", b"\0" * 4096)
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    mp4meta._cache.clear()
+
+
+def test_probe_reads_stream_info_and_comment(tmp_path):
+    payload = {"prompt": "a red fox", "seed": 42}
+    fp = tmp_path / "clip.mp4"
+    fp.write_bytes(make_mp4(json.dumps(payload)))
+
+    meta = mp4meta.probe(fp)
+
+    assert meta["width"] == 640
+    assert meta["height"] == 360
+    assert meta["codec"] == "avc1"
+    assert meta["frame_count"] == 90
+    assert meta["duration"] == pytest.approx(3.0)
+    assert meta["fps"] == pytest.approx(30.0)
+    assert _extract_mp4_comment_json(fp) == payload
+
+
+def test_probe_without_comment_or_moov(tmp_path):
+    plain = tmp_path / "plain.mp4"
+    plain.write_bytes(make_mp4(None))
+    assert mp4meta.comment(plain) is None
+    assert _extract_mp4_comment_json(plain) is None
+
+    junk = tmp_path / "junk.mp4"
+    junk.write_bytes(b"not an mp4 at all")
+    assert mp4meta.probe(junk) is None
+
+
+def test_probe_cache_invalidates_on_change(tmp_path):
+    fp = tmp_path / "clip.mp4"
+    fp.write_bytes(make_mp4('{"v": 1}'))
+    first = mp4meta.probe(fp)
+    assert mp4meta.probe(fp) is first
+
+    fp.write_bytes(make_mp4('{"v": 22}'))
+    st = fp.stat()
+    os.utime(fp, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+
+    assert mp4meta.comment(fp) == '{"v": 22}'
+
+
+def test_probe_handles_real_encoder_output(tmp_path):
+    cv2 = pytest.importorskip("cv2")
+    np = pytest.importorskip("numpy")
+    fp = tmp_path / "real.mp4"
+    writer = cv2.VideoWriter(str(fp), cv2.VideoWriter_fourcc(*"mp4v"), 10, (64, 48))
+    if not writer.isOpened():
+        pytest.skip("no mp4 encoder available")
+    for _ in range(20):
+        writer.write(np.zeros((48, 64, 3), dtype=np.uint8))
+    writer.release()
+
+    meta = mp4meta.probe(fp)
+
+    assert (meta["width"], meta["height"]) == (64, 48)
+    assert meta["frame_count"] == 20
+    assert meta["fps"] == pytest.approx(10.0, rel=0.01)
@@ -0,0 +1,79 @@
+"""Unit tests for cached conditional /output serving (routes/output_serving.py)."""
+
+import hashlib
+import os
+
+import pytest
+from flask import Flask
+
+import config
+from routes import output_serving, publish_events
+
+
+@pytest.fixture
+def client(output):
+    output_serving.clear()
+    output_serving.init(str(output))
+    app = Flask(__name__)
+    app.add_url_rule("/output/<path:relpath>", "output", output_serving.serve)
+    yield app.test_client()
+    output_serving.clear()
+
+
+def test_revalidation_is_answered_from_the_cache(client, tmp_path, monkeypatch):
+    (tmp_path / "screen.jpg").write_bytes(b"jpeg")
+    first = client.get("/output/screen.jpg")
+    assert first.status_code == 200 and first.data == b"jpeg"
+    assert first.headers["Cache-Control"] == "no-cache"
+    etag = first.headers["ETag"]
+
+    monkeypatch.setattr(output_serving, "safe_join", lambda *a: pytest.fail("hit the filesystem"))
+    assert client.get("/output/screen.jpg", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/output/screen.jpg", headers={"If-Modified-Since": first.headers["Last-Modified"]}).status_code == 304
+
+
+def test_publish_event_sets_content_hash_etag(client, tmp_path):
+    path = tmp_path / "screen.jpg"
+    path.write_bytes(b"old")
+    old_etag = client.get("/output/screen.jpg").headers["ETag"]
+
+    path.write_bytes(b"new image")
+    event = publish_events.emit("screen", path)
+    resp = client.get("/output/screen.jpg", headers={"If-None-Match": old_etag})
+    assert resp.status_code == 200 and resp.data == b"new image"
+    assert resp.headers["ETag"] == f'"{event["hash"]}"' == f'"{hashlib.sha256(b"new image").hexdigest()}"'
+
+
+def test_changes_outside_publish_are_seen_after_the_ttl(client, tmp_path, monkeypatch):
+    path = tmp_path / "screen.jpg"
+    path.write_bytes(b"one")
+    etag = client.get("/output/screen.jpg").headers["ETag"]
+    path.write_bytes(b"two!")
+    os.utime(path, ns=(path.stat().st_mtime_ns + 10**9,) * 2)
+
+    assert client.get("/output/screen.jpg", headers={"If-None-Match": etag}).status_code == 304
+    monkeypatch.setattr(config, "OUTPUT_STAT_TTL_S", 0)
+    resp = client.get("/output/screen.jpg", headers={"If-None-Match": etag})
+    assert resp.status_code == 200 and resp.data == b"two!"
+
+    path.unlink()
+    assert client.get("/output/screen.jpg").status_code == 404
+
+
+def test_bucket_media_are_immutable_and_ranges_work(client, tmp_path):
+    (tmp_path / "screen").mkdir()
+    (tmp_path / "screen" / "20250423-230102-abcd1234.mp4").write_bytes(bytes(range(100)))
+    (tmp_path / "screen" / "bucket.json").write_text("{}")
+
+    resp = client.get("/output/screen/20250423-230102-abcd1234.mp4", headers={"Range": "bytes=10-19"})
+    assert resp.status_code == 206
+    assert resp.data == bytes(range(10, 20))
+    assert resp.headers["Content-Type"] == "video/mp4"
+    assert "immutable" in resp.headers["Cache-Control"]
+    assert client.get("/output/screen/bucket.json").headers["Cache-Control"] == "no-cache"
+
+
+def test_paths_outside_output_are_rejected(client, tmp_path):
+    (tmp_path.parent / "secret.txt").write_text("x")
+    assert client.get("/output/../secret.txt").status_code == 404
+    assert client.get("/output/screen").status_code == 404
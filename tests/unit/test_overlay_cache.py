@@ -0,0 +1,93 @@
+"""Unit tests for cached overlay rendering (routes/display.py, routes/utils.py)."""
+
+import os
+
+import pytest
+
+from routes import display, utils
+
+DESTS = [{"id": "north", "groups": ["lobby"], "alexavisible": True}]
+
+
+@pytest.fixture
+def sources(monkeypatch):
+    """build_schema_subs() inputs, swappable by replacing the list objects."""
+    data = {"workflow": [{"id": "flux"}], "refiner": [], "destination": DESTS}
+    monkeypatch.setattr(utils, "_load_json_once", lambda key, filename: data[key])
+    utils.invalidate_schema_subs()
+    yield data
+    utils.invalidate_schema_subs()
+
+
+@pytest.fixture
+def sent(monkeypatch, sources):
+    messages = []
+
+    async def fake_send(data):
+        messages.append(data)
+
+    monkeypatch.setattr(display, "send_overlay_to_clients", fake_send)
+    monkeypatch.setattr(display, "_rendered_overlays", display.OrderedDict())
+    return messages
+
+
+def test_schema_subs_are_rebuilt_only_when_sources_change(sources, monkeypatch):
+    builds = []
+    real_build = utils._build_schema_subs
+    monkeypatch.setattr(utils, "_build_schema_subs", lambda: builds.append(1) or real_build())
+
+    first = utils.build_schema_subs()
+    first["QR_BASE64"] = "mine"                       # callers get their own copy
+    second = utils.build_schema_subs()
+    assert len(builds) == 1 and "QR_BASE64" not in second
+    assert second["ALL_WORKFLOWS"] == [None, "flux"]
+
+    sources["workflow"] = [{"id": "sdxl"}]            # what _load_json_once does on mtime change
+    assert utils.build_schema_subs()["ALL_WORKFLOWS"] == [None, "sdxl"]
+    version = utils.schema_subs_version()
+
+    utils.invalidate_schema_subs()
+    utils.build_schema_subs()
+    assert len(builds) == 3 and utils.schema_subs_version() == version + 1
+
+
+def test_qr_is_memoised_by_payload(monkeypatch):
+    monkeypatch.setenv("VITE_URL", "http://screens.local/")
+    utils._qr_data_uri.cache_clear()
+    a = utils.get_qr(publish="north")
+    assert utils.get_qr(publish="north") is a
+    assert utils.get_qr(publish="south") != a
+    assert utils._qr_data_uri.cache_info().hits == 1
+
+
+def test_progress_overlays_render_once_per_distinct_value(sent, tmp_path, monkeypatch):
+    template = tmp_path / "overlay_test.html.j2"
+    template.write_text("{{ SCREEN_NAME }}: {{ PROGRESS_PERCENT }}%")
+    renders = []
+    real_substitute = display.dict_substitute
+    monkeypatch.setattr(display, "dict_substitute", lambda t, s: renders.append(1) or real_substitute(t, s))
+    monkeypatch.setattr(display, "get_qr", lambda publish: "qr")
+
+    for percent in (10, 10, 10, 20, 10):
+        display.send_overlay(str(template), screens=["north"], substitutions={"PROGRESS_PERCENT": percent})
+    assert [m["html"] for m in sent] == ["north: 10%", "north: 10%", "north: 10%", "north: 20%", "north: 10%"]
+    assert len(renders) == 2
+
+    template.write_text("{{ PROGRESS_PERCENT }} percent")
+    stat = template.stat()
+    os.utime(template, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    display.send_overlay(str(template), screens=["north"], substitutions={"PROGRESS_PERCENT": 10})
+    assert sent[-1]["html"] == "10 percent" and len(renders) == 3
+
+
+def test_inline_templates_are_compiled_once(monkeypatch):
+    compiled = []
+    env = utils.Environment()
+    real_from_string = env.from_string
+    monkeypatch.setattr(utils, "_inline_env", env)
+    monkeypatch.setattr(utils, "_inline_templates", utils.OrderedDict())
+    monkeypatch.setattr(env, "from_string", lambda src: compiled.append(src) or real_from_string(src))
+
+    for name in ("a", "b", "a"):
+        assert utils.dict_substitute("<p>{{ name }}</p>", {"name": name}) == f"<p>{name}</p>"
+    assert len(compiled) == 1
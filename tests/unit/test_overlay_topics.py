@@ -0,0 +1,132 @@
+"""Unit tests for topic-based overlay routing (connection_registry.py, overlay_ws_server.py)."""
+
+import asyncio
+import json
+
+import pytest
+
+import overlay_ws_server
+from connection_registry import ConnectionRegistry
+
+DESTS = [{"id": "north", "groups": ["lobby"]}, {"id": "south", "groups": ["lobby"]}, {"id": "east"}]
+
+
+class FakeSocket:
+    """Records what it is sent; yields what is put on .incoming until a None arrives."""
+
+    def __init__(self, name):
+        self.name, self.sent, self.incoming = name, [], None
+        self.remote_address = (name, 0)
+
+    async def send(self, msg):
+        self.sent.append(json.loads(msg))
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        msg = await self.incoming.get()
+        if msg is None:
+            raise StopAsyncIteration
+        return msg
+
+    def __repr__(self):
+        return self.name
+
+
+async def settle():
+    """Let the outbox writer tasks run."""
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    reg = ConnectionRegistry()
+    monkeypatch.setattr(overlay_ws_server, "registry", reg)
+    monkeypatch.setattr(overlay_ws_server, "_load_json_once", lambda *a: DESTS)
+    return reg
+
+
+def test_registry_indexes_topics_both_ways():
+    reg = ConnectionRegistry()
+    a, b, legacy = FakeSocket("a"), FakeSocket("b"), FakeSocket("legacy")
+    reg.add_overlay(legacy)
+    reg.subscribe(a, ["north", "lobby"])
+    reg.subscribe(b, ["south"])
+
+    assert reg.recipients(["north"]) == {a, legacy}
+    assert reg.recipients(["lobby", "south"]) == {a, b, legacy}
+    assert reg.recipients(None) == {a, b, legacy}
+
+    reg.unsubscribe(a, ["north"])
+    assert reg.recipients(["north"]) == {legacy}
+    reg.remove_overlay(a)
+    assert "lobby" not in reg.by_topic and a not in reg.topics_of
+
+
+def test_sends_only_reach_subscribers(registry):
+    north, south, east = FakeSocket("north"), FakeSocket("south"), FakeSocket("east")
+    for ws in (north, south, east):
+        registry.subscribe(ws, overlay_ws_server._with_groups([ws.name]))
+
+    async def run():
+        await overlay_ws_server.send_overlay_to_clients({"html": "n", "screens": ["north"]})
+        await overlay_ws_server.send_overlay_to_clients({"html": "l", "screens": ["lobby"]})
+        await overlay_ws_server.send_overlay_to_clients({"html": "all", "screens": None})
+        await overlay_ws_server.send_overlay_to_clients({"html": "star", "screens": ["*"]})
+        await settle()
+
+    asyncio.run(run())
+    assert [m["html"] for m in north.sent] == ["n", "l", "all", "star"]
+    assert [m["html"] for m in south.sent] == ["l", "all", "star"]
+    assert [m["html"] for m in east.sent] == ["all", "star"]
+
+
+def test_job_topic_and_later_subscriptions(registry):
+    watcher = FakeSocket("watcher")
+    registry.add_overlay(watcher)
+    job_message = {"html": "p", "screens": ["east"], "job_id": "42"}
+
+    async def run():
+        watcher.incoming = asyncio.Queue()
+        listener = asyncio.ensure_future(overlay_ws_server.listen_for_subscriptions(watcher))
+
+        async def client_says(*messages):
+            for msg in messages:
+                await watcher.incoming.put(msg)
+            await settle()
+
+        await overlay_ws_server.send_overlay_to_clients(job_message)      # unfiltered: gets it
+        await settle()
+        await client_says(json.dumps({"type": "subscribe", "topics": ["index"]}), "not json")
+        await overlay_ws_server.send_overlay_to_clients(job_message)      # filtered now: doesn't
+        await client_says(json.dumps({"type": "subscribe", "topics": ["job:42"]}))
+        await overlay_ws_server.send_overlay_to_clients(job_message)
+        await client_says(json.dumps({"type": "unsubscribe", "topics": ["job:42"]}))
+        await overlay_ws_server.send_overlay_to_clients(job_message)
+        await client_says(None)
+        await listener
+
+    asyncio.run(run())
+    assert len(watcher.sent) == 2
+    assert watcher not in registry.overlays                # removed once it disconnects
+
+
+def test_subscribe_with_since_replays_missed_publishes(registry, monkeypatch):
+    events = {"north": {"type": "published", "dest": "north", "url": "/output/north.jpg", "version": 5}}
+    monkeypatch.setattr(overlay_ws_server.publish_events, "latest", events.get)
+    display = FakeSocket("display")
+
+    async def run():
+        display.incoming = asyncio.Queue()
+        listener = asyncio.ensure_future(overlay_ws_server.listen_for_subscriptions(display))
+        for since in (0, 5):
+            await display.incoming.put(json.dumps({"type": "subscribe", "topics": ["north"],
+                                                   "since": {"north": since}}))
+            await settle()
+        await display.incoming.put(None)
+        await listener
+
+    asyncio.run(run())
+    assert [m["version"] for m in display.sent] == [5]      # only what it hadn't seen
@@ -0,0 +1,143 @@
+"""Unit tests for the perceptual-hash similarity index (routes/phash.py)."""
+
+import random
+
+import numpy as np
+import pytest
+from PIL import Image, ImageFilter
+
+from routes import bucketer, phash
+
+
+def _pattern(seed, size=128):
+    rng = np.random.default_rng(seed)
+    px = rng.integers(0, 256, (8, 8, 3), dtype=np.uint8)
+    return Image.fromarray(px).resize((size, size), Image.BICUBIC)
+
+
+@pytest.fixture
+def bucket(tmp_path, monkeypatch):
+    monkeypatch.setattr(bucketer, "bucket_path", lambda name: tmp_path / name)
+    monkeypatch.setattr(bucketer, "meta_path", lambda name: tmp_path / name / "bucket.json")
+    bucketer._meta_cache.clear()
+    phash._indexes.clear()
+    bdir = tmp_path / "screen"
+    bdir.mkdir()
+    base = _pattern(1)
+    base.save(bdir / "a.jpg", quality=95)
+    base.filter(ImageFilter.GaussianBlur(1)).resize((100, 100)).save(bdir / "a-copy.jpg", quality=60)
+    _pattern(2).save(bdir / "b.jpg")
+    _pattern(3).save(bdir / "c.png")
+    bucketer.save_meta("screen", {"sequence": ["a.jpg", {"file": "b.jpg", "batchId": "x"}, "a-copy.jpg", "c.png"]})
+    return bdir
+
+
+def test_bk_tree_matches_linear_scan():
+    rng = random.Random(7)
+    hashes = [rng.getrandbits(64) for _ in range(300)]
+    hashes += [h ^ (1 << rng.randrange(64)) for h in hashes[:50]]
+    tree = phash.BKTree()
+    for i, h in enumerate(hashes):
+        tree.add(h, str(i))
+    assert len(tree) == len(hashes)
+
+    for probe in hashes[:20]:
+        expected = sorted((phash.hamming(probe, h), str(i)) for i, h in enumerate(hashes)
+                          if phash.hamming(probe, h) <= 10)
+        assert tree.search(probe, 10) == expected
+
+
+def test_hashes_survive_recompression_but_separate_different_images(bucket):
+    a, copy, b = (phash.compute(bucket / n) for n in ("a.jpg", "a-copy.jpg", "b.jpg"))
+    for kind in phash.HASH_KINDS:
+        assert phash.hamming(int(a[kind], 16), int(copy[kind], 16)) <= phash.DUPLICATE_DISTANCE
+        assert phash.hamming(int(a[kind], 16), int(b[kind], 16)) > phash.SIMILAR_DISTANCE
+
+
+class HeldPool:
+    """Stands in for the hashing pool; work runs only when release() is called."""
+
+    def __init__(self):
+        self.held = []
+
+    def submit(self, fn, *args):
+        self.held.append((fn, args))
+
+    def release(self):
+        while self.held:
+            fn, args = self.held.pop(0)
+            fn(*args)
+
+
+def test_near_duplicates_and_similar(bucket, monkeypatch):
+    pool = HeldPool()
+    monkeypatch.setattr(phash._work, "pool", pool)
+    # nothing indexed yet: the first query answers from that and queues a backfill
+    assert phash.near_duplicates("screen")["groups"] == []
+    assert phash.similar("screen", "a.jpg")["pending"]
+    pool.release()
+    assert set(phash.load_index("screen")) == {"a.jpg", "b.jpg", "a-copy.jpg", "c.png"}
+
+    dupes = phash.near_duplicates("screen")
+    assert dupes["groups"] == [["a.jpg", "a-copy.jpg"]]
+    assert dupes["redundant"] == 1
+
+    found = phash.similar("screen", "a.jpg", max_distance=phash.DUPLICATE_DISTANCE)
+    assert [(m["bucket"], m["filename"]) for m in found["items"]] == [("screen", "a-copy.jpg")]
+
+    with pytest.raises(FileNotFoundError):
+        phash.similar("screen", "nope.jpg")
+    with pytest.raises(ValueError):
+        phash.near_duplicates("screen", kind="xhash")
+
+
+def test_similar_across_buckets_and_stale_entries(bucket, tmp_path):
+    other = tmp_path / "other"
+    other.mkdir()
+    _pattern(1).save(other / "twin.png")
+    bucketer.save_meta("other", {"sequence": ["twin.png"]})
+    phash.sync_index("screen"), phash.sync_index("other")
+    assert phash.wait_idle(10)
+
+    found = phash.similar("screen", "a.jpg", max_distance=phash.DUPLICATE_DISTANCE, buckets=["screen", "other"])
+    assert {(m["bucket"], m["filename"]) for m in found["items"]} == {("screen", "a-copy.jpg"), ("other", "twin.png")}
+
+    bucketer.save_meta("screen", {"sequence": ["a.jpg", "b.jpg", "c.png"]})
+    assert phash.near_duplicates("screen")["groups"] == []     # filtered straight away
+    assert phash.wait_idle(10)
+    assert "a-copy.jpg" not in phash.load_index("screen")      # and dropped from the log
+
+
+def test_append_to_bucket_records_hashes(bucket, tmp_path, monkeypatch):
+    monkeypatch.setattr("routes.publisher.generate_thumbnail", lambda src, dst: None)
+    src = tmp_path / "incoming.png"
+    _pattern(4).save(src)
+
+    target = bucketer._append_to_bucket("screen", src)
+    assert phash.wait_idle(10)
+
+    assert phash.load_index("screen")[target.name] == phash.compute(src)
+
+
+def test_log_is_appended_replayed_and_compacted(bucket, monkeypatch):
+    monkeypatch.setattr(phash, "COMPACT_MIN_LINES", 8)
+    log = bucket / phash.INDEX_FILE
+    for i in range(3):
+        phash.record("screen", bucket / "a.jpg")
+        assert phash.wait_idle(10)
+    assert len(log.read_text().splitlines()) == 3              # one line per record, no rewrite
+    phash.forget("screen", ["a.jpg"])
+    log.write_text(log.read_text() + '{"file": "torn')          # crash mid-append
+
+    phash._indexes.clear()                                     # a fresh process
+    assert phash.load_index("screen") == {}
+
+    phash.record("screen", bucket / "b.jpg")
+    phash.record("screen", bucket / "c.png")
+    assert phash.wait_idle(10)
+    for _ in range(3):
+        phash.record("screen", bucket / "b.jpg")
+        assert phash.wait_idle(10)
+    assert len(log.read_text().splitlines()) <= 4              # 10 without compaction
+    phash._indexes.clear()
+    assert set(phash.load_index("screen")) == {"b.jpg", "c.png"}
@@ -0,0 +1,92 @@
+"""Unit tests for publish notifications (routes/publish_events.py) and the long-poll endpoint."""
+
+import hashlib
+import os
+import threading
+import time
+
+from flask import Flask
+
+from routes import publish_events, publisher
+import routes.publish_api as publish_api
+
+
+def test_emit_versions_and_listeners(output):
+    seen = []
+    publish_events.add_listener("test", seen.append)
+    path = output / "screen.jpg"
+    path.write_bytes(b"one")
+
+    first = publish_events.emit("screen", path)
+    second = publish_events.emit("screen", path)
+
+    assert second["version"] > first["version"]
+    assert first["hash"] == hashlib.sha256(b"one").hexdigest()
+    assert first["url"] == f"/output/screen.jpg?v={first['hash'][:12]}"
+    assert first["media_type"] == "image" and first["screens"] == ["screen"]
+    assert seen == [first, second]
+    assert publish_events.missed(["screen", "other"], {"screen": first["version"]}) == [second]
+    assert publish_events.missed(["screen"], {"screen": second["version"]}) == []
+
+
+def test_latest_is_rebuilt_from_disk_after_restart(output):
+    older, newer = output / "screen.jpg", output / "screen.mp4"
+    older.write_bytes(b"img")
+    newer.write_bytes(b"vid")
+    # Newest by the later of mtime/ctime; the mtime here is in the future, so it wins
+    os.utime(newer, ns=(2_000_000_000_000_000_000, 2_000_000_000_000_000_000))
+
+    event = publish_events.latest("screen")
+    assert event["media_type"] == "video"
+    assert event["version"] == 2_000_000_000_000
+    assert event["url"].startswith("/output/screen.mp4?v=")
+    assert publish_events.latest("missing") is None
+
+
+def test_wait_wakes_on_emit(output):
+    path = output / "screen.jpg"
+    path.write_bytes(b"x")
+    seen = publish_events.wait("screen", 0, timeout=0)["version"]
+    assert publish_events.wait("screen", seen, timeout=0) is None
+
+    timer = threading.Timer(0.05, publish_events.emit, ("screen", path))
+    timer.start()
+    started = time.monotonic()
+    event = publish_events.wait("screen", seen, timeout=5)
+    timer.join()
+    assert event is not None and time.monotonic() - started < 2
+    assert publish_events.wait("screen", event["version"], timeout=0) is None
+
+
+def test_long_poll_endpoint(output, monkeypatch):
+    def get_destination(dest_id):
+        if dest_id != "screen":
+            raise KeyError(dest_id)
+        return {"id": dest_id}
+
+    monkeypatch.setattr(publish_api, "get_destination", get_destination)
+    app = Flask(__name__)
+    app.register_blueprint(publish_api.publish_api)
+    client = app.test_client()
+
+    assert client.get("/publish/events/screen?timeout=0").status_code == 204
+    (output / "screen.jpg").write_bytes(b"x")
+    resp = client.get("/publish/events/screen?since=0&timeout=0")
+    assert resp.status_code == 200 and resp.json["dest"] == "screen"
+    assert client.get(f"/publish/events/screen?since={resp.json['version']}&timeout=0").status_code == 204
+    assert client.get("/publish/events/nope?timeout=0").status_code == 404
+
+
+def test_publish_emits_event_for_the_display_file(output, monkeypatch):
+    monkeypatch.setattr(publisher, "get_destination", lambda d: {"id": d})
+    monkeypatch.setattr(publisher, "_record_publish", lambda **kw: None)
+    (output / "screen").mkdir()
+    source = output / "incoming.png"
+    source.write_bytes(b"png-bytes")
+
+    result = publisher._publish_to_destination(source, "screen", {}, skip_bucket=True, silent=True, cross_bucket_mode=True)
+
+    assert result["success"]
+    event = publish_events.latest("screen")
+    assert event["url"].startswith("/output/screen.png?v=")
+    assert event["hash"] == hashlib.sha256(b"png-bytes").hexdigest()
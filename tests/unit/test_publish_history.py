@@ -0,0 +1,86 @@
+"""Unit tests for the append-only publish history log (routes/publish_utils.py)."""
+
+import json
+
+import pytest
+
+import config
+from routes import bucketer, publish_utils
+
+
+@pytest.fixture
+def output(output, monkeypatch):
+    monkeypatch.setattr(publish_utils, "_logs", {})
+    monkeypatch.setattr(publish_utils, "get_published_info", lambda dest: {})
+    return output
+
+
+def _publish(dest, name):
+    return publish_utils.record_new_publish(dest, name, "2026-01-01T00:00:00Z", f"/output/{name}", "", {})
+
+
+def _restart(monkeypatch):
+    monkeypatch.setattr(publish_utils, "_logs", {})
+
+
+def test_undo_redo_and_truncation_survive_a_restart(output, monkeypatch):
+    for name in ("a.jpg", "b.jpg", "c.jpg"):
+        assert _publish("screen", name)["success"]
+
+    assert publish_utils.undo_publish("screen")["current_image"]["filename"] == "b.jpg"
+    assert publish_utils.undo_publish("screen")["current_image"]["filename"] == "a.jpg"
+    assert publish_utils.undo_publish("screen")["error"] == "Already at oldest image"
+    assert publish_utils.redo_publish("screen")["current_image"]["filename"] == "b.jpg"
+
+    result = _publish("screen", "d.jpg")                  # drops "c" (it was undone)
+    assert (result["stack_size"], result["can_undo"], result["can_redo"]) == (3, True, False)
+    assert publish_utils.redo_publish("screen")["error"] == "Already at newest image"
+
+    _restart(monkeypatch)
+    publish_utils.undo_publish("screen")
+    _restart(monkeypatch)
+    info = publish_utils.get_publish_history_info("screen")
+    assert (info["current_image"]["filename"], info["current_pointer"], info["stack_size"]) == ("b.jpg", 1, 3)
+    assert not bucketer.meta_path("screen").exists()
+
+
+def test_log_is_compacted_and_depth_is_capped(output, monkeypatch):
+    monkeypatch.setattr(config, "PUBLISH_HISTORY_COMPACT_SLACK", 10)
+    monkeypatch.setattr(config, "PUBLISH_HISTORY_MAX", 5)
+    for i in range(8):
+        _publish("screen", f"{i}.jpg")
+    for _ in range(20):
+        publish_utils.undo_publish("screen")
+        publish_utils.redo_publish("screen")
+    publish_utils.undo_publish("screen")
+
+    log = output / "screen" / publish_utils.HISTORY_FILENAME
+    assert len(log.read_text().splitlines()) <= 5 + 10
+    _restart(monkeypatch)
+    info = publish_utils.get_publish_history_info("screen")
+    assert (info["stack_size"], info["current_image"]["filename"]) == (5, "6.jpg")
+
+
+def test_torn_last_line_is_ignored(output, monkeypatch):
+    _publish("screen", "a.jpg")
+    _publish("screen", "b.jpg")
+    log = output / "screen" / publish_utils.HISTORY_FILENAME
+    with open(log, "a") as f:
+        f.write('{"push": {"filen')
+
+    _restart(monkeypatch)
+    assert publish_utils.get_publish_history_info("screen")["current_image"]["filename"] == "b.jpg"
+
+
+def test_history_is_moved_out_of_bucket_json(output):
+    stack = [{"filename": n, "published_at": "", "raw_url": "", "thumbnail_url": "", "metadata": {}}
+             for n in ("new.jpg", "mid.jpg", "old.jpg")]
+    bucketer.save_meta("screen", {
+        "sequence": ["x.jpg"], "favorites": [],
+        "published_meta": {"filename": "mid.jpg", "history_stack": stack, "current_pointer": 1},
+    })
+
+    info = publish_utils.get_publish_history_info("screen")
+    assert (info["current_image"]["filename"], info["stack_size"], info["can_redo"]) == ("mid.jpg", 3, True)
+    meta = json.loads(bucketer.meta_path("screen").read_text())
+    assert meta["published_meta"] == {"filename": "mid.jpg"} and meta["sequence"] == ["x.jpg"]
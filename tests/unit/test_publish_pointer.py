@@ -0,0 +1,91 @@
+"""Unit tests for pointer-swap publishing (routes/publish_pointer.py)."""
+
+import os
+
+import pytest
+from flask import Flask
+
+import config
+from routes import blobstore, publish_events, publish_pointer, publisher
+import routes.publish_api as publish_api
+
+
+def _file(path, data):
+    path.write_bytes(data)
+    return path
+
+
+def test_swap_links_the_source_and_keeps_the_previous_file(output):
+    first = _file(output / "first.jpg", b"first")
+    pointer = publish_pointer.swap("screen", first)
+
+    assert pointer == output / "screen.jpg"
+    assert os.path.samefile(pointer, first)
+    assert not (output / "_blobs").exists()               # dedup is opt-in
+    assert publish_pointer.previous("screen") is None
+
+    second = _file(output / "second.mp4", b"second")
+    assert publish_pointer.swap("screen", second) == output / "screen.mp4"
+
+    assert not (output / "screen.jpg").exists()          # other extension removed
+    assert publish_pointer.current("screen") == output / "screen.mp4"
+    assert publish_pointer.previous("screen").read_bytes() == b"first"
+    assert first.stat().st_nlink == 2                     # source, kept previous
+    assert not [p for p in output.rglob("*.tmp")]
+
+
+def test_swap_links_the_blob_when_dedup_is_on(output, monkeypatch):
+    monkeypatch.setattr(config, "BUCKET_DEDUP_ENABLED", True)
+    src = _file(output / "a.jpg", b"a")
+    pointer = publish_pointer.swap("screen", src)
+    assert os.path.samefile(pointer, blobstore.blob_path(blobstore.hash_file(src), ".jpg"))
+
+
+def test_rollback_swaps_back_and_forth(output):
+    publish_pointer.swap("screen", _file(output / "a.png", b"a"))
+    publish_pointer.swap("screen", _file(output / "b.png", b"b"))
+
+    assert publish_pointer.rollback("screen").read_bytes() == b"a"
+    assert publish_pointer.previous("screen").read_bytes() == b"b"
+    assert publish_pointer.rollback("screen").read_bytes() == b"b"
+
+    with pytest.raises(FileNotFoundError):
+        publish_pointer.rollback("empty")
+
+
+def test_republishing_the_same_content_keeps_the_previous_file(output):
+    publish_pointer.swap("screen", _file(output / "a.png", b"a"))
+    src = _file(output / "b.png", b"b")
+    publish_pointer.swap("screen", src)
+    publish_pointer.swap("screen", src)
+    assert publish_pointer.previous("screen").read_bytes() == b"a"
+
+
+def test_publish_swaps_pointer_and_rollback_endpoint(output, monkeypatch):
+    monkeypatch.setattr(publisher, "get_destination", lambda d: {"id": d})
+    monkeypatch.setattr(publish_api, "get_destination", lambda d: {"id": d})
+    monkeypatch.setattr(publisher, "_record_publish", lambda **kw: None)
+    (output / "screen").mkdir()
+
+    for data in (b"old", b"new"):
+        src = _file(output / f"{data.decode()}.png", data)
+        assert publisher._publish_to_destination(src, "screen", {}, skip_bucket=True, silent=True, cross_bucket_mode=True)["success"]
+    pointer = output / "screen.png"
+    assert pointer.read_bytes() == b"new" and os.path.samefile(pointer, output / "new.png")
+
+    app = Flask(__name__)
+    app.register_blueprint(publish_api.publish_api)
+    resp = app.test_client().post("/publish/screen/rollback")
+    assert resp.status_code == 200
+    assert pointer.read_bytes() == b"old"
+    assert resp.json["hash"] == blobstore.hash_file(output / "old.png")
+    assert publish_events.latest("screen")["version"] == resp.json["version"]
+
+
+def test_hash_file_is_memoised_per_inode(output, monkeypatch):
+    src = _file(output / "a.jpg", b"bytes")
+    digest = blobstore.hash_file(src)
+    os.link(src, output / "b.jpg")
+
+    monkeypatch.setattr(blobstore.hashlib, "sha256", None)   # would fail if re-read
+    assert blobstore.hash_file(output / "b.jpg") == digest
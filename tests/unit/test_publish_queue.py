@@ -0,0 +1,138 @@
+"""Unit tests for the background publish queue (routes/publish_queue.py)."""
+
+import threading
+from collections import OrderedDict
+from types import SimpleNamespace
+
+import pytest
+from flask import Flask
+
+from routes import publish_queue
+from routes.keyed_drain import Pool
+import routes.publish_api as publish_api
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    """Fake publish_to_destination; publishes to "slow" block until released."""
+    monkeypatch.setattr(publish_queue, "_pending", {})
+    monkeypatch.setattr(publish_queue, "_active", set())
+    monkeypatch.setattr(publish_queue, "_jobs", OrderedDict())
+    monkeypatch.setattr(publish_queue, "_pool", Pool("publish", lambda: 4))
+    record = SimpleNamespace(calls=[], release=threading.Event(), started=threading.Event())
+
+    def publish(**kwargs):
+        if kwargs["publish_destination_id"] == "slow":
+            record.started.set()
+            record.release.wait(5)
+        record.calls.append(kwargs)
+        if kwargs["source"] == "broken":
+            raise RuntimeError("download failed")
+        return {"success": True, "meta": {"filename": kwargs["source"]}}
+
+    def publish_group(source, targets, **kwargs):
+        if "slow" in targets:
+            record.started.set()
+            record.release.wait(5)
+        record.calls.append({"source": source, "targets": list(targets), **kwargs})
+        return {"success": True, "results": {d: {"success": True} for d in targets}}
+
+    monkeypatch.setattr(publish_queue, "publish_to_destination", publish)
+    monkeypatch.setattr(publish_queue, "publish_to_group", publish_group)
+    monkeypatch.setattr(publish_queue, "expand_targets", list)
+    return record
+
+
+def test_newest_wins_per_destination(fake):
+    first = publish_queue.submit("a.jpg", "slow", skip_bucket=True)
+    assert fake.started.wait(5)                                   # "a" is running
+    pointer_only = publish_queue.submit("b.jpg", "slow", skip_bucket=True)
+    saves_to_bucket = publish_queue.submit("c.jpg", "slow")
+    publish_queue.submit("d.jpg", "slow", update_published=False)
+    newest = publish_queue.submit("e.jpg", "slow", skip_bucket=True)
+    fake.release.set()
+
+    assert publish_queue.wait(newest.id, 5).status == publish_queue.DONE
+    assert publish_queue.wait(first.id, 5).status == publish_queue.DONE
+    assert pointer_only.status == publish_queue.SUPERSEDED and pointer_only.superseded_by == saves_to_bucket.id
+    assert saves_to_bucket.status == publish_queue.DONE
+
+    # Run in submission order; the demoted bucket save no longer touches the screen
+    assert [c["source"] for c in fake.calls] == ["a.jpg", "c.jpg", "d.jpg", "e.jpg"]
+    assert fake.calls[1]["update_published"] is False and fake.calls[1]["silent"] is True
+    assert "silent" not in fake.calls[3]
+
+
+def test_destinations_do_not_block_each_other(fake):
+    slow = publish_queue.submit("a.jpg", "slow")
+    assert fake.started.wait(5)
+    fast = publish_queue.submit("b.jpg", "fast")
+    assert publish_queue.wait(fast.id, 5).status == publish_queue.DONE
+    assert slow.status == publish_queue.RUNNING
+    fake.release.set()
+    assert publish_queue.wait(slow.id, 5).status == publish_queue.DONE
+
+
+def test_group_jobs_queue_behind_each_member(fake):
+    group = publish_queue.submit_group("g.jpg", ["slow", "fast"])
+    assert fake.started.wait(5)
+    single = publish_queue.submit("s.jpg", "slow")
+    assert single.status == publish_queue.QUEUED and group.status == publish_queue.RUNNING
+    fake.release.set()
+
+    assert publish_queue.wait(single.id, 5).status == publish_queue.DONE
+    assert [c["source"] for c in fake.calls] == ["g.jpg", "s.jpg"]
+    assert [j.id for j in publish_queue.jobs("fast")] == [group.id]
+
+
+def _calls(fake):
+    return [(c["source"], c.get("targets", c.get("publish_destination_id")), c.get("update_published", True))
+            for c in fake.calls]
+
+
+def test_newer_publish_drops_a_group_from_its_screen_only(fake):
+    first = publish_queue.submit("a.jpg", "slow")
+    assert fake.started.wait(5)
+    group = publish_queue.submit_group("g.jpg", ["slow", "fast"], skip_bucket=True)
+    assert group.status == publish_queue.QUEUED                        # held by "slow"
+    newer = publish_queue.submit("n.jpg", "slow", skip_bucket=True)
+
+    # No longer waiting on "slow", the group goes out to "fast" alone
+    assert publish_queue.wait(group.id, 5).status == publish_queue.DONE
+    assert group.superseded_by == newer.id and _calls(fake) == [("g.jpg", ["fast"], True)]
+    fake.release.set()
+    assert publish_queue.wait(newer.id, 5).status == publish_queue.DONE
+    assert publish_queue.wait(first.id, 5).status == publish_queue.DONE
+    assert _calls(fake)[1:] == [("a.jpg", "slow", True), ("n.jpg", "slow", True)]
+
+
+def test_newer_publish_demotes_a_group_bucket_save_on_its_screen_only(fake):
+    publish_queue.submit("a.jpg", "slow")
+    assert fake.started.wait(5)
+    group = publish_queue.submit_group("g.jpg", ["slow", "fast"])
+    newer = publish_queue.submit("n.jpg", "slow", skip_bucket=True)
+    fake.release.set()
+
+    assert publish_queue.wait(newer.id, 5).status == publish_queue.DONE
+    assert group.status == publish_queue.DONE and set(group.result["results"]) == {"slow", "fast"}
+    # The save still reaches "slow", but only "fast" shows it; "n.jpg" wins on "slow"
+    assert _calls(fake) == [("a.jpg", "slow", True), ("g.jpg", ["fast"], True),
+                            ("g.jpg", ["slow"], False), ("n.jpg", "slow", True)]
+
+
+def test_failures_and_status_endpoints(fake):
+    job = publish_queue.submit("broken", "fast")
+    assert publish_queue.wait(job.id, 5).status == publish_queue.FAILED
+    assert job.result == {"success": False, "error": "download failed"}
+
+    app = Flask(__name__)
+    app.register_blueprint(publish_api.publish_api)
+    client = app.test_client()
+    assert client.get(f"/publish/jobs/{job.id}").json["status"] == "failed"
+    assert [j["id"] for j in client.get("/publish/jobs?dest=fast").json] == [job.id]
+    assert client.get("/publish/jobs/nope").status_code == 404
+
+    url = "https://example.com/img.jpg?token=secret"
+    queued = publish_queue.submit(url, "fast", skip_bucket=True)
+    publish_queue.wait(queued.id, 5)
+    assert client.get(f"/publish/jobs/{queued.id}").json["source"] == "https://example.com/img.jpg"
@@ -0,0 +1,70 @@
+"""Unit tests for batched reference-image lookup in routes/bucket_utils.py."""
+
+import json
+
+import pytest
+
+from routes import bucketer
+import routes.bucket_utils as bucket_utils
+from routes.bucket_utils import ReferenceImageStorage
+
+
+def ref(name, index=1):
+    return {
+        "index": index,
+        "original_filename": f"upload{index}.png",
+        "stored_path": name,
+        "thumbnail_path": f"thumbnails/{name}.jpg",
+        "content_type": "image/png",
+        "size": 3,
+        "source_type": "file_upload",
+    }
+
+
+@pytest.fixture
+def bucket(tmp_path, monkeypatch):
+    monkeypatch.setattr(bucket_utils, "bucket_path", lambda name: tmp_path / name)
+    monkeypatch.setattr(bucketer, "meta_path", lambda name: tmp_path / name / "bucket.json")
+    bucketer._meta_cache.clear()
+    bdir = tmp_path / "screen"
+    bdir.mkdir()
+
+    # a: refs in its sidecar (one ref file missing on disk)
+    (bdir / "a.jpg").write_bytes(b"img")
+    (bdir / "a.ref.1").write_bytes(b"ref")
+    (bdir / "a.jpg.json").write_text(json.dumps({"reference_images": [ref("a.ref.1"), ref("a.ref.2", 2)]}))
+    # b: legacy refs in bucket.json, prefixed path
+    (bdir / "b.png").write_bytes(b"img")
+    (bdir / "b.ref.1").write_bytes(b"ref")
+    # c: nothing
+    (bdir / "c.mp4").write_bytes(b"vid")
+    bucketer.save_meta("screen", {"sequence": [], "reference_images": {"b": [ref("screen/b.ref.1")]}})
+    return bdir
+
+
+def test_batch_matches_single_lookups(bucket):
+    storage = ReferenceImageStorage()
+    batch = storage.get_reference_images_batch(["a", "b", "c"], "screen")
+
+    for base in ("a", "b", "c"):
+        single = storage.get_reference_images(base, "screen")
+        assert [r.to_dict() for r in batch[base]] == [r.to_dict() for r in single]
+
+    assert [r.stored_path for r in batch["a"]] == ["a.ref.1"]
+    assert [r.stored_path for r in batch["b"]] == ["b.ref.1"]
+    assert batch["c"] == []
+
+
+def test_batch_loads_metadata_once_and_reuses_sidecars(bucket, monkeypatch):
+    calls = []
+    real = bucket_utils.read_meta
+    monkeypatch.setattr(bucket_utils, "read_meta", lambda b: (calls.append(b), real(b))[1])
+    (bucket / "a.jpg.json").write_text("not json")  # must not be read
+
+    result = ReferenceImageStorage().get_reference_images_batch(
+        ["a", "b", "c"], "screen",
+        sidecars={"a.jpg": {"reference_images": [ref("a.ref.1")]}},
+    )
+
+    assert calls == ["screen"]
+    assert [r.stored_path for r in result["a"]] == ["a.ref.1"]
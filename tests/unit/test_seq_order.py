@@ -0,0 +1,58 @@
+"""Unit tests for batch sequence moves (routes/seq_order.py) and the reorder endpoints."""
+
+import pytest
+from flask import Flask
+
+from routes import bucketer, seq_order
+import routes.bucket_api as bucket_api
+
+
+def names(seq):
+    return [e["file"] if isinstance(e, dict) else e for e in seq]
+
+
+def test_move_keeps_entries_and_places_the_block():
+    seq = ["a", {"file": "b", "batchId": "x"}, "c", "d", "e"]
+
+    assert seq_order.move(seq, ["e"], insert_after="a") == 1
+    assert seq == ["a", "e", {"file": "b", "batchId": "x"}, "c", "d"]
+    assert seq_order.move(seq, ["d", "a"], insert_before="b") == 1
+    assert names(seq) == ["e", "d", "a", "b", "c"]
+    assert seq_order.move(seq, ["c"]) == 0
+    assert names(seq) == ["c", "e", "d", "a", "b"]
+
+    with pytest.raises(KeyError):
+        seq_order.move(seq, ["nope"])
+    with pytest.raises(KeyError):
+        seq_order.move(seq, ["a"], insert_after="nope")
+    with pytest.raises(ValueError):
+        seq_order.move(seq, ["a"], insert_after="a")
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(bucketer, "bucket_path", lambda name: tmp_path / name)
+    monkeypatch.setattr(bucketer, "meta_path", lambda name: tmp_path / name / "bucket.json")
+    monkeypatch.setattr(bucket_api, "_load_json_once", lambda *a: [{"id": "screen", "has_bucket": True}])
+    bucketer._meta_cache.clear()
+    (tmp_path / "screen").mkdir()
+    bucketer.save_meta("screen", {"sequence": ["a", "b", "c", "d", "e"]})
+    app = Flask(__name__)
+    app.register_blueprint(bucket_api.buckets_bp)
+    return app.test_client()
+
+
+def test_reorder_endpoints(client):
+    assert client.post("/buckets/screen/move-up/a").json["index"] == 4
+    assert names(bucketer.read_meta("screen")["sequence"]) == ["b", "c", "d", "e", "a"]
+    assert client.post("/buckets/screen/move-down/b").json["index"] == 1
+    assert client.post("/buckets/screen/move-to/a", json={"insert_after": None}).json["index"] == 0
+    assert names(bucketer.read_meta("screen")["sequence"]) == ["a", "c", "b", "d", "e"]
+
+    resp = client.post("/buckets/screen/reorder", json={"filenames": ["e", "a"], "insert_after": "c"})
+    assert resp.status_code == 200 and resp.json["index"] == 1
+    assert resp.json["moved"] == ["e", "a"]
+    assert names(bucketer.read_meta("screen")["sequence"]) == ["c", "e", "a", "b", "d"]
+
+    assert client.post("/buckets/screen/reorder", json={"filenames": ["zz"]}).status_code == 404
+    assert client.post("/buckets/screen/reorder", json={"filenames": ["a"], "insert_after": "a"}).status_code == 400
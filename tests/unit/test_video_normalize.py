@@ -0,0 +1,188 @@
+"""Unit tests for fast-start video normalization (routes/video_normalize.py)."""
+
+import io
+import json
+import shutil
+import struct
+
+import pytest
+
+import config
+from routes import blobstore, display_variants, mp4meta, publish_events, video_normalize
+
+DESTS = [{"id": "screen"}, {"id": "tv", "device_class": "tv", "video_max_kbps": 1}]
+CHUNKS = [b"A" * 500, b"B" * 700, b"C" * 300]
+
+
+def box(kind: bytes, payload: bytes = b"") -> bytes:
+    return struct.pack(">I4s", 8 + len(payload), kind) + payload
+
+
+def full_box(kind: bytes, payload: bytes) -> bytes:
+    return box(kind, b"\0\0\0\0" + payload)
+
+
+def make_mp4(moov_last=True, comment='{"prompt": "waves"}') -> bytes:
+    """ftyp, mdat holding CHUNKS, and a moov whose stco points at them."""
+    ftyp = box(b"ftyp", b"isom\0\0\x02\0isomiso2avc1mp41")
+    mdat = box(b"mdat", b"".join(CHUNKS))
+
+    def moov(first_chunk_at):
+        offsets, pos = [], first_chunk_at
+        for chunk in CHUNKS:
+            offsets.append(pos)
+            pos += len(chunk)
+        stco = full_box(b"stco", struct.pack(f">I{len(offsets)}I", len(offsets), *offsets))
+        entry = box(b"avc1", b"\0" * 24 + struct.pack(">HH", 640, 360) + b"\0" * 50)
+        stbl = box(b"stbl", full_box(b"stsd", struct.pack(">I", 1) + entry)
+                   + full_box(b"stts", struct.pack(">III", 1, 90, 1000)) + stco)
+        mdhd = full_box(b"mdhd", struct.pack(">IIII", 0, 0, 30000, 90_000) + b"\0" * 4)
+        trak = box(b"trak", full_box(b"tkhd", b"\0" * 72 + struct.pack(">II", 640 << 16, 360 << 16))
+                   + box(b"mdia", mdhd + box(b"minf", stbl)))
+        mvhd = full_box(b"mvhd", struct.pack(">IIII", 0, 0, 1000, 3000) + b"\0" * 80)
+        data = box(b"data", struct.pack(">II", 1, 0) + comment.encode())
+        udta = box(b"udta", full_box(b"meta", box(b"ilst", box(b"\xa9cmt", data))))
+        return box(b"moov", mvhd + trak + udta)
+
+    if moov_last:
+        return ftyp + mdat + moov(len(ftyp) + 8)
+    head = len(ftyp) + len(moov(0))
+    return ftyp + moov(head + 8) + mdat
+
+
+def chunks_at_offsets(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    at = data.index(b"stco") + 8
+    count = struct.unpack_from(">I", data, at)[0]
+    offsets = struct.unpack_from(f">{count}I", data, at + 4)
+    return [data[o:o + len(c)] for o, c in zip(offsets, CHUNKS)]
+
+
+@pytest.fixture(autouse=True)
+def clear_probe_cache():
+    mp4meta._cache.clear()
+
+
+@pytest.fixture
+def output(output, monkeypatch):
+    monkeypatch.setattr(display_variants, "_load_json_once", lambda *a: DESTS)
+    monkeypatch.setattr(config, "VIDEO_NORMALIZE_ENABLED", True)
+    return output
+
+
+class HeldPool:
+    """Stands in for the normalizing pool; work runs only when release() is called."""
+
+    def __init__(self):
+        self.held = []
+
+    def submit(self, fn, *args):
+        self.held.append((fn, args))
+
+    def release(self):
+        while self.held:
+            fn, args = self.held.pop(0)
+            fn(*args)
+
+
+def test_remux_moves_moov_first_and_fixes_offsets(tmp_path):
+    src, dst = tmp_path / "late.mp4", tmp_path / "fast.mp4"
+    src.write_bytes(make_mp4())
+    assert chunks_at_offsets(src) == CHUNKS
+    assert not video_normalize.inspect(src)["fast_start"]
+
+    assert video_normalize.faststart(src, dst)
+
+    assert video_normalize.inspect(dst)["fast_start"]
+    assert chunks_at_offsets(dst) == CHUNKS
+    assert dst.stat().st_size == src.stat().st_size
+    assert json.loads(mp4meta.comment(dst)) == {"prompt": "waves"}
+
+
+def test_stco_overflow_is_refused(tmp_path, monkeypatch):
+    moov = bytearray(full_box(b"stco", struct.pack(">II", 1, 0xFFFFFF00)))
+    f = io.BytesIO(bytes(moov))
+    assert not video_normalize._shift_offsets(f, moov, 0, len(moov), 0, 2 ** 32, 0x1000)
+    assert video_normalize._shift_offsets(f, moov, 0, len(moov), 0, 2 ** 32, 0x10)
+    assert struct.unpack_from(">I", moov, 16)[0] == 0xFFFFFF10
+
+    monkeypatch.setattr(video_normalize, "ffmpeg", lambda: None)      # no remux, no fallback
+    monkeypatch.setattr(video_normalize, "_remux", lambda src, dst: False)
+    assert not video_normalize.faststart(tmp_path / "a.mp4", tmp_path / "b.mp4")
+
+
+def test_variant_is_cached_by_source_hash(output, monkeypatch):
+    monkeypatch.setattr(video_normalize, "ffmpeg", lambda: None)
+    src = output / "screen.mp4"
+    src.write_bytes(make_mp4())
+    digest = blobstore.hash_file(src)
+
+    out = display_variants.render(src, "screen", digest)
+    assert out.name == f"{digest[:16]}-faststart.mp4" and out.parent == output / "_variants"
+    assert display_variants.url_for(out) == f"/output/_variants/{out.name}"
+    assert display_variants.existing("screen", src, digest) == out
+
+    monkeypatch.setattr(video_normalize, "faststart", None)        # cache hit: no work
+    assert display_variants.render(src, "screen", digest) == out
+
+    already = output / "ok.mp4"
+    already.write_bytes(make_mp4(moov_last=False))
+    assert display_variants.render(already, "screen", blobstore.hash_file(already)) is None
+
+
+def test_over_the_cap_is_transcoded_when_ffmpeg_is_available(output, monkeypatch):
+    src = output / "tv.mp4"
+    src.write_bytes(make_mp4(moov_last=False))
+    digest = blobstore.hash_file(src)
+
+    monkeypatch.setattr(video_normalize, "ffmpeg", lambda: None)
+    assert display_variants.render(src, "tv", digest) is None        # nothing else to do
+
+    calls = []
+    monkeypatch.setattr(video_normalize, "ffmpeg", lambda: "/usr/bin/ffmpeg")
+    monkeypatch.setattr(video_normalize, "transcode",
+                        lambda s, d, kbps: calls.append(kbps) or shutil.copy(s, d) or True)
+    out = display_variants.render(src, "tv", digest)
+    assert out.name == f"{digest[:16]}-h264-1k.mp4" and calls == [1]
+
+    monkeypatch.setattr(config, "VIDEO_NORMALIZE_ENABLED", False)
+    assert display_variants.render(src, "tv", digest) is None
+
+
+def test_publish_sends_the_original_then_the_variant(output, monkeypatch):
+    monkeypatch.setattr(video_normalize, "ffmpeg", lambda: None)
+    pool = HeldPool()
+    monkeypatch.setattr(display_variants._work, "pool", pool)
+    src = output / "screen.mp4"
+    src.write_bytes(make_mp4())
+    digest = blobstore.hash_file(src)
+
+    assert display_variants.render_for_publish(src, "screen", digest) is None   # nothing rendered inline
+    first = publish_events.emit("screen", src, digest)
+    assert first["url"].startswith("/output/screen.mp4?v=") and len(pool.held) == 1
+    assert not (output / "_variants").exists()
+
+    pool.release()
+    second = publish_events.latest("screen")
+    assert second["url"] == f"/output/_variants/{digest[:16]}-faststart.mp4"
+    assert second["hash"] == digest and second["version"] > first["version"]
+    assert [p.name for p in output.iterdir() if ".pin" in p.name] == []
+
+    # Republished as the cached variant: no second round
+    assert display_variants.render_for_publish(src, "screen", digest).name == f"{digest[:16]}-faststart.mp4"
+
+
+def test_a_late_variant_does_not_replace_a_newer_publish(output, monkeypatch):
+    monkeypatch.setattr(video_normalize, "ffmpeg", lambda: None)
+    pool = HeldPool()
+    monkeypatch.setattr(display_variants._work, "pool", pool)
+    src = output / "screen.mp4"
+    src.write_bytes(make_mp4())
+    publish_events.emit("screen", src)
+
+    still = output / "screen.jpg"
+    still.write_bytes(b"jpeg")
+    newer = publish_events.emit("screen", still)
+    pool.release()
+    assert publish_events.latest("screen") == newer
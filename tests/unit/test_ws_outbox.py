@@ -0,0 +1,103 @@
+"""Unit tests for per-client WebSocket outboxes (connection_registry.Outbox)."""
+
+import asyncio
+import json
+
+import pytest
+
+import config
+import overlay_ws_server
+from connection_registry import ConnectionRegistry
+
+
+class Client:
+    """A socket whose sends complete only when .gate is open."""
+
+    def __init__(self, name, open_gate=True):
+        self.name, self.sent, self.closed_with = name, [], None
+        self.remote_address = (name, 0)
+        self.gate = asyncio.Event()
+        if open_gate:
+            self.gate.set()
+
+    async def send(self, msg):
+        await self.gate.wait()
+        self.sent.append(json.loads(msg))
+
+    async def close(self, code=1000, reason=""):
+        self.closed_with = (code, reason)
+
+
+async def settle():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    reg = ConnectionRegistry()
+    monkeypatch.setattr(overlay_ws_server, "registry", reg)
+    monkeypatch.setattr(config, "WS_SEND_QUEUE_MAX", 4)
+    monkeypatch.setattr(config, "WS_SLOW_CLIENT_MAX_DROPS", 100)
+    return reg
+
+
+def test_a_stuck_client_delays_nobody_else(registry):
+    async def run():
+        fast, stuck = Client("fast"), Client("stuck", open_gate=False)
+        registry.add_overlay(fast)
+        registry.add_overlay(stuck)
+        for i in range(3):
+            await overlay_ws_server.send_overlay_to_clients({"html": str(i)})
+        await settle()
+        assert [m["html"] for m in fast.sent] == ["0", "1", "2"]
+        assert stuck.sent == []
+
+        stuck.gate.set()
+        await settle()
+        assert [m["html"] for m in stuck.sent] == ["0", "1", "2"]
+
+    asyncio.run(run())
+
+
+def test_full_queue_drops_oldest_and_coalesces_by_key(registry):
+    async def run():
+        tv = Client("tv", open_gate=False)
+        registry.add_overlay(tv)
+        await overlay_ws_server.send_overlay_to_clients({"html": "first"})   # in flight
+        await settle()
+        for i in range(6):
+            await overlay_ws_server.send_overlay_to_clients({"html": f"o{i}"})
+        for lux in (10, 20, 30):
+            await overlay_ws_server.send_overlay_to_clients({"sensor_name": "hall", "lux": lux})
+        tv.gate.set()
+        await settle()
+        return tv
+
+    tv = asyncio.run(run())
+    assert [m.get("html", m.get("lux")) for m in tv.sent] == ["first", "o3", "o4", "o5", 30]
+
+
+def test_slow_consumers_are_disconnected(registry, monkeypatch):
+    monkeypatch.setattr(config, "WS_SLOW_CLIENT_MAX_DROPS", 3)
+
+    async def run():
+        dropping, hung = Client("dropping", open_gate=False), Client("hung", open_gate=False)
+        registry.add_overlay(dropping)
+        for i in range(8):
+            await overlay_ws_server.send_overlay_to_clients({"html": str(i)})
+            await settle()
+        assert dropping.closed_with == (1013, "slow consumer")
+        assert dropping not in registry.overlays
+
+        monkeypatch.setattr(config, "WS_SEND_TIMEOUT_S", 0)
+        registry.add_overlay(hung)
+        await overlay_ws_server.send_overlay_to_clients({"html": "a"})
+        await settle()
+        await asyncio.sleep(0.01)
+        await overlay_ws_server.send_overlay_to_clients({"html": "b"})
+        await settle()
+        assert hung.closed_with == (1013, "send timeout")
+        assert hung not in registry.overlays and not registry.outboxes
+
+    asyncio.run(run())
@@ -28,6 +28,9 @@ DEFAULT_SEVERITIES = {
     "device.samsung_token": "warning",
     "assemblyai.stream": "warning",
     "media.download_failed": "warning",
+    "bucket.quota_soft": "warning",
+    "bucket.quota_hard": "error",
+    "disk.low_space": "critical",
     "alerting.storm": "error",
     "alerting.dropped": "error",
     "selftest": "critical",